@@ -0,0 +1,105 @@
+import argparse
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import select
+
+from database_config import ArchiveSessionLocal, archive_engine
+from models_new import ActivityLogArchive
+from utils.activity_log_partitions import (
+    convert_activity_log_to_partitions,
+    list_partitions,
+    partition_name,
+    rehydrate_activity_partition,
+    run_activity_log_retention,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Manage activity_log's monthly partitions: convert the plain table once, "
+            "retire old months to R2, bring an exported month back, or list both."
+        )
+    )
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    retire = subcommands.add_parser("run", help="Export and drop partitions past the retention window.")
+    retire.add_argument("--retain-months", type=int, default=None, help="Override ACTIVITY_LOG_RETAIN_MONTHS.")
+    retire.add_argument("--dry-run", action="store_true", help="Only report which partitions are due.")
+
+    restore = subcommands.add_parser("rehydrate", help="Restore an exported partition from R2.")
+    target = restore.add_mutually_exclusive_group(required=True)
+    target.add_argument("--month", help="Month to restore, YYYY-MM.")
+    target.add_argument("--partition", help="Partition name, e.g. activity_log_legacy.")
+    restore.add_argument("--keep-days", type=int, default=None, help="Override ACTIVITY_LOG_REHYDRATE_DAYS.")
+
+    subcommands.add_parser("list", help="Show live partitions and recorded exports.")
+
+    convert = subcommands.add_parser(
+        "convert",
+        help="One-off: partition the existing plain activity_log table in place (Postgres; run off-peak).",
+    )
+    convert.add_argument("--batch-size", type=int, default=50000, help="Rows per NULL-timestamp backfill batch.")
+
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logger verbosity.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    logging.basicConfig(
+        level=getattr(logging, args.log_level.upper(), logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+    )
+    logger = logging.getLogger("activity_log_retention")
+
+    if args.command == "convert":
+        try:
+            summary = convert_activity_log_to_partitions(archive_engine, batch_size=args.batch_size)
+        except Exception as exc:
+            logger.exception("activity_log convert failed: %s", exc)
+            return 1
+        print(json.dumps(summary, indent=2, sort_keys=True, default=str))
+        return 0
+
+    session = ArchiveSessionLocal()
+    try:
+        if args.command == "run":
+            summary = run_activity_log_retention(session, retain_months=args.retain_months, dry_run=args.dry_run)
+        elif args.command == "rehydrate":
+            name = args.partition or partition_name(datetime.strptime(args.month, "%Y-%m"))
+            summary = rehydrate_activity_partition(session, name, keep_days=args.keep_days)
+        else:
+            summary = {
+                "partitions": [
+                    {
+                        "name": partition.name,
+                        "start": partition.start.isoformat() if partition.start else None,
+                        "end": partition.end.isoformat() if partition.end else None,
+                    }
+                    for partition in list_partitions(session.connection())
+                ],
+                "exports": [
+                    entry.to_dict()
+                    for entry in session.scalars(select(ActivityLogArchive).order_by(ActivityLogArchive.range_end))
+                ],
+            }
+        print(json.dumps(summary, indent=2, sort_keys=True, default=str))
+        return 1 if summary.get("failed") else 0
+    except Exception as exc:
+        session.rollback()
+        logger.exception("activity_log %s failed: %s", args.command, exc)
+        return 1
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,6 +3,9 @@ from sqlalchemy.orm import Session
 from models_new import Task, ArchivedTask, ActivityLog, TaskParticipant, TaskStatusHistory
 from database_config import get_dual_db
 from datetime import datetime
+from sqlalchemy import and_, or_
+from utils.activity_log_writer import activity_log_writer, activity_row
+from utils.archived_tasks import apply_archived_task_summary
 import json
 
 
@@ -61,6 +64,7 @@ class ArchiveService:
                 archived_by=user_id,
                 archive_reason=reason
             )
+            apply_archived_task_summary(archived_task)
             
             archive_db.add(archived_task)
             archive_db.commit()
@@ -115,21 +119,26 @@ class ArchiveService:
             details: Additional details as JSON
             ip_address: User's IP address
             user_agent: User's browser/client info
+
+        The row is queued for the batched writer when it is enabled;
+        archive_db is only written through when it isn't.
         """
+        row = activity_row(
+            user_id=user_id,
+            task_id=task_id,
+            action=action,
+            entity_type=entity_type,
+            entity_id=entity_id,
+            details=details,
+            ip_address=ip_address,
+            user_agent=user_agent,
+        )
+        if activity_log_writer.enqueue(row):
+            # Inserted in the next batch by main.py's flush loop; see
+            # utils/activity_log_writer.py.
+            return
         try:
-            activity = ActivityLog(
-                user_id=user_id,
-                task_id=task_id,
-                action=action,
-                entity_type=entity_type,
-                entity_id=entity_id,
-                details=details or {},
-                ip_address=ip_address,
-                user_agent=user_agent,
-                timestamp=datetime.utcnow()
-            )
-            
-            archive_db.add(activity)
+            archive_db.add(ActivityLog(**row))
             archive_db.commit()
             
             print(f"📝 Activity logged: {action} by user {user_id}")
@@ -140,14 +149,33 @@ class ArchiveService:
     
     
     @staticmethod
-    def get_task_history(task_id: int, archive_db: Session):
-        """Get complete history of a task from archive"""
+    def get_task_history(task_id: int, archive_db: Session, limit: int = None, before_id: int = None):
+        """Get the history of a task from archive, newest first.
+
+        With `limit`, returns at most that many entries; `before_id` (an
+        ActivityLog id from a previous page) continues after it. Both walk
+        ix_activity_log_task_timestamp_id.
+        """
         try:
-            activities = archive_db.query(ActivityLog).filter(
-                ActivityLog.task_id == task_id
-            ).order_by(ActivityLog.timestamp.desc()).all()
-            
-            return [activity.to_dict() for activity in activities]
+            query = archive_db.query(ActivityLog).filter(ActivityLog.task_id == task_id)
+            if before_id is not None:
+                anchor = archive_db.query(ActivityLog.timestamp, ActivityLog.id).filter(
+                    ActivityLog.id == before_id,
+                    ActivityLog.task_id == task_id
+                ).first()
+                if not anchor:
+                    return []
+                query = query.filter(
+                    or_(
+                        ActivityLog.timestamp < anchor.timestamp,
+                        and_(ActivityLog.timestamp == anchor.timestamp, ActivityLog.id < anchor.id)
+                    )
+                )
+            query = query.order_by(ActivityLog.timestamp.desc(), ActivityLog.id.desc())
+            if limit is not None:
+                query = query.limit(limit)
+            
+            return [activity.to_dict() for activity in query.all()]
             
         except Exception as e:
             print(f"❌ Error fetching task history: {str(e)}")
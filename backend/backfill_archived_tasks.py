@@ -0,0 +1,81 @@
+import argparse
+import json
+import logging
+
+from database_config import ArchiveSessionLocal, OperationalSessionLocal
+from utils.archived_tasks import run_archived_task_backfill
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Copy creator, task number, title, status and participants out of every "
+            "archived task's task_data into indexed columns, then mark them ready so "
+            "archive listings stop scanning the whole archive."
+        )
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Number of archived tasks to summarize per transaction.",
+    )
+    parser.add_argument(
+        "--start-after-id",
+        type=int,
+        default=0,
+        help="Resume after this archive id.",
+    )
+    parser.add_argument(
+        "--no-mark-ready",
+        action="store_true",
+        help="Fill the columns without switching readers over.",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logger verbosity for the backfill run.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    logging.basicConfig(
+        level=getattr(logging, args.log_level.upper(), logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+    )
+    logger = logging.getLogger("archived_task_backfill")
+    logger.info(
+        "Starting archived task backfill batch_size=%s start_after_id=%s mark_ready=%s",
+        args.batch_size,
+        args.start_after_id,
+        not args.no_mark_ready,
+    )
+
+    archive_session = ArchiveSessionLocal()
+    operational_session = OperationalSessionLocal()
+    try:
+        summary = run_archived_task_backfill(
+            archive_session,
+            operational_session,
+            batch_size=max(1, args.batch_size),
+            start_after_id=max(0, args.start_after_id),
+            mark_ready=not args.no_mark_ready,
+            logger=logger,
+        )
+        print(json.dumps(summary, indent=2, sort_keys=True))
+        return 0
+    except Exception as exc:
+        archive_session.rollback()
+        operational_session.rollback()
+        logger.exception("Archived task backfill failed: %s", exc)
+        return 1
+    finally:
+        archive_session.close()
+        operational_session.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
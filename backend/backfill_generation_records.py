@@ -3,7 +3,8 @@ import json
 import logging
 
 from database_config import OperationalSessionLocal
-from utils.generation_backfill import run_generation_records_backfill
+from utils.backfill_engine import checkpoint_last_id
+from utils.generation_backfill import GENERATION_BACKFILL_JOB, run_generation_records_backfill
 
 
 def parse_args() -> argparse.Namespace:
@@ -33,6 +34,11 @@ def parse_args() -> argparse.Namespace:
         default=0,
         help="Resume scanning after this usage-event id.",
     )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Start after the last id an earlier --apply run checkpointed (overrides --start-after-id).",
+    )
     parser.add_argument(
         "--log-level",
         default="INFO",
@@ -59,12 +65,17 @@ def main() -> int:
 
     session = OperationalSessionLocal()
     try:
+        start_after_id = max(0, args.start_after_id)
+        if args.resume:
+            start_after_id = checkpoint_last_id(session, GENERATION_BACKFILL_JOB) or start_after_id
+            logger.info("Resuming after usage-event id %s", start_after_id)
         summary = run_generation_records_backfill(
             session,
             apply=args.apply,
             batch_size=max(1, args.batch_size),
             max_rows=args.max_rows or None,
-            start_after_id=max(0, args.start_after_id),
+            start_after_id=start_after_id,
+            checkpoint=args.apply,
             logger=logger,
         )
         print(json.dumps(summary.to_dict(), indent=2, sort_keys=True))
@@ -0,0 +1,76 @@
+import argparse
+import json
+import logging
+
+from database_config import OperationalSessionLocal
+from utils.task_comments import run_task_comment_stats_backfill
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Count every task's comments into tasks.comment_count/last_comment_*, "
+            "then mark them ready so task lists stop counting comment rows."
+        )
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Number of tasks to recount per transaction.",
+    )
+    parser.add_argument(
+        "--start-after-id",
+        type=int,
+        default=0,
+        help="Resume after this task id.",
+    )
+    parser.add_argument(
+        "--no-mark-ready",
+        action="store_true",
+        help="Recount without switching readers over.",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logger verbosity for the backfill run.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    logging.basicConfig(
+        level=getattr(logging, args.log_level.upper(), logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+    )
+    logger = logging.getLogger("task_comment_stats_backfill")
+    logger.info(
+        "Starting task comment stats backfill batch_size=%s start_after_id=%s mark_ready=%s",
+        args.batch_size,
+        args.start_after_id,
+        not args.no_mark_ready,
+    )
+
+    session = OperationalSessionLocal()
+    try:
+        summary = run_task_comment_stats_backfill(
+            session,
+            batch_size=max(1, args.batch_size),
+            start_after_id=max(0, args.start_after_id),
+            mark_ready=not args.no_mark_ready,
+            logger=logger,
+        )
+        print(json.dumps(summary, indent=2, sort_keys=True))
+        return 0
+    except Exception as exc:
+        session.rollback()
+        logger.exception("Task comment stats backfill failed: %s", exc)
+        return 1
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,19 @@
+"""
+Reproducible load tests for the hot read and ingest paths.
+
+seed.py fills an empty database with a deterministic synthetic workload,
+driver.py replays requests against the FastAPI app in-process, and run.py
+ties the two together and writes a JSON report that can be compared with a
+report from another commit:
+
+    python -m benchmarks.run --tier quick --output bench.json
+    python -m benchmarks.run --tier full --database-url postgresql://... \\
+        --baseline bench-main.json
+
+higgsfield_ledger.py times a Higgsfield backfill_all replay over a
+synthetic capture history instead:
+
+    python -m benchmarks.higgsfield_ledger --events 50000 --output ledger.json
+
+Run from backend/, like the backfill scripts.
+"""
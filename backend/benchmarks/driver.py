@@ -0,0 +1,163 @@
+"""
+In-process ASGI load driver.
+
+Requests go through httpx's ASGITransport straight into the FastAPI app - no
+server, no sockets - so what is measured is the app and its database. Each
+scenario runs its requests with a fixed number of concurrent clients; sync
+endpoints still run on Starlette's threadpool, exactly as under uvicorn.
+
+Queries per request are read back from the Server-Timing header that the
+SQL profiler middleware (utils/sql_profiler.py) adds, so the driver turns
+profiling on for the run.
+"""
+import asyncio
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import httpx
+
+_QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # (rng, request_index) -> path, and optionally -> JSON body.
+    path: Callable[[random.Random, int], str]
+    # (rng) -> session token of the user making the request.
+    session: Callable[[random.Random], str]
+    body: Optional[Callable[[random.Random, int], dict]] = None
+    # (response) -> error message, for failures a 2xx status doesn't show.
+    check: Optional[Callable[[httpx.Response], Optional[str]]] = None
+    # Caps the run's concurrency for this scenario (e.g. writes on SQLite,
+    # which has a single writer).
+    max_concurrency: Optional[int] = None
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int = 0
+    errors: int = 0
+    status_counts: dict = field(default_factory=dict)
+    latencies_ms: list = field(default_factory=list)
+    query_counts: list = field(default_factory=list)
+    wall_seconds: float = 0.0
+    first_error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        latencies = sorted(self.latencies_ms)
+        queries = self.query_counts
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "statusCounts": dict(sorted(self.status_counts.items())),
+            "p50Ms": percentile(latencies, 50),
+            "p95Ms": percentile(latencies, 95),
+            "p99Ms": percentile(latencies, 99),
+            "meanMs": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "maxMs": round(latencies[-1], 2) if latencies else None,
+            "queriesPerRequest": {
+                "mean": round(sum(queries) / len(queries), 2) if queries else None,
+                "max": max(queries) if queries else None,
+            },
+            "throughputRps": round(self.requests / self.wall_seconds, 2) if self.wall_seconds else None,
+            "firstError": self.first_error,
+        }
+
+
+def percentile(sorted_values: list, pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, min(len(sorted_values), int(-(-pct * len(sorted_values) // 100))))
+    return round(sorted_values[rank - 1], 2)
+
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+async def _run_scenario(app, scenario: Scenario, *, requests: int, concurrency: int, seed: int) -> ScenarioResult:
+    result = ScenarioResult(name=scenario.name)
+    if scenario.max_concurrency:
+        concurrency = min(concurrency, scenario.max_concurrency)
+    rng = random.Random(f"{seed}:{scenario.name}")
+    # Draw every request up front so concurrency can't change what is sent.
+    plan = []
+    for index in range(requests):
+        plan.append((
+            scenario.path(rng, index),
+            scenario.session(rng),
+            scenario.body(rng, index) if scenario.body else None,
+        ))
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in plan:
+        queue.put_nowait(item)
+
+    transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 50000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench.local", timeout=120.0) as client:
+        async def worker() -> None:
+            while True:
+                try:
+                    path, session, body = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                try:
+                    response = await client.request(scenario.method, path, json=body, headers={"X-Session-Id": session})
+                except Exception as exc:  # noqa: BLE001 - counted as an error, the run goes on
+                    result.requests += 1
+                    result.errors += 1
+                    result.first_error = result.first_error or f"{type(exc).__name__}: {exc}"
+                    continue
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                result.requests += 1
+                result.latencies_ms.append(elapsed_ms)
+                result.status_counts[str(response.status_code)] = result.status_counts.get(str(response.status_code), 0) + 1
+                error = f"{response.status_code}: {response.text[:300]}" if response.status_code >= 400 else None
+                if error is None and scenario.check:
+                    error = scenario.check(response)
+                if error:
+                    result.errors += 1
+                    result.first_error = result.first_error or error
+                match = _QUERY_COUNT.search(response.headers.get("server-timing") or "")
+                if match:
+                    result.query_counts.append(int(match.group(1)))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        result.wall_seconds = time.perf_counter() - started
+    return result
+
+
+def run_scenarios(app, scenarios: list, *, requests: int, concurrency: int, seed: int, warmup: int = 0) -> dict:
+    """Runs each scenario in turn (after `warmup` unrecorded requests) and
+    returns {name: result dict}."""
+    from utils import sql_profiler
+
+    was_enabled = sql_profiler.profiling_enabled()
+    sql_profiler.set_profiling_enabled(True)
+    try:
+        results = {}
+        for scenario in scenarios:
+            if warmup:
+                asyncio.run(_run_scenario(app, scenario, requests=warmup, concurrency=concurrency, seed=seed + 1))
+            outcome = asyncio.run(_run_scenario(app, scenario, requests=requests, concurrency=concurrency, seed=seed))
+            results[scenario.name] = outcome.to_dict()
+        return results
+    finally:
+        sql_profiler.set_profiling_enabled(was_enabled)
+        sql_profiler.slow_request_log.clear()
@@ -0,0 +1,261 @@
+"""
+Replays a synthetic Higgsfield capture history through
+providers/higgsfield/normalization.py's backfill_all and reports how long it
+took and how many queries it ran.
+
+The history is what the extension produces for one busy shared account:
+generation snapshots (single jobs and small same-feature batches), each
+job's credit-ledger charge landing tens of milliseconds after it, the odd
+refund minutes later, and the ledger page being re-read every few jobs, so
+most ledger transactions are captured more than once. Every choice comes
+from random.Random(seed) and timestamps are offsets from a fixed anchor, so
+a seed and event count always give the same rows.
+
+    python -m benchmarks.higgsfield_ledger --events 50000 --output ledger.json
+    python -m benchmarks.higgsfield_ledger --database-url postgresql://... --events 50000
+
+Defaults to a throwaway SQLite file. Run from backend/, like the backfill
+scripts.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.seed import BENCH_PASSWORD_HASH, _insert, configure_environment, prepare_schema
+
+logger = logging.getLogger("benchmarks.higgsfield_ledger")
+
+REPORT_SCHEMA_VERSION = 1
+DEFAULT_EVENTS = 50000
+DEFAULT_SEED = 1729
+HIGGSFIELD_TOOL_SLUG = "higgsfield"
+ANCHOR = datetime(2026, 5, 1)
+# Raw ledger amounts per feature (Higgsfield's unit, 100x the UI number).
+LEDGER_AMOUNTS = {
+    "Nano Banana Pro": (-200, -400),
+    "Seedance 2.0": (-5400,),
+    "Seedance 1.5 Pro": (-1800, -3600),
+    "Kling v3.0": (-1250, -2500),
+    "Angles": (-20,),
+    "Sora 2": (-1000,),
+    "Face Swap": (-300,),
+}
+BATCH_SHARE = 0.2
+REFUND_SHARE = 0.05
+PAGE_READ_SHARE = 0.3
+PAGE_READ_ROWS = 10
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat(timespec="microseconds") + "Z"
+
+
+def build_capture_history(events: int, seed: int = DEFAULT_SEED) -> list:
+    """`events` capture payloads in capture order, as (event_type, payload)."""
+    from providers.higgsfield.constants import EVENT_TYPE_CREDIT_LEDGER_ROW, EVENT_TYPE_NETWORK_SNAPSHOT
+    from providers.higgsfield.normalization import _DISPLAY_NAME_TO_PRESET_CATEGORY
+
+    rng = random.Random(seed)
+    names = sorted(LEDGER_AMOUNTS)
+    history = []
+    recent_ledger = []
+    refunds = []
+    moment = ANCHOR
+    job = 0
+    while len(history) < events:
+        job += 1
+        moment += timedelta(seconds=rng.uniform(5, 90))
+        name = rng.choice(names)
+        amount = rng.choice(LEDGER_AMOUNTS[name])
+        size = rng.randint(2, 4) if rng.random() < BATCH_SHARE else 1
+        for position in range(size):
+            created = moment + timedelta(microseconds=40 * position)
+            history.append((EVENT_TYPE_NETWORK_SNAPSHOT, {
+                "generationId": f"bench-gen-{job:07d}-{position}",
+                "job_set_type": _DISPLAY_NAME_TO_PRESET_CATEGORY[name],
+                "status": "completed",
+                "createdAt": _iso(created),
+            }))
+        for position in range(size):
+            charged = moment + timedelta(milliseconds=rng.randint(30, 100), microseconds=position)
+            row = {
+                "tx_id": f"bench-tx-{job:07d}-{position}", "display_name": name, "total_credits": amount,
+                "action": "spend", "created_at": _iso(charged), "workflow_id": None,
+            }
+            history.append((EVENT_TYPE_CREDIT_LEDGER_ROW, row))
+            recent_ledger.append(row)
+            if rng.random() < REFUND_SHARE:
+                refunds.append((moment + timedelta(minutes=rng.uniform(3, 9)), {
+                    **row, "tx_id": f"bench-refund-{job:07d}-{position}", "total_credits": -amount, "action": "refund",
+                }))
+        due = [row for at, row in refunds if at <= moment]
+        refunds = [(at, row) for at, row in refunds if at > moment]
+        for row in due:
+            history.append((EVENT_TYPE_CREDIT_LEDGER_ROW, row))
+            recent_ledger.append(row)
+        recent_ledger = recent_ledger[-PAGE_READ_ROWS:]
+        if rng.random() < PAGE_READ_SHARE:
+            history.extend((EVENT_TYPE_CREDIT_LEDGER_ROW, row) for row in recent_ledger)
+    return history[:events]
+
+
+def seed_capture_history(db, events: int, seed: int = DEFAULT_SEED) -> dict:
+    """Inserts the history as raw HiggsfieldCaptureEvent rows, unnormalized."""
+    from models_new import ITPortalTool, User
+    from providers.higgsfield.models import HiggsfieldCaptureEvent
+    from providers.payload_store import payload_columns
+
+    if db.scalar(select(func.count(HiggsfieldCaptureEvent.id))):
+        raise RuntimeError("the ledger replay needs an empty higgsfield_capture_events table")
+    user_id = db.scalar(select(User.id).where(User.email == "bench-higgsfield@example.com"))
+    if user_id is None:
+        user_id = _insert(db, User, [{
+            "email": "bench-higgsfield@example.com", "name": "Bench Higgsfield", "hashed_password": BENCH_PASSWORD_HASH,
+            "department": "CREATIVE", "is_active": True, "is_deleted": False,
+        }])[0]
+    tool_id = db.scalar(select(ITPortalTool.id).where(ITPortalTool.slug == HIGGSFIELD_TOOL_SLUG))
+    if tool_id is None:
+        tool_id = _insert(db, ITPortalTool, [{
+            "name": "Higgsfield", "slug": HIGGSFIELD_TOOL_SLUG, "website_url": "https://higgsfield.ai",
+            "status": "active", "is_active": True,
+        }])[0]
+    rows = [
+        {
+            "tool_id": tool_id, "user_id": user_id, "provider": "higgsfield", "event_type": event_type,
+            "client_event_id": f"bench-higgsfield-{index:07d}", **payload_columns("higgsfield", payload),
+            "ownership_confidence": "reconciliation", "capture_version": 1,
+            "event_date": ANCHOR.date(), "created_at": ANCHOR,
+        }
+        for index, (event_type, payload) in enumerate(build_capture_history(events, seed))
+    ]
+    for start in range(0, len(rows), 5000):
+        _insert(db, HiggsfieldCaptureEvent, rows[start:start + 5000])
+    db.commit()
+    return {"captureEvents": len(rows), "toolId": tool_id}
+
+
+def _outcome(db) -> dict:
+    from providers.higgsfield.models import HiggsfieldCreditLedgerEntry, HiggsfieldGeneration
+
+    return {
+        "generations": db.scalar(select(func.count(HiggsfieldGeneration.id))),
+        "creditedGenerations": db.scalar(
+            select(func.count(HiggsfieldGeneration.id)).where(HiggsfieldGeneration.credits_used.isnot(None))
+        ),
+        "ledgerRows": db.scalar(select(func.count(HiggsfieldCreditLedgerEntry.id))),
+        "matchedLedgerRows": db.scalar(
+            select(func.count(HiggsfieldCreditLedgerEntry.id)).where(HiggsfieldCreditLedgerEntry.generation_id.isnot(None))
+        ),
+    }
+
+
+def run_ledger_replay(
+    *, database_url: str, events: int = DEFAULT_EVENTS, seed: int = DEFAULT_SEED, batch_size: int = 500,
+) -> dict:
+    """Seeds the capture history, times backfill_all over it and returns the
+    report dict. configure_environment() must already have run for
+    `database_url`."""
+    from benchmarks.driver import peak_rss_mb
+    from benchmarks.run import _git_state, create_bench_engine
+    from providers.higgsfield.normalization import backfill_all
+
+    engine = create_bench_engine(database_url)
+    queries = {"count": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_args):
+        queries["count"] += 1
+
+    try:
+        prepare_schema(engine)
+        session_factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        with session_factory() as db:
+            started = time.perf_counter()
+            seeded = seed_capture_history(db, events, seed)
+            seed_seconds = round(time.perf_counter() - started, 2)
+        with session_factory() as db:
+            queries["count"] = 0
+            started = time.perf_counter()
+            stats = backfill_all(db, batch_size=batch_size)
+            elapsed = time.perf_counter() - started
+            replay_queries = queries["count"]
+            outcome = _outcome(db)
+    finally:
+        engine.dispose()
+
+    return {
+        "schemaVersion": REPORT_SCHEMA_VERSION,
+        "generatedAt": datetime.utcnow().isoformat() + "Z",
+        "git": _git_state(),
+        "database": engine.dialect.name,
+        "dataset": {"events": events, "seed": seed, "counts": seeded, "seedSeconds": seed_seconds},
+        "replay": {
+            "batchSize": batch_size,
+            "elapsedSeconds": round(elapsed, 2),
+            "eventsPerSecond": round(events / elapsed, 1) if elapsed else None,
+            "queries": replay_queries,
+            "queriesPerEvent": round(replay_queries / events, 2) if events else None,
+            "stats": stats,
+            **outcome,
+        },
+        "peakRssMb": peak_rss_mb(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time a Higgsfield backfill_all replay over synthetic capture history.")
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file.")
+    parser.add_argument("--events", type=int, default=DEFAULT_EVENTS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--output", default=None, help="Write the JSON report here (default: stdout).")
+    args = parser.parse_args(argv)
+
+    # Unmatched ledger rows log at INFO; over 50k events that is the output.
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger("benchmarks").setLevel(logging.INFO)
+    temp_path: Optional[str] = None
+    database_url = args.database_url
+    if not database_url:
+        handle, temp_path = tempfile.mkstemp(prefix="bench-higgsfield-", suffix=".sqlite3")
+        os.close(handle)
+        database_url = f"sqlite:///{temp_path}"
+    configure_environment(database_url)
+
+    try:
+        report = run_ledger_replay(
+            database_url=database_url, events=args.events, seed=args.seed, batch_size=args.batch_size,
+        )
+    except Exception:
+        logger.exception("Ledger replay failed")
+        return 1
+    finally:
+        if temp_path:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.unlink(temp_path + suffix)
+                except FileNotFoundError:
+                    pass
+
+    body = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(body + "\n")
+        logger.info("Wrote %s", args.output)
+    else:
+        print(body)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
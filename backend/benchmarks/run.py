@@ -0,0 +1,365 @@
+"""
+Seeds (or reuses) a benchmark database, drives the hot endpoints and writes
+the JSON report.
+
+    python -m benchmarks.run --tier quick --output bench.json
+    python -m benchmarks.run --tier full --database-url postgresql://... \\
+        --output bench.json --baseline bench-main.json --fail-on-regression
+
+The quick tier defaults to a throwaway SQLite file. database_config only
+builds PostgreSQL engines, so the app is pointed at the benchmark engine by
+overriding get_operational_db/get_archive_db; on Postgres the app's own
+engines target the same database as well, so code paths that open their own
+session see the seeded rows too.
+
+Reports carry the dataset fingerprint; compare_reports() refuses to compare
+two runs over different datasets. Latency regressions are judged against
+--max-regression, query counts are judged strictly - one more query per
+request is always a regression.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.driver import Scenario, peak_rss_mb, run_scenarios
+from benchmarks.seed import (
+    FLOW_TOOL_SLUG,
+    configure_environment,
+    config_for,
+    flow_workflow_payload,
+    load_seeded_dataset,
+    normalize_database_url,
+    prepare_schema,
+    seed_dataset,
+    TIERS,
+    _anchor,
+)
+
+logger = logging.getLogger("benchmarks.run")
+
+REPORT_SCHEMA_VERSION = 1
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+LATENCY_KEYS = ("p50Ms", "p95Ms", "p99Ms")
+CAPTURE_BATCH_SIZE = 20
+# Share of each capture batch that replays an already-stored event, so the
+# duplicate path is exercised alongside inserts.
+CAPTURE_DUPLICATE_SHARE = 0.2
+SEARCH_TERMS = ("banner", "reel", "deck", "voiceover", "thumbnail")
+
+
+def _git_state() -> dict:
+    def git(*args) -> Optional[str]:
+        try:
+            return subprocess.run(
+                ["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=10, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    status = git("status", "--porcelain")
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(status) if status is not None else None}
+
+
+def create_bench_engine(database_url: str):
+    url = normalize_database_url(database_url)
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=20, max_overflow=10, pool_pre_ping=True)
+    engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 30})
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return engine
+
+
+def build_app(engine):
+    """main.app with every request session bound to `engine`."""
+    import main
+    from database_config import get_archive_db, get_operational_db
+    from utils import sql_profiler
+
+    bench_session = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+    def get_bench_db():
+        db = bench_session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[get_operational_db] = get_bench_db
+    main.app.dependency_overrides[get_archive_db] = get_bench_db
+    sql_profiler.install_sql_profiler(engine, "benchmark")
+    return main.app
+
+
+def _check_capture(response) -> Optional[str]:
+    rejected = [item for item in response.json().get("results", []) if item.get("status") == "rejected"]
+    if rejected:
+        return f"{len(rejected)} events rejected: {rejected[0].get('reason')}"
+    return None
+
+
+def build_scenarios(dataset: dict, *, worker_sessions: int = 24, single_writer: bool = False) -> list:
+    """The benchmarked endpoints, each drawing users and parameters from the
+    driver's per-scenario RNG. `single_writer` runs the write scenario one
+    request at a time (SQLite)."""
+    from auth import create_session_token
+
+    admin_token = create_session_token(dataset["adminUserId"])
+    worker_ids = dataset["userIds"][:worker_sessions]
+    worker_tokens = [create_session_token(user_id) for user_id in worker_ids]
+    seeded_events = dataset["counts"].get("captureEvents", 0)
+    anchor = _anchor()
+
+    def worker(rng):
+        return rng.choice(worker_tokens)
+
+    def admin(_rng):
+        return admin_token
+
+    def capture_batch(rng, index):
+        events = []
+        for n in range(CAPTURE_BATCH_SIZE):
+            if seeded_events and rng.random() < CAPTURE_DUPLICATE_SHARE:
+                key = f"seed{rng.randint(1, seeded_events):07d}"
+            else:
+                key = f"run{index:05d}{n:02d}{rng.getrandbits(32):08x}"
+            events.append({
+                "event_type": "generation_workflow_row",
+                "client_event_id": f"bench-{key}",
+                "creation_id": f"wf-{key}",
+                "payload": flow_workflow_payload(key, anchor, rng.randint(1, 600)),
+                "capture_version": 1,
+            })
+        return {"events": events}
+
+    return [
+        Scenario("tasks_inbox", "GET", lambda rng, i: "/api/tasks/inbox?limit=50", worker),
+        Scenario(
+            "tasks_inbox_search", "GET",
+            lambda rng, i: f"/api/tasks/inbox?limit=50&q={rng.choice(SEARCH_TERMS)}", worker,
+        ),
+        Scenario("task_assets", "GET", lambda rng, i: "/api/tasks/assets?limit=60", worker),
+        Scenario(
+            "task_assets_filtered", "GET",
+            lambda rng, i: f"/api/tasks/assets?limit=60&media_type={rng.choice(['image', 'video'])}", worker,
+        ),
+        Scenario("reports_executive", "GET", lambda rng, i: "/api/reports/executive", admin),
+        Scenario(
+            "capture_ingest", "POST", lambda rng, i: f"/api/providers/{FLOW_TOOL_SLUG}/capture/events", worker,
+            body=capture_batch, check=_check_capture, max_concurrency=1 if single_writer else None,
+        ),
+    ]
+
+
+def compare_reports(baseline: dict, current: dict, *, max_regression_pct: float = 20.0) -> dict:
+    """Per-scenario deltas between two reports, with the regressions flagged."""
+    baseline_fp = (baseline.get("dataset") or {}).get("fingerprint")
+    current_fp = (current.get("dataset") or {}).get("fingerprint")
+    if baseline_fp != current_fp:
+        return {
+            "comparable": False,
+            "reason": f"dataset fingerprint differs ({baseline_fp} vs {current_fp})",
+            "baselineCommit": (baseline.get("git") or {}).get("commit"),
+            "regressions": [],
+            "scenarios": {},
+        }
+
+    regressions, scenarios = [], {}
+    for name, now in current.get("scenarios", {}).items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        deltas = {}
+        for key in LATENCY_KEYS:
+            old, new = before.get(key), now.get(key)
+            if not old or new is None:
+                continue
+            change = round((new - old) / old * 100, 1)
+            deltas[key] = {"baseline": old, "current": new, "changePct": change}
+            if change > max_regression_pct:
+                regressions.append(f"{name}.{key} +{change}% ({old} -> {new} ms)")
+        old_queries = (before.get("queriesPerRequest") or {}).get("mean")
+        new_queries = (now.get("queriesPerRequest") or {}).get("mean")
+        if old_queries is not None and new_queries is not None:
+            deltas["queriesPerRequest"] = {"baseline": old_queries, "current": new_queries}
+            if new_queries > old_queries:
+                regressions.append(f"{name}.queriesPerRequest {old_queries} -> {new_queries}")
+        if now.get("errors") and not before.get("errors"):
+            regressions.append(f"{name}.errors 0 -> {now['errors']}")
+        scenarios[name] = deltas
+    return {
+        "comparable": True,
+        "baselineCommit": (baseline.get("git") or {}).get("commit"),
+        "maxRegressionPct": max_regression_pct,
+        "regressions": regressions,
+        "scenarios": scenarios,
+    }
+
+
+def run_benchmark(
+    *,
+    tier: str = "quick",
+    database_url: Optional[str] = None,
+    seed: Optional[int] = None,
+    scale: Optional[float] = None,
+    requests: int = 200,
+    concurrency: int = 8,
+    warmup: int = 10,
+    scenarios: Optional[list] = None,
+    reuse_database: bool = False,
+) -> dict:
+    """Seeds the database (unless reusing one), runs the scenarios and
+    returns the report dict. configure_environment() must already have run
+    for `database_url`."""
+    engine = create_bench_engine(database_url)
+    try:
+        prepare_schema(engine)
+        config = config_for(tier, seed=seed, scale=scale)
+        session_factory = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+        seed_seconds = None
+        with session_factory() as db:
+            if reuse_database:
+                dataset = load_seeded_dataset(db)
+            else:
+                started = time.perf_counter()
+                dataset = seed_dataset(db, config)
+                seed_seconds = round(time.perf_counter() - started, 2)
+
+        app = build_app(engine)
+        selected = build_scenarios(dataset, single_writer=engine.dialect.name == "sqlite")
+        if scenarios:
+            unknown = set(scenarios) - {scenario.name for scenario in selected}
+            if unknown:
+                raise ValueError(f"unknown scenarios: {', '.join(sorted(unknown))}")
+            selected = [scenario for scenario in selected if scenario.name in scenarios]
+        run_seed = dataset["config"]["seed"]
+        results = run_scenarios(
+            app, selected, requests=requests, concurrency=concurrency, seed=run_seed, warmup=warmup,
+        )
+    finally:
+        engine.dispose()
+
+    return {
+        "schemaVersion": REPORT_SCHEMA_VERSION,
+        "generatedAt": datetime.utcnow().isoformat() + "Z",
+        "git": _git_state(),
+        "tier": tier,
+        "database": engine.dialect.name,
+        "dataset": {
+            "fingerprint": dataset["fingerprint"],
+            "config": dataset["config"],
+            "counts": dataset["counts"],
+            "seedSeconds": seed_seconds,
+        },
+        "run": {"requests": requests, "concurrency": concurrency, "warmup": warmup},
+        "scenarios": results,
+        "peakRssMb": peak_rss_mb(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Seed a benchmark database and load-test the hot endpoints.")
+    parser.add_argument("--tier", choices=sorted(TIERS), default="quick")
+    parser.add_argument("--database-url", default=None,
+                        help="Defaults to a temporary SQLite file for the quick tier; required for full.")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--scale", type=float, default=None, help="Multiply every seeded row count.")
+    parser.add_argument("--requests", type=int, default=200, help="Recorded requests per scenario.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10, help="Unrecorded requests per scenario.")
+    parser.add_argument("--scenarios", default=None, help="Comma-separated subset of scenarios to run.")
+    parser.add_argument("--output", default=None, help="Write the JSON report here (default: stdout).")
+    parser.add_argument("--baseline", default=None, help="Earlier report to compare against.")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="Allowed latency increase, in percent.")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit 2 when the comparison finds regressions.")
+    parser.add_argument("--reuse-database", action="store_true", help="Run against a database seeded earlier.")
+    parser.add_argument("--keep-database", action="store_true", help="Don't delete the temporary SQLite file.")
+    args = parser.parse_args(argv)
+
+    # Per-request app and httpx logging would dominate the output (and the timings).
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger("benchmarks").setLevel(logging.INFO)
+    if args.tier == "full" and not args.database_url:
+        parser.error("--database-url is required for the full tier")
+    temp_path = None
+    database_url = args.database_url
+    if not database_url:
+        handle, temp_path = tempfile.mkstemp(prefix="bench-", suffix=".sqlite3")
+        os.close(handle)
+        database_url = f"sqlite:///{temp_path}"
+    configure_environment(database_url)
+
+    try:
+        report = run_benchmark(
+            tier=args.tier,
+            database_url=database_url,
+            seed=args.seed,
+            scale=args.scale,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            warmup=args.warmup,
+            scenarios=[name.strip() for name in args.scenarios.split(",")] if args.scenarios else None,
+            reuse_database=args.reuse_database,
+        )
+    except Exception:
+        logger.exception("Benchmark run failed")
+        return 1
+    finally:
+        if temp_path and not args.keep_database:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.unlink(temp_path + suffix)
+                except FileNotFoundError:
+                    pass
+        elif temp_path:
+            logger.info("Kept benchmark database at %s", temp_path)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            comparison = compare_reports(json.load(handle), report, max_regression_pct=args.max_regression)
+        report["comparison"] = comparison
+        if not comparison["comparable"]:
+            logger.warning("Baseline not comparable: %s", comparison["reason"])
+        for line in comparison["regressions"]:
+            logger.warning("Regression: %s", line)
+        if comparison["regressions"] and args.fail_on_regression:
+            exit_code = 2
+
+    rendered = json.dumps(report, indent=2, sort_keys=False)
+    if args.output:
+        Path(args.output).write_text(rendered + "\n", encoding="utf-8")
+        logger.info("Wrote %s", args.output)
+    else:
+        print(rendered)
+    for name, result in report["scenarios"].items():
+        logger.info(
+            "%-22s p50=%sms p95=%sms p99=%sms queries=%s errors=%s",
+            name, result["p50Ms"], result["p95Ms"], result["p99Ms"],
+            result["queriesPerRequest"]["mean"], result["errors"],
+        )
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
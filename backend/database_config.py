@@ -7,22 +7,13 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import NullPool
 from contextlib import contextmanager
+from utils.env import int_env
 
 
 def _is_truthy(value: str) -> bool:
     return (value or "").strip().lower() in {"1", "true", "yes", "on"}
 
 
-def _int_env(name: str, default: int) -> int:
-    raw = (os.getenv(name) or "").strip()
-    if not raw:
-        return default
-    try:
-        return int(raw)
-    except ValueError:
-        return default
-
-
 def _should_load_env_file() -> bool:
     explicit = (os.getenv("LOAD_DOTENV") or "").strip().lower()
     if explicit in {"1", "true", "yes", "on"}:
@@ -155,10 +146,10 @@ def _pool_settings(url: str) -> dict:
         default_pool_size = 20
         default_max_overflow = 20
     return {
-        "pool_size": max(1, _int_env("DB_POOL_SIZE", default_pool_size)),
-        "max_overflow": max(0, _int_env("DB_MAX_OVERFLOW", default_max_overflow)),
-        "pool_timeout": max(1, _int_env("DB_POOL_TIMEOUT", 5)),
-        "pool_recycle": max(30, _int_env("DB_POOL_RECYCLE", 1800)),
+        "pool_size": max(1, int_env("DB_POOL_SIZE", default_pool_size)),
+        "max_overflow": max(0, int_env("DB_MAX_OVERFLOW", default_max_overflow)),
+        "pool_timeout": max(1, int_env("DB_POOL_TIMEOUT", 5)),
+        "pool_recycle": max(30, int_env("DB_POOL_RECYCLE", 1800)),
         "pool_pre_ping": True,
         "pool_use_lifo": True,
     }
@@ -175,7 +166,7 @@ def _create_engine(url: str):
         # Disable automatic prepare to avoid DuplicatePreparedStatement on startup.
         "connect_args": {
             "prepare_threshold": None,
-            "connect_timeout": max(3, _int_env("DB_CONNECT_TIMEOUT", 10)),
+            "connect_timeout": max(3, int_env("DB_CONNECT_TIMEOUT", 10)),
         },
     }
     if _uses_external_pooler(normalized) and not _is_truthy(os.getenv("DB_USE_SQLALCHEMY_POOL")):
@@ -210,8 +201,8 @@ def _create_engine(url: str):
 # Defaults are deliberately generous: this is meant to catch a leak, not to
 # police slow-but-legitimate work (the asset-mirror sweeps hold a transaction
 # open across a paced fetch loop by design). Set either to 0 to disable.
-DB_IDLE_IN_TRANSACTION_TIMEOUT_MS = _int_env("DB_IDLE_IN_TRANSACTION_TIMEOUT_MS", 300_000)  # 5 min
-DB_STATEMENT_TIMEOUT_MS = _int_env("DB_STATEMENT_TIMEOUT_MS", 0)  # off by default
+DB_IDLE_IN_TRANSACTION_TIMEOUT_MS = int_env("DB_IDLE_IN_TRANSACTION_TIMEOUT_MS", 300_000)  # 5 min
+DB_STATEMENT_TIMEOUT_MS = int_env("DB_STATEMENT_TIMEOUT_MS", 0)  # off by default
 
 
 def _install_session_timeouts(engine) -> None:
@@ -229,7 +220,7 @@ def _install_session_timeouts(engine) -> None:
             with dbapi_connection.cursor() as cursor:
                 for name, milliseconds in settings:
                     # Identifiers are module constants, values are ints from
-                    # _int_env - no user input reaches this string.
+                    # int_env - no user input reaches this string.
                     cursor.execute(f"SET {name} = {int(milliseconds)}")
         except Exception:  # noqa: BLE001 - a pooler that refuses SET must not break connecting
             pass
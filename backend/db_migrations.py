@@ -1,3 +1,5 @@
+import logging
+
 from sqlalchemy import text
 from providers.chatgpt.migrations import ensure_chatgpt_postgres_schema, ensure_chatgpt_sqlite_schema
 from providers.elevenlabs.migrations import ensure_elevenlabs_postgres_schema, ensure_elevenlabs_sqlite_schema
@@ -6,6 +8,7 @@ from providers.flow.migrations import ensure_flow_postgres_schema, ensure_flow_s
 from providers.freepik.migrations import ensure_freepik_postgres_schema, ensure_freepik_sqlite_schema
 from providers.heygen.migrations import ensure_heygen_postgres_schema, ensure_heygen_sqlite_schema
 from providers.higgsfield.migrations import ensure_higgsfield_postgres_schema, ensure_higgsfield_sqlite_schema
+from utils.activity_log_partitions import ensure_activity_log_partitioning
 
 DEFAULT_DEPARTMENT_DIRECTORY = (
     "CREATIVE",
@@ -18,6 +21,8 @@ DEFAULT_DEPARTMENT_DIRECTORY = (
     "3D Visualizer",
 )
 
+logger = logging.getLogger(__name__)
+
 DEFAULT_TOOL_DIRECTORY = (
     {
         "name": "Claude",
@@ -342,6 +347,11 @@ def _ensure_postgres_schema(conn) -> None:
     _pg_add_column_if_missing(conn, "tasks", "current_stage_title", "VARCHAR")
     _pg_add_column_if_missing(conn, "tasks", "final_approval_required", "BOOLEAN DEFAULT FALSE")
     _pg_add_column_if_missing(conn, "task_comments", "stage_id", "INTEGER")
+    # Comment thread summary (see utils/task_comments.py); filled for
+    # existing tasks by backfill_task_comment_stats.py.
+    _pg_add_column_if_missing(conn, "tasks", "comment_count", "INTEGER NOT NULL DEFAULT 0")
+    _pg_add_column_if_missing(conn, "tasks", "last_comment_id", "INTEGER")
+    _pg_add_column_if_missing(conn, "tasks", "last_comment_at", "TIMESTAMP")
     conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_is_deleted ON users(is_deleted)"))
     conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_session_revoked_at ON users(session_revoked_at)"))
     conn.execute(
@@ -839,6 +849,9 @@ def _ensure_postgres_schema(conn) -> None:
     conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_workflow_status ON tasks(workflow_status)"))
     conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_current_stage_order ON tasks(current_stage_order)"))
     conn.execute(text("CREATE INDEX IF NOT EXISTS ix_task_comments_stage_id ON task_comments(stage_id)"))
+    conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_task_comments_task_created_id ON task_comments(task_id, created_at, id)")
+    )
     conn.execute(
         text(
             """
@@ -1005,6 +1018,72 @@ def _ensure_postgres_schema(conn) -> None:
             """
         )
     )
+    # Per-user list membership for tasks (see utils/task_visibility.py). The
+    # covering index turns inbox/outbox/all-tasks/unread into one range scan
+    # on (user_id, updated_at) without visiting the heap for the lane check.
+    conn.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS task_visibility (
+                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+                task_id INTEGER NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+                lanes INTEGER NOT NULL DEFAULT 0,
+                is_read BOOLEAN NOT NULL DEFAULT TRUE,
+                updated_at TIMESTAMP,
+                PRIMARY KEY (user_id, task_id)
+            )
+            """
+        )
+    )
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_task_visibility_task_id ON task_visibility(task_id)"))
+    conn.execute(
+        text(
+            """
+            CREATE INDEX IF NOT EXISTS ix_task_visibility_user_updated
+            ON task_visibility(user_id, updated_at, task_id) INCLUDE (lanes, is_read)
+            """
+        )
+    )
+    # Task search text (see utils/task_search.py). The trigram GIN index
+    # serves LIKE '%q%' directly; without pg_trgm (no CREATE privilege) the
+    # table is still searched correctly, just by a scan of one narrow table.
+    conn.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS task_search_documents (
+                task_id INTEGER PRIMARY KEY REFERENCES tasks(id) ON DELETE CASCADE,
+                document TEXT NOT NULL DEFAULT '',
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+    )
+    try:
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as exc:
+        logger.warning("pg_trgm unavailable, task search falls back to sequential scans: %s", exc)
+    else:
+        conn.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS ix_task_search_documents_trgm
+                ON task_search_documents USING gin (document gin_trgm_ops)
+                """
+            )
+        )
+    conn.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS task_cards (
+                task_id INTEGER PRIMARY KEY REFERENCES tasks(id) ON DELETE CASCADE,
+                card_json JSON NOT NULL,
+                source_updated_at TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+    )
     conn.execute(
         text(
             """
@@ -1359,6 +1438,9 @@ def ensure_operational_schema(engine) -> None:
                 "current_stage_order": "INTEGER",
                 "current_stage_title": "VARCHAR",
                 "final_approval_required": "BOOLEAN DEFAULT 0",
+                "comment_count": "INTEGER NOT NULL DEFAULT 0",
+                "last_comment_id": "INTEGER",
+                "last_comment_at": "DATETIME",
             }
             for column, sql_type in add_columns.items():
                 if column not in task_cols:
@@ -1378,6 +1460,12 @@ def ensure_operational_schema(engine) -> None:
             if "attachments_json" not in comment_cols:
                 conn.execute(text("ALTER TABLE task_comments ADD COLUMN attachments_json JSON"))
             conn.execute(text("CREATE INDEX IF NOT EXISTS ix_task_comments_stage_id ON task_comments(stage_id)"))
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_task_comments_task_created_id "
+                    "ON task_comments(task_id, created_at, id)"
+                )
+            )
 
         if _table_exists(conn, "task_notifications"):
             notif_cols = _table_columns(conn, "task_notifications")
@@ -1519,6 +1607,51 @@ def ensure_operational_schema(engine) -> None:
         conn.execute(text("CREATE INDEX IF NOT EXISTS ix_task_views_user_id ON task_views(user_id)"))
         conn.execute(text("CREATE INDEX IF NOT EXISTS ix_task_stage_assignees_user_id ON task_stage_assignees(user_id)"))
 
+        conn.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS task_visibility (
+                    user_id INTEGER NOT NULL,
+                    task_id INTEGER NOT NULL,
+                    lanes INTEGER NOT NULL DEFAULT 0,
+                    is_read BOOLEAN NOT NULL DEFAULT 1,
+                    updated_at DATETIME,
+                    PRIMARY KEY (user_id, task_id),
+                    FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+                    FOREIGN KEY(task_id) REFERENCES tasks (id) ON DELETE CASCADE
+                )
+                """
+            )
+        )
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_task_visibility_task_id ON task_visibility(task_id)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_task_visibility_user_updated ON task_visibility(user_id, updated_at, task_id)"))
+
+        conn.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS task_search_documents (
+                    task_id INTEGER PRIMARY KEY,
+                    document TEXT NOT NULL DEFAULT '',
+                    updated_at DATETIME,
+                    FOREIGN KEY(task_id) REFERENCES tasks (id) ON DELETE CASCADE
+                )
+                """
+            )
+        )
+        conn.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS task_cards (
+                    task_id INTEGER PRIMARY KEY,
+                    card_json JSON NOT NULL,
+                    source_updated_at DATETIME,
+                    updated_at DATETIME,
+                    FOREIGN KEY(task_id) REFERENCES tasks (id) ON DELETE CASCADE
+                )
+                """
+            )
+        )
+
         conn.execute(
             text(
                 """
@@ -2044,3 +2177,108 @@ def ensure_operational_schema(engine) -> None:
             credential_cols = _table_columns(conn, "it_portal_tool_credentials")
             if "login_method" not in credential_cols:
                 conn.execute(text("ALTER TABLE it_portal_tool_credentials ADD COLUMN login_method VARCHAR(40) DEFAULT 'email_password'"))
+
+
+_ARCHIVED_TASK_SUMMARY_COLUMNS = {
+    "creator_id": "INTEGER",
+    "task_number": "VARCHAR",
+    "title": "VARCHAR",
+    "status": "VARCHAR",
+}
+
+
+def ensure_archive_schema(engine) -> None:
+    """Additive migrations for the archive tables (ArchiveBase). Runs against
+    archive_engine, which may be the operational engine."""
+    dialect = engine.dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        return
+
+    id_column = "SERIAL PRIMARY KEY" if dialect == "postgresql" else "INTEGER PRIMARY KEY"
+    with engine.begin() as conn:
+        if not _table_exists(conn, "archived_tasks"):
+            # create_all hasn't run against this database yet; it will
+            # create everything below from the models.
+            return
+
+        # Task summary copied out of task_data (see utils/archived_tasks.py);
+        # filled for existing rows by backfill_archived_tasks.py.
+        for column, sql_type in _ARCHIVED_TASK_SUMMARY_COLUMNS.items():
+            if dialect == "postgresql":
+                _pg_add_column_if_missing(conn, "archived_tasks", column, sql_type)
+            elif column not in _table_columns(conn, "archived_tasks"):
+                conn.execute(text(f"ALTER TABLE archived_tasks ADD COLUMN {column} {sql_type}"))
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_archived_tasks_creator_archived_id "
+                "ON archived_tasks(creator_id, archived_at, id)"
+            )
+        )
+        conn.execute(
+            text(
+                f"""
+                CREATE TABLE IF NOT EXISTS archived_task_participants (
+                    id {id_column},
+                    archived_task_id INTEGER NOT NULL REFERENCES archived_tasks (id) ON DELETE CASCADE,
+                    original_task_id INTEGER,
+                    user_id INTEGER NOT NULL,
+                    role VARCHAR,
+                    CONSTRAINT ux_archived_task_participants_task_user UNIQUE (archived_task_id, user_id)
+                )
+                """
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_archived_task_participants_user_task "
+                "ON archived_task_participants(user_id, archived_task_id)"
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_archived_task_participants_original_user "
+                "ON archived_task_participants(original_task_id, user_id)"
+            )
+        )
+
+        if _table_exists(conn, "activity_log"):
+            # Once activity_log is partitioned (a one-off, explicit step - see
+            # utils/activity_log_partitions.py), keeps the coming months'
+            # partitions in place; the indexes below then land on the parent.
+            ensure_activity_log_partitioning(conn)
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_activity_log_task_timestamp_id "
+                    "ON activity_log(task_id, timestamp, id)"
+                )
+            )
+            conn.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_activity_log_user_timestamp_id "
+                    "ON activity_log(user_id, timestamp, id)"
+                )
+            )
+
+        timestamp_type = "TIMESTAMP" if dialect == "postgresql" else "DATETIME"
+        conn.execute(
+            text(
+                f"""
+                CREATE TABLE IF NOT EXISTS activity_log_archives (
+                    id {id_column},
+                    partition_name VARCHAR NOT NULL UNIQUE,
+                    range_start {timestamp_type},
+                    range_end {timestamp_type} NOT NULL,
+                    object_key VARCHAR NOT NULL,
+                    row_count INTEGER NOT NULL DEFAULT 0,
+                    byte_size INTEGER NOT NULL DEFAULT 0,
+                    exported_at {timestamp_type},
+                    dropped_at {timestamp_type},
+                    rehydrated_at {timestamp_type},
+                    rehydrated_until {timestamp_type}
+                )
+                """
+            )
+        )
+        conn.execute(
+            text("CREATE INDEX IF NOT EXISTS ix_activity_log_archives_range_end ON activity_log_archives(range_end)")
+        )
@@ -1,12 +1,15 @@
+const os = require('os');
+const path = require('path');
+
 module.exports = {
   apps: [
     {
       name: 'backend',
       cwd: __dirname,
       script: 'venv/bin/python3',
+      // run_server.py empties PROMETHEUS_MULTIPROC_DIR, then execs uvicorn.
       args: [
-        '-m',
-        'uvicorn',
+        'run_server.py',
         'main:app',
         '--host',
         '0.0.0.0',
@@ -34,6 +37,9 @@ module.exports = {
         NOTIFICATION_QUEUE_MAX_SIZE: '1000',
         NOTIFICATION_QUEUE_WORKERS: '2',
         WEB_CONCURRENCY: process.env.WEB_CONCURRENCY || '2',
+        // Shared by the workers so /metrics covers all of them (utils/metrics.py).
+        PROMETHEUS_MULTIPROC_DIR:
+          process.env.PROMETHEUS_MULTIPROC_DIR || path.join(os.tmpdir(), 'backend-prometheus-multiproc'),
       },
     },
   ],
@@ -2,11 +2,12 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, Response
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from datetime import datetime
 import asyncio
+import hmac
 import os
 import re
 import time
@@ -24,7 +25,8 @@ from database_config import (
     OPERATIONAL_DB_URL,
     ARCHIVE_DB_URL,
 )
-from db_migrations import ensure_operational_schema
+from db_migrations import ensure_archive_schema, ensure_operational_schema
+from utils import metrics, sql_profiler
 
 from models_new import User, Task, TaskParticipant, TaskStatusHistory, ArchivedTask, ActivityLog
 import providers.chatgpt  # noqa: F401 (registers ChatGPT Conversation* models onto Base.metadata)
@@ -61,6 +63,11 @@ from routers import reports_router
 from routers import credit_rates_router
 from routers import report_distribution_router
 from utils import cache as cache_utils
+from utils import config_cache
+from utils.env import bool_env, int_env
+from utils.activity_log_writer import ACTIVITY_LOG_FLUSH_MS, activity_log_writer
+from utils.task_views import TASK_VIEW_FLUSH_SECONDS, task_view_buffer
+from utils.activity_log_partitions import run_activity_log_retention
 
 # Import auth utilities for system status
 from auth import SESSION_STORE
@@ -68,6 +75,8 @@ from auth import get_password_hash
 from auth import cleanup_expired_reset_tokens, cleanup_expired_sessions
 from routers.tasks_router import notification_dispatcher
 from services.notification_outbox_service import dispatch_notification_outbox_batch
+from services.ephemeral_state_service import get_ephemeral_state_stats
+from services.mailbox_watcher import mailbox_watchers
 from routers.report_distribution_router import process_due_schedules
 
 def _split_csv(value: str) -> list[str]:
@@ -111,7 +120,7 @@ def _allowed_origin_regex() -> str | None:
     configured = (os.getenv("CORS_ALLOW_ORIGIN_REGEX") or "").strip()
     if configured:
         return configured
-    if _bool_env("CORS_ALLOW_RENDER_PREVIEWS", False):
+    if bool_env("CORS_ALLOW_RENDER_PREVIEWS", False):
         return r"https://.*\.onrender\.com"
     return None
 
@@ -149,27 +158,10 @@ def _safe_print(value: object = "") -> None:
     print(_ascii_safe_text(value))
 
 
-def _int_env(name: str, default: int) -> int:
-    raw = (os.getenv(name) or "").strip()
-    if not raw:
-        return default
-    try:
-        return int(raw)
-    except ValueError:
-        return default
-
-
-def _bool_env(name: str, default: bool = False) -> bool:
-    raw = (os.getenv(name) or "").strip().lower()
-    if not raw:
-        return default
-    return raw in {"1", "true", "yes", "on"}
-
-
 def _startup_schema_sync_enabled() -> bool:
     raw = (os.getenv("RUN_STARTUP_SCHEMA_SYNC") or "").strip()
     if raw:
-        return _bool_env("RUN_STARTUP_SCHEMA_SYNC", True)
+        return bool_env("RUN_STARTUP_SCHEMA_SYNC", True)
     return not _is_production()
 
 
@@ -249,6 +241,17 @@ def _run_freepik_asset_mirror_cycle(limit: int) -> dict:
         db.close()
 
 
+def _run_activity_log_retention_cycle() -> dict:
+    db = ArchiveSessionLocal()
+    try:
+        return run_activity_log_retention(db)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 def _run_flow_asset_mirror_cycle(limit: int) -> dict:
     db = OperationalSessionLocal()
     try:
@@ -293,7 +296,7 @@ async def _periodic_report_schedule_dispatch(interval_seconds: int = 300) -> Non
         try:
             result = await asyncio.wait_for(
                 asyncio.to_thread(_run_report_schedule_cycle),
-                timeout=max(30, _int_env("REPORT_SCHEDULE_TIMEOUT_SECONDS", 300)),
+                timeout=max(30, int_env("REPORT_SCHEDULE_TIMEOUT_SECONDS", 300)),
             )
             if result.get("processed"):
                 sent = sum(1 for r in result.get("results", []) if r.get("status") == "sent")
@@ -309,9 +312,9 @@ async def _periodic_notification_outbox_dispatch(interval_seconds: int = 30) ->
             dispatched = await asyncio.wait_for(
                 asyncio.to_thread(
                     _run_notification_outbox_cycle,
-                    _int_env("NOTIFICATION_OUTBOX_BATCH_SIZE", 100),
+                    int_env("NOTIFICATION_OUTBOX_BATCH_SIZE", 100),
                 ),
-                timeout=max(5, _int_env("NOTIFICATION_OUTBOX_DISPATCH_TIMEOUT_SECONDS", 20)),
+                timeout=max(5, int_env("NOTIFICATION_OUTBOX_DISPATCH_TIMEOUT_SECONDS", 20)),
             )
             if dispatched:
                 _safe_print(f"Notification outbox dispatched={dispatched}")
@@ -328,13 +331,15 @@ async def _periodic_freepik_asset_mirror_dispatch(interval_seconds: int = 300) -
     while True:
         await asyncio.sleep(max(60, interval_seconds))
         try:
+            started_at = time.perf_counter()
             stats = await asyncio.wait_for(
                 asyncio.to_thread(
                     _run_freepik_asset_mirror_cycle,
-                    _int_env("FREEPIK_ASSET_MIRROR_BATCH_SIZE", 25),
+                    int_env("FREEPIK_ASSET_MIRROR_BATCH_SIZE", 25),
                 ),
-                timeout=max(30, _int_env("FREEPIK_ASSET_MIRROR_TIMEOUT_SECONDS", 180)),
+                timeout=max(30, int_env("FREEPIK_ASSET_MIRROR_TIMEOUT_SECONDS", 180)),
             )
+            metrics.record_mirror_sweep("freepik", stats, time.perf_counter() - started_at)
             if stats.get("scanned"):
                 _safe_print(
                     "Freepik asset mirror scanned="
@@ -354,13 +359,15 @@ async def _periodic_flow_asset_mirror_dispatch(interval_seconds: int = 300) -> N
     while True:
         await asyncio.sleep(max(60, interval_seconds))
         try:
+            started_at = time.perf_counter()
             stats = await asyncio.wait_for(
                 asyncio.to_thread(
                     _run_flow_asset_mirror_cycle,
-                    _int_env("FLOW_ASSET_MIRROR_BATCH_SIZE", 25),
+                    int_env("FLOW_ASSET_MIRROR_BATCH_SIZE", 25),
                 ),
-                timeout=max(30, _int_env("FLOW_ASSET_MIRROR_TIMEOUT_SECONDS", 180)),
+                timeout=max(30, int_env("FLOW_ASSET_MIRROR_TIMEOUT_SECONDS", 180)),
             )
+            metrics.record_mirror_sweep("flow", stats, time.perf_counter() - started_at)
             if stats.get("scanned"):
                 _safe_print(
                     "Flow asset mirror scanned="
@@ -380,13 +387,15 @@ async def _periodic_heygen_asset_mirror_dispatch(interval_seconds: int = 300) ->
     while True:
         await asyncio.sleep(max(60, interval_seconds))
         try:
+            started_at = time.perf_counter()
             stats = await asyncio.wait_for(
                 asyncio.to_thread(
                     _run_heygen_asset_mirror_cycle,
-                    _int_env("HEYGEN_ASSET_MIRROR_BATCH_SIZE", 25),
+                    int_env("HEYGEN_ASSET_MIRROR_BATCH_SIZE", 25),
                 ),
-                timeout=max(30, _int_env("HEYGEN_ASSET_MIRROR_TIMEOUT_SECONDS", 180)),
+                timeout=max(30, int_env("HEYGEN_ASSET_MIRROR_TIMEOUT_SECONDS", 180)),
             )
+            metrics.record_mirror_sweep("heygen", stats, time.perf_counter() - started_at)
             if stats.get("scanned"):
                 _safe_print(
                     "HeyGen asset mirror scanned="
@@ -407,13 +416,15 @@ async def _periodic_elevenlabs_asset_mirror_dispatch(interval_seconds: int = 300
     while True:
         await asyncio.sleep(max(60, interval_seconds))
         try:
+            started_at = time.perf_counter()
             stats = await asyncio.wait_for(
                 asyncio.to_thread(
                     _run_elevenlabs_asset_mirror_cycle,
-                    _int_env("ELEVENLABS_ASSET_MIRROR_BATCH_SIZE", 25),
+                    int_env("ELEVENLABS_ASSET_MIRROR_BATCH_SIZE", 25),
                 ),
-                timeout=max(30, _int_env("ELEVENLABS_ASSET_MIRROR_TIMEOUT_SECONDS", 180)),
+                timeout=max(30, int_env("ELEVENLABS_ASSET_MIRROR_TIMEOUT_SECONDS", 180)),
             )
+            metrics.record_mirror_sweep("elevenlabs", stats, time.perf_counter() - started_at)
             if stats.get("scanned"):
                 _safe_print(
                     "ElevenLabs asset mirror scanned="
@@ -424,6 +435,59 @@ async def _periodic_elevenlabs_asset_mirror_dispatch(interval_seconds: int = 300
             _safe_print(f"ElevenLabs asset mirror dispatch failed: {exc}")
 
 
+async def _periodic_activity_log_retention(interval_seconds: int = 86400) -> None:
+    """Creates the coming months' activity_log partitions and retires the
+    ones past ACTIVITY_LOG_RETAIN_MONTHS to R2 - see
+    utils/activity_log_partitions.py. A no-op off Postgres."""
+    while True:
+        await asyncio.sleep(max(300, interval_seconds))
+        try:
+            stats = await asyncio.wait_for(
+                asyncio.to_thread(_run_activity_log_retention_cycle),
+                timeout=max(60, int_env("ACTIVITY_LOG_RETENTION_TIMEOUT_SECONDS", 3600)),
+            )
+            if stats.get("created") or stats.get("dropped") or stats.get("failed"):
+                _safe_print(
+                    "Activity log retention created="
+                    f"{len(stats['created'])} dropped={len(stats['dropped'])} failed={len(stats['failed'])}"
+                )
+        except Exception as exc:
+            _safe_print(f"Activity log retention failed: {exc}")
+
+
+async def _periodic_metrics_collect(interval_seconds: int) -> None:
+    """Refreshes this worker's mirrored gauges (queue depth, pool size) in the
+    multiprocess directory so a scrape answered by any worker sees them."""
+    while True:
+        await asyncio.sleep(max(1, interval_seconds))
+        try:
+            await asyncio.to_thread(metrics.run_collectors)
+        except Exception as exc:
+            _safe_print(f"Metrics collection failed: {exc}")
+
+
+async def _periodic_task_view_flush(interval_seconds: int) -> None:
+    """Writes the seen-by timestamps buffered by comment thread reads (see
+    utils/task_views.py)."""
+    while True:
+        await asyncio.sleep(max(1, interval_seconds))
+        try:
+            await asyncio.to_thread(task_view_buffer.flush, OperationalSessionLocal)
+        except Exception as exc:
+            _safe_print(f"Task view flush failed: {exc}")
+
+
+async def _periodic_activity_log_flush(interval_ms: int) -> None:
+    """Inserts the activity log rows queued by ArchiveService.log_activity
+    in batches (see utils/activity_log_writer.py)."""
+    while True:
+        await asyncio.sleep(max(50, interval_ms) / 1000)
+        try:
+            await asyncio.to_thread(activity_log_writer.flush, ArchiveSessionLocal)
+        except Exception as exc:
+            _safe_print(f"Activity log flush failed, rows spooled to disk: {exc}")
+
+
 # ==================== LIFESPAN EVENT ====================
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -443,6 +507,7 @@ async def lifespan(app: FastAPI):
         _safe_print("\nInitializing archive database...")
         _safe_print(f"Archive DB target: {_mask_db_url(ARCHIVE_DB_URL)}")
         ArchiveBase.metadata.create_all(bind=archive_engine)
+        ensure_archive_schema(archive_engine)
         _safe_print(f"Archive database ready: {archive_engine.dialect.name}")
     else:
         _safe_print("\nStartup schema sync disabled.")
@@ -508,29 +573,47 @@ async def lifespan(app: FastAPI):
     except Exception as exc:
         _safe_print(f"Notification dispatcher failed to start; continuing degraded: {exc}")
     auth_cleanup_task = asyncio.create_task(
-        _periodic_auth_store_cleanup(_int_env("AUTH_CLEANUP_INTERVAL_SECONDS", 3600)),
+        _periodic_auth_store_cleanup(int_env("AUTH_CLEANUP_INTERVAL_SECONDS", 3600)),
         name="auth-store-cleanup",
     )
     notification_outbox_task = asyncio.create_task(
-        _periodic_notification_outbox_dispatch(_int_env("NOTIFICATION_OUTBOX_INTERVAL_SECONDS", 30)),
+        _periodic_notification_outbox_dispatch(int_env("NOTIFICATION_OUTBOX_INTERVAL_SECONDS", 30)),
         name="notification-outbox-dispatch",
     )
     report_schedule_task = asyncio.create_task(
-        _periodic_report_schedule_dispatch(_int_env("REPORT_SCHEDULE_INTERVAL_SECONDS", 300)),
+        _periodic_report_schedule_dispatch(int_env("REPORT_SCHEDULE_INTERVAL_SECONDS", 300)),
         name="report-schedule-dispatch",
     )
     freepik_asset_mirror_task = asyncio.create_task(
-        _periodic_freepik_asset_mirror_dispatch(_int_env("FREEPIK_ASSET_MIRROR_INTERVAL_SECONDS", 300)),
+        _periodic_freepik_asset_mirror_dispatch(int_env("FREEPIK_ASSET_MIRROR_INTERVAL_SECONDS", 300)),
         name="freepik-asset-mirror-dispatch",
     )
     flow_asset_mirror_task = asyncio.create_task(
-        _periodic_flow_asset_mirror_dispatch(_int_env("FLOW_ASSET_MIRROR_INTERVAL_SECONDS", 300)),
+        _periodic_flow_asset_mirror_dispatch(int_env("FLOW_ASSET_MIRROR_INTERVAL_SECONDS", 300)),
         name="flow-asset-mirror-dispatch",
     )
     heygen_asset_mirror_task = asyncio.create_task(
-        _periodic_heygen_asset_mirror_dispatch(_int_env("HEYGEN_ASSET_MIRROR_INTERVAL_SECONDS", 300)),
+        _periodic_heygen_asset_mirror_dispatch(int_env("HEYGEN_ASSET_MIRROR_INTERVAL_SECONDS", 300)),
         name="heygen-asset-mirror-dispatch",
     )
+    task_view_flush_task = asyncio.create_task(
+        _periodic_task_view_flush(TASK_VIEW_FLUSH_SECONDS),
+        name="task-view-flush",
+    )
+    activity_log_flush_task = asyncio.create_task(
+        _periodic_activity_log_flush(ACTIVITY_LOG_FLUSH_MS),
+        name="activity-log-flush",
+    )
+    activity_log_retention_task = asyncio.create_task(
+        _periodic_activity_log_retention(int_env("ACTIVITY_LOG_RETENTION_INTERVAL_SECONDS", 86400)),
+        name="activity-log-retention",
+    )
+    metrics_collect_task = None
+    if metrics.multiprocess_dir():
+        metrics_collect_task = asyncio.create_task(
+            _periodic_metrics_collect(metrics.METRICS_COLLECT_SECONDS),
+            name="metrics-collect",
+        )
     # ElevenLabs' periodic asset-mirror sweep is intentionally NOT started
     # (unlike Freepik's/HeyGen's above). Confirmed 2026-08-13 (see
     # providers/elevenlabs/CAPTURE_CONTRACT.md's "Audio asset delivery"
@@ -559,12 +642,35 @@ async def lifespan(app: FastAPI):
         freepik_asset_mirror_task.cancel()
         heygen_asset_mirror_task.cancel()
         flow_asset_mirror_task.cancel()
+        task_view_flush_task.cancel()
+        activity_log_flush_task.cancel()
+        activity_log_retention_task.cancel()
+        if metrics_collect_task is not None:
+            metrics_collect_task.cancel()
         await asyncio.gather(
             auth_cleanup_task, notification_outbox_task, report_schedule_task,
             freepik_asset_mirror_task, heygen_asset_mirror_task, flow_asset_mirror_task,
+            task_view_flush_task, activity_log_flush_task, activity_log_retention_task,
+            *([metrics_collect_task] if metrics_collect_task is not None else []),
             return_exceptions=True,
         )
+        try:
+            await asyncio.to_thread(task_view_buffer.flush, OperationalSessionLocal)
+        except Exception as exc:
+            _safe_print(f"Final task view flush failed: {exc}")
+        try:
+            await asyncio.to_thread(activity_log_writer.flush, ArchiveSessionLocal, force=True)
+        except Exception as exc:
+            _safe_print(f"Final activity log flush failed: {exc}")
+        # Whatever couldn't be inserted is replayed by the next process.
+        activity_log_writer.spill()
         await notification_dispatcher.stop()
+        mailbox_watchers.shutdown()
+        if metrics_collect_task is not None:
+            try:
+                metrics.mark_process_dead()
+            except Exception as exc:
+                _safe_print(f"Metrics shutdown failed: {exc}")
     
     _safe_print("\nShutting down gracefully...")
     await cache_utils.close_redis()
@@ -594,6 +700,29 @@ app.add_middleware(
 )
 
 
+sql_profiler.install_sql_profiler(operational_engine, "operational")
+sql_profiler.install_sql_profiler(archive_engine, "archive")
+metrics.instrument_pool_checkout(operational_engine, "operational")
+metrics.instrument_pool_checkout(archive_engine, "archive")
+metrics.register_dispatcher_collector(notification_dispatcher)
+metrics.register_activity_log_writer_collector(activity_log_writer)
+
+
+@app.middleware("http")
+async def profile_request_sql(request: Request, call_next):
+    if not sql_profiler.profiling_enabled() or request.url.path.startswith("/api/debug/"):
+        return await call_next(request)
+    profile, token = sql_profiler.start_request_profile(request.method, request.url.path)
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        sql_profiler.finish_request_profile(profile, token, status_code)
+    response.headers["Server-Timing"] = profile.server_timing()
+    return response
+
+
 @app.middleware("http")
 async def ensure_cors_headers_on_error_responses(request: Request, call_next):
     started_at = time.perf_counter()
@@ -616,8 +745,12 @@ async def ensure_cors_headers_on_error_responses(request: Request, call_next):
         response.headers["Access-Control-Allow-Origin"] = origin
         response.headers["Vary"] = "Origin"
         response.headers["Access-Control-Allow-Credentials"] = "true"
-    elapsed_ms = int((time.perf_counter() - started_at) * 1000)
-    slow_request_ms = max(1000, _int_env("SLOW_REQUEST_LOG_MS", 3000))
+    elapsed_seconds = time.perf_counter() - started_at
+    # The route template, not the raw path, keeps ids out of the label set.
+    route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+    metrics.observe_request(request.method, route, response.status_code, elapsed_seconds)
+    elapsed_ms = int(elapsed_seconds * 1000)
+    slow_request_ms = max(1000, int_env("SLOW_REQUEST_LOG_MS", 3000))
     if elapsed_ms >= slow_request_ms or request.url.path in {"/api/auth/login", "/api/auth/me"}:
         _safe_print(
             f"REQUEST {request.method} {request.url.path} "
@@ -820,9 +953,55 @@ def debug_pool(request: Request):
         "archivePool": archive_engine.pool.status(),
         "sharedArchivePool": archive_engine is operational_engine,
         "notificationDispatcher": notification_dispatcher.status(),
+        "configCache": config_cache.get_config_cache_stats(),
+        "ephemeralState": get_ephemeral_state_stats(),
+        "sqlProfiler": sql_profiler.profiler_status(),
+        "taskViewBuffer": task_view_buffer.status(),
+        "activityLogWriter": activity_log_writer.status(),
+        "mailboxWatchers": mailbox_watchers.status(),
     }
 
 
+@app.get("/api/debug/sql-profile")
+def debug_sql_profile(request: Request, limit: int = 20):
+    """Local-only: the slowest recently profiled requests, slowest first."""
+    if not _is_local_request(request):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "processId": os.getpid(),
+        "profiler": sql_profiler.profiler_status(),
+        "requests": sql_profiler.slow_request_log.snapshot(max(1, limit)),
+    }
+
+
+@app.post("/api/debug/sql-profile")
+def toggle_sql_profile(request: Request, enabled: bool, clear: bool = False):
+    """Local-only: switch request profiling on or off without a restart."""
+    if not _is_local_request(request):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    sql_profiler.set_profiling_enabled(enabled)
+    if clear:
+        sql_profiler.slow_request_log.clear()
+    return {"profiler": sql_profiler.profiler_status()}
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(request: Request):
+    """Prometheus scrape endpoint: local callers, or METRICS_TOKEN as a bearer token."""
+    token = (os.getenv("METRICS_TOKEN") or "").strip()
+    authorization = request.headers.get("authorization") or ""
+    if token:
+        if not hmac.compare_digest(authorization, f"Bearer {token}"):
+            raise HTTPException(status_code=404, detail="Not found")
+    elif not _is_local_request(request):
+        raise HTTPException(status_code=404, detail="Not found")
+
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
 @app.get("/api/system/status")
 def system_status():
     """Get system status"""
@@ -848,7 +1027,7 @@ def system_status():
             }
         }
         _SYSTEM_STATUS_CACHE["payload"] = payload
-        _SYSTEM_STATUS_CACHE["expires_at"] = now + max(5, _int_env("SYSTEM_STATUS_CACHE_SECONDS", 30))
+        _SYSTEM_STATUS_CACHE["expires_at"] = now + max(5, int_env("SYSTEM_STATUS_CACHE_SECONDS", 30))
         return payload
     except Exception as e:
         return {"status": "error", "error": str(e)}
@@ -1,5 +1,5 @@
 # models_new.py - New Database Models
-from sqlalchemy import Column, Integer, String, Text, DateTime, Date, Boolean, ForeignKey, JSON, Float, Numeric, Enum as SQLEnum, Index, UniqueConstraint, CheckConstraint, text
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date, Boolean, ForeignKey, JSON, Float, Numeric, LargeBinary, Enum as SQLEnum, Index, UniqueConstraint, CheckConstraint, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database_config import Base, ArchiveBase
@@ -231,6 +231,13 @@ class Task(Base):
     task_edit_locked = Column(Boolean, default=False)
     result_edit_locked = Column(Boolean, default=True)
     result_text = Column(Text)
+
+    # Comment thread summary, maintained with each TaskComment insert (see
+    # utils/task_comments.py). Not a foreign key: task_comments already
+    # references tasks.
+    comment_count = Column(Integer, default=0, nullable=False, server_default="0")
+    last_comment_id = Column(Integer)
+    last_comment_at = Column(DateTime)
     
     # Relationships
     creator = relationship("User", foreign_keys=[creator_id], back_populates="created_tasks")
@@ -484,6 +491,11 @@ class TaskComment(Base):
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Keyset paging of a task's thread (GET /api/tasks/{id}/comments).
+        Index("ix_task_comments_task_created_id", "task_id", "created_at", "id"),
+    )
     
     # Relationships
     task = relationship("Task", back_populates="comments")
@@ -575,6 +587,51 @@ class TaskView(Base):
     seen_at = Column(DateTime, default=datetime.utcnow, index=True)
 
 
+class TaskVisibility(Base):
+    """Which task lists each task appears in, per user (lane bits from
+    utils/task_visibility.py). Derived from tasks, participants and stage
+    assignees and rewritten whenever they change - never edited directly."""
+    __tablename__ = "task_visibility"
+    __table_args__ = (
+        Index(
+            "ix_task_visibility_user_updated",
+            "user_id",
+            "updated_at",
+            "task_id",
+            postgresql_include=["lanes", "is_read"],
+        ),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True, index=True)
+    lanes = Column(Integer, nullable=False, default=0)
+    is_read = Column(Boolean, nullable=False, default=True)
+    updated_at = Column(DateTime)
+
+
+class TaskSearchDocument(Base):
+    """Lower-cased searchable text for one task (utils/task_search.py).
+    The Postgres trigram index on `document` is created by db_migrations.py
+    once pg_trgm is available, not here."""
+    __tablename__ = "task_search_documents"
+
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    document = Column(Text, nullable=False, default="")
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TaskCard(Base):
+    """Viewer-independent task list JSON for one task (utils/task_cards.py).
+    `source_updated_at` is the tasks.updated_at the card was built from, so
+    readers can spot a card that missed a write."""
+    __tablename__ = "task_cards"
+
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    card_json = Column(JSON, nullable=False)
+    source_updated_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
 class TaskEditLog(Base):
     """Track task and result edits with before/after snapshots"""
     __tablename__ = "task_edit_logs"
@@ -1321,6 +1378,26 @@ class ArchivedTask(ArchiveBase):
     archived_at = Column(DateTime, default=datetime.utcnow, index=True)
     archived_by = Column(Integer)
     archive_reason = Column(String)  # deleted, completed, cancelled
+
+    # Copied out of task_data when the row is written (see
+    # utils/archived_tasks.py) so listings and access checks are indexed
+    # queries; backfill_archived_tasks.py fills rows archived before them.
+    creator_id = Column(Integer)
+    task_number = Column(String)
+    title = Column(String)
+    status = Column(String)
+
+    participants = relationship(
+        "ArchivedTaskParticipant",
+        back_populates="archived_task",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+    __table_args__ = (
+        # Keyset paging of a creator's archive, newest first (GET /api/archive/tasks).
+        Index("ix_archived_tasks_creator_archived_id", "creator_id", "archived_at", "id"),
+    )
     
     def to_dict(self):
         return {
@@ -1332,6 +1409,25 @@ class ArchivedTask(ArchiveBase):
         }
 
 
+class ArchivedTaskParticipant(ArchiveBase):
+    """One row per user who took part in an archived task (task_data["participants"])."""
+    __tablename__ = "archived_task_participants"
+
+    id = Column(Integer, primary_key=True)
+    archived_task_id = Column(Integer, ForeignKey("archived_tasks.id", ondelete="CASCADE"), nullable=False)
+    original_task_id = Column(Integer)
+    user_id = Column(Integer, nullable=False)
+    role = Column(String)
+
+    archived_task = relationship("ArchivedTask", back_populates="participants")
+
+    __table_args__ = (
+        UniqueConstraint("archived_task_id", "user_id", name="ux_archived_task_participants_task_user"),
+        Index("ix_archived_task_participants_user_task", "user_id", "archived_task_id"),
+        Index("ix_archived_task_participants_original_user", "original_task_id", "user_id"),
+    )
+
+
 class ActivityLog(ArchiveBase):
     """Log every single action in the system"""
     __tablename__ = "activity_log"
@@ -1349,6 +1445,13 @@ class ActivityLog(ArchiveBase):
     user_agent = Column(String)
     
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        # Keyset paging of one task's audit trail (GET /api/archive/tasks/{id}/history).
+        Index("ix_activity_log_task_timestamp_id", "task_id", "timestamp", "id"),
+        # A user's activity window (GET /api/archive/activity and /activity/summary).
+        Index("ix_activity_log_user_timestamp_id", "user_id", "timestamp", "id"),
+    )
     
     def to_dict(self):
         return {
@@ -1361,6 +1464,39 @@ class ActivityLog(ArchiveBase):
         }
 
 
+class ActivityLogArchive(ArchiveBase):
+    """One activity_log partition exported to R2 by the retention job (see
+    utils/activity_log_partitions.py). range_start is NULL for the partition
+    that holds rows from before partitioning."""
+    __tablename__ = "activity_log_archives"
+
+    id = Column(Integer, primary_key=True)
+    partition_name = Column(String, nullable=False, unique=True)
+    range_start = Column(DateTime)
+    range_end = Column(DateTime, nullable=False, index=True)
+    object_key = Column(String, nullable=False)
+    row_count = Column(Integer, nullable=False, default=0)
+    byte_size = Column(Integer, nullable=False, default=0)
+    exported_at = Column(DateTime, default=datetime.utcnow)
+    dropped_at = Column(DateTime)
+    rehydrated_at = Column(DateTime)
+    # A rehydrated partition is left in place until then.
+    rehydrated_until = Column(DateTime)
+
+    def to_dict(self):
+        return {
+            "partition": self.partition_name,
+            "rangeStart": serialize_utc_datetime(self.range_start),
+            "rangeEnd": serialize_utc_datetime(self.range_end),
+            "objectKey": self.object_key,
+            "rowCount": self.row_count,
+            "byteSize": self.byte_size,
+            "exportedAt": serialize_utc_datetime(self.exported_at),
+            "droppedAt": serialize_utc_datetime(self.dropped_at),
+            "rehydratedUntil": serialize_utc_datetime(self.rehydrated_until),
+        }
+
+
 # ==================== REPORT DISTRIBUTION MODELS ====================
 
 class SavedReport(Base):
@@ -1417,6 +1553,63 @@ class AppSetting(Base):
         }
 
 
+class BackfillCheckpoint(Base):
+    """One id range of a utils/backfill_engine.py run. last_id moves forward
+    after every committed batch, so a resumed run continues after it."""
+    __tablename__ = "backfill_checkpoints"
+    __table_args__ = (
+        UniqueConstraint("job", "partition_index", name="ux_backfill_checkpoints_job_partition"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    job = Column(String(80), nullable=False, index=True)
+    partition_index = Column(Integer, nullable=False, default=0)
+    range_start = Column(Integer, nullable=False)  # exclusive
+    range_end = Column(Integer, nullable=False)  # inclusive
+    last_id = Column(Integer, nullable=False)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    stats = Column(JSON, nullable=False, default=dict)
+    status = Column(String(20), nullable=False, default="pending")  # pending/running/done/failed
+    error = Column(Text)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "job": self.job,
+            "partition": self.partition_index,
+            "rangeStart": self.range_start,
+            "rangeEnd": self.range_end,
+            "lastId": self.last_id,
+            "rowsProcessed": self.rows_processed,
+            "stats": self.stats or {},
+            "status": self.status,
+            "error": self.error,
+            "startedAt": serialize_utc_datetime(self.started_at),
+            "finishedAt": serialize_utc_datetime(self.finished_at),
+            "updatedAt": serialize_utc_datetime(self.updated_at),
+        }
+
+
+class CapturePayloadDictionary(Base):
+    """A compression dictionary trained on one provider's capture payloads
+    (see providers/payload_store.py). Rows are never updated or deleted:
+    every compressed payload names the dictionary it was written with, and
+    the newest row per (provider, codec) is the one new payloads use."""
+    __tablename__ = "capture_payload_dictionaries"
+    __table_args__ = (
+        Index("ix_capture_payload_dictionaries_provider_codec", "provider", "codec"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(String(40), nullable=False)
+    codec = Column(String(10), nullable=False)  # zlib/zstd
+    data = Column(LargeBinary, nullable=False)
+    sample_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
 class ReportSchedule(Base):
     """A recurring report: render + export + (optional) email on a cadence."""
     __tablename__ = "report_schedules"
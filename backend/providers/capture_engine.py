@@ -0,0 +1,860 @@
+# providers/capture_engine.py
+"""
+Shared capture pipeline for the extension-captured, ticket-attributed
+providers (Freepik, HeyGen, Higgsfield, Envato, ElevenLabs, Flow).
+
+Each of those packages used to carry its own copy of the same ingest path:
+capture.py (validate, dedupe, SAVEPOINT insert, stats), router.py's
+capture_events batch loop (per-ticket resolution cache, chunked commits,
+normalization hand-off), health.py, sync.py and normalization.py's batch
+driver. The copies only differed in the model classes and the names of the
+provider-side identity columns, so every fix had to be made six times.
+
+A provider now declares a CaptureProvider (in its own capture.py, listed in
+providers/registry.py) naming its models, event types and identity fields,
+and keeps only what is genuinely provider-specific: the event schema,
+normalization.py's field extraction, and the GenerationRecord projection.
+Its capture.py/health.py/sync.py keep their public functions as thin
+wrappers over this module, so existing callers are unaffected.
+
+ChatGPT is deliberately not on this engine: its identity is the request's
+plain session, not per-event launch tickets, and its events carry a
+conversation/message identity rather than a generation one.
+"""
+import importlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Iterable, Optional
+
+from fastapi import HTTPException, Request
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models_new import ITPortalTool, ITPortalToolCredential, User
+from providers import payload_store
+from utils.attribution_gate import GenerationAttribution, prefetch_generation_attribution
+from utils.client_gate import validate_client_for_generation
+from utils.config_cache import get_active_tool_by_slugs
+from utils.metrics import record_capture_ingest
+from utils.task_gate import validate_task_for_generation
+
+HEALTH_STATUS_HEALTHY = "healthy"
+HEALTH_STATUS_DEGRADED = "degraded"
+HEALTH_STATUS_BACKLOGGED = "backlogged"
+HEALTH_STATUS_OFFLINE = "offline"
+
+SYNC_STATUS_IDLE = "idle"
+SYNC_STATUS_RUNNING = "running"
+SYNC_STATUS_FAILED = "failed"
+
+# Upper bound on one `client_event_id IN (...)` dedupe lookup.
+DEDUPE_LOOKUP_CHUNK_SIZE = 500
+
+
+@dataclass(frozen=True)
+class CaptureProvider:
+    """Everything the shared pipeline needs to know about one provider.
+
+    identity_fields pairs each identity attribute of the provider's
+    CaptureEventIn schema with the event-model column it is stored in, e.g.
+    ("creation_id", "provider_creation_id"). normalizer is a "module:attr"
+    reference to the provider's normalize_capture_events_batch, resolved on
+    first use so capture.py never imports normalization.py at module scope.
+    """
+
+    slug: str
+    label: str
+    tool_slugs: frozenset
+    event_types: frozenset
+    event_model: Any
+    identity_fields: tuple
+    normalizer: str
+    schema_version: int = 1
+    commit_chunk_size: int = 50
+    health_model: Any = None
+    sync_cursor_model: Any = None
+    sync_cursor_field: Optional[str] = None
+    health_stale_ping_seconds: int = 15 * 60
+    health_backlog_queue_length: int = 500
+
+    @property
+    def logger(self) -> logging.Logger:
+        return logging.getLogger(f"{self.slug}_capture")
+
+    def identity(self, item: Any) -> dict:
+        """Identity column values for one schema item (or keyword dict)."""
+        get = item.get if isinstance(item, dict) else (lambda name: getattr(item, name, None))
+        return {column: get(field) for field, column in self.identity_fields}
+
+
+@dataclass
+class CaptureIngestResult:
+    status: str  # "created" | "duplicate" | "rejected"
+    event: Optional[Any] = None
+    reason: Optional[str] = None
+
+
+def _resolve_ref(ref: str) -> Any:
+    module_name, _, attribute = ref.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+# ---- stats ----
+
+_INGEST_STATS: dict[str, dict] = {}
+
+
+def get_ingest_stats_snapshot(provider: CaptureProvider) -> dict:
+    return dict(_INGEST_STATS.get(provider.slug) or {"created": 0, "duplicate": 0, "rejected": 0})
+
+
+def _record_stat(provider: CaptureProvider, status: str) -> None:
+    stats = _INGEST_STATS.setdefault(provider.slug, {"created": 0, "duplicate": 0, "rejected": 0})
+    if status in stats:
+        stats[status] += 1
+        record_capture_ingest(provider.slug, status)
+
+
+# ---- actor / credential resolution ----
+#
+# routers.it_tools_router is imported lazily inside the two resolvers below,
+# NOT at module scope. At module scope it closes a cycle:
+#   providers.<p>.capture -> routers.it_tools_router -> routers/__init__
+#   -> auth_router -> services.admin_workflow_service -> routers.tasks_router
+#   -> providers.<p>.capture (still executing)
+# main.py happens to import `routers` before the providers, so the app boots -
+# but only by import-order luck. Any entry point that reaches a provider
+# package first (a provider-scoped script, a test module) would hit "cannot
+# import name ... from partially initialized module" instead.
+
+def resolve_tool(provider: CaptureProvider, db: Session) -> Optional[ITPortalTool]:
+    return get_active_tool_by_slugs(db, provider.tool_slugs)
+
+
+def resolve_actor(
+    *,
+    request: Request,
+    db: Session,
+    tool: ITPortalTool,
+    usage_ticket: Optional[str],
+    extension_ticket: Optional[str],
+) -> User:
+    """_resolve_usage_event_actor - the exact function Kling's usage-event
+    endpoint uses to answer "who is the logged-in employee right now" from a
+    launch ticket, reused verbatim rather than reimplemented."""
+    from routers.it_tools_router import _resolve_usage_event_actor
+
+    return _resolve_usage_event_actor(
+        request=request,
+        db=db,
+        tool=tool,
+        usage_ticket=usage_ticket or "",
+        extension_ticket=extension_ticket or "",
+    )
+
+
+def resolve_credential(
+    db: Session,
+    *,
+    tool_id: int,
+    user_id: int,
+    explicit_credential_id: Optional[int] = None,
+) -> Optional[ITPortalToolCredential]:
+    from routers.it_tools_router import _resolve_usage_event_credential
+
+    return _resolve_usage_event_credential(
+        db,
+        tool_id=tool_id,
+        user_id=user_id,
+        explicit_credential_id=explicit_credential_id,
+    )
+
+
+# ---- ingest ----
+
+def _parse_event_date(value: Optional[str]) -> date:
+    if value:
+        try:
+            return datetime.strptime(value, "%Y-%m-%d").date()
+        except ValueError:
+            pass
+    return datetime.utcnow().date()
+
+
+def _payload_size(payload: Optional[dict]) -> int:
+    try:
+        return len(json.dumps(payload or {}))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def _log(provider: CaptureProvider, *, event_type: str, status: str, duration_ms: float, payload_size: int, reason: Optional[str] = None) -> None:
+    provider.logger.info(
+        "%s_capture_event provider=%s event_type=%s status=%s duration_ms=%s payload_size=%s reason=%s",
+        provider.slug,
+        provider.slug,
+        event_type,
+        status,
+        duration_ms,
+        payload_size,
+        reason or "",
+    )
+
+
+def _existing_query(provider: CaptureProvider, db: Session, client_event_id: str, credential_id: Optional[int]):
+    model = provider.event_model
+    query = db.query(model).filter(model.provider == provider.slug, model.client_event_id == client_event_id)
+    if credential_id is not None:
+        return query.filter(model.credential_id == credential_id)
+    return query.filter(model.credential_id.is_(None))
+
+
+def prefetch_existing_events(provider: CaptureProvider, db: Session, client_event_ids: Iterable[str]) -> dict:
+    """Every already-stored event among `client_event_ids`, keyed by
+    (client_event_id, credential_id) - one IN lookup per chunk instead of one
+    SELECT per event. The returned dict is meant to be passed to
+    ingest_capture_event as `known_events`, which keeps it current as the
+    batch inserts."""
+    ids = sorted({(value or "").strip() for value in client_event_ids} - {""})
+    model = provider.event_model
+    known: dict = {}
+    for start in range(0, len(ids), DEDUPE_LOOKUP_CHUNK_SIZE):
+        rows = (
+            db.query(model)
+            .filter(model.provider == provider.slug, model.client_event_id.in_(ids[start:start + DEDUPE_LOOKUP_CHUNK_SIZE]))
+            .order_by(model.id)
+        )
+        for row in rows:
+            known.setdefault((row.client_event_id, row.credential_id), row)
+    return known
+
+
+def ingest_capture_event(
+    provider: CaptureProvider,
+    db: Session,
+    *,
+    tool: ITPortalTool,
+    credential_id: Optional[int],
+    user: User,
+    event_type: str,
+    client_event_id: str,
+    identity: dict,
+    payload: Optional[dict],
+    capture_version: Optional[int],
+    extension_version: Optional[str],
+    browser: Optional[str],
+    tab_id: Optional[int],
+    session_id: Optional[str],
+    extension_session_id: Optional[str],
+    event_date: Optional[str],
+    ownership_confidence: Optional[str] = None,
+    task_id: Optional[int] = None,
+    client_id: Optional[int] = None,
+    attribution: Optional[GenerationAttribution] = None,
+    known_events: Optional[dict] = None,
+) -> CaptureIngestResult:
+    """Idempotent insert: retrying the same (provider, credential, client_event_id)
+    is always a no-op "duplicate" response - never a second row, never an error.
+
+    Flushes inside a SAVEPOINT and does NOT commit - the caller owns the
+    transaction and commits a chunk of events at a time. The savepoint
+    preserves the property that used to require a commit per event: an event
+    that loses a concurrent-insert race unwinds by itself, leaving every
+    sibling in the same transaction untouched.
+
+    `identity` maps the provider's identity columns to their values.
+    `known_events` is a prefetch_existing_events() result; when given it
+    replaces the per-event duplicate SELECT (a race past it still lands in
+    the IntegrityError path below) and gains every event created here.
+    """
+    started = time.perf_counter()
+    payload_size = _payload_size(payload)
+
+    normalized_event_type = (event_type or "").strip().lower()
+    if normalized_event_type not in provider.event_types:
+        reason = f"unknown event_type: {event_type!r}"
+        _log(provider, event_type=event_type or "", status="rejected", duration_ms=_elapsed_ms(started), payload_size=payload_size, reason=reason)
+        _record_stat(provider, "rejected")
+        return CaptureIngestResult(status="rejected", reason=reason)
+
+    normalized_client_event_id = (client_event_id or "").strip()
+    if not normalized_client_event_id:
+        reason = "client_event_id is required"
+        _log(provider, event_type=normalized_event_type, status="rejected", duration_ms=_elapsed_ms(started), payload_size=payload_size, reason=reason)
+        _record_stat(provider, "rejected")
+        return CaptureIngestResult(status="rejected", reason=reason)
+
+    dedupe_key = (normalized_client_event_id, credential_id)
+    if known_events is not None:
+        existing = known_events.get(dedupe_key)
+    else:
+        existing = _existing_query(provider, db, normalized_client_event_id, credential_id).first()
+    if existing:
+        _log(provider, event_type=normalized_event_type, status="duplicate", duration_ms=_elapsed_ms(started), payload_size=payload_size)
+        _record_stat(provider, "duplicate")
+        return CaptureIngestResult(status="duplicate", event=existing)
+
+    validated_task_id: Optional[int] = None
+    validated_task_name: Optional[str] = None
+    if task_id is not None:
+        # Never trust the client's task_id at face value - re-check it's
+        # still an active task this user is actually assigned to. A stale/
+        # tampered/deleted task degrades to "captured without task
+        # attribution" rather than failing the whole capture.
+        task = (
+            attribution.task_for(db, user.id, task_id)
+            if attribution is not None
+            else validate_task_for_generation(db, task_id, user.id)
+        )
+        if task:
+            validated_task_id = task.id
+            validated_task_name = task.title
+        else:
+            provider.logger.warning(
+                "%s_capture_event dropped invalid task attribution user_id=%s task_id=%s",
+                provider.slug, user.id, task_id,
+            )
+
+    validated_client_id: Optional[int] = None
+    validated_client_name: Optional[str] = None
+    if client_id is not None:
+        client = (
+            attribution.client_for(client_id)
+            if attribution is not None
+            else validate_client_for_generation(db, client_id)
+        )
+        if client:
+            validated_client_id = client.id
+            validated_client_name = client.name
+        else:
+            provider.logger.warning(
+                "%s_capture_event dropped invalid client attribution user_id=%s client_id=%s",
+                provider.slug, user.id, client_id,
+            )
+
+    event = provider.event_model(
+        tool_id=tool.id,
+        credential_id=credential_id,
+        user_id=user.id,
+        provider=provider.slug,
+        event_type=normalized_event_type,
+        client_event_id=normalized_client_event_id,
+        **{column: (value or None) for column, value in identity.items()},
+        ownership_confidence=ownership_confidence,
+        linked_task_id=validated_task_id,
+        linked_task_name=validated_task_name,
+        linked_client_id=validated_client_id,
+        linked_client_name=validated_client_name,
+        payload_json=payload or {},
+        capture_version=int(capture_version or provider.schema_version),
+        extension_version=extension_version,
+        browser=browser,
+        tab_id=tab_id,
+        session_id=session_id,
+        extension_session_id=extension_session_id,
+        event_date=_parse_event_date(event_date),
+    )
+    savepoint = db.begin_nested()
+    try:
+        db.add(event)
+        # Populates event.id and the Python-side created_at default that
+        # normalization's freshness gate reads - no COMMIT or refresh needed.
+        db.flush()
+        savepoint.commit()
+    except IntegrityError:
+        # Race: a concurrent request inserted the same client_event_id first.
+        # Unwinds this event only; siblings already flushed in this
+        # transaction keep their work.
+        savepoint.rollback()
+        existing = _existing_query(provider, db, normalized_client_event_id, credential_id).first()
+        if existing:
+            if known_events is not None:
+                known_events[dedupe_key] = existing
+            _log(provider, event_type=normalized_event_type, status="duplicate", duration_ms=_elapsed_ms(started), payload_size=payload_size)
+            _record_stat(provider, "duplicate")
+            return CaptureIngestResult(status="duplicate", event=existing)
+        raise
+    if known_events is not None:
+        known_events[dedupe_key] = event
+    _log(provider, event_type=normalized_event_type, status="created", duration_ms=_elapsed_ms(started), payload_size=payload_size)
+    _record_stat(provider, "created")
+    return CaptureIngestResult(status="created", event=event)
+
+
+def _ownership_confidence(*, is_reconciliation: bool, has_ticket: bool) -> str:
+    if is_reconciliation:
+        return "reconciliation"
+    return "ticket" if has_ticket else "session"
+
+
+def _rejected(item: Any, reason: str) -> dict:
+    return {"client_event_id": item.client_event_id, "status": "rejected", "id": None, "reason": reason}
+
+
+def ingest_capture_batch(
+    provider: CaptureProvider,
+    db: Session,
+    *,
+    request: Optional[Request],
+    events: list,
+    tool: Optional[ITPortalTool],
+    resolve_actor: Callable[..., User],
+    resolve_credential: Callable[..., Optional[ITPortalToolCredential]],
+) -> tuple[bool, list[dict]]:
+    """The POST /capture/events body shared by every provider router: resolve
+    who captured each event, store the batch, commit it in chunks, then hand
+    the new events to the provider's normalizer.
+
+    Returns (success, results) where each result has the CaptureEventResult
+    fields. The resolvers are passed in by the router so provider-named
+    wrappers (and tests that swap them) stay in charge of attribution."""
+    if not tool:
+        return False, [_rejected(item, f"{provider.slug} tool is not configured") for item in events]
+
+    # Picks up a payload dictionary trained since the last batch (TTL-gated).
+    payload_store.refresh_dictionaries(db)
+
+    # Every task/client id the batch mentions, validated in one pass rather
+    # than re-queried per event (see utils/attribution_gate.py).
+    attribution = prefetch_generation_attribution(
+        db,
+        task_ids=[item.linked_task_id for item in events],
+        client_ids=[item.linked_client_id for item in events],
+    )
+
+    # Memoized per unique (usage_ticket, extension_ticket, explicit_credential_id)
+    # triple, NOT resolved once for the whole request: the extension's queue
+    # is shared across the whole browser (not per-tab), so a single flush
+    # batch can legitimately mix events from different tabs carrying
+    # different tickets (e.g. two tabs open under different employees, or a
+    # ticket that rotated mid-session). Resolving once and reusing for every
+    # item - the way ChatGPT's router does, safely, because its identity is
+    # request-level session, not per-event tickets - would misattribute every
+    # item after the first ticket change in a mixed batch.
+    resolution_cache: dict[tuple, tuple] = {}
+    resolved: list[tuple] = []
+    for item in events:
+        cache_key = (item.usage_ticket, item.extension_ticket, item.credential_id)
+        if cache_key not in resolution_cache:
+            try:
+                current_user = resolve_actor(
+                    request=request,
+                    db=db,
+                    tool=tool,
+                    usage_ticket=item.usage_ticket,
+                    extension_ticket=item.extension_ticket,
+                )
+            except HTTPException as error:
+                resolution_cache[cache_key] = (None, None, str(error.detail))
+            else:
+                credential = resolve_credential(
+                    db,
+                    tool_id=tool.id,
+                    user_id=current_user.id,
+                    explicit_credential_id=item.credential_id,
+                )
+                resolution_cache[cache_key] = (current_user, credential.id if credential else None, None)
+        resolved.append(resolution_cache[cache_key])
+
+    # One dedupe lookup for the whole batch. Retries of a whole queue are the
+    # common case (the extension re-posts anything it never saw acknowledged),
+    # and they used to cost a SELECT per event before anything was inserted.
+    known_events = prefetch_existing_events(
+        provider,
+        db,
+        (item.client_event_id for item, (_user, _credential, error) in zip(events, resolved) if error is None),
+    )
+
+    results: list[dict] = []
+    newly_created_events = []
+    pending_since_commit = 0
+    for item, (current_user, credential_id, error) in zip(events, resolved):
+        if error is not None:
+            results.append(_rejected(item, error))
+            continue
+        outcome = ingest_capture_event(
+            provider,
+            db,
+            tool=tool,
+            credential_id=credential_id,
+            user=current_user,
+            event_type=item.event_type,
+            client_event_id=item.client_event_id,
+            identity=provider.identity(item),
+            payload=item.payload,
+            capture_version=item.capture_version,
+            extension_version=item.extension_version,
+            browser=item.browser,
+            tab_id=item.tab_id,
+            session_id=item.session_id,
+            extension_session_id=item.extension_session_id,
+            event_date=item.event_date,
+            task_id=item.linked_task_id,
+            client_id=item.linked_client_id,
+            attribution=attribution,
+            ownership_confidence=_ownership_confidence(
+                is_reconciliation=item.is_reconciliation,
+                has_ticket=bool(item.usage_ticket or item.extension_ticket),
+            ),
+            known_events=known_events,
+        )
+        if outcome.status == "created" and outcome.event is not None:
+            newly_created_events.append(outcome.event)
+        results.append({
+            "client_event_id": item.client_event_id,
+            "status": outcome.status,
+            "id": outcome.event.id if outcome.event else None,
+            "reason": outcome.reason,
+        })
+
+        # ingest_capture_event flushes inside a savepoint but never commits -
+        # the transaction is ours. Commit a chunk at a time so a 200-event
+        # batch costs a handful of round-trips instead of one per event,
+        # while still making earlier chunks durable before the later ones
+        # are attempted. Duplicates write nothing, so they don't count: a
+        # retried queue commits nothing and never expires the prefetched rows.
+        if outcome.status != "created":
+            continue
+        pending_since_commit += 1
+        if pending_since_commit >= provider.commit_chunk_size:
+            db.commit()
+            pending_since_commit = 0
+
+    if pending_since_commit:
+        db.commit()
+
+    if newly_created_events:
+        # Normalization failure must never turn a successful, lossless
+        # ingest into an error response. Every event above is already
+        # committed at this point, so nothing here can lose raw data.
+        try:
+            _resolve_ref(provider.normalizer)(db, newly_created_events)
+        except Exception:
+            logging.getLogger(f"{provider.slug}_router").exception(
+                "%s normalization batch failed for %d event(s)", provider.slug, len(newly_created_events)
+            )
+            db.rollback()
+
+    return True, results
+
+
+# ---- normalization batch driver ----
+
+def normalize_events_batch(
+    db: Session,
+    events: list,
+    normalize_event: Callable[[Session, Any], Any],
+    *,
+    provider: str,
+    commit_chunk_size: int,
+    logger: logging.Logger,
+) -> dict:
+    """Runs normalize_event over `events`, each in its own SAVEPOINT, with a
+    real COMMIT once per `commit_chunk_size` events.
+
+    The isolation matters: two requests normalizing the same never-before-
+    seen identity at once make the loser's INSERT raise IntegrityError
+    against the generation table's unique index, and without per-event
+    isolation that single collision would roll back every sibling already
+    normalized in the same batch. It costs the losing event only its own
+    redundant update, since the winning request already normalized it.
+
+    A None from normalize_event is the deliberate "no identity field in this
+    payload" skip, not a failure. Returns {"normalized", "skipped", "errors"}."""
+    stats = {"normalized": 0, "skipped": 0, "errors": 0}
+    if not events:
+        return stats
+    pending_since_commit = 0
+    for event in events:
+        savepoint = db.begin_nested()
+        try:
+            generation = normalize_event(db, event)
+            savepoint.commit()
+            stats["normalized" if generation is not None else "skipped"] += 1
+        except Exception:
+            savepoint.rollback()
+            stats["errors"] += 1
+            logger.exception(
+                "%s normalization failed for capture_event_id=%s - skipped this cycle, "
+                "harmless if lost to a concurrent normalize of the same identity",
+                provider,
+                event.id,
+            )
+        pending_since_commit += 1
+        if pending_since_commit >= commit_chunk_size:
+            db.commit()
+            pending_since_commit = 0
+    if pending_since_commit:
+        db.commit()
+    return stats
+
+
+# ---- capture health ----
+
+def _parse_iso_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+
+def record_health_ping(
+    provider: CaptureProvider,
+    db: Session,
+    *,
+    user_id: int,
+    tool_id: Optional[int],
+    credential_id: Optional[int],
+    extension_session_id: Optional[str],
+    extension_version: Optional[str],
+    queue_length: int,
+    events_waiting: int,
+    oldest_pending_event_at: Optional[str],
+    retry_count: int,
+    last_capture_event_at: Optional[str],
+    last_successful_upload_at: Optional[str],
+    last_failed_upload_at: Optional[str],
+    average_upload_time_ms: Optional[int],
+    offline_since: Optional[str],
+):
+    """Upserts the install's latest health snapshot - one row per extension
+    session (or per user for installs that don't report one), not a log."""
+    model = provider.health_model
+    if extension_session_id:
+        existing = (
+            db.query(model)
+            .filter(model.provider == provider.slug, model.extension_session_id == extension_session_id)
+            .first()
+        )
+    else:
+        existing = (
+            db.query(model)
+            .filter(model.provider == provider.slug, model.user_id == user_id, model.extension_session_id.is_(None))
+            .order_by(model.reported_at.desc())
+            .first()
+        )
+
+    record = existing or model(provider=provider.slug, user_id=user_id)
+    record.tool_id = tool_id
+    record.credential_id = credential_id
+    record.user_id = user_id
+    record.extension_session_id = extension_session_id
+    record.extension_version = extension_version
+    record.queue_length = max(0, int(queue_length or 0))
+    record.events_waiting = max(0, int(events_waiting or 0))
+    record.oldest_pending_event_at = _parse_iso_datetime(oldest_pending_event_at)
+    record.retry_count = max(0, int(retry_count or 0))
+    record.last_capture_event_at = _parse_iso_datetime(last_capture_event_at)
+    record.last_successful_upload_at = _parse_iso_datetime(last_successful_upload_at)
+    record.last_failed_upload_at = _parse_iso_datetime(last_failed_upload_at)
+    record.average_upload_time_ms = average_upload_time_ms
+    record.offline_since = _parse_iso_datetime(offline_since)
+    record.reported_at = datetime.utcnow()
+
+    if not existing:
+        db.add(record)
+    db.commit()
+    db.refresh(record)
+    return record
+
+
+def get_capture_health_for_user(provider: CaptureProvider, db: Session, *, user_id: int) -> list:
+    model = provider.health_model
+    return (
+        db.query(model)
+        .filter(model.provider == provider.slug, model.user_id == user_id)
+        .order_by(model.reported_at.desc())
+        .all()
+    )
+
+
+def compute_capture_health_status(provider: CaptureProvider, record: Any, *, now: Optional[datetime] = None) -> str:
+    """Priority when multiple rules match: OFFLINE > BACKLOGGED > DEGRADED > HEALTHY."""
+    now = now or datetime.utcnow()
+
+    ping_age_seconds = (now - record.reported_at).total_seconds() if record.reported_at else float("inf")
+    if record.offline_since is not None or ping_age_seconds > provider.health_stale_ping_seconds:
+        return HEALTH_STATUS_OFFLINE
+
+    if (record.queue_length or 0) >= provider.health_backlog_queue_length:
+        return HEALTH_STATUS_BACKLOGGED
+
+    has_unresolved_queue = (record.queue_length or 0) > 0
+    has_recent_failure = record.last_failed_upload_at is not None and (
+        record.last_successful_upload_at is None or record.last_failed_upload_at > record.last_successful_upload_at
+    )
+    is_capturing_without_delivery = record.last_capture_event_at is not None and (
+        record.last_successful_upload_at is None or record.last_capture_event_at > record.last_successful_upload_at
+    )
+    if has_unresolved_queue or has_recent_failure or is_capturing_without_delivery:
+        return HEALTH_STATUS_DEGRADED
+
+    return HEALTH_STATUS_HEALTHY
+
+
+def capture_health_to_dict(provider: CaptureProvider, record: Any, *, now: Optional[datetime] = None) -> dict:
+    data = record.to_dict()
+    data["status"] = compute_capture_health_status(provider, record, now=now)
+    return data
+
+
+def report_capture_health(
+    provider: CaptureProvider,
+    db: Session,
+    *,
+    request: Optional[Request],
+    payload: Any,
+    tool: Optional[ITPortalTool],
+    resolve_actor: Callable[..., User],
+    resolve_credential: Callable[..., Optional[ITPortalToolCredential]],
+) -> tuple[bool, dict]:
+    """The POST /capture/health body shared by every provider router.
+    Returns (success, data) for the provider's CaptureHealthOut."""
+    current_user: Optional[User] = None
+    try:
+        if tool:
+            current_user = resolve_actor(
+                request=request,
+                db=db,
+                tool=tool,
+                usage_ticket=payload.usage_ticket,
+                extension_ticket=payload.extension_ticket,
+            )
+    except HTTPException:
+        # Health pings are best-effort/non-critical - an unresolvable actor
+        # just means "no health row this time", never a hard failure back to
+        # the extension.
+        return False, {"reason": "actor_unresolved"}
+
+    if not current_user:
+        return False, {"reason": f"{provider.slug} tool is not configured"}
+
+    credential_id = payload.credential_id
+    if tool and not credential_id:
+        credential = resolve_credential(db, tool_id=tool.id, user_id=current_user.id)
+        credential_id = credential.id if credential else None
+
+    record = record_health_ping(
+        provider,
+        db,
+        user_id=current_user.id,
+        tool_id=tool.id if tool else None,
+        credential_id=credential_id,
+        extension_session_id=payload.extension_session_id,
+        extension_version=payload.extension_version,
+        queue_length=payload.queue_length,
+        events_waiting=payload.events_waiting,
+        oldest_pending_event_at=payload.oldest_pending_event_at,
+        retry_count=payload.retry_count,
+        last_capture_event_at=payload.last_capture_event_at,
+        last_successful_upload_at=payload.last_successful_upload_at,
+        last_failed_upload_at=payload.last_failed_upload_at,
+        average_upload_time_ms=payload.average_upload_time_ms,
+        offline_since=payload.offline_since,
+    )
+    return True, capture_health_to_dict(provider, record)
+
+
+# ---- reconciliation sync cursors ----
+
+def get_or_create_cursor(provider: CaptureProvider, db: Session, *, credential_id: int):
+    model = provider.sync_cursor_model
+    cursor = db.query(model).filter(model.credential_id == credential_id).first()
+    if cursor:
+        return cursor
+    cursor = model(credential_id=credential_id, status=SYNC_STATUS_IDLE)
+    db.add(cursor)
+    db.commit()
+    db.refresh(cursor)
+    return cursor
+
+
+def report_sync_progress(
+    provider: CaptureProvider,
+    db: Session,
+    *,
+    credential_id: int,
+    last_seen_id: Optional[str],
+    last_synced_page: int,
+    is_full_reconciliation: bool,
+    status: str,
+    error: Optional[str],
+    run_by_user_id: Optional[int],
+):
+    """Idempotent progress report from the extension after walking one batch
+    of reconciliation pages. Only ever moves last_synced_page forward for an
+    incremental walk (a stale/out-of-order report from a slower tab can't
+    regress a cursor another tab already advanced); a full reconciliation
+    report always wins since it is authoritative for the entire history.
+    `last_seen_id` lands in the provider's sync_cursor_field."""
+    cursor = get_or_create_cursor(provider, db, credential_id=credential_id)
+
+    if is_full_reconciliation or last_synced_page >= (cursor.last_synced_page or 0):
+        cursor.last_synced_page = last_synced_page
+        if last_seen_id:
+            setattr(cursor, provider.sync_cursor_field, last_seen_id)
+    if is_full_reconciliation and status == SYNC_STATUS_IDLE:
+        cursor.last_full_reconciliation_at = datetime.utcnow()
+
+    cursor.last_run_at = datetime.utcnow()
+    cursor.last_run_by_user_id = run_by_user_id
+    cursor.status = status if status in (SYNC_STATUS_IDLE, SYNC_STATUS_RUNNING, SYNC_STATUS_FAILED) else SYNC_STATUS_IDLE
+    cursor.last_error = error
+
+    db.commit()
+    db.refresh(cursor)
+    return cursor
+
+
+def report_sync_cursor(
+    provider: CaptureProvider,
+    db: Session,
+    *,
+    request: Optional[Request],
+    payload: Any,
+    tool: Optional[ITPortalTool],
+    resolve_actor: Callable[..., User],
+    resolve_credential: Callable[..., Optional[ITPortalToolCredential]],
+):
+    """The POST /sync/cursor body shared by every provider router. Resolving
+    the acting user is best-effort (for the audit trail only,
+    run_by_user_id); the cursor itself is keyed by credential_id, not by who
+    happened to run the scan."""
+    run_by_user_id = None
+    credential_id = payload.credential_id
+    if tool:
+        try:
+            actor = resolve_actor(
+                request=request, db=db, tool=tool,
+                usage_ticket=payload.usage_ticket, extension_ticket=payload.extension_ticket,
+            )
+            run_by_user_id = actor.id
+            if not credential_id:
+                credential = resolve_credential(db, tool_id=tool.id, user_id=actor.id)
+                credential_id = credential.id if credential else None
+        except HTTPException:
+            run_by_user_id = None
+
+    if not credential_id:
+        raise HTTPException(status_code=400, detail=f"Could not resolve a credential for this {provider.label} sync report")
+
+    return report_sync_progress(
+        provider,
+        db,
+        credential_id=credential_id,
+        last_seen_id=getattr(payload, provider.sync_cursor_field),
+        last_synced_page=payload.last_synced_page,
+        is_full_reconciliation=payload.is_full_reconciliation,
+        status=payload.status,
+        error=payload.error,
+        run_by_user_id=run_by_user_id,
+    )
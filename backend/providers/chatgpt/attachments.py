@@ -22,7 +22,8 @@ from sqlalchemy.orm import Session
 from models_new import User
 from providers.chatgpt.constants import PROVIDER
 from providers.chatgpt.models import ConversationCaptureAttachment
-from routers.upload import _build_public_url, _build_r2_client, _env, _is_r2_configured, _normalized_content_type
+from routers.upload import _build_public_url, _is_r2_configured, _normalized_content_type
+from utils import r2_storage
 
 MAX_ATTACHMENT_BYTES = 8 * 1024 * 1024  # 8MB - generous for a chat-uploaded image, small enough for one HTTP POST
 
@@ -71,9 +72,7 @@ def _upload_bytes_to_r2(raw_bytes: bytes, *, file_name: str, mime_type: str) ->
     safe_name = (file_name or "attachment").strip().replace("/", "_").replace("\\", "_")[:200] or "attachment"
     key = f"chatgpt-capture/{timestamp_ms}/{uuid4().hex[:8]}_{safe_name}"
 
-    client = _build_r2_client()
-    bucket = _env("R2_BUCKET")
-    client.put_object(Bucket=bucket, Key=key, Body=raw_bytes, ContentType=mime_type)
+    r2_storage.put_object(key, raw_bytes, content_type=mime_type)
 
     return key, _build_public_url(key)
 
@@ -21,7 +21,9 @@ from sqlalchemy.orm import Session
 from models_new import ITPortalTool, ITPortalToolCredential, User
 from providers.chatgpt.constants import ALL_EVENT_TYPES, CAPTURE_SCHEMA_VERSION, PROVIDER, TOOL_SLUGS
 from providers.chatgpt.models import ConversationCaptureEvent
-from routers.it_tools_router import _resolve_tool_credential
+from routers.it_tools_router import _resolve_usage_event_credential
+from utils.config_cache import get_active_tool_by_slugs
+from utils.metrics import record_capture_ingest
 
 logger = logging.getLogger("chatgpt_capture")
 
@@ -40,6 +42,7 @@ def get_ingest_stats_snapshot() -> dict:
 def _record_stat(status: str) -> None:
     if status in _INGEST_STATS:
         _INGEST_STATS[status] += 1
+        record_capture_ingest("chatgpt", status)
 
 
 @dataclass
@@ -50,12 +53,7 @@ class CaptureIngestResult:
 
 
 def resolve_chatgpt_tool(db: Session) -> Optional[ITPortalTool]:
-    return (
-        db.query(ITPortalTool)
-        .filter(ITPortalTool.slug.in_(TOOL_SLUGS))
-        .filter(ITPortalTool.is_active == True)  # noqa: E712 (SQLAlchemy comparison, not a Python bool check)
-        .first()
-    )
+    return get_active_tool_by_slugs(db, TOOL_SLUGS)
 
 
 def resolve_chatgpt_credential(
@@ -65,18 +63,12 @@ def resolve_chatgpt_credential(
     user_id: int,
     explicit_credential_id: Optional[int] = None,
 ) -> Optional[ITPortalToolCredential]:
-    if explicit_credential_id:
-        explicit = (
-            db.query(ITPortalToolCredential)
-            .filter(
-                ITPortalToolCredential.id == explicit_credential_id,
-                ITPortalToolCredential.tool_id == tool_id,
-            )
-            .first()
-        )
-        if explicit:
-            return explicit
-    return _resolve_tool_credential(db, tool_id, user_id)
+    return _resolve_usage_event_credential(
+        db,
+        tool_id=tool_id,
+        user_id=user_id,
+        explicit_credential_id=explicit_credential_id,
+    )
 
 
 def _parse_event_date(value: Optional[str]) -> date:
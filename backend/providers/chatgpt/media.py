@@ -42,7 +42,8 @@ from providers.chatgpt.constants import (
     PROVIDER,
 )
 from providers.chatgpt.models import ConversationMediaAsset, ConversationRecord
-from routers.upload import _build_public_url, _build_r2_client, _env, _is_r2_configured, _normalized_content_type
+from routers.upload import _build_public_url, _is_r2_configured, _normalized_content_type
+from utils import r2_storage
 
 # Generous enough for high-resolution generated images; video capture
 # (deferred - see plan) will need a much higher ceiling when that phase
@@ -148,9 +149,7 @@ def _upload_bytes_to_r2(raw_bytes: bytes, *, file_name: str, mime_type: str) ->
     safe_name = (file_name or "media").strip().replace("/", "_").replace("\\", "_")[:200] or "media"
     key = f"chatgpt-media/{timestamp_ms}/{uuid4().hex[:8]}_{safe_name}"
 
-    client = _build_r2_client()
-    bucket = _env("R2_BUCKET")
-    client.put_object(Bucket=bucket, Key=key, Body=raw_bytes, ContentType=mime_type)
+    r2_storage.put_object(key, raw_bytes, content_type=mime_type)
 
     return key, _build_public_url(key)
 
@@ -50,6 +50,7 @@ from providers.chatgpt.models import (
     ConversationRecord,
     ConversationResponse,
 )
+from utils.backfill_engine import BackfillJob, replay_range
 
 logger = logging.getLogger("chatgpt_normalization")
 
@@ -415,6 +416,27 @@ def normalize_capture_events_batch(db: Session, events: list) -> dict:
     return {"touchedConversations": len(touched_records), "errors": errors}
 
 
+def _backfill_batch(db: Session, events: list) -> dict:
+    eligible = [event for event in events if event.provider_conversation_id and event.event_type in _EVENT_HANDLERS]
+    stats = {"normalized": 0, "skipped": len(events) - len(eligible), "errors": 0}
+    if eligible:
+        batch_result = normalize_capture_events_batch(db, eligible)
+        stats["errors"] = batch_result["errors"]
+        stats["normalized"] = len(eligible) - batch_result["errors"]
+    return stats
+
+
+# A conversation's events must reach the normalizer in capture order
+# (prompts before their responses, edits after the message), so this job
+# never splits into parallel id ranges.
+BACKFILL_JOB = BackfillJob(
+    name="chatgpt-normalization",
+    model=ConversationCaptureEvent,
+    process_batch=_backfill_batch,
+    parallel_safe=False,
+)
+
+
 def backfill_all(db: Session, *, batch_size: int = 500) -> dict:
     """Replays every historical ConversationCaptureEvent (oldest-first)
     through the same idempotent normalizer the live path uses - safe to
@@ -423,24 +445,5 @@ def backfill_all(db: Session, *, batch_size: int = 500) -> dict:
     just a straight replay of data this system already captured losslessly.
     Commits once per `batch_size`-sized page (via normalize_capture_events_batch),
     not once per event."""
-    stats = {"processed": 0, "normalized": 0, "skipped": 0, "errors": 0}
-    last_id = 0
-    while True:
-        events = (
-            db.query(ConversationCaptureEvent)
-            .filter(ConversationCaptureEvent.id > last_id)
-            .order_by(ConversationCaptureEvent.id.asc())
-            .limit(batch_size)
-            .all()
-        )
-        if not events:
-            break
-        last_id = events[-1].id
-        stats["processed"] += len(events)
-        eligible = [event for event in events if event.provider_conversation_id and event.event_type in _EVENT_HANDLERS]
-        stats["skipped"] += len(events) - len(eligible)
-        if eligible:
-            batch_result = normalize_capture_events_batch(db, eligible)
-            stats["errors"] += batch_result["errors"]
-            stats["normalized"] += len(eligible) - batch_result["errors"]
-    return stats
+    stats = replay_range(db, BACKFILL_JOB, batch_size=batch_size, log=logger)
+    return {key: stats.get(key, 0) for key in ("processed", "normalized", "skipped", "errors")}
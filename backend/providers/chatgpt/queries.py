@@ -46,6 +46,7 @@ from providers.chatgpt.models import (
     ConversationResponse,
 )
 from models_new import User
+from utils import r2_storage
 from utils.datetime_utils import serialize_utc_datetime
 
 # Event types that make up a conversation's chat flow (as opposed to lifecycle
@@ -1327,12 +1328,24 @@ def _build_attachment_list(payload: dict) -> list[dict]:
     return attachments
 
 
+def _signed_urls(keys: list[Optional[str]]) -> dict[str, str]:
+    """Presigned GET URLs for a whole list of stored objects in one pass
+    (r2_storage.presign_urls). Best effort: a signing failure leaves the
+    rows to fall back to /api/files/open, as they did before."""
+    try:
+        return r2_storage.presign_urls(keys)
+    except Exception:
+        return {}
+
+
 def list_conversation_attachments(db: Session, conversation_id: str) -> list[dict]:
     """Real stored files (see attachments.py) for one conversation, newest
     first. Separate from the {kind, label} placeholders embedded in a
     prompt_captured event's payload - those come from the network layer and
     only ever carry a filename; this is the actual uploaded bytes, captured
-    via DOM file-input/drop interception and stored in R2."""
+    via DOM file-input/drop interception and stored in R2. signedUrl is a
+    presigned GET for the stored object (see _signed_urls), null when R2
+    isn't configured."""
     records = (
         db.query(ConversationCaptureAttachment)
         .filter(
@@ -1342,7 +1355,8 @@ def list_conversation_attachments(db: Session, conversation_id: str) -> list[dic
         .order_by(ConversationCaptureAttachment.created_at.desc())
         .all()
     )
-    return [record.to_dict() for record in records]
+    signed = _signed_urls([record.storage_path for record in records])
+    return [{**record.to_dict(), "signedUrl": signed.get(record.storage_path)} for record in records]
 
 
 def list_conversation_media(db: Session, conversation_id: str) -> list[dict]:
@@ -1352,7 +1366,8 @@ def list_conversation_media(db: Session, conversation_id: str) -> list[dict]:
     the server couldn't fetch) has nothing renderable, so it would only show
     as a broken thumbnail in the gallery. The row's `url` is the raw
     (private) R2 url; the dashboard renders it through /api/files/open?url=,
-    which extracts the key and issues a short-lived signed redirect."""
+    which extracts the key and issues a short-lived signed redirect;
+    signedUrl is that same signed URL, so a gallery can skip the redirect."""
     records = (
         db.query(ConversationMediaAsset)
         .filter(
@@ -1366,4 +1381,6 @@ def list_conversation_media(db: Session, conversation_id: str) -> list[dict]:
         )
         .all()
     )
-    return [record.to_dict() for record in records]
+    keys = [r2_storage.object_key(record.url) for record in records]
+    signed = _signed_urls(keys)
+    return [{**record.to_dict(), "signedUrl": signed.get(key)} for record, key in zip(records, keys)]
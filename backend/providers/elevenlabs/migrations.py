@@ -61,8 +61,13 @@ def _sqlite_add_column_if_missing(conn, table_name: str, column_name: str, sql_t
 def ensure_elevenlabs_postgres_schema(conn) -> None:
     _pg_add_column_if_missing(conn, "elevenlabs_generations", "downloaded_at", "TIMESTAMP")
     _pg_add_column_if_missing(conn, "elevenlabs_generations", "credits_used", "INTEGER")
+    # Compressed payloads (providers/payload_store.py). STORAGE EXTERNAL: the
+    # blob is already compressed, so TOAST should not try again.
+    _pg_add_column_if_missing(conn, "elevenlabs_capture_events", "payload_blob", "BYTEA")
+    conn.execute(text("ALTER TABLE elevenlabs_capture_events ALTER COLUMN payload_blob SET STORAGE EXTERNAL"))
 
 
 def ensure_elevenlabs_sqlite_schema(conn) -> None:
     _sqlite_add_column_if_missing(conn, "elevenlabs_generations", "downloaded_at", "DATETIME")
     _sqlite_add_column_if_missing(conn, "elevenlabs_generations", "credits_used", "INTEGER")
+    _sqlite_add_column_if_missing(conn, "elevenlabs_capture_events", "payload_blob", "BLOB")
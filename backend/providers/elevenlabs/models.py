@@ -40,16 +40,18 @@ from sqlalchemy import (
     Index,
     Integer,
     JSON,
+    LargeBinary,
     String,
     Text,
 )
 
 from database_config import Base
+from providers.payload_store import CompressedPayloadMixin
 from utils.datetime_utils import serialize_utc_datetime
 from utils import r2_storage
 
 
-def _presigned_mirror_url(key, *, client=None):
+def _presigned_mirror_url(key):
     """Mints a fresh short-lived R2 URL for a mirrored-asset key at
     serialization time - identical reasoning/implementation to
     providers/freepik/models.py's function of the same name (see its
@@ -63,12 +65,12 @@ def _presigned_mirror_url(key, *, client=None):
     try:
         if not r2_storage.is_configured():
             return None
-        return r2_storage.generate_presigned_url(key, client=client)
+        return r2_storage.generate_presigned_url(key)
     except Exception:
         return None
 
 
-class ElevenlabsCaptureEvent(Base):
+class ElevenlabsCaptureEvent(CompressedPayloadMixin, Base):
     """Raw capture signal reported by the extension - mirrors
     providers/flow/models.py::FlowCaptureEvent's shape/columns/idempotency
     rule exactly (same (provider, credential_id, client_event_id) scope - see
@@ -76,6 +78,7 @@ class ElevenlabsCaptureEvent(Base):
     parsing, no business logic - see providers/elevenlabs/capture.py.
     """
     __tablename__ = "elevenlabs_capture_events"
+    __payload_provider__ = "elevenlabs"
     __table_args__ = (
         Index(
             "ux_elevenlabs_capture_events_credential_client_event_id",
@@ -106,7 +109,10 @@ class ElevenlabsCaptureEvent(Base):
     # Client Mapping - independent selection from Task Mapping above.
     linked_client_id = Column(Integer, ForeignKey("generation_clients.id", ondelete="SET NULL"), index=True)
     linked_client_name = Column(String(255))
-    payload_json = Column(JSON, nullable=False)
+    # payload_json is CompressedPayloadMixin's property over these two:
+    # payload_blob once compressed, else the plain JSON in payload_raw.
+    payload_raw = Column("payload_json", JSON, nullable=False)
+    payload_blob = Column(LargeBinary)
     capture_version = Column(Integer, nullable=False, default=1)
     extension_version = Column(String(40))
     browser = Column(String(80))
@@ -278,7 +284,6 @@ class ElevenlabsGeneration(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
 
     def to_dict(self):
-        r2_client = r2_storage.build_client() if self.mirrored_asset_key and r2_storage.is_configured() else None
         return {
             "id": self.id,
             "provider": self.provider,
@@ -313,7 +318,7 @@ class ElevenlabsGeneration(Base):
             "mediaUrl": self.media_url,
             "thumbnailUrl": self.thumbnail_url,
             "metadata": self.metadata_json or {},
-            "mirroredAssetUrl": _presigned_mirror_url(self.mirrored_asset_key, client=r2_client),
+            "mirroredAssetUrl": _presigned_mirror_url(self.mirrored_asset_key),
             "assetMirrorStatus": self.asset_mirror_status,
             "assetMirrorAttemptedAt": serialize_utc_datetime(self.asset_mirror_attempted_at),
             "assetMirrorError": self.asset_mirror_error,
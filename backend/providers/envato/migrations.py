@@ -291,6 +291,10 @@ def ensure_envato_postgres_schema(conn) -> None:
     _pg_add_column_if_missing(conn, "envato_downloads", "asset_mirror_status", "VARCHAR(20) NOT NULL DEFAULT 'pending'")
     _pg_add_column_if_missing(conn, "envato_downloads", "asset_mirror_attempted_at", "TIMESTAMP")
     _pg_add_column_if_missing(conn, "envato_downloads", "asset_mirror_error", "TEXT")
+    # Compressed payloads (providers/payload_store.py). STORAGE EXTERNAL: the
+    # blob is already compressed, so TOAST should not try again.
+    _pg_add_column_if_missing(conn, "envato_capture_events", "payload_blob", "BYTEA")
+    conn.execute(text("ALTER TABLE envato_capture_events ALTER COLUMN payload_blob SET STORAGE EXTERNAL"))
 
 
 def ensure_envato_sqlite_schema(conn) -> None:
@@ -562,3 +566,4 @@ def ensure_envato_sqlite_schema(conn) -> None:
     _sqlite_add_column_if_missing(conn, "envato_downloads", "asset_mirror_status", "VARCHAR(20) NOT NULL DEFAULT 'pending'")
     _sqlite_add_column_if_missing(conn, "envato_downloads", "asset_mirror_attempted_at", "DATETIME")
     _sqlite_add_column_if_missing(conn, "envato_downloads", "asset_mirror_error", "TEXT")
+    _sqlite_add_column_if_missing(conn, "envato_capture_events", "payload_blob", "BLOB")
@@ -29,6 +29,7 @@ from sqlalchemy import (
     Index,
     Integer,
     JSON,
+    LargeBinary,
     String,
     Text,
     text,
@@ -36,11 +37,12 @@ from sqlalchemy import (
 from datetime import datetime
 
 from database_config import Base
+from providers.payload_store import CompressedPayloadMixin
 from utils.datetime_utils import serialize_utc_datetime
 from utils import r2_storage
 
 
-def _presigned_mirror_url(key, *, client=None):
+def _presigned_mirror_url(key):
     """Mints a fresh short-lived R2 URL for a mirrored-asset key at
     serialization time - identical reasoning/implementation to
     providers/freepik/models.py's function of the same name (see its
@@ -54,12 +56,12 @@ def _presigned_mirror_url(key, *, client=None):
     try:
         if not r2_storage.is_configured():
             return None
-        return r2_storage.generate_presigned_url(key, client=client)
+        return r2_storage.generate_presigned_url(key)
     except Exception:
         return None
 
 
-class EnvatoCaptureEvent(Base):
+class EnvatoCaptureEvent(CompressedPayloadMixin, Base):
     """Raw, provider-agnostic capture signal reported by the extension,
     stored losslessly and opaquely (payload_json) before normalization into
     EnvatoGeneration. Deliberately thin - see providers/envato/capture.py.
@@ -69,6 +71,7 @@ class EnvatoCaptureEvent(Base):
     shared account (credential), never by the reporting portal user.
     """
     __tablename__ = "envato_capture_events"
+    __payload_provider__ = "envato"
     __table_args__ = (
         Index(
             "ux_envato_capture_events_credential_client_event_id",
@@ -97,7 +100,10 @@ class EnvatoCaptureEvent(Base):
     # Client Mapping - independent selection from Task Mapping above.
     linked_client_id = Column(Integer, ForeignKey("generation_clients.id", ondelete="SET NULL"), index=True)
     linked_client_name = Column(String(255))
-    payload_json = Column(JSON, nullable=False)
+    # payload_json is CompressedPayloadMixin's property over these two:
+    # payload_blob once compressed, else the plain JSON in payload_raw.
+    payload_raw = Column("payload_json", JSON, nullable=False)
+    payload_blob = Column(LargeBinary)
     capture_version = Column(Integer, nullable=False, default=1)
     extension_version = Column(String(40))
     browser = Column(String(80))
@@ -412,11 +418,6 @@ class EnvatoDownload(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
     def to_dict(self):
-        r2_client = (
-            r2_storage.build_client()
-            if self.mirrored_asset_key and r2_storage.is_configured()
-            else None
-        )
         return {
             "id": self.id,
             "provider": self.provider,
@@ -437,7 +438,7 @@ class EnvatoDownload(Base):
             "searchTerm": self.search_term,
             "sourceHost": self.source_host,
             "pageUrl": self.page_url,
-            "mirroredAssetUrl": _presigned_mirror_url(self.mirrored_asset_key, client=r2_client),
+            "mirroredAssetUrl": _presigned_mirror_url(self.mirrored_asset_key),
             "assetMirrorStatus": self.asset_mirror_status,
             "assetMirrorAttemptedAt": serialize_utc_datetime(self.asset_mirror_attempted_at),
             "assetMirrorError": self.asset_mirror_error,
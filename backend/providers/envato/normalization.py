@@ -31,6 +31,7 @@ from typing import Any, Optional, Union
 from sqlalchemy.orm import Session
 
 from models_new import GenerationRecord
+from providers.capture_engine import normalize_events_batch
 from providers.envato.constants import (
     EVENT_TYPE_DOWNLOAD_CLICK,
     GENERATION_SOURCE_LIVE_CAPTURE,
@@ -382,34 +383,17 @@ def _project_into_generation_record(db: Session, generation: EnvatoGeneration) -
 
 
 def normalize_capture_events_batch(db: Session, events: list[EnvatoCaptureEvent]) -> dict:
-    """Best-effort relative to raw capture - mirrors
-    providers/freepik/normalization.py's identical function (per-event
-    SAVEPOINT isolation, chunked commit) verbatim."""
-    stats = {"normalized": 0, "skipped": 0, "errors": 0}
-    if not events:
-        return stats
-    pending_since_commit = 0
-    for event in events:
-        savepoint = db.begin_nested()
-        try:
-            generation = normalize_capture_event(db, event)
-            savepoint.commit()
-            stats["normalized" if generation is not None else "skipped"] += 1
-        except Exception:
-            savepoint.rollback()
-            stats["errors"] += 1
-            logger.exception(
-                "envato normalization failed for capture_event_id=%s - skipped this cycle, "
-                "harmless if lost to a concurrent normalize of the same item_uuid",
-                event.id,
-            )
-        pending_since_commit += 1
-        if pending_since_commit >= INGEST_COMMIT_CHUNK_SIZE:
-            db.commit()
-            pending_since_commit = 0
-    if pending_since_commit:
-        db.commit()
-    return stats
+    """Best-effort relative to raw capture - the shared
+    capture_engine.normalize_events_batch driver (per-event SAVEPOINT
+    isolation, chunked commit) over normalize_capture_event."""
+    return normalize_events_batch(
+        db,
+        events,
+        normalize_capture_event,
+        provider=PROVIDER,
+        commit_chunk_size=INGEST_COMMIT_CHUNK_SIZE,
+        logger=logger,
+    )
 
 
 def backfill_all(db: Session, *, batch_size: int = 500) -> dict:
@@ -6,28 +6,17 @@ extension (content-envato.js), authenticated as the tab's own logged-in
 Envato session via `POST /generation-history.data` with
 `actionType=loadMore` - there is no server-side Envato credential.
 """
-from datetime import datetime
 from typing import Optional
 
 from sqlalchemy.orm import Session
 
-from providers.envato.constants import SYNC_STATUS_FAILED, SYNC_STATUS_IDLE, SYNC_STATUS_RUNNING
+from providers import capture_engine
+from providers.envato.capture import CAPTURE
 from providers.envato.models import EnvatoSyncCursor
 
 
 def get_or_create_cursor(db: Session, *, credential_id: int) -> EnvatoSyncCursor:
-    cursor = (
-        db.query(EnvatoSyncCursor)
-        .filter(EnvatoSyncCursor.credential_id == credential_id)
-        .first()
-    )
-    if cursor:
-        return cursor
-    cursor = EnvatoSyncCursor(credential_id=credential_id, status=SYNC_STATUS_IDLE)
-    db.add(cursor)
-    db.commit()
-    db.refresh(cursor)
-    return cursor
+    return capture_engine.get_or_create_cursor(CAPTURE, db, credential_id=credential_id)
 
 
 def report_sync_progress(
@@ -41,20 +30,17 @@ def report_sync_progress(
     error: Optional[str],
     run_by_user_id: Optional[int],
 ) -> EnvatoSyncCursor:
-    cursor = get_or_create_cursor(db, credential_id=credential_id)
-
-    if is_full_reconciliation or last_synced_page >= (cursor.last_synced_page or 0):
-        cursor.last_synced_page = last_synced_page
-        if last_seen_item_uuid:
-            cursor.last_seen_item_uuid = last_seen_item_uuid
-    if is_full_reconciliation and status == SYNC_STATUS_IDLE:
-        cursor.last_full_reconciliation_at = datetime.utcnow()
-
-    cursor.last_run_at = datetime.utcnow()
-    cursor.last_run_by_user_id = run_by_user_id
-    cursor.status = status if status in (SYNC_STATUS_IDLE, SYNC_STATUS_RUNNING, SYNC_STATUS_FAILED) else SYNC_STATUS_IDLE
-    cursor.last_error = error
-
-    db.commit()
-    db.refresh(cursor)
-    return cursor
+    """Idempotent progress report from the extension after walking one batch
+    of reconciliation pages - see capture_engine.report_sync_progress for the
+    forward-only rule."""
+    return capture_engine.report_sync_progress(
+        CAPTURE,
+        db,
+        credential_id=credential_id,
+        last_seen_id=last_seen_item_uuid,
+        last_synced_page=last_synced_page,
+        is_full_reconciliation=is_full_reconciliation,
+        status=status,
+        error=error,
+        run_by_user_id=run_by_user_id,
+    )
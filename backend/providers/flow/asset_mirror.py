@@ -145,7 +145,7 @@ def mirror_pending_generations(db: Session, *, limit: int = 25) -> dict:
     if not rows:
         return stats
 
-    r2_client = r2_storage.build_client()
+    r2_client = r2_storage.get_client()
     with httpx.Client(follow_redirects=True) as http_client:
         for generation in rows:
             stats["scanned"] += 1
@@ -55,6 +55,10 @@ def ensure_flow_postgres_schema(conn) -> None:
     _pg_add_column_if_missing(conn, "flow_generations", "asset_mirror_status", "VARCHAR(20) NOT NULL DEFAULT 'pending'")
     _pg_add_column_if_missing(conn, "flow_generations", "asset_mirror_attempted_at", "TIMESTAMP")
     _pg_add_column_if_missing(conn, "flow_generations", "asset_mirror_error", "TEXT")
+    # Compressed payloads (providers/payload_store.py). STORAGE EXTERNAL: the
+    # blob is already compressed, so TOAST should not try again.
+    _pg_add_column_if_missing(conn, "flow_capture_events", "payload_blob", "BYTEA")
+    conn.execute(text("ALTER TABLE flow_capture_events ALTER COLUMN payload_blob SET STORAGE EXTERNAL"))
 
 
 def ensure_flow_sqlite_schema(conn) -> None:
@@ -63,3 +67,4 @@ def ensure_flow_sqlite_schema(conn) -> None:
     _sqlite_add_column_if_missing(conn, "flow_generations", "asset_mirror_status", "VARCHAR(20) NOT NULL DEFAULT 'pending'")
     _sqlite_add_column_if_missing(conn, "flow_generations", "asset_mirror_attempted_at", "DATETIME")
     _sqlite_add_column_if_missing(conn, "flow_generations", "asset_mirror_error", "TEXT")
+    _sqlite_add_column_if_missing(conn, "flow_capture_events", "payload_blob", "BLOB")
@@ -29,16 +29,18 @@ from sqlalchemy import (
     Index,
     Integer,
     JSON,
+    LargeBinary,
     String,
     Text,
 )
 
 from database_config import Base
+from providers.payload_store import CompressedPayloadMixin
 from utils.datetime_utils import serialize_utc_datetime
 from utils import r2_storage
 
 
-def _presigned_mirror_url(key, *, client=None):
+def _presigned_mirror_url(key):
     """Mints a fresh short-lived R2 URL for a mirrored-asset key at
     serialization time - identical reasoning/implementation to
     providers/freepik/models.py's function of the same name (see its
@@ -52,12 +54,12 @@ def _presigned_mirror_url(key, *, client=None):
     try:
         if not r2_storage.is_configured():
             return None
-        return r2_storage.generate_presigned_url(key, client=client)
+        return r2_storage.generate_presigned_url(key)
     except Exception:
         return None
 
 
-class FlowCaptureEvent(Base):
+class FlowCaptureEvent(CompressedPayloadMixin, Base):
     """Raw capture signal reported by the extension - mirrors
     providers/freepik/models.py::FreepikCaptureEvent's shape/columns/
     idempotency rule exactly (same (provider, credential_id, client_event_id)
@@ -65,6 +67,7 @@ class FlowCaptureEvent(Base):
     thin: no parsing, no business logic - see providers/flow/capture.py.
     """
     __tablename__ = "flow_capture_events"
+    __payload_provider__ = "flow"
     __table_args__ = (
         Index(
             "ux_flow_capture_events_credential_client_event_id",
@@ -95,7 +98,10 @@ class FlowCaptureEvent(Base):
     # Client Mapping - independent selection from Task Mapping above.
     linked_client_id = Column(Integer, ForeignKey("generation_clients.id", ondelete="SET NULL"), index=True)
     linked_client_name = Column(String(255))
-    payload_json = Column(JSON, nullable=False)
+    # payload_json is CompressedPayloadMixin's property over these two:
+    # payload_blob once compressed, else the plain JSON in payload_raw.
+    payload_raw = Column("payload_json", JSON, nullable=False)
+    payload_blob = Column(LargeBinary)
     capture_version = Column(Integer, nullable=False, default=1)
     extension_version = Column(String(40))
     browser = Column(String(80))
@@ -256,11 +262,6 @@ class FlowGeneration(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
 
     def to_dict(self):
-        r2_client = (
-            r2_storage.build_client()
-            if (self.mirrored_asset_key or self.mirrored_thumbnail_key) and r2_storage.is_configured()
-            else None
-        )
         return {
             "id": self.id,
             "provider": self.provider,
@@ -293,8 +294,8 @@ class FlowGeneration(Base):
             "providerUpdatedAt": serialize_utc_datetime(self.provider_updated_at),
             "mediaUrl": self.media_url,
             "thumbnailUrl": self.thumbnail_url,
-            "mirroredAssetUrl": _presigned_mirror_url(self.mirrored_asset_key, client=r2_client),
-            "mirroredThumbnailUrl": _presigned_mirror_url(self.mirrored_thumbnail_key, client=r2_client),
+            "mirroredAssetUrl": _presigned_mirror_url(self.mirrored_asset_key),
+            "mirroredThumbnailUrl": _presigned_mirror_url(self.mirrored_thumbnail_key),
             "assetMirrorStatus": self.asset_mirror_status,
             "assetMirrorAttemptedAt": serialize_utc_datetime(self.asset_mirror_attempted_at),
             "assetMirrorError": self.asset_mirror_error,
@@ -27,6 +27,7 @@ from typing import Any, List, Optional
 from sqlalchemy.orm import Session
 
 from models_new import GenerationRecord
+from providers.capture_engine import normalize_events_batch
 from providers.flow.constants import (
     EVENT_TYPE_MEDIA_URL_RESOLVED,
     GENERATION_SOURCE_LIVE_CAPTURE,
@@ -387,38 +388,17 @@ def _project_into_generation_record(db: Session, generation: FlowGeneration) ->
 
 def normalize_capture_events_batch(db: Session, events: List[FlowCaptureEvent]) -> dict:
     """Best-effort relative to raw capture (each event is already durably
-    committed by ingest_capture_event before this runs) - mirrors
-    providers/freepik/normalization.py's identical function, including the
-    per-event SAVEPOINT isolation reasoning (a concurrent normalize of the
-    same never-before-seen provider_creation_id must not roll back sibling
-    events already normalized in the same batch)."""
-    stats = {"normalized": 0, "skipped": 0, "errors": 0}
-    if not events:
-        return stats
-    pending_since_commit = 0
-    for event in events:
-        savepoint = db.begin_nested()
-        try:
-            generation = normalize_capture_event(db, event)
-            savepoint.commit()
-            # A None return is the deliberate "no identity field in this
-            # payload" skip, not a failure.
-            stats["normalized" if generation is not None else "skipped"] += 1
-        except Exception:
-            savepoint.rollback()
-            stats["errors"] += 1
-            logger.exception(
-                "flow normalization failed for capture_event_id=%s - skipped this cycle, "
-                "harmless if lost to a concurrent normalize of the same provider_creation_id",
-                event.id,
-            )
-        pending_since_commit += 1
-        if pending_since_commit >= INGEST_COMMIT_CHUNK_SIZE:
-            db.commit()
-            pending_since_commit = 0
-    if pending_since_commit:
-        db.commit()
-    return stats
+    committed by ingest_capture_event before this runs). Same shared driver
+    as every other ticket-attributed provider:
+    capture_engine.normalize_events_batch."""
+    return normalize_events_batch(
+        db,
+        events,
+        normalize_capture_event,
+        provider=PROVIDER,
+        commit_chunk_size=INGEST_COMMIT_CHUNK_SIZE,
+        logger=logger,
+    )
 
 
 def backfill_all(db: Session, *, batch_size: int = 500) -> dict:
@@ -16,15 +16,15 @@ from sqlalchemy.orm import Session
 
 from database_config import get_operational_db
 from models_new import User
+from providers import capture_engine
 from providers.flow.capture import (
-    ingest_capture_event,
+    CAPTURE,
     resolve_flow_actor,
     resolve_flow_credential,
     resolve_flow_tool,
 )
-from providers.flow.constants import INGEST_COMMIT_CHUNK_SIZE, PROVIDER
+from providers.flow.constants import PROVIDER
 from providers.flow.models import FlowCaptureEvent, FlowGeneration
-from providers.flow.normalization import normalize_capture_events_batch
 from providers.flow.schemas import (
     CaptureEventResult,
     CaptureEventsRequest,
@@ -35,6 +35,7 @@ from providers.flow.schemas import (
     GenerationListOut,
     PaginationOut,
 )
+from utils import r2_storage
 from utils.permissions import require_admin
 
 router = APIRouter(prefix="/api/providers/flow", tags=["flow"])
@@ -75,129 +76,22 @@ def _attach_event_user_names(db: Session, dicts: list[dict]) -> list[dict]:
     return dicts
 
 
-def _ownership_confidence(*, is_reconciliation: bool, has_ticket: bool) -> str:
-    if is_reconciliation:
-        return "reconciliation"
-    return "ticket" if has_ticket else "session"
-
-
 @router.post("/capture/events", response_model=CaptureEventsResponse)
 def capture_events(
     payload: CaptureEventsRequest,
     request: Request,
     db: Session = Depends(get_operational_db),
 ):
-    tool = resolve_flow_tool(db)
-    if not tool:
-        return CaptureEventsResponse(
-            success=False,
-            results=[
-                CaptureEventResult(client_event_id=item.client_event_id, status="rejected", reason="flow tool is not configured")
-                for item in payload.events
-            ],
-        )
-
-    results = []
-    newly_created_events = []
-    pending_since_commit = 0
-    # Memoized per unique (usage_ticket, extension_ticket, explicit_credential_id)
-    # triple, NOT resolved once for the whole request - see
-    # providers/freepik/router.py's identical comment for why a shared
-    # multi-tab queue makes per-request resolution unsafe here (unlike
-    # ChatGPT's session-based router, where it's safe).
-    resolution_cache: dict = {}
-
-    for item in payload.events:
-        cache_key = (item.usage_ticket, item.extension_ticket, item.credential_id)
-        cached = resolution_cache.get(cache_key)
-        if cached is not None:
-            current_user, credential_id, cached_error = cached
-            if cached_error is not None:
-                results.append(
-                    CaptureEventResult(client_event_id=item.client_event_id, status="rejected", reason=cached_error)
-                )
-                continue
-        else:
-            try:
-                current_user = resolve_flow_actor(
-                    request=request,
-                    db=db,
-                    tool=tool,
-                    usage_ticket=item.usage_ticket,
-                    extension_ticket=item.extension_ticket,
-                )
-            except HTTPException as error:
-                resolution_cache[cache_key] = (None, None, str(error.detail))
-                results.append(
-                    CaptureEventResult(client_event_id=item.client_event_id, status="rejected", reason=str(error.detail))
-                )
-                continue
-
-            credential = resolve_flow_credential(
-                db,
-                tool_id=tool.id,
-                user_id=current_user.id,
-                explicit_credential_id=item.credential_id,
-            )
-            credential_id = credential.id if credential else None
-            resolution_cache[cache_key] = (current_user, credential_id, None)
-
-        outcome = ingest_capture_event(
-            db,
-            tool=tool,
-            credential_id=credential_id,
-            user=current_user,
-            event_type=item.event_type,
-            client_event_id=item.client_event_id,
-            creation_id=item.creation_id,
-            family_id=item.family_id,
-            payload=item.payload,
-            capture_version=item.capture_version,
-            extension_version=item.extension_version,
-            browser=item.browser,
-            tab_id=item.tab_id,
-            session_id=item.session_id,
-            extension_session_id=item.extension_session_id,
-            event_date=item.event_date,
-            task_id=item.linked_task_id,
-            client_id=item.linked_client_id,
-            ownership_confidence=_ownership_confidence(
-                is_reconciliation=item.is_reconciliation,
-                has_ticket=bool(item.usage_ticket or item.extension_ticket),
-            ),
-        )
-        if outcome.status == "created" and outcome.event is not None:
-            newly_created_events.append(outcome.event)
-        results.append(
-            CaptureEventResult(
-                client_event_id=item.client_event_id,
-                status=outcome.status,
-                id=outcome.event.id if outcome.event else None,
-                reason=outcome.reason,
-            )
-        )
-
-        # ingest_capture_event flushes inside a savepoint but never commits -
-        # the transaction is ours. Commit a chunk at a time.
-        pending_since_commit += 1
-        if pending_since_commit >= INGEST_COMMIT_CHUNK_SIZE:
-            db.commit()
-            pending_since_commit = 0
-
-    if pending_since_commit:
-        db.commit()
-
-    if newly_created_events:
-        # Normalization failure must never turn a successful, lossless
-        # ingest into an error response - every event above is already
-        # committed at this point, so nothing here can lose raw data.
-        try:
-            normalize_capture_events_batch(db, newly_created_events)
-        except Exception:
-            logger.exception("flow normalization batch failed for %d event(s)", len(newly_created_events))
-            db.rollback()
-
-    return CaptureEventsResponse(success=True, results=results)
+    success, results = capture_engine.ingest_capture_batch(
+        CAPTURE,
+        db,
+        request=request,
+        events=payload.events,
+        tool=resolve_flow_tool(db),
+        resolve_actor=resolve_flow_actor,
+        resolve_credential=resolve_flow_credential,
+    )
+    return CaptureEventsResponse(success=success, results=[CaptureEventResult(**result) for result in results])
 
 
 # ==================== Minimal admin read surface ====================
@@ -229,6 +123,7 @@ def list_generations(
 
     total = query.count()
     items = query.order_by(desc(FlowGeneration.created_at)).offset(offset).limit(limit).all()
+    r2_storage.prime_presigned(items, "mirrored_asset_key", "mirrored_thumbnail_key")
     data = _attach_owner_names(db, [item.to_dict() for item in items])
     return GenerationListOut(
         data=data,
@@ -379,6 +379,10 @@ def ensure_freepik_postgres_schema(conn) -> None:
     conn.execute(text("CREATE INDEX IF NOT EXISTS ix_freepik_downloads_credential_created_at ON freepik_downloads(credential_id, created_at)"))
     conn.execute(text("CREATE INDEX IF NOT EXISTS ix_freepik_downloads_linked_task_id ON freepik_downloads(linked_task_id)"))
     conn.execute(text("CREATE INDEX IF NOT EXISTS ix_freepik_downloads_linked_client_id ON freepik_downloads(linked_client_id)"))
+    # Compressed payloads (providers/payload_store.py). STORAGE EXTERNAL: the
+    # blob is already compressed, so TOAST should not try again.
+    _pg_add_column_if_missing(conn, "freepik_capture_events", "payload_blob", "BYTEA")
+    conn.execute(text("ALTER TABLE freepik_capture_events ALTER COLUMN payload_blob SET STORAGE EXTERNAL"))
 
 
 def ensure_freepik_sqlite_schema(conn) -> None:
@@ -727,3 +731,4 @@ def ensure_freepik_sqlite_schema(conn) -> None:
     conn.execute(text("CREATE INDEX IF NOT EXISTS ix_freepik_downloads_credential_created_at ON freepik_downloads(credential_id, created_at)"))
     conn.execute(text("CREATE INDEX IF NOT EXISTS ix_freepik_downloads_linked_task_id ON freepik_downloads(linked_task_id)"))
     conn.execute(text("CREATE INDEX IF NOT EXISTS ix_freepik_downloads_linked_client_id ON freepik_downloads(linked_client_id)"))
+    _sqlite_add_column_if_missing(conn, "freepik_capture_events", "payload_blob", "BLOB")
@@ -29,6 +29,7 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from models_new import GenerationRecord
+from providers.capture_engine import normalize_events_batch
 from providers.freepik.constants import (
     EVENT_TYPE_DOWNLOAD_CLICK,
     EVENT_TYPE_SEARCH_QUERY,
@@ -47,6 +48,7 @@ from providers.freepik.constants import (
     PROVIDER,
 )
 from providers.freepik.models import FreepikCaptureEvent, FreepikDownload, FreepikGeneration, FreepikSearchQuery
+from utils.backfill_engine import BackfillJob, replay_range
 
 logger = logging.getLogger("freepik_normalization")
 
@@ -616,65 +618,48 @@ def normalize_capture_events_batch(db: Session, events: list[FreepikCaptureEvent
     failure here must never turn a successful, lossless ingest into an error
     response.
 
-    Each event is isolated in its own SAVEPOINT, and a real COMMIT lands once
-    per INGEST_COMMIT_CHUNK_SIZE events. The isolation matters: two requests
-    normalizing the same never-before-seen creation_id at once make the
-    loser's INSERT raise IntegrityError against FreepikGeneration's unique
-    index, and without per-event isolation that single collision would roll
-    back every sibling already normalized in the same batch. It costs the
-    losing event only its own redundant update - not a bug, since the winning
-    request already normalized that creation_id correctly.
-
-    An earlier version bought that isolation with a COMMIT per event, which
-    on a 200-event batch meant 200 sequential round-trips to the pooler on one
-    held connection. Savepoints give the same guarantee for a fraction of the
-    traffic.
+    Each event runs in its own SAVEPOINT with a real COMMIT once per
+    INGEST_COMMIT_CHUNK_SIZE events - see capture_engine.normalize_events_batch
+    for why the isolation matters when two requests race on one creation_id.
 
     Returns per-batch counts ({"normalized", "skipped", "errors"}) so the
     backfill below can report an honest outcome. The live capture path ignores
     the return value - a normalization problem there is logged, never
     surfaced to the extension."""
-    stats = {"normalized": 0, "skipped": 0, "errors": 0}
-    if not events:
-        return stats
-    pending_since_commit = 0
-    for event in events:
-        savepoint = db.begin_nested()
-        try:
-            generation = normalize_capture_event(db, event)
-            savepoint.commit()
-            # A None return is the deliberate "no identity field in this
-            # payload" skip, not a failure - see normalize_capture_event.
-            stats["normalized" if generation is not None else "skipped"] += 1
-        except Exception:
-            savepoint.rollback()
-            stats["errors"] += 1
-            logger.exception(
-                "freepik normalization failed for capture_event_id=%s - skipped this cycle, "
-                "harmless if lost to a concurrent normalize of the same creation_id",
-                event.id,
-            )
-        pending_since_commit += 1
-        if pending_since_commit >= INGEST_COMMIT_CHUNK_SIZE:
-            db.commit()
-            pending_since_commit = 0
-    if pending_since_commit:
-        db.commit()
-    return stats
+    return normalize_events_batch(
+        db,
+        events,
+        normalize_capture_event,
+        provider=PROVIDER,
+        commit_chunk_size=INGEST_COMMIT_CHUNK_SIZE,
+        logger=logger,
+    )
+
+
+BACKFILL_JOB = BackfillJob(
+    name="freepik-normalization",
+    model=FreepikCaptureEvent,
+    process_batch=normalize_capture_events_batch,
+    criteria=(FreepikCaptureEvent.provider == PROVIDER,),
+)
 
 
 def backfill_all(db: Session, *, batch_size: int = 500) -> dict:
     """Replays every historical FreepikCaptureEvent through the same
     idempotent normalizer the live path uses. Safe to re-run any number of
-    times; safe to interrupt and restart (keyset pagination + per-event
-    commit means completed work is already durable).
+    times; safe to interrupt and restart (normalize_capture_events_batch
+    commits as it goes, so completed work is already durable). For a
+    resumable, multi-process replay use utils.backfill_engine.run_backfill
+    ("freepik-normalization"), as scripts/backfill_freepik_normalization.py
+    does.
 
     Oldest-first is load-bearing, not incidental. The same creation is
     captured repeatedly as it moves from "processing" to "completed", and
     replaying in id order feeds those snapshots to normalize_capture_event in
     their original sequence, so each row converges on its newest state. The
-    staleness guard makes any other ordering safe too, but this ordering
-    makes it unnecessary.
+    staleness guard makes any other ordering safe too - which is what lets
+    BACKFILL_JOB replay id ranges in parallel - but this ordering makes it
+    unnecessary.
 
     Ownership cannot drift on a replay: _is_fresh_enough_for_attribution
     measures the generation's age against `event.created_at` - when the event
@@ -682,25 +667,5 @@ def backfill_all(db: Session, *, batch_size: int = 500) -> dict:
     exact same attribution verdict the live pass did, however long after the
     fact it runs.
     """
-    stats = {"processed": 0, "normalized": 0, "skipped": 0, "errors": 0}
-    last_id = 0
-    while True:
-        events = (
-            db.query(FreepikCaptureEvent)
-            .filter(FreepikCaptureEvent.provider == PROVIDER, FreepikCaptureEvent.id > last_id)
-            .order_by(FreepikCaptureEvent.id.asc())
-            .limit(batch_size)
-            .all()
-        )
-        if not events:
-            break
-        last_id = events[-1].id
-        stats["processed"] += len(events)
-        batch_stats = normalize_capture_events_batch(db, events)
-        for key, value in batch_stats.items():
-            stats[key] += value
-        logger.info(
-            "freepik backfill progress: processed=%s normalized=%s skipped=%s errors=%s (through capture_event_id=%s)",
-            stats["processed"], stats["normalized"], stats["skipped"], stats["errors"], last_id,
-        )
-    return stats
+    stats = replay_range(db, BACKFILL_JOB, batch_size=batch_size, log=logger)
+    return {key: stats.get(key, 0) for key in ("processed", "normalized", "skipped", "errors")}
@@ -16,28 +16,17 @@ One row per credential (the shared Freepik account), not per user - the
 cursor describes how far *that account's* history has been walked,
 independent of who happens to be running the scan.
 """
-from datetime import datetime
 from typing import Optional
 
 from sqlalchemy.orm import Session
 
-from providers.freepik.constants import SYNC_STATUS_FAILED, SYNC_STATUS_IDLE, SYNC_STATUS_RUNNING
+from providers import capture_engine
+from providers.freepik.capture import CAPTURE
 from providers.freepik.models import FreepikSyncCursor
 
 
 def get_or_create_cursor(db: Session, *, credential_id: int) -> FreepikSyncCursor:
-    cursor = (
-        db.query(FreepikSyncCursor)
-        .filter(FreepikSyncCursor.credential_id == credential_id)
-        .first()
-    )
-    if cursor:
-        return cursor
-    cursor = FreepikSyncCursor(credential_id=credential_id, status=SYNC_STATUS_IDLE)
-    db.add(cursor)
-    db.commit()
-    db.refresh(cursor)
-    return cursor
+    return capture_engine.get_or_create_cursor(CAPTURE, db, credential_id=credential_id)
 
 
 def report_sync_progress(
@@ -52,24 +41,16 @@ def report_sync_progress(
     run_by_user_id: Optional[int],
 ) -> FreepikSyncCursor:
     """Idempotent progress report from the extension after walking one batch
-    of reconciliation pages. Only ever moves last_synced_page forward for an
-    incremental walk (a stale/out-of-order report from a slower tab can't
-    regress a cursor another tab already advanced); a full reconciliation
-    report always wins since it is authoritative for the entire history."""
-    cursor = get_or_create_cursor(db, credential_id=credential_id)
-
-    if is_full_reconciliation or last_synced_page >= (cursor.last_synced_page or 0):
-        cursor.last_synced_page = last_synced_page
-        if last_seen_creation_id:
-            cursor.last_seen_creation_id = last_seen_creation_id
-    if is_full_reconciliation and status == SYNC_STATUS_IDLE:
-        cursor.last_full_reconciliation_at = datetime.utcnow()
-
-    cursor.last_run_at = datetime.utcnow()
-    cursor.last_run_by_user_id = run_by_user_id
-    cursor.status = status if status in (SYNC_STATUS_IDLE, SYNC_STATUS_RUNNING, SYNC_STATUS_FAILED) else SYNC_STATUS_IDLE
-    cursor.last_error = error
-
-    db.commit()
-    db.refresh(cursor)
-    return cursor
+    of reconciliation pages - see capture_engine.report_sync_progress for the
+    forward-only rule."""
+    return capture_engine.report_sync_progress(
+        CAPTURE,
+        db,
+        credential_id=credential_id,
+        last_seen_id=last_seen_creation_id,
+        last_synced_page=last_synced_page,
+        is_full_reconciliation=is_full_reconciliation,
+        status=status,
+        error=error,
+        run_by_user_id=run_by_user_id,
+    )
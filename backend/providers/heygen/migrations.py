@@ -310,6 +310,10 @@ def ensure_heygen_postgres_schema(conn) -> None:
             """
         )
     )
+    # Compressed payloads (providers/payload_store.py). STORAGE EXTERNAL: the
+    # blob is already compressed, so TOAST should not try again.
+    _pg_add_column_if_missing(conn, "heygen_capture_events", "payload_blob", "BYTEA")
+    conn.execute(text("ALTER TABLE heygen_capture_events ALTER COLUMN payload_blob SET STORAGE EXTERNAL"))
 
 
 def ensure_heygen_sqlite_schema(conn) -> None:
@@ -578,3 +582,4 @@ def ensure_heygen_sqlite_schema(conn) -> None:
             """
         )
     )
+    _sqlite_add_column_if_missing(conn, "heygen_capture_events", "payload_blob", "BLOB")
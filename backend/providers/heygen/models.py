@@ -31,6 +31,7 @@ from sqlalchemy import (
     Index,
     Integer,
     JSON,
+    LargeBinary,
     String,
     Text,
     text,
@@ -38,11 +39,12 @@ from sqlalchemy import (
 from datetime import datetime
 
 from database_config import Base
+from providers.payload_store import CompressedPayloadMixin
 from utils.datetime_utils import serialize_utc_datetime
 from utils import r2_storage
 
 
-def _presigned_mirror_url(key, *, client=None):
+def _presigned_mirror_url(key):
     """Mints a fresh short-lived R2 URL for a mirrored-asset key at
     serialization time - see providers/freepik/models.py's identical helper
     for the private-bucket reasoning (this package's template). Swallows any
@@ -54,12 +56,12 @@ def _presigned_mirror_url(key, *, client=None):
     try:
         if not r2_storage.is_configured():
             return None
-        return r2_storage.generate_presigned_url(key, client=client)
+        return r2_storage.generate_presigned_url(key)
     except Exception:
         return None
 
 
-class HeygenCaptureEvent(Base):
+class HeygenCaptureEvent(CompressedPayloadMixin, Base):
     """Raw, provider-agnostic capture signal reported by the extension, stored
     losslessly and opaquely (payload_json) before normalization into
     HeygenGeneration. Deliberately thin: no parsing, no business logic - see
@@ -72,6 +74,7 @@ class HeygenCaptureEvent(Base):
     duplicate row.
     """
     __tablename__ = "heygen_capture_events"
+    __payload_provider__ = "heygen"
     __table_args__ = (
         Index(
             "ux_heygen_capture_events_credential_client_event_id",
@@ -102,7 +105,10 @@ class HeygenCaptureEvent(Base):
     # Client Mapping - independent selection from Task Mapping above.
     linked_client_id = Column(Integer, ForeignKey("generation_clients.id", ondelete="SET NULL"), index=True)
     linked_client_name = Column(String(255))
-    payload_json = Column(JSON, nullable=False)
+    # payload_json is CompressedPayloadMixin's property over these two:
+    # payload_blob once compressed, else the plain JSON in payload_raw.
+    payload_raw = Column("payload_json", JSON, nullable=False)
+    payload_blob = Column(LargeBinary)
     capture_version = Column(Integer, nullable=False, default=1)
     extension_version = Column(String(40))
     browser = Column(String(80))
@@ -319,10 +325,6 @@ class HeygenGeneration(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
 
     def to_dict(self):
-        # One R2 client shared by both presign calls below (asset + thumbnail)
-        # instead of building a fresh one for each - client construction is
-        # local/no network I/O, but no reason to pay it twice per row.
-        r2_client = r2_storage.build_client() if (self.mirrored_asset_key or self.mirrored_thumbnail_key) and r2_storage.is_configured() else None
         return {
             "id": self.id,
             "provider": self.provider,
@@ -397,8 +399,8 @@ class HeygenGeneration(Base):
             "storageUrl": self.storage_url,
             "metadata": self.metadata_json or {},
             "sourceMetadata": self.source_metadata_json or {},
-            "mirroredAssetUrl": _presigned_mirror_url(self.mirrored_asset_key, client=r2_client),
-            "mirroredThumbnailUrl": _presigned_mirror_url(self.mirrored_thumbnail_key, client=r2_client),
+            "mirroredAssetUrl": _presigned_mirror_url(self.mirrored_asset_key),
+            "mirroredThumbnailUrl": _presigned_mirror_url(self.mirrored_thumbnail_key),
             "assetMirrorStatus": self.asset_mirror_status,
             "assetMirrorAttemptedAt": serialize_utc_datetime(self.asset_mirror_attempted_at),
             "assetMirrorError": self.asset_mirror_error,
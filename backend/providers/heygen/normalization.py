@@ -42,6 +42,7 @@ from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 from models_new import GenerationRecord
+from providers.capture_engine import normalize_events_batch
 from providers.heygen.constants import (
     GENERATION_SOURCE_LIVE_CAPTURE,
     GENERATION_SOURCE_RECONCILIATION,
@@ -582,36 +583,17 @@ def _project_into_generation_record(db: Session, generation: HeygenGeneration) -
 
 def normalize_capture_events_batch(db: Session, events: list[HeygenCaptureEvent]) -> dict:
     """Best-effort relative to raw capture (each event is already durably
-    committed by ingest_capture_event before this runs) - a normalization
-    failure here must never turn a successful, lossless ingest into an error
-    response. Each event is isolated in its own SAVEPOINT so one event losing
-    a concurrent-insert race can't roll back its siblings; a real COMMIT lands
-    once per INGEST_COMMIT_CHUNK_SIZE events."""
-    stats = {"normalized": 0, "skipped": 0, "errors": 0}
-    if not events:
-        return stats
-    pending_since_commit = 0
-    for event in events:
-        savepoint = db.begin_nested()
-        try:
-            generation = normalize_capture_event(db, event)
-            savepoint.commit()
-            stats["normalized" if generation is not None else "skipped"] += 1
-        except Exception:
-            savepoint.rollback()
-            stats["errors"] += 1
-            logger.exception(
-                "heygen normalization failed for capture_event_id=%s - skipped this cycle, "
-                "harmless if lost to a concurrent normalize of the same identity",
-                event.id,
-            )
-        pending_since_commit += 1
-        if pending_since_commit >= INGEST_COMMIT_CHUNK_SIZE:
-            db.commit()
-            pending_since_commit = 0
-    if pending_since_commit:
-        db.commit()
-    return stats
+    committed by ingest_capture_event before this runs). Per-event SAVEPOINT
+    isolation and chunked commits come from
+    capture_engine.normalize_events_batch."""
+    return normalize_events_batch(
+        db,
+        events,
+        normalize_capture_event,
+        provider=PROVIDER,
+        commit_chunk_size=INGEST_COMMIT_CHUNK_SIZE,
+        logger=logger,
+    )
 
 
 def backfill_all(db: Session, *, batch_size: int = 500) -> dict:
@@ -19,28 +19,17 @@ field is known, mirroring Freepik's design; until then nothing calls
 report_sync_progress and every cursor stays at its created idle state, same
 graceful degradation as before.
 """
-from datetime import datetime
 from typing import Optional
 
 from sqlalchemy.orm import Session
 
-from providers.heygen.constants import SYNC_STATUS_FAILED, SYNC_STATUS_IDLE, SYNC_STATUS_RUNNING
+from providers import capture_engine
+from providers.heygen.capture import CAPTURE
 from providers.heygen.models import HeygenSyncCursor
 
 
 def get_or_create_cursor(db: Session, *, credential_id: int) -> HeygenSyncCursor:
-    cursor = (
-        db.query(HeygenSyncCursor)
-        .filter(HeygenSyncCursor.credential_id == credential_id)
-        .first()
-    )
-    if cursor:
-        return cursor
-    cursor = HeygenSyncCursor(credential_id=credential_id, status=SYNC_STATUS_IDLE)
-    db.add(cursor)
-    db.commit()
-    db.refresh(cursor)
-    return cursor
+    return capture_engine.get_or_create_cursor(CAPTURE, db, credential_id=credential_id)
 
 
 def report_sync_progress(
@@ -55,23 +44,16 @@ def report_sync_progress(
     run_by_user_id: Optional[int],
 ) -> HeygenSyncCursor:
     """Idempotent progress report from the extension after walking one batch
-    of reconciliation pages. Only ever moves last_synced_page forward for an
-    incremental walk; a full reconciliation report always wins since it is
-    authoritative for the entire history."""
-    cursor = get_or_create_cursor(db, credential_id=credential_id)
-
-    if is_full_reconciliation or last_synced_page >= (cursor.last_synced_page or 0):
-        cursor.last_synced_page = last_synced_page
-        if last_seen_video_id:
-            cursor.last_seen_video_id = last_seen_video_id
-    if is_full_reconciliation and status == SYNC_STATUS_IDLE:
-        cursor.last_full_reconciliation_at = datetime.utcnow()
-
-    cursor.last_run_at = datetime.utcnow()
-    cursor.last_run_by_user_id = run_by_user_id
-    cursor.status = status if status in (SYNC_STATUS_IDLE, SYNC_STATUS_RUNNING, SYNC_STATUS_FAILED) else SYNC_STATUS_IDLE
-    cursor.last_error = error
-
-    db.commit()
-    db.refresh(cursor)
-    return cursor
+    of reconciliation pages - see capture_engine.report_sync_progress for the
+    forward-only rule."""
+    return capture_engine.report_sync_progress(
+        CAPTURE,
+        db,
+        credential_id=credential_id,
+        last_seen_id=last_seen_video_id,
+        last_synced_page=last_synced_page,
+        is_full_reconciliation=is_full_reconciliation,
+        status=status,
+        error=error,
+        run_by_user_id=run_by_user_id,
+    )
@@ -223,6 +223,32 @@ def ensure_higgsfield_postgres_schema(conn) -> None:
     # covers an install that ran migrations before that column existed.
     _pg_add_column_if_missing(conn, "higgsfield_generations", "output_type", "VARCHAR(20)")
     conn.execute(text("CREATE INDEX IF NOT EXISTS ix_higgsfield_generations_output_type ON higgsfield_generations(output_type)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_higgsfield_generations_tool_preset_created ON higgsfield_generations(tool_id, preset_category, provider_created_at)"))
+
+    conn.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS higgsfield_credit_ledger (
+                id SERIAL PRIMARY KEY,
+                tool_id INTEGER NOT NULL REFERENCES it_portal_tools(id),
+                capture_event_id INTEGER REFERENCES higgsfield_capture_events(id) ON DELETE SET NULL,
+                generation_id INTEGER REFERENCES higgsfield_generations(id) ON DELETE SET NULL,
+                tx_id VARCHAR(160) NOT NULL,
+                display_name VARCHAR(160),
+                action VARCHAR(40),
+                workflow_id VARCHAR(160),
+                total_credits DOUBLE PRECISION,
+                provider_created_at TIMESTAMP,
+                payload_json JSON NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+    )
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_higgsfield_credit_ledger_tool_tx_id ON higgsfield_credit_ledger(tool_id, tx_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_higgsfield_credit_ledger_tool_name_created ON higgsfield_credit_ledger(tool_id, display_name, provider_created_at)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_higgsfield_credit_ledger_generation_id ON higgsfield_credit_ledger(generation_id)"))
 
     conn.execute(
         text(
@@ -281,6 +307,10 @@ def ensure_higgsfield_postgres_schema(conn) -> None:
             """
         )
     )
+    # Compressed payloads (providers/payload_store.py). STORAGE EXTERNAL: the
+    # blob is already compressed, so TOAST should not try again.
+    _pg_add_column_if_missing(conn, "higgsfield_capture_events", "payload_blob", "BYTEA")
+    conn.execute(text("ALTER TABLE higgsfield_capture_events ALTER COLUMN payload_blob SET STORAGE EXTERNAL"))
 
 
 def ensure_higgsfield_sqlite_schema(conn) -> None:
@@ -470,6 +500,35 @@ def ensure_higgsfield_sqlite_schema(conn) -> None:
     # covers an install that ran migrations before that column existed.
     _sqlite_add_column_if_missing(conn, "higgsfield_generations", "output_type", "VARCHAR(20)")
     conn.execute(text("CREATE INDEX IF NOT EXISTS ix_higgsfield_generations_output_type ON higgsfield_generations(output_type)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_higgsfield_generations_tool_preset_created ON higgsfield_generations(tool_id, preset_category, provider_created_at)"))
+
+    conn.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS higgsfield_credit_ledger (
+                id INTEGER PRIMARY KEY,
+                tool_id INTEGER NOT NULL,
+                capture_event_id INTEGER,
+                generation_id INTEGER,
+                tx_id VARCHAR(160) NOT NULL,
+                display_name VARCHAR(160),
+                action VARCHAR(40),
+                workflow_id VARCHAR(160),
+                total_credits FLOAT,
+                provider_created_at DATETIME,
+                payload_json JSON NOT NULL,
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(tool_id) REFERENCES it_portal_tools (id),
+                FOREIGN KEY(capture_event_id) REFERENCES higgsfield_capture_events (id) ON DELETE SET NULL,
+                FOREIGN KEY(generation_id) REFERENCES higgsfield_generations (id) ON DELETE SET NULL
+            )
+            """
+        )
+    )
+    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_higgsfield_credit_ledger_tool_tx_id ON higgsfield_credit_ledger(tool_id, tx_id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_higgsfield_credit_ledger_tool_name_created ON higgsfield_credit_ledger(tool_id, display_name, provider_created_at)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_higgsfield_credit_ledger_generation_id ON higgsfield_credit_ledger(generation_id)"))
 
     conn.execute(
         text(
@@ -533,3 +592,4 @@ def ensure_higgsfield_sqlite_schema(conn) -> None:
             """
         )
     )
+    _sqlite_add_column_if_missing(conn, "higgsfield_capture_events", "payload_blob", "BLOB")
@@ -37,6 +37,7 @@ from sqlalchemy import (
     Index,
     Integer,
     JSON,
+    LargeBinary,
     String,
     Text,
     text,
@@ -44,10 +45,11 @@ from sqlalchemy import (
 from datetime import datetime
 
 from database_config import Base
+from providers.payload_store import CompressedPayloadMixin
 from utils.datetime_utils import serialize_utc_datetime
 
 
-class HiggsfieldCaptureEvent(Base):
+class HiggsfieldCaptureEvent(CompressedPayloadMixin, Base):
     """Raw, provider-agnostic capture signal reported by the extension,
     stored losslessly and opaquely (payload_json) before normalization into
     HiggsfieldGeneration. Deliberately thin: no parsing, no business logic -
@@ -60,6 +62,7 @@ class HiggsfieldCaptureEvent(Base):
     own login must not spawn a duplicate row.
     """
     __tablename__ = "higgsfield_capture_events"
+    __payload_provider__ = "higgsfield"
     __table_args__ = (
         Index(
             "ux_higgsfield_capture_events_credential_client_event_id",
@@ -90,7 +93,10 @@ class HiggsfieldCaptureEvent(Base):
     # Client Mapping - independent selection from Task Mapping above.
     linked_client_id = Column(Integer, ForeignKey("generation_clients.id", ondelete="SET NULL"), index=True)
     linked_client_name = Column(String(255))
-    payload_json = Column(JSON, nullable=False)
+    # payload_json is CompressedPayloadMixin's property over these two:
+    # payload_blob once compressed, else the plain JSON in payload_raw.
+    payload_raw = Column("payload_json", JSON, nullable=False)
+    payload_blob = Column(LargeBinary)
     capture_version = Column(Integer, nullable=False, default=1)
     extension_version = Column(String(40))
     browser = Column(String(80))
@@ -179,6 +185,9 @@ class HiggsfieldGeneration(Base):
         Index("ix_higgsfield_generations_credential_created_at", "credential_id", "created_at"),
         Index("ix_higgsfield_generations_ingestion_created_at", "ingestion_source", "created_at"),
         Index("ix_higgsfield_generations_generation_record_id", "generation_record_id"),
+        # Credit-ledger matching's candidate window (normalization.py's
+        # _credit_ledger_candidates).
+        Index("ix_higgsfield_generations_tool_preset_created", "tool_id", "preset_category", "provider_created_at"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -341,6 +350,56 @@ class HiggsfieldGeneration(Base):
         }
 
 
+class HiggsfieldCreditLedgerEntry(Base):
+    """One row per Higgsfield credit-ledger transaction (tx_id), extracted
+    from its capture event by normalization.py before matching. Ledger
+    matching needs every same-feature charge near a ledger row's own
+    timestamp; reading that from here is one indexed window query instead
+    of a scan of the tool's whole capture history per normalized row.
+
+    The same tx_id is re-captured whenever the extension re-reads the
+    ledger page - (tool_id, tx_id) is unique, so a re-capture updates the
+    row instead of counting as another sibling. generation_id is the
+    HiggsfieldGeneration the row was matched to, NULL while unmatched.
+    """
+    __tablename__ = "higgsfield_credit_ledger"
+    __table_args__ = (
+        Index("ux_higgsfield_credit_ledger_tool_tx_id", "tool_id", "tx_id", unique=True),
+        Index("ix_higgsfield_credit_ledger_tool_name_created", "tool_id", "display_name", "provider_created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    tool_id = Column(Integer, ForeignKey("it_portal_tools.id"), nullable=False)
+    capture_event_id = Column(Integer, ForeignKey("higgsfield_capture_events.id", ondelete="SET NULL"))
+    generation_id = Column(Integer, ForeignKey("higgsfield_generations.id", ondelete="SET NULL"), index=True)
+    tx_id = Column(String(160), nullable=False)
+    display_name = Column(String(160))
+    action = Column(String(40))
+    workflow_id = Column(String(160))
+    total_credits = Column(Float)  # Higgsfield's raw unit, 100x the UI number - see normalization.py
+    provider_created_at = Column(DateTime)  # the ledger row's own created_at
+    payload_json = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "toolId": self.tool_id,
+            "captureEventId": self.capture_event_id,
+            "generationId": self.generation_id,
+            "txId": self.tx_id,
+            "displayName": self.display_name,
+            "action": self.action,
+            "workflowId": self.workflow_id,
+            "totalCredits": self.total_credits,
+            "providerCreatedAt": serialize_utc_datetime(self.provider_created_at),
+            "payload": self.payload_json or {},
+            "createdAt": serialize_utc_datetime(self.created_at),
+            "updatedAt": serialize_utc_datetime(self.updated_at),
+        }
+
+
 class HiggsfieldRecoveryAudit(Base):
     """Batch-import provenance for admin-triggered full reconciliation runs -
     mirrors HeygenRecoveryAudit exactly."""
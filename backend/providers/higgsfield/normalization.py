@@ -43,6 +43,7 @@ from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 from models_new import GenerationRecord
+from providers.capture_engine import normalize_events_batch
 from providers.higgsfield.constants import (
     GENERATION_SOURCE_LIVE_CAPTURE,
     GENERATION_SOURCE_RECONCILIATION,
@@ -61,7 +62,8 @@ from providers.higgsfield.constants import (
     OWNERSHIP_STATUS_UNKNOWN,
     PROVIDER,
 )
-from providers.higgsfield.models import HiggsfieldCaptureEvent, HiggsfieldGeneration
+from providers.higgsfield.models import HiggsfieldCaptureEvent, HiggsfieldCreditLedgerEntry, HiggsfieldGeneration
+from utils.backfill_engine import BackfillJob, replay_range
 
 logger = logging.getLogger("higgsfield_normalization")
 
@@ -321,30 +323,87 @@ def _is_credit_ledger_event(payload: dict) -> bool:
     )
 
 
+def _record_credit_ledger_entry(db: Session, event: HiggsfieldCaptureEvent, payload: dict) -> HiggsfieldCreditLedgerEntry:
+    """Upserts this payload's higgsfield_credit_ledger row, keyed by
+    (tool_id, tx_id) - the extension re-reads the whole ledger page, so the
+    same transaction arrives in many capture events, and it must count as
+    ONE sibling in _resolve_credit_ledger_candidates no matter how often it
+    was captured. Columns only change when the payload does, so a replay
+    writes nothing."""
+    tx_id = _s(payload.get("tx_id"), 160) or ""
+    entry = (
+        db.query(HiggsfieldCreditLedgerEntry)
+        .filter(HiggsfieldCreditLedgerEntry.tool_id == event.tool_id, HiggsfieldCreditLedgerEntry.tx_id == tx_id)
+        .one_or_none()
+    )
+    if entry is None:
+        entry = HiggsfieldCreditLedgerEntry(tool_id=event.tool_id, tx_id=tx_id, capture_event_id=event.id)
+        db.add(entry)
+    elif entry.capture_event_id is None:
+        entry.capture_event_id = event.id
+    fields = {
+        "display_name": _s(payload.get("display_name"), 160),
+        "action": _s(payload.get("action"), 40),
+        "workflow_id": _s(payload.get("workflow_id"), 160),
+        "total_credits": _f(payload.get("total_credits")),
+        "provider_created_at": _parse_dt(payload.get("created_at")),
+        "payload_json": payload,
+    }
+    for key, value in fields.items():
+        if getattr(entry, key) != value:
+            setattr(entry, key, value)
+    db.flush()
+    return entry
+
+
 def _credit_ledger_candidates(
-    db: Session, event: HiggsfieldCaptureEvent, mapped_category: str, ledger_created_at: datetime, window_seconds: int,
-) -> tuple[list[HiggsfieldGeneration], datetime, datetime]:
+    db: Session, entry: HiggsfieldCreditLedgerEntry, mapped_category: str, window_seconds: int,
+) -> list[HiggsfieldGeneration]:
+    """Every same-category generation within `window_seconds` of the ledger
+    row, oldest id first - one query on ix_higgsfield_generations_tool_preset_created.
+    _attempt_credit_ledger_match asks for the WIDE window once and narrows
+    it to TIGHT itself."""
     window = timedelta(seconds=window_seconds)
-    window_start = ledger_created_at - window
-    window_end = ledger_created_at + window
-    candidates = (
+    return (
         db.query(HiggsfieldGeneration)
         .filter(
             HiggsfieldGeneration.provider == PROVIDER,
-            HiggsfieldGeneration.tool_id == event.tool_id,
+            HiggsfieldGeneration.tool_id == entry.tool_id,
             HiggsfieldGeneration.preset_category == mapped_category,
             HiggsfieldGeneration.provider_created_at.isnot(None),
-            HiggsfieldGeneration.provider_created_at >= window_start,
-            HiggsfieldGeneration.provider_created_at <= window_end,
+            HiggsfieldGeneration.provider_created_at >= entry.provider_created_at - window,
+            HiggsfieldGeneration.provider_created_at <= entry.provider_created_at + window,
         )
         .order_by(HiggsfieldGeneration.id.asc())
         .all()
     )
-    return candidates, window_start, window_end
+
+
+def _same_amount_sibling_tx_ids(
+    db: Session, entry: HiggsfieldCreditLedgerEntry, window_start: datetime, window_end: datetime,
+) -> list[str]:
+    """tx_ids of every ledger row (this one included) for the same tool,
+    display_name and amount inside the window, sorted - an indexed window
+    query on ix_higgsfield_credit_ledger_tool_name_created. Siblings come
+    from higgsfield_credit_ledger rather than a scan of the tool's capture
+    events, which made every backfill_all replay quadratic in capture
+    history."""
+    rows = (
+        db.query(HiggsfieldCreditLedgerEntry.tx_id)
+        .filter(
+            HiggsfieldCreditLedgerEntry.tool_id == entry.tool_id,
+            HiggsfieldCreditLedgerEntry.display_name == entry.display_name,
+            HiggsfieldCreditLedgerEntry.provider_created_at >= window_start,
+            HiggsfieldCreditLedgerEntry.provider_created_at <= window_end,
+            HiggsfieldCreditLedgerEntry.total_credits == entry.total_credits,
+        )
+        .all()
+    )
+    return sorted(tx_id for (tx_id,) in rows)
 
 
 def _resolve_credit_ledger_candidates(
-    db: Session, event: HiggsfieldCaptureEvent, payload: dict,
+    db: Session, entry: HiggsfieldCreditLedgerEntry,
     candidates: list[HiggsfieldGeneration], window_start: datetime, window_end: datetime,
 ) -> Optional[HiggsfieldGeneration]:
     if len(candidates) == 1:
@@ -365,40 +424,32 @@ def _resolve_credit_ledger_candidates(
     # would silently mis-pair on a backfill replay processing events in a
     # different order than the first pass - see backfill_all's own
     # "safe to re-run any number of times" guarantee this has to honor.
-    this_amount = _f(payload.get("total_credits"))
-    if this_amount is None:
+    if entry.total_credits is None:
         return None
-    same_amount_sibling_tx_ids = sorted(
-        _s(entry.get("tx_id")) or ""
-        for entry in _find_sibling_credit_ledger_events(db, event, _s(payload.get("display_name")) or "")
-        if _f(entry.get("total_credits")) == this_amount
-        and (entry_dt := _parse_dt(entry.get("created_at")))
-        and window_start <= entry_dt <= window_end
-    )
+    same_amount_sibling_tx_ids = _same_amount_sibling_tx_ids(db, entry, window_start, window_end)
     if len(same_amount_sibling_tx_ids) != len(candidates):
         return None
-    this_tx_id = _s(payload.get("tx_id")) or ""
-    if this_tx_id not in same_amount_sibling_tx_ids:
+    if entry.tx_id not in same_amount_sibling_tx_ids:
         return None
-    return candidates[same_amount_sibling_tx_ids.index(this_tx_id)]
+    return candidates[same_amount_sibling_tx_ids.index(entry.tx_id)]
 
 
-def _attempt_credit_ledger_match(db: Session, event: HiggsfieldCaptureEvent, payload: dict) -> Optional[HiggsfieldGeneration]:
-    workflow_id = _s(payload.get("workflow_id"))
-    if workflow_id:
+def _attempt_credit_ledger_match(db: Session, entry: HiggsfieldCreditLedgerEntry) -> Optional[HiggsfieldGeneration]:
+    if entry.workflow_id:
         # A real, confirmed identity when present - exact match across the
         # full identity chain, same as every other lookup in this module.
         # Never observed non-null in a real capture yet, but the field
         # exists in the confirmed shape, so honor it if Higgsfield ever
         # populates it.
+        workflow_id = entry.workflow_id
         matched = _find_existing_generation(db, generation_id=workflow_id, job_id=workflow_id, request_id=workflow_id, external_event_id=None)
         if matched:
             return matched
 
-    mapped_category = _DISPLAY_NAME_TO_PRESET_CATEGORY.get(_s(payload.get("display_name")) or "")
+    mapped_category = _DISPLAY_NAME_TO_PRESET_CATEGORY.get(entry.display_name or "")
     if not mapped_category:
         return None
-    ledger_created_at = _parse_dt(payload.get("created_at"))
+    ledger_created_at = entry.provider_created_at
     if not ledger_created_at:
         return None
 
@@ -409,55 +460,72 @@ def _attempt_credit_ledger_match(db: Session, event: HiggsfieldCaptureEvent, pay
     # through to WIDE (the original, more permissive window) when the tight
     # window itself is inconclusive - empty (this row's real timing outlier,
     # or a refund landing minutes later) or still ambiguous even at 15s.
-    tight_candidates, tight_start, tight_end = _credit_ledger_candidates(
-        db, event, mapped_category, ledger_created_at, CREDIT_LEDGER_TIGHT_MATCH_WINDOW_SECONDS
-    )
-    matched = _resolve_credit_ledger_candidates(db, event, payload, tight_candidates, tight_start, tight_end)
+    # TIGHT is a subset of WIDE, so both come from one query.
+    wide = timedelta(seconds=CREDIT_LEDGER_MATCH_WINDOW_SECONDS)
+    tight = timedelta(seconds=CREDIT_LEDGER_TIGHT_MATCH_WINDOW_SECONDS)
+    wide_candidates = _credit_ledger_candidates(db, entry, mapped_category, CREDIT_LEDGER_MATCH_WINDOW_SECONDS)
+    tight_start, tight_end = ledger_created_at - tight, ledger_created_at + tight
+    tight_candidates = [
+        candidate for candidate in wide_candidates
+        if tight_start <= candidate.provider_created_at <= tight_end
+    ]
+    matched = _resolve_credit_ledger_candidates(db, entry, tight_candidates, tight_start, tight_end)
     if matched is not None:
         return matched
+    return _resolve_credit_ledger_candidates(db, entry, wide_candidates, ledger_created_at - wide, ledger_created_at + wide)
 
-    wide_candidates, wide_start, wide_end = _credit_ledger_candidates(
-        db, event, mapped_category, ledger_created_at, CREDIT_LEDGER_MATCH_WINDOW_SECONDS
-    )
-    return _resolve_credit_ledger_candidates(db, event, payload, wide_candidates, wide_start, wide_end)
-
-
-def _find_sibling_credit_ledger_events(db: Session, event: HiggsfieldCaptureEvent, display_name: str) -> list[dict]:
-    """All OTHER captured credit-ledger payloads for this same display_name,
-    scoped to this tool - deliberately filtered in Python, not a JSON-path
-    SQL predicate, since payload_json is a plain JSON column (not JSONB) and
-    this table's realistic volume (a full account's ledger history, observed
-    at 62 rows) makes that unnecessary. Matched via _is_credit_ledger_event
-    (the payload's own shape), not HiggsfieldCaptureEvent.event_type - that
-    column is client-supplied metadata content-higgsfield.js happens to set
-    correctly today, but the payload's own shape is the same ground truth
-    normalize_capture_event itself trusts to route here in the first place,
-    so this stays consistent even if that metadata field is ever missing or
-    wrong on some row."""
-    rows = (
-        db.query(HiggsfieldCaptureEvent)
+
+def _normalize_credit_ledger_event(db: Session, event: HiggsfieldCaptureEvent, payload: dict) -> Optional[HiggsfieldGeneration]:
+    entry = _record_credit_ledger_entry(db, event, payload)
+    matched = _apply_credit_ledger_entry(db, event, entry)
+    _retry_unmatched_credit_ledger_siblings(db, entry)
+    return matched
+
+
+def _retry_unmatched_credit_ledger_siblings(db: Session, entry: HiggsfieldCreditLedgerEntry) -> None:
+    """A tied batch only resolves once ALL of its same-amount rows are in
+    higgsfield_credit_ledger (see _resolve_credit_ledger_candidates), but its
+    rows can be normalized one at a time, or arrive in different capture
+    batches. So a new row re-tries the still-unmatched siblings whose
+    window it falls inside - the earlier rows of its batch - instead of
+    leaving them uncredited until the next backfill_all."""
+    if entry.provider_created_at is None or entry.total_credits is None:
+        return
+    if entry.display_name not in _DISPLAY_NAME_TO_PRESET_CATEGORY:
+        return
+    window = timedelta(seconds=CREDIT_LEDGER_MATCH_WINDOW_SECONDS)
+    siblings = (
+        db.query(HiggsfieldCreditLedgerEntry)
         .filter(
-            HiggsfieldCaptureEvent.provider == PROVIDER,
-            HiggsfieldCaptureEvent.tool_id == event.tool_id,
+            HiggsfieldCreditLedgerEntry.tool_id == entry.tool_id,
+            HiggsfieldCreditLedgerEntry.display_name == entry.display_name,
+            HiggsfieldCreditLedgerEntry.provider_created_at >= entry.provider_created_at - window,
+            HiggsfieldCreditLedgerEntry.provider_created_at <= entry.provider_created_at + window,
+            HiggsfieldCreditLedgerEntry.total_credits == entry.total_credits,
+            HiggsfieldCreditLedgerEntry.generation_id.is_(None),
+            HiggsfieldCreditLedgerEntry.capture_event_id.isnot(None),
+            HiggsfieldCreditLedgerEntry.id != entry.id,
         )
+        .order_by(HiggsfieldCreditLedgerEntry.id.asc())
         .all()
     )
-    return [
-        row.payload_json for row in rows
-        if isinstance(row.payload_json, dict)
-        and _is_credit_ledger_event(row.payload_json)
-        and row.payload_json.get("display_name") == display_name
-    ]
+    for sibling in siblings:
+        sibling_event = db.get(HiggsfieldCaptureEvent, sibling.capture_event_id)
+        if sibling_event is not None:
+            _apply_credit_ledger_entry(db, sibling_event, sibling, log_unmatched=False)
 
 
-def _normalize_credit_ledger_event(db: Session, event: HiggsfieldCaptureEvent, payload: dict) -> Optional[HiggsfieldGeneration]:
-    matched = _attempt_credit_ledger_match(db, event, payload)
+def _apply_credit_ledger_entry(
+    db: Session, event: HiggsfieldCaptureEvent, entry: HiggsfieldCreditLedgerEntry, *, log_unmatched: bool = True,
+) -> Optional[HiggsfieldGeneration]:
+    matched = _attempt_credit_ledger_match(db, entry)
     if matched is None:
-        logger.info(
-            "higgsfield credit ledger row tx_id=%s (%s, %s credits) could not be matched to exactly one "
-            "generation - captured raw only (capture_event_id=%s), no HiggsfieldGeneration updated",
-            payload.get("tx_id"), payload.get("display_name"), payload.get("total_credits"), event.id,
-        )
+        if log_unmatched:
+            logger.info(
+                "higgsfield credit ledger row tx_id=%s (%s, %s credits) could not be matched to exactly one "
+                "generation - captured raw only (capture_event_id=%s), no HiggsfieldGeneration updated",
+                entry.tx_id, entry.display_name, entry.total_credits, event.id,
+            )
         return None
 
     # Accumulate rather than overwrite: a failed generation's SPEND is
@@ -477,9 +545,10 @@ def _normalize_credit_ledger_event(db: Session, event: HiggsfieldCaptureEvent, p
     # persisted correctly, credit_ledger_json silently reverted to [] on
     # refresh. A genuinely new list object with different content compares
     # unequal to the old one and gets flushed correctly.
+    payload = entry.payload_json
     ledger_list = list(matched.credit_ledger_json) if isinstance(matched.credit_ledger_json, list) else []
     tx_id = payload.get("tx_id")
-    if not any(isinstance(entry, dict) and entry.get("tx_id") == tx_id for entry in ledger_list):
+    if not any(isinstance(item, dict) and item.get("tx_id") == tx_id for item in ledger_list):
         ledger_list.append(payload)
     matched.credit_ledger_json = ledger_list
     # total_credits is in Higgsfield's own internal unit, exactly 100x the
@@ -490,9 +559,10 @@ def _normalize_credit_ledger_event(db: Session, event: HiggsfieldCaptureEvent, p
     # across every display_name observed). credit_ledger_json still stores
     # the raw payload as-is for fidelity/debugging - only this derived
     # column applies the conversion.
-    net_raw_credits = sum(_f(entry.get("total_credits")) or 0.0 for entry in ledger_list if isinstance(entry, dict))
+    net_raw_credits = sum(_f(item.get("total_credits")) or 0.0 for item in ledger_list if isinstance(item, dict))
     matched.credits_used = abs(net_raw_credits) / 100.0
     matched.source_capture_event_id = event.id
+    entry.generation_id = matched.id
     db.flush()
 
     _project_into_generation_record(db, matched)
@@ -965,37 +1035,31 @@ def _project_into_generation_record(db: Session, generation: HiggsfieldGeneratio
 
 
 def normalize_capture_events_batch(db: Session, events: list[HiggsfieldCaptureEvent]) -> dict:
-    """Best-effort relative to raw capture (each event is already durably
-    committed by ingest_capture_event before this runs) - a normalization
-    failure here must never turn a successful, lossless ingest into an
-    error response. Each event is isolated in its own SAVEPOINT so one
-    event losing a concurrent-insert race can't roll back its siblings; a
-    real COMMIT lands once per INGEST_COMMIT_CHUNK_SIZE events."""
-    stats = {"normalized": 0, "skipped": 0, "errors": 0}
-    if not events:
-        return stats
-    pending_since_commit = 0
-    for event in events:
-        savepoint = db.begin_nested()
-        try:
-            generation = normalize_capture_event(db, event)
-            savepoint.commit()
-            stats["normalized" if generation is not None else "skipped"] += 1
-        except Exception:
-            savepoint.rollback()
-            stats["errors"] += 1
-            logger.exception(
-                "higgsfield normalization failed for capture_event_id=%s - skipped this cycle, "
-                "harmless if lost to a concurrent normalize of the same identity",
-                event.id,
-            )
-        pending_since_commit += 1
-        if pending_since_commit >= INGEST_COMMIT_CHUNK_SIZE:
-            db.commit()
-            pending_since_commit = 0
-    if pending_since_commit:
-        db.commit()
-    return stats
+    """Best-effort relative to raw capture - a normalization failure here
+    must never turn a successful, lossless ingest into an error response.
+    Runs through capture_engine.normalize_events_batch (per-event SAVEPOINT,
+    chunked commit)."""
+    return normalize_events_batch(
+        db,
+        events,
+        normalize_capture_event,
+        provider=PROVIDER,
+        commit_chunk_size=INGEST_COMMIT_CHUNK_SIZE,
+        logger=logger,
+    )
+
+
+# A credit-ledger event can only be matched to a generation that already
+# exists, and normalizing a generation never goes back to retry ledger rows
+# captured before it. Parallel id ranges could run a ledger event ahead of its
+# generation's snapshots and leave it uncredited, so this job never splits.
+BACKFILL_JOB = BackfillJob(
+    name="higgsfield-normalization",
+    model=HiggsfieldCaptureEvent,
+    process_batch=normalize_capture_events_batch,
+    criteria=(HiggsfieldCaptureEvent.provider == PROVIDER,),
+    parallel_safe=False,
+)
 
 
 def backfill_all(db: Session, *, batch_size: int = 500) -> dict:
@@ -1003,26 +1067,8 @@ def backfill_all(db: Session, *, batch_size: int = 500) -> dict:
     idempotent normalizer the live path uses. Safe to re-run any number of
     times; safe to interrupt and restart. Oldest-first so the same
     generation's snapshots (submitted -> settled) are replayed in their
-    original sequence."""
-    stats = {"processed": 0, "normalized": 0, "skipped": 0, "errors": 0}
-    last_id = 0
-    while True:
-        events = (
-            db.query(HiggsfieldCaptureEvent)
-            .filter(HiggsfieldCaptureEvent.provider == PROVIDER, HiggsfieldCaptureEvent.id > last_id)
-            .order_by(HiggsfieldCaptureEvent.id.asc())
-            .limit(batch_size)
-            .all()
-        )
-        if not events:
-            break
-        last_id = events[-1].id
-        stats["processed"] += len(events)
-        batch_stats = normalize_capture_events_batch(db, events)
-        for key, value in batch_stats.items():
-            stats[key] += value
-        logger.info(
-            "higgsfield backfill progress: processed=%s normalized=%s skipped=%s errors=%s (through capture_event_id=%s)",
-            stats["processed"], stats["normalized"], stats["skipped"], stats["errors"], last_id,
-        )
-    return stats
+    original sequence, and so each credit-ledger event comes after the
+    generations it can be matched to. Always one process (see
+    BACKFILL_JOB)."""
+    stats = replay_range(db, BACKFILL_JOB, batch_size=batch_size, log=logger)
+    return {key: stats.get(key, 0) for key in ("processed", "normalized", "skipped", "errors")}
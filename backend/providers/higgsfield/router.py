@@ -14,16 +14,15 @@ from sqlalchemy.orm import Session
 
 from database_config import get_operational_db
 from models_new import User
+from providers import capture_engine
 from providers.higgsfield import queries as higgsfield_queries
 from providers.higgsfield.capture import (
-    ingest_capture_event,
+    CAPTURE,
     resolve_higgsfield_actor,
     resolve_higgsfield_credential,
     resolve_higgsfield_tool,
 )
-from providers.higgsfield.constants import INGEST_COMMIT_CHUNK_SIZE
-from providers.higgsfield.health import capture_health_to_dict, get_capture_health_for_user, record_health_ping
-from providers.higgsfield.normalization import normalize_capture_events_batch
+from providers.higgsfield.health import capture_health_to_dict, get_capture_health_for_user
 from providers.higgsfield.queries import GenerationFilters
 from providers.higgsfield.schemas import (
     CaptureEventResult,
@@ -42,135 +41,29 @@ from providers.higgsfield.schemas import (
     UserDetailOut,
     UserListOut,
 )
-from providers.higgsfield.sync import get_or_create_cursor, report_sync_progress
+from providers.higgsfield.sync import get_or_create_cursor
 from utils.permissions import require_admin
 
 router = APIRouter(prefix="/api/providers/higgsfield", tags=["higgsfield"])
 logger = logging.getLogger("higgsfield_router")
 
 
-def _ownership_confidence(*, is_reconciliation: bool, has_ticket: bool) -> str:
-    if is_reconciliation:
-        return "reconciliation"
-    return "ticket" if has_ticket else "session"
-
-
 @router.post("/capture/events", response_model=CaptureEventsResponse)
 def capture_events(
     payload: CaptureEventsRequest,
     request: Request,
     db: Session = Depends(get_operational_db),
 ):
-    tool = resolve_higgsfield_tool(db)
-    if not tool:
-        return CaptureEventsResponse(
-            success=False,
-            results=[
-                CaptureEventResult(client_event_id=item.client_event_id, status="rejected", reason="higgsfield tool is not configured")
-                for item in payload.events
-            ],
-        )
-
-    results = []
-    newly_created_events = []
-    pending_since_commit = 0
-    # Memoized per unique (usage_ticket, extension_ticket, explicit_credential_id)
-    # triple, NOT resolved once for the whole request - a batch flush is
-    # shared across the whole browser (not per-tab, see
-    # background-higgsfield-capture.js), so a single flush can legitimately
-    # mix events from different tabs carrying different tickets. See
-    # providers/heygen/router.py's identical comment for the full reasoning.
-    resolution_cache: dict[tuple, tuple] = {}
-
-    for item in payload.events:
-        cache_key = (item.usage_ticket, item.extension_ticket, item.credential_id)
-        cached = resolution_cache.get(cache_key)
-        if cached is not None:
-            current_user, credential_id, cached_error = cached
-            if cached_error is not None:
-                results.append(
-                    CaptureEventResult(client_event_id=item.client_event_id, status="rejected", reason=cached_error)
-                )
-                continue
-        else:
-            try:
-                current_user = resolve_higgsfield_actor(
-                    request=request,
-                    db=db,
-                    tool=tool,
-                    usage_ticket=item.usage_ticket,
-                    extension_ticket=item.extension_ticket,
-                )
-            except HTTPException as error:
-                resolution_cache[cache_key] = (None, None, str(error.detail))
-                results.append(
-                    CaptureEventResult(client_event_id=item.client_event_id, status="rejected", reason=str(error.detail))
-                )
-                continue
-
-            credential = resolve_higgsfield_credential(
-                db,
-                tool_id=tool.id,
-                user_id=current_user.id,
-                explicit_credential_id=item.credential_id,
-            )
-            credential_id = credential.id if credential else None
-            resolution_cache[cache_key] = (current_user, credential_id, None)
-
-        outcome = ingest_capture_event(
-            db,
-            tool=tool,
-            credential_id=credential_id,
-            user=current_user,
-            event_type=item.event_type,
-            client_event_id=item.client_event_id,
-            generation_id=item.generation_id,
-            project_id=item.project_id,
-            payload=item.payload,
-            capture_version=item.capture_version,
-            extension_version=item.extension_version,
-            browser=item.browser,
-            tab_id=item.tab_id,
-            session_id=item.session_id,
-            extension_session_id=item.extension_session_id,
-            event_date=item.event_date,
-            task_id=item.linked_task_id,
-            client_id=item.linked_client_id,
-            ownership_confidence=_ownership_confidence(
-                is_reconciliation=item.is_reconciliation,
-                has_ticket=bool(item.usage_ticket or item.extension_ticket),
-            ),
-        )
-        if outcome.status == "created" and outcome.event is not None:
-            newly_created_events.append(outcome.event)
-        results.append(
-            CaptureEventResult(
-                client_event_id=item.client_event_id,
-                status=outcome.status,
-                id=outcome.event.id if outcome.event else None,
-                reason=outcome.reason,
-            )
-        )
-
-        pending_since_commit += 1
-        if pending_since_commit >= INGEST_COMMIT_CHUNK_SIZE:
-            db.commit()
-            pending_since_commit = 0
-
-    if pending_since_commit:
-        db.commit()
-
-    if newly_created_events:
-        # Normalization failure must never turn a successful, lossless
-        # ingest into an error response - every event above is already
-        # committed at this point, so nothing here can lose raw data.
-        try:
-            normalize_capture_events_batch(db, newly_created_events)
-        except Exception:
-            logger.exception("higgsfield normalization batch failed for %d event(s)", len(newly_created_events))
-            db.rollback()
-
-    return CaptureEventsResponse(success=True, results=results)
+    success, results = capture_engine.ingest_capture_batch(
+        CAPTURE,
+        db,
+        request=request,
+        events=payload.events,
+        tool=resolve_higgsfield_tool(db),
+        resolve_actor=resolve_higgsfield_actor,
+        resolve_credential=resolve_higgsfield_credential,
+    )
+    return CaptureEventsResponse(success=success, results=[CaptureEventResult(**result) for result in results])
 
 
 @router.post("/capture/health", response_model=CaptureHealthOut)
@@ -179,49 +72,16 @@ def report_capture_health(
     request: Request,
     db: Session = Depends(get_operational_db),
 ):
-    tool = resolve_higgsfield_tool(db)
-    current_user: Optional[User] = None
-    try:
-        if tool:
-            current_user = resolve_higgsfield_actor(
-                request=request,
-                db=db,
-                tool=tool,
-                usage_ticket=payload.usage_ticket,
-                extension_ticket=payload.extension_ticket,
-            )
-    except HTTPException:
-        # Health pings are best-effort/non-critical - an unresolvable actor
-        # just means "no health row this time", never a hard failure back to
-        # the extension.
-        return CaptureHealthOut(success=False, data={"reason": "actor_unresolved"})
-
-    if not current_user:
-        return CaptureHealthOut(success=False, data={"reason": "higgsfield tool is not configured"})
-
-    credential_id = payload.credential_id
-    if tool and not credential_id:
-        credential = resolve_higgsfield_credential(db, tool_id=tool.id, user_id=current_user.id)
-        credential_id = credential.id if credential else None
-
-    record = record_health_ping(
+    success, data = capture_engine.report_capture_health(
+        CAPTURE,
         db,
-        user_id=current_user.id,
-        tool_id=tool.id if tool else None,
-        credential_id=credential_id,
-        extension_session_id=payload.extension_session_id,
-        extension_version=payload.extension_version,
-        queue_length=payload.queue_length,
-        events_waiting=payload.events_waiting,
-        oldest_pending_event_at=payload.oldest_pending_event_at,
-        retry_count=payload.retry_count,
-        last_capture_event_at=payload.last_capture_event_at,
-        last_successful_upload_at=payload.last_successful_upload_at,
-        last_failed_upload_at=payload.last_failed_upload_at,
-        average_upload_time_ms=payload.average_upload_time_ms,
-        offline_since=payload.offline_since,
+        request=request,
+        payload=payload,
+        tool=resolve_higgsfield_tool(db),
+        resolve_actor=resolve_higgsfield_actor,
+        resolve_credential=resolve_higgsfield_credential,
     )
-    return CaptureHealthOut(success=True, data=capture_health_to_dict(record))
+    return CaptureHealthOut(success=success, data=data)
 
 
 @router.post("/sync/cursor", response_model=SyncCursorOut)
@@ -233,34 +93,14 @@ def report_sync_cursor(
     """Progress report from an extension-driven reconciliation walk. Not
     called by anything in this pass (see sync.py's module docstring) but
     left fully wired for when a listing endpoint is confirmed."""
-    tool = resolve_higgsfield_tool(db)
-    run_by_user_id = None
-    credential_id = payload.credential_id
-    if tool:
-        try:
-            actor = resolve_higgsfield_actor(
-                request=request, db=db, tool=tool,
-                usage_ticket=payload.usage_ticket, extension_ticket=payload.extension_ticket,
-            )
-            run_by_user_id = actor.id
-            if not credential_id:
-                credential = resolve_higgsfield_credential(db, tool_id=tool.id, user_id=actor.id)
-                credential_id = credential.id if credential else None
-        except HTTPException:
-            run_by_user_id = None
-
-    if not credential_id:
-        raise HTTPException(status_code=400, detail="Could not resolve a Higgsfield credential for this sync report")
-
-    cursor = report_sync_progress(
+    cursor = capture_engine.report_sync_cursor(
+        CAPTURE,
         db,
-        credential_id=credential_id,
-        last_seen_generation_id=payload.last_seen_generation_id,
-        last_synced_page=payload.last_synced_page,
-        is_full_reconciliation=payload.is_full_reconciliation,
-        status=payload.status,
-        error=payload.error,
-        run_by_user_id=run_by_user_id,
+        request=request,
+        payload=payload,
+        tool=resolve_higgsfield_tool(db),
+        resolve_actor=resolve_higgsfield_actor,
+        resolve_credential=resolve_higgsfield_credential,
     )
     return SyncCursorOut(success=True, data=cursor.to_dict())
 
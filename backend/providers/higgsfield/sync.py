@@ -13,28 +13,17 @@ runFreepikReconciliationWalk), without a schema change at that point -
 same graceful degradation HeyGen shipped with before its own listing
 endpoint (api2.heygen.com/v1/project/items) was confirmed.
 """
-from datetime import datetime
 from typing import Optional
 
 from sqlalchemy.orm import Session
 
-from providers.higgsfield.constants import SYNC_STATUS_FAILED, SYNC_STATUS_IDLE, SYNC_STATUS_RUNNING
+from providers import capture_engine
+from providers.higgsfield.capture import CAPTURE
 from providers.higgsfield.models import HiggsfieldSyncCursor
 
 
 def get_or_create_cursor(db: Session, *, credential_id: int) -> HiggsfieldSyncCursor:
-    cursor = (
-        db.query(HiggsfieldSyncCursor)
-        .filter(HiggsfieldSyncCursor.credential_id == credential_id)
-        .first()
-    )
-    if cursor:
-        return cursor
-    cursor = HiggsfieldSyncCursor(credential_id=credential_id, status=SYNC_STATUS_IDLE)
-    db.add(cursor)
-    db.commit()
-    db.refresh(cursor)
-    return cursor
+    return capture_engine.get_or_create_cursor(CAPTURE, db, credential_id=credential_id)
 
 
 def report_sync_progress(
@@ -49,23 +38,16 @@ def report_sync_progress(
     run_by_user_id: Optional[int],
 ) -> HiggsfieldSyncCursor:
     """Idempotent progress report from the extension after walking one batch
-    of reconciliation pages. Only ever moves last_synced_page forward for an
-    incremental walk; a full reconciliation report always wins since it is
-    authoritative for the entire history."""
-    cursor = get_or_create_cursor(db, credential_id=credential_id)
-
-    if is_full_reconciliation or last_synced_page >= (cursor.last_synced_page or 0):
-        cursor.last_synced_page = last_synced_page
-        if last_seen_generation_id:
-            cursor.last_seen_generation_id = last_seen_generation_id
-    if is_full_reconciliation and status == SYNC_STATUS_IDLE:
-        cursor.last_full_reconciliation_at = datetime.utcnow()
-
-    cursor.last_run_at = datetime.utcnow()
-    cursor.last_run_by_user_id = run_by_user_id
-    cursor.status = status if status in (SYNC_STATUS_IDLE, SYNC_STATUS_RUNNING, SYNC_STATUS_FAILED) else SYNC_STATUS_IDLE
-    cursor.last_error = error
-
-    db.commit()
-    db.refresh(cursor)
-    return cursor
+    of reconciliation pages - see capture_engine.report_sync_progress for the
+    forward-only rule."""
+    return capture_engine.report_sync_progress(
+        CAPTURE,
+        db,
+        credential_id=credential_id,
+        last_seen_id=last_seen_generation_id,
+        last_synced_page=last_synced_page,
+        is_full_reconciliation=is_full_reconciliation,
+        status=status,
+        error=error,
+        run_by_user_id=run_by_user_id,
+    )
@@ -0,0 +1,391 @@
+# providers/payload_store.py
+"""
+Compact storage for the raw capture payloads the ticket-attributed providers
+keep in their *_capture_events tables (see providers/capture_engine.py).
+
+Those payloads are the largest and fastest-growing thing in the database,
+and they are written once, read by normalization.py moments later, and
+almost never again. Most of their bytes are the same JSON keys, enum values
+and boilerplate strings repeated in every row, which a general-purpose
+compressor only partly removes from one small document at a time. Trained
+on a provider's own payloads, a preset dictionary lets each row reference
+those shared fragments instead of carrying them.
+
+Each event model declares two columns and mixes in CompressedPayloadMixin:
+
+  * payload_blob (LargeBinary) - codec tag + dictionary id + compressed JSON.
+  * payload_raw, mapped onto the existing payload_json column - the plain
+    JSON, kept for payloads too small to be worth compressing and for rows
+    written before this module existed. Holds {} once a blob is written, so
+    the column's NOT NULL constraint is left alone.
+
+The mixin's payload_json property reads whichever is present and encodes on
+assignment, so capture_engine.py, normalization.py, queries.py and to_dict()
+keep reading and writing event.payload_json unchanged. It is a plain Python
+property, not a column: nothing may filter on payload_json in SQL (none of
+these providers does - ChatGPT, which searches its payloads with ILIKE,
+keeps its plain JSON column and is not on this module).
+
+Codecs: zstd when the optional `zstandard` package is installed, otherwise
+stdlib zlib (raw deflate) with the dictionary as its preset window.
+CAPTURE_PAYLOAD_CODEC=zlib|zstd|off pins one; "off" writes plain JSON as
+before. Blobs are self-describing, so a process can always read what
+another wrote with a different setting - as long as it has the codec.
+
+Dictionaries live in capture_payload_dictionaries and are immutable: a blob
+names the dictionary it was written with, and retraining only adds a newer
+row that later writes pick up (refresh_dictionaries, at most once per
+CAPTURE_PAYLOAD_DICT_REFRESH_SECONDS). scripts/compress_capture_payloads.py
+trains them and re-encodes existing rows in checkpointed batches through
+utils/backfill_engine.py (PAYLOAD_COMPACTION_JOB in each provider's
+capture.py).
+"""
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, object_session
+
+from models_new import CapturePayloadDictionary
+from utils.backfill_engine import BackfillJob
+from utils.env import int_env
+
+try:
+    import zstandard
+
+    ZSTD_AVAILABLE = True
+except ImportError:  # pragma: no cover - zlib with a preset dictionary is the fallback
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+_CODEC_TAGS = {CODEC_ZLIB: 1, CODEC_ZSTD: 2}
+_CODEC_NAMES = {tag: name for name, tag in _CODEC_TAGS.items()}
+# codec tag, dictionary id (0 = no dictionary)
+_HEADER = struct.Struct(">BI")
+
+PAYLOAD_CODEC = (os.getenv("CAPTURE_PAYLOAD_CODEC") or "auto").strip().lower()
+# Below this many bytes of JSON a payload stays plain: the header and codec
+# framing eat most of the saving and the row is small either way.
+PAYLOAD_MIN_BYTES = int_env("CAPTURE_PAYLOAD_MIN_BYTES", 256)
+ZLIB_LEVEL = int_env("CAPTURE_PAYLOAD_ZLIB_LEVEL", 6)
+ZSTD_LEVEL = int_env("CAPTURE_PAYLOAD_ZSTD_LEVEL", 9)
+# zlib can only reach back 32KB, so larger dictionaries only help zstd.
+DICTIONARY_SIZE = int_env("CAPTURE_PAYLOAD_DICT_BYTES", 32 * 1024)
+DICTIONARY_REFRESH_SECONDS = int_env("CAPTURE_PAYLOAD_DICT_REFRESH_SECONDS", 300)
+TRAIN_SAMPLE_SIZE = int_env("CAPTURE_PAYLOAD_TRAIN_SAMPLES", 2000)
+TRAIN_MIN_SAMPLES = 20
+_ZLIB_WINDOW = 32 * 1024
+
+# Loaded dictionaries by id, and the newest id per (provider, codec).
+_dictionaries: dict[int, tuple[str, str, Any]] = {}
+_current: dict[tuple[str, str], int] = {}
+_refreshed_at: Optional[float] = None
+_lock = threading.Lock()
+
+
+def active_codec() -> Optional[str]:
+    """The codec new payloads are written with, or None to keep them plain."""
+    if PAYLOAD_CODEC in ("off", "none", "plain"):
+        return None
+    if PAYLOAD_CODEC == CODEC_ZLIB or not ZSTD_AVAILABLE:
+        return CODEC_ZLIB
+    return CODEC_ZSTD
+
+
+def _dumps(payload: Any) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _register(dictionary_id: int, provider: str, codec: str, data: bytes) -> None:
+    if codec == CODEC_ZSTD:
+        if not ZSTD_AVAILABLE:
+            # Readable again once zstandard is installed; until then only
+            # blobs written with it fail, and new writes use zlib.
+            return
+        dictionary = zstandard.ZstdCompressionDict(bytes(data))
+    else:
+        dictionary = bytes(data)
+    with _lock:
+        _dictionaries[dictionary_id] = (provider, codec, dictionary)
+        if dictionary_id > _current.get((provider, codec), 0):
+            _current[(provider, codec)] = dictionary_id
+
+
+def refresh_dictionaries(db: Session, *, force: bool = False) -> None:
+    """Loads dictionaries trained since the last refresh. Cheap to call per
+    batch: it queries at most once per DICTIONARY_REFRESH_SECONDS, and only
+    for rows newer than the ones already loaded."""
+    global _refreshed_at
+    now = time.monotonic()
+    if not force and _refreshed_at is not None and now - _refreshed_at < DICTIONARY_REFRESH_SECONDS:
+        return
+    _refreshed_at = now
+    known = max(_dictionaries, default=0)
+    try:
+        # A SAVEPOINT so a missing table (a deployment that has not run its
+        # migrations yet) cannot poison the caller's transaction.
+        with db.begin_nested():
+            rows = db.execute(
+                select(
+                    CapturePayloadDictionary.id,
+                    CapturePayloadDictionary.provider,
+                    CapturePayloadDictionary.codec,
+                    CapturePayloadDictionary.data,
+                )
+                .where(CapturePayloadDictionary.id > known)
+                .order_by(CapturePayloadDictionary.id)
+            ).all()
+    except SQLAlchemyError as exc:
+        logger.warning("capture payload dictionaries could not be loaded: %s", exc.__class__.__name__)
+        return
+    for row in rows:
+        _register(row.id, row.provider, row.codec, row.data)
+
+
+def _dictionary(dictionary_id: int, db: Optional[Session]) -> Any:
+    entry = _dictionaries.get(dictionary_id)
+    if entry is None and db is not None:
+        row = db.execute(
+            select(CapturePayloadDictionary.provider, CapturePayloadDictionary.codec, CapturePayloadDictionary.data)
+            .where(CapturePayloadDictionary.id == dictionary_id)
+        ).first()
+        if row is not None:
+            _register(dictionary_id, row.provider, row.codec, row.data)
+            entry = _dictionaries.get(dictionary_id)
+    if entry is None:
+        raise LookupError(f"capture payload dictionary {dictionary_id} is not available")
+    return entry[2]
+
+
+def _compress(codec: str, raw: bytes, dictionary: Any) -> bytes:
+    if codec == CODEC_ZSTD:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary, write_checksum=False)
+        return compressor.compress(raw)
+    if dictionary:
+        compressor = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, dictionary)
+    else:
+        compressor = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -15, 9)
+    return compressor.compress(raw) + compressor.flush()
+
+
+def _decompress(codec: str, body: bytes, dictionary: Any) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(body)
+    decompressor = zlib.decompressobj(-15, zdict=dictionary) if dictionary else zlib.decompressobj(-15)
+    return decompressor.decompress(body) + decompressor.flush()
+
+
+def _encode_raw(provider: str, raw: bytes) -> Optional[bytes]:
+    codec = active_codec()
+    if codec is None or len(raw) < PAYLOAD_MIN_BYTES:
+        return None
+    dictionary_id = _current.get((provider, codec), 0)
+    dictionary = _dictionaries[dictionary_id][2] if dictionary_id else None
+    blob = _HEADER.pack(_CODEC_TAGS[codec], dictionary_id) + _compress(codec, raw, dictionary)
+    return blob if len(blob) < len(raw) else None
+
+
+def encode_payload(provider: str, payload: Any) -> Optional[bytes]:
+    """The compressed blob for `payload`, or None when it should be stored as
+    plain JSON (codec off, too small, or incompressible)."""
+    return _encode_raw(provider, _dumps(payload))
+
+
+def decode_payload(blob: bytes, *, db: Optional[Session] = None) -> Any:
+    """Inverse of encode_payload. `db` is used to load a dictionary this
+    process has not seen yet (one trained by another process)."""
+    blob = bytes(blob)
+    tag, dictionary_id = _HEADER.unpack_from(blob)
+    codec = _CODEC_NAMES.get(tag)
+    if codec is None:
+        raise ValueError(f"unknown capture payload codec tag {tag}")
+    if codec == CODEC_ZSTD and not ZSTD_AVAILABLE:
+        raise RuntimeError("this capture payload was written with zstd; install the zstandard package to read it")
+    dictionary = _dictionary(dictionary_id, db) if dictionary_id else None
+    return json.loads(_decompress(codec, blob[_HEADER.size:], dictionary))
+
+
+def payload_columns(provider: str, payload: Any) -> dict:
+    """payload_raw/payload_blob values for a bulk insert(), which bypasses
+    CompressedPayloadMixin's setter."""
+    blob = encode_payload(provider, payload)
+    return {"payload_raw": payload if blob is None else {}, "payload_blob": blob}
+
+class CompressedPayloadMixin:
+    """payload_json for a capture event model that declares
+    payload_raw = Column("payload_json", JSON, nullable=False) and
+    payload_blob = Column(LargeBinary). __payload_provider__ picks the
+    dictionary new payloads are compressed with."""
+
+    __payload_provider__ = ""
+
+    @property
+    def payload_json(self) -> Any:
+        blob = self.payload_blob
+        if blob is None:
+            return self.payload_raw
+        cached = getattr(self, "_payload_cache", None)
+        if cached is not None and cached[0] is blob:
+            return cached[1]
+        value = decode_payload(blob, db=object_session(self))
+        self._payload_cache = (blob, value)
+        return value
+
+    @payload_json.setter
+    def payload_json(self, value: Any) -> None:
+        blob = encode_payload(self.__payload_provider__, value) if value is not None else None
+        if blob is None:
+            self.payload_raw = value
+            self.payload_blob = None
+            self._payload_cache = None
+            return
+        self.payload_raw = {}
+        self.payload_blob = blob
+        self._payload_cache = (blob, value)
+
+
+def _fragments(value: Any) -> Iterable[bytes]:
+    """JSON fragments worth sharing across payloads: every key, short
+    key/value pairs, and longer string values, serialized exactly as
+    _dumps writes them."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            encoded_key = _dumps(str(key))
+            yield encoded_key + b":"
+            if isinstance(item, (str, int, float, bool)) or item is None:
+                pair = encoded_key + b":" + _dumps(item)
+                if len(pair) <= 96:
+                    yield pair
+            yield from _fragments(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _fragments(item)
+    elif isinstance(value, str) and len(value) >= 8:
+        yield _dumps(value)
+
+
+def _content_dictionary(samples: list[bytes], size: int) -> bytes:
+    """A raw-content dictionary: the fragments shared by enough samples,
+    highest total saving last, followed by a few whole recent samples that
+    carry the usual key order and nesting. Both deflate and zstd reach the
+    end of a dictionary cheapest."""
+    whole: list[bytes] = []
+    budget = size // 4
+    for sample in samples:
+        if len(sample) <= budget:
+            whole.append(sample)
+            budget -= len(sample)
+    seen: Counter = Counter()
+    for sample in samples:
+        seen.update(set(_fragments(json.loads(sample))))
+    threshold = max(2, len(samples) // 50)
+    ranked = sorted(
+        (fragment for fragment, count in seen.items() if count >= threshold),
+        key=lambda fragment: (seen[fragment] * len(fragment), fragment),
+        reverse=True,
+    )
+    picked: list[bytes] = []
+    total = sum(len(sample) for sample in whole)
+    for fragment in ranked:
+        if total + len(fragment) > size:
+            continue
+        picked.append(fragment)
+        total += len(fragment)
+    return b"".join(reversed(picked)) + b"".join(reversed(whole))
+
+
+def train_dictionary(
+    db: Session,
+    model: Any,
+    *,
+    codec: Optional[str] = None,
+    sample_size: int = TRAIN_SAMPLE_SIZE,
+    size: int = DICTIONARY_SIZE,
+) -> Optional[CapturePayloadDictionary]:
+    """Trains a dictionary on `model`'s most recent payloads and commits it
+    as the provider's current one. Returns None (and writes nothing) when
+    there are too few payloads to learn from."""
+    codec = codec or active_codec() or CODEC_ZLIB
+    provider = model.__payload_provider__
+    rows = db.execute(
+        select(model.payload_raw, model.payload_blob).order_by(model.id.desc()).limit(sample_size)
+    ).all()
+    payloads = [decode_payload(blob, db=db) if blob is not None else raw for raw, blob in rows]
+    samples = [_dumps(payload) for payload in payloads if payload]
+    if len(samples) < TRAIN_MIN_SAMPLES:
+        logger.info("%s: %s payload(s) is too few to train a dictionary on", provider, len(samples))
+        return None
+    if codec == CODEC_ZSTD:
+        try:
+            data = zstandard.train_dictionary(size, samples).as_bytes()
+        except zstandard.ZstdError:
+            # Too little variety for zstd's trainer; a raw-content
+            # dictionary still carries the shared keys.
+            data = _content_dictionary(samples, size)
+    else:
+        data = _content_dictionary(samples, min(size, _ZLIB_WINDOW))
+    record = CapturePayloadDictionary(provider=provider, codec=codec, data=data, sample_count=len(samples))
+    db.add(record)
+    db.commit()
+    _register(record.id, provider, codec, data)
+    logger.info("%s: trained %s dictionary %s (%s bytes from %s payloads)", provider, codec, record.id, len(data), len(samples))
+    return record
+
+
+def compact_payloads(db: Session, events: list) -> dict:
+    """BackfillJob.process_batch for PAYLOAD_COMPACTION_JOB: re-encodes
+    plain-JSON payloads through the current codec and dictionary."""
+    refresh_dictionaries(db)
+    stats = {"compressed": 0, "plain": 0, "bytesBefore": 0, "bytesAfter": 0}
+    for event in events:
+        if event.payload_blob is not None:
+            continue
+        payload = event.payload_raw
+        raw = _dumps(payload)
+        blob = _encode_raw(event.__payload_provider__, raw)
+        stats["bytesBefore"] += len(raw)
+        if blob is None:
+            stats["plain"] += 1
+            stats["bytesAfter"] += len(raw)
+            continue
+        event.payload_raw = {}
+        event.payload_blob = blob
+        stats["compressed"] += 1
+        stats["bytesAfter"] += len(blob)
+    db.commit()
+    return stats
+
+
+def payload_compaction_job(model: Any) -> BackfillJob:
+    """The re-encode job for one provider's capture events, registered in
+    utils/backfill_engine.BACKFILL_JOBS as "<provider>-payload-compaction"."""
+    return BackfillJob(
+        name=f"{model.__payload_provider__}-payload-compaction",
+        model=model,
+        process_batch=compact_payloads,
+        criteria=(model.payload_blob.is_(None),),
+    )
+
+
+def payload_storage_stats(db: Session, model: Any) -> dict:
+    """Row counts and stored-payload bytes for one provider, split by
+    encoding - what scripts/compress_capture_payloads.py --dry-run reports."""
+    compressed, blob_bytes = db.execute(
+        select(func.count(model.id), func.coalesce(func.sum(func.length(model.payload_blob)), 0))
+        .where(model.payload_blob.is_not(None))
+    ).one()
+    plain = db.scalar(select(func.count(model.id)).where(model.payload_blob.is_(None)))
+    return {"compressed": int(compressed or 0), "compressedBytes": int(blob_bytes or 0), "plain": int(plain or 0)}
@@ -3,17 +3,22 @@
 Declarative metadata for every AI tool/provider the Capture Center supports.
 
 This is metadata only - adding an entry here does not, by itself, mount a
-router or run migrations. Nothing currently imports this module; it exists
-so that when the Capture Center dashboard, admin health checks, and
-analytics are built out (a later phase), a new provider can be onboarded by
-adding one PROVIDERS entry instead of hardcoding it into each of those
-surfaces separately.
+router or run migrations. It exists so that when the Capture Center
+dashboard, admin health checks, and analytics are built out (a later phase),
+a new provider can be onboarded by adding one PROVIDERS entry instead of
+hardcoding it into each of those surfaces separately.
+
+`capture` points at the provider's providers.capture_engine.CaptureProvider
+spec ("module:attribute") for providers ingesting through the shared capture
+pipeline; get_capture_provider() imports it on demand, so reading the
+registry never drags in a provider's models.
 
 Kling is listed here even though its code has not been moved into
 backend/providers/kling/ (see the Phase 1 addendum in the ChatGPT plan for
 why that migration is deferred) - the registry describes where a provider's
 code currently lives, it doesn't require that location to be providers/<name>/.
 """
+import importlib
 from dataclasses import dataclass
 from typing import Optional
 
@@ -26,6 +31,7 @@ class ProviderInfo:
     status: str  # "active" (fully built) | "in_development" | "planned"
     models_module: Optional[str] = None
     migrations_module: Optional[str] = None
+    capture: Optional[str] = None
     notes: str = ""
 
 
@@ -55,6 +61,7 @@ PROVIDERS: dict[str, ProviderInfo] = {
         status="in_development",
         models_module="providers.freepik.models",
         migrations_module="providers.freepik.migrations",
+        capture="providers.freepik.capture:CAPTURE",
         notes=(
             "Ticket-based ownership attribution (Kling pattern, not ChatGPT's plain-session one) - "
             "Freepik's own API never identifies the employee, only the shared account. Reconciliation "
@@ -68,6 +75,7 @@ PROVIDERS: dict[str, ProviderInfo] = {
         status="in_development",
         models_module="providers.heygen.models",
         migrations_module="providers.heygen.migrations",
+        capture="providers.heygen.capture:CAPTURE",
         notes=(
             "Ticket-based ownership attribution, same pattern as Freepik. Built from a single UI "
             "screenshot rather than observed HeyGen API traffic, so the network interceptor is "
@@ -86,6 +94,7 @@ PROVIDERS: dict[str, ProviderInfo] = {
         status="in_development",
         models_module="providers.higgsfield.models",
         migrations_module="providers.higgsfield.migrations",
+        capture="providers.higgsfield.capture:CAPTURE",
         notes=(
             "Ticket-based ownership attribution, same pattern as Freepik/HeyGen. Built from a single "
             "UI screenshot (Create Video tab: preset picker, Multi-shot toggle, Prompt textarea, "
@@ -106,6 +115,7 @@ PROVIDERS: dict[str, ProviderInfo] = {
         status="in_development",
         models_module="providers.envato.models",
         migrations_module="providers.envato.migrations",
+        capture="providers.envato.capture:CAPTURE",
         notes=(
             "Ticket-based ownership attribution, same pattern as Freepik/HeyGen/Higgsfield. Envato "
             "(app.envato.com) is a React Router 7 app - its `.data` route-loader responses use React "
@@ -127,6 +137,7 @@ PROVIDERS: dict[str, ProviderInfo] = {
         status="in_development",
         models_module="providers.flow.models",
         migrations_module=None,
+        capture="providers.flow.capture:CAPTURE",
         notes=(
             "Ticket-based ownership attribution, same pattern as Freepik/HeyGen/Higgsfield/Envato. "
             "Built from real captured network traffic (not a single screenshot, unlike HeyGen/"
@@ -147,6 +158,7 @@ PROVIDERS: dict[str, ProviderInfo] = {
         status="in_development",
         models_module="providers.elevenlabs.models",
         migrations_module=None,
+        capture="providers.elevenlabs.capture:CAPTURE",
         notes=(
             "Ticket-based ownership attribution, same pattern as Flow/Freepik/HeyGen/Higgsfield/Envato. "
             "Built from a single DevTools screenshot of one request "
@@ -170,3 +182,17 @@ def get_provider(slug: str) -> Optional[ProviderInfo]:
 
 def list_providers() -> list:
     return list(PROVIDERS.values())
+
+
+def get_capture_provider(slug: str):
+    """The provider's capture_engine.CaptureProvider, or None when it doesn't
+    use the shared capture pipeline."""
+    info = PROVIDERS.get(slug)
+    if info is None or not info.capture:
+        return None
+    module_name, _, attribute = info.capture.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def list_capture_providers() -> list:
+    return [get_capture_provider(slug) for slug, info in PROVIDERS.items() if info.capture]
@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 from auth import get_request_session_token, resolve_session_user
 from database_config import get_operational_db
 from models_new import ActivityStatus, Task, User, UserActivity
+from services.ephemeral_state_service import PRESENCE_STALE_SECONDS, get_presence_entries, record_presence
 from utils.datetime_utils import normalize_to_utc_naive, serialize_utc_datetime, utcnow_naive
 from utils.permissions import require_faculty, resolve_roles
 
@@ -217,6 +218,7 @@ def start_session(
 
     db.commit()
     db.refresh(row)
+    record_presence(user.id, row.status, now)
     return {"success": True, "data": serialize_activity(row, user)}
 
 
@@ -230,6 +232,10 @@ def heartbeat(
     now = normalize_to_utc_naive(payload.timestamp) or utcnow_naive()
     row, _ = get_or_create_today_activity(db, user, now, status=payload.status)
 
+    # Presence is cheap to update and should track the client exactly, so it
+    # takes every heartbeat - including the ones the DB write below skips.
+    record_presence(user.id, payload.status, now)
+
     # Soft rate limit: accept at most one persisted heartbeat every 20s.
     # Extra heartbeats are treated as no-op to avoid 429 noise storms.
     last_seen = normalize_to_utc_naive(row.last_seen)
@@ -273,6 +279,7 @@ def update_status(
 
     db.commit()
     db.refresh(row)
+    record_presence(user.id, payload.status, now)
     return {"success": True, "data": serialize_activity(row, user)}
 
 
@@ -301,6 +308,7 @@ def end_session(
 
     db.commit()
     db.refresh(row)
+    record_presence(user.id, ActivityStatus.OFFLINE, now)
     return {"success": True, "data": serialize_activity(row, user)}
 
 
@@ -447,27 +455,27 @@ def live_stats(
 ):
     user = ensure_authenticated(current_user)
 
-    today = utcnow_naive().date()
-    total_users = db.query(func.count(User.id)).filter(User.is_active == True).scalar() or 0
-    rows = db.query(UserActivity).filter(UserActivity.date == today).all()
+    # Presence comes from the ephemeral store (one batched lookup, database
+    # only for users it hasn't seen today) rather than every UserActivity row.
+    user_ids = [user_id for (user_id,) in db.query(User.id).filter(User.is_active == True).all()]
+    total_users = len(user_ids)
+    entries = get_presence_entries(db, user_ids)
 
     active = 0
     idle = 0
     away = 0
     offline = 0
 
-    # Users with no activity today are offline
-    users_with_rows = {r.user_id for r in rows}
-    offline += max(total_users - len(users_with_rows), 0)
-
-    stale_cutoff = utcnow_naive() - timedelta(seconds=90)
-    for row in rows:
-        last_seen = normalize_to_utc_naive(row.last_seen)
-        if row.status == ActivityStatus.ACTIVE and last_seen and last_seen >= stale_cutoff:
+    stale_cutoff = utcnow_naive() - timedelta(seconds=PRESENCE_STALE_SECONDS)
+    for entry in entries.values():
+        if entry is None:
+            # Users with no activity today are offline
+            offline += 1
+        elif entry.status == ActivityStatus.ACTIVE.value and entry.last_seen and entry.last_seen >= stale_cutoff:
             active += 1
-        elif row.status == ActivityStatus.IDLE:
+        elif entry.status == ActivityStatus.IDLE.value:
             idle += 1
-        elif row.status == ActivityStatus.AWAY:
+        elif entry.status == ActivityStatus.AWAY.value:
             away += 1
         else:
             offline += 1
@@ -1,5 +1,6 @@
 # routers/archive_router.py - View archived tasks and activity logs
 from fastapi import APIRouter, HTTPException, Depends, Query, Cookie, Header
+from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from datetime import datetime, timedelta
@@ -9,6 +10,13 @@ from models_new import User, Task, ArchivedTask, ActivityLog
 from auth import get_request_session_token, resolve_session_user
 from archive_service import ArchiveService
 from task_helpers import TaskHelpers
+from utils.activity_log_partitions import cold_activity_ranges
+from utils.archived_tasks import (
+    archived_task_columns_ready,
+    archived_task_creator_id,
+    user_can_view_archived_task,
+    user_took_part_in_archived_task,
+)
 
 router = APIRouter(prefix="/api/archive", tags=["Archive"])
 
@@ -29,19 +37,107 @@ def get_current_user_from_session(
 
 
 # ==================== GET ARCHIVED TASKS ====================
+def _archived_task_item(archived) -> dict:
+    return {
+        "archiveId": archived.id,
+        "originalTaskId": archived.original_task_id,
+        "taskNumber": archived.task_number,
+        "title": archived.title,
+        "status": archived.status,
+        "archivedAt": archived.archived_at.isoformat() if archived.archived_at else None,
+        "archiveReason": archived.archive_reason,
+        "canRestore": archived.archive_reason == "deleted"  # Only deleted tasks can be restored
+    }
+
+
 @router.get("/tasks")
 def get_archived_tasks(
     limit: int = Query(50, le=200),
     offset: int = Query(0, ge=0),
+    before_id: Optional[int] = Query(None, ge=1, description="Continue after this archive id (keyset paging)"),
     reason: Optional[str] = Query(None, description="Filter by archive reason"),
     operational_db: Session = Depends(get_operational_db),
     archive_db: Session = Depends(get_archive_db),
     current_user: User = Depends(get_current_user_from_session)
 ):
-    """Get archived tasks for current user"""
+    """Get archived tasks the current user created, newest first.
+
+    `before_id` pages by keyset from the last archiveId the client has;
+    without it `offset` pages as before.
+    """
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
+    if not archived_task_columns_ready(operational_db):
+        return _scan_archived_tasks(limit, offset, reason, archive_db, current_user)
+
+    try:
+        # Only the user's own tasks, via ix_archived_tasks_creator_archived_id
+        query = archive_db.query(
+            ArchivedTask.id,
+            ArchivedTask.original_task_id,
+            ArchivedTask.task_number,
+            ArchivedTask.title,
+            ArchivedTask.status,
+            ArchivedTask.archived_at,
+            ArchivedTask.archive_reason,
+        ).filter(ArchivedTask.creator_id == current_user.id)
+        count_query = archive_db.query(func.count(ArchivedTask.id)).filter(ArchivedTask.creator_id == current_user.id)
+        
+        # Filter by reason if provided
+        if reason:
+            query = query.filter(ArchivedTask.archive_reason == reason)
+            count_query = count_query.filter(ArchivedTask.archive_reason == reason)
+        
+        if before_id is not None:
+            anchor = archive_db.query(ArchivedTask.archived_at, ArchivedTask.id).filter(
+                ArchivedTask.id == before_id,
+                ArchivedTask.creator_id == current_user.id
+            ).first()
+            if not anchor:
+                raise HTTPException(status_code=400, detail="Archive cursor not found")
+            query = query.filter(
+                or_(
+                    ArchivedTask.archived_at < anchor.archived_at,
+                    and_(ArchivedTask.archived_at == anchor.archived_at, ArchivedTask.id < anchor.id)
+                )
+            )
+        
+        # Order by most recent
+        query = query.order_by(ArchivedTask.archived_at.desc(), ArchivedTask.id.desc())
+        if before_id is None:
+            query = query.offset(offset)
+        rows = query.limit(limit + 1).all()
+        has_more = len(rows) > limit
+        result = [_archived_task_item(row) for row in rows[:limit]]
+        total = count_query.scalar() or 0
+        
+        print(f"📦 Found {len(result)} archived tasks for user {current_user.email}")
+        
+        return {
+            "success": True,
+            "count": len(result),
+            "total": total,
+            "data": result,
+            "pagination": {
+                "limit": limit,
+                "offset": offset if before_id is None else None,
+                "beforeId": before_id,
+                "hasMore": has_more,
+                "nextBeforeId": result[-1]["archiveId"] if has_more and result else None
+            }
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error fetching archived tasks: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _scan_archived_tasks(limit: int, offset: int, reason: Optional[str], archive_db: Session, current_user: User):
+    """Listing before backfill_archived_tasks.py has run: pages the whole
+    archive and keeps the user's rows from task_data."""
     try:
         # Query archived tasks
         query = archive_db.query(ArchivedTask)
@@ -111,11 +207,8 @@ def get_archived_task_details(
         task_data = archived.task_data
         
         # Check if user has access (was creator or participant)
-        creator_id = task_data.get("creatorId")
-        participants = task_data.get("participants", [])
-        participant_ids = [p.get("userId") for p in participants]
-        
-        if current_user.id != creator_id and current_user.id not in participant_ids:
+        creator_id = archived_task_creator_id(archived)
+        if not user_can_view_archived_task(archive_db, archived, current_user.id):
             raise HTTPException(status_code=403, detail="Access denied")
         
         return {
@@ -164,10 +257,8 @@ def restore_archived_task(
                 detail=f"Cannot restore task with reason: {archived.archive_reason}"
             )
         
-        task_data = archived.task_data
-        
         # Only creator can restore
-        if task_data.get("creatorId") != current_user.id:
+        if archived_task_creator_id(archived) != current_user.id:
             raise HTTPException(status_code=403, detail="Only creator can restore task")
         
         # Check if task still exists in operational DB (soft deleted)
@@ -223,14 +314,20 @@ def restore_archived_task(
 def get_activity_log(
     limit: int = Query(100, le=500),
     offset: int = Query(0, ge=0),
+    before_id: Optional[int] = Query(None, ge=1, description="Continue after this activity id (keyset paging)"),
     action_filter: Optional[str] = Query(None, description="Filter by action type"),
     task_id: Optional[int] = Query(None, description="Filter by task ID"),
-    days: int = Query(30, description="Number of days to look back"),
+    days: int = Query(30, ge=1, description="Number of days to look back"),
+    include_total: bool = Query(True),
     operational_db: Session = Depends(get_operational_db),
     archive_db: Session = Depends(get_archive_db),
     current_user: User = Depends(get_current_user_from_session)
 ):
-    """Get activity log for current user"""
+    """Get activity log for current user, newest first.
+
+    The `days` window bounds the scan to the activity_log partitions it
+    covers; months already retired to R2 are listed under `coldRanges`.
+    """
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -251,13 +348,31 @@ def get_activity_log(
         if task_id:
             query = query.filter(ActivityLog.task_id == task_id)
         
-        # Order by most recent
-        query = query.order_by(ActivityLog.timestamp.desc())
+        total = query.order_by(None).count() if include_total else None
+        
+        if before_id is not None:
+            anchor = archive_db.query(ActivityLog.timestamp, ActivityLog.id).filter(
+                ActivityLog.id == before_id,
+                ActivityLog.user_id == current_user.id,
+                ActivityLog.timestamp >= since_date
+            ).first()
+            if not anchor:
+                raise HTTPException(status_code=400, detail="Activity cursor not found in this window")
+            query = query.filter(
+                or_(
+                    ActivityLog.timestamp < anchor.timestamp,
+                    and_(ActivityLog.timestamp == anchor.timestamp, ActivityLog.id < anchor.id)
+                )
+            )
         
-        total = query.count()
-        activities = query.offset(offset).limit(limit).all()
+        # Order by most recent
+        query = query.order_by(ActivityLog.timestamp.desc(), ActivityLog.id.desc())
+        if before_id is None:
+            query = query.offset(offset)
+        activities = query.limit(limit + 1).all()
+        has_more = len(activities) > limit
         
-        result = [activity.to_dict() for activity in activities]
+        result = [activity.to_dict() for activity in activities[:limit]]
         
         print(f"📝 Found {len(result)} activity logs for user {current_user.email}")
         
@@ -265,9 +380,19 @@ def get_activity_log(
             "success": True,
             "count": len(result),
             "total": total,
-            "data": result
+            "data": result,
+            "pagination": {
+                "limit": limit,
+                "offset": offset if before_id is None else None,
+                "beforeId": before_id,
+                "hasMore": has_more,
+                "nextBeforeId": result[-1]["id"] if has_more and result else None
+            },
+            "coldRanges": cold_activity_ranges(archive_db, since_date)
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error fetching activity log: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -277,27 +402,40 @@ def get_activity_log(
 @router.get("/tasks/{task_id}/history")
 def get_task_complete_history(
     task_id: int,
+    limit: int = Query(100, ge=1, le=500),
+    before_id: Optional[int] = Query(None, ge=1, description="Continue after this activity id (keyset paging)"),
     operational_db: Session = Depends(get_operational_db),
     archive_db: Session = Depends(get_archive_db),
     current_user: User = Depends(get_current_user_from_session)
 ):
-    """Get complete audit trail for a specific task"""
+    """Get the audit trail for a specific task, newest first, a page at a time"""
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     try:
-        # Check if user has access to this task
-        if not TaskHelpers.can_user_access_task(task_id, current_user.id, operational_db):
+        # Check if user has access to this task; a task that is gone from the
+        # operational database is checked against its archived snapshots
+        if not (
+            TaskHelpers.can_user_access_task(task_id, current_user.id, operational_db)
+            or user_took_part_in_archived_task(archive_db, task_id, current_user.id)
+        ):
             raise HTTPException(status_code=403, detail="Access denied")
         
-        # Get all activities for this task
-        history = ArchiveService.get_task_history(task_id, archive_db)
+        history = ArchiveService.get_task_history(task_id, archive_db, limit=limit + 1, before_id=before_id)
+        has_more = len(history) > limit
+        history = history[:limit]
         
         return {
             "success": True,
             "taskId": task_id,
             "count": len(history),
-            "data": history
+            "data": history,
+            "pagination": {
+                "limit": limit,
+                "beforeId": before_id,
+                "hasMore": has_more,
+                "nextBeforeId": history[-1]["id"] if has_more and history else None
+            }
         }
         
     except HTTPException:
@@ -321,31 +459,33 @@ def get_activity_summary(
     
     try:
         since_date = datetime.utcnow() - timedelta(days=days)
-        
-        # Get all activities
-        activities = archive_db.query(ActivityLog).filter(
+        window = (
             ActivityLog.user_id == current_user.id,
             ActivityLog.timestamp >= since_date
-        ).all()
+        )
         
         # Count by action type
-        action_counts = {}
-        for activity in activities:
-            action = activity.action
-            action_counts[action] = action_counts.get(action, 0) + 1
+        action_counts = dict(
+            archive_db.query(ActivityLog.action, func.count(ActivityLog.id))
+            .filter(*window)
+            .group_by(ActivityLog.action)
+            .all()
+        )
         
         # Count by day
+        day = func.date(ActivityLog.timestamp)
         daily_activity = {}
-        for activity in activities:
-            date_key = activity.timestamp.date().isoformat()
-            daily_activity[date_key] = daily_activity.get(date_key, 0) + 1
+        for date_value, count in archive_db.query(day, func.count(ActivityLog.id)).filter(*window).group_by(day).all():
+            date_key = date_value.isoformat() if hasattr(date_value, "isoformat") else str(date_value)
+            daily_activity[date_key] = count
         
         return {
             "success": True,
             "period": f"Last {days} days",
-            "totalActivities": len(activities),
+            "totalActivities": sum(action_counts.values()),
             "byAction": action_counts,
-            "byDay": daily_activity
+            "byDay": daily_activity,
+            "coldRanges": cold_activity_ranges(archive_db, since_date)
         }
         
     except Exception as e:
@@ -377,10 +517,8 @@ def permanently_delete_archived_task(
         if not archived:
             raise HTTPException(status_code=404, detail="Archived task not found")
         
-        task_data = archived.task_data
-        
         # Only creator can permanently delete
-        if task_data.get("creatorId") != current_user.id:
+        if archived_task_creator_id(archived) != current_user.id:
             raise HTTPException(status_code=403, detail="Only creator can permanently delete")
         
         # Delete from archive
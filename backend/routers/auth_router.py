@@ -66,6 +66,7 @@ KNOWN_DEPARTMENTS = (
     "3D Visualizer",
 )
 from utils.cache import cache_response
+from utils.env import int_env
 from utils.permissions import has_any_role, require_admin
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
@@ -82,16 +83,6 @@ _LOGIN_RATE_LIMIT_CACHE: dict[str, tuple[int, float]] = {}
 _DUMMY_PASSWORD_HASH: Optional[str] = None
 
 
-def _int_env(name: str, default: int) -> int:
-    raw = (os.getenv(name) or "").strip()
-    if not raw:
-        return default
-    try:
-        return int(raw)
-    except ValueError:
-        return default
-
-
 def _is_production_auth() -> bool:
     environment = (os.getenv("ENVIRONMENT") or "").strip().lower()
     render_flag = (os.getenv("RENDER") or "").strip().lower()
@@ -107,11 +98,11 @@ def _auth_requires_redis() -> bool:
     return _is_production_auth()
 
 
-_LOGIN_RATE_LIMIT_ATTEMPTS = max(1, _int_env("LOGIN_RATE_LIMIT_ATTEMPTS", 5))
-_LOGIN_RATE_LIMIT_WINDOW_SECONDS = max(10, _int_env("LOGIN_RATE_LIMIT_WINDOW_SECONDS", 60))
-_FORGOT_PASSWORD_RATE_LIMIT_ATTEMPTS = max(1, _int_env("FORGOT_PASSWORD_RATE_LIMIT_ATTEMPTS", 3))
-_FORGOT_PASSWORD_RATE_LIMIT_WINDOW_SECONDS = max(60, _int_env("FORGOT_PASSWORD_RATE_LIMIT_WINDOW_SECONDS", 300))
-_AUTH_RESPONSE_CACHE_TTL_SECONDS = max(0, _int_env("AUTH_RESPONSE_CACHE_TTL_SECONDS", 10))
+_LOGIN_RATE_LIMIT_ATTEMPTS = max(1, int_env("LOGIN_RATE_LIMIT_ATTEMPTS", 5))
+_LOGIN_RATE_LIMIT_WINDOW_SECONDS = max(10, int_env("LOGIN_RATE_LIMIT_WINDOW_SECONDS", 60))
+_FORGOT_PASSWORD_RATE_LIMIT_ATTEMPTS = max(1, int_env("FORGOT_PASSWORD_RATE_LIMIT_ATTEMPTS", 3))
+_FORGOT_PASSWORD_RATE_LIMIT_WINDOW_SECONDS = max(60, int_env("FORGOT_PASSWORD_RATE_LIMIT_WINDOW_SECONDS", 300))
+_AUTH_RESPONSE_CACHE_TTL_SECONDS = max(0, int_env("AUTH_RESPONSE_CACHE_TTL_SECONDS", 10))
 _AUTH_RESPONSE_CACHE: dict[str, tuple[dict, float]] = {}
 
 
@@ -434,7 +425,7 @@ def _send_password_reset_email(recipient_email: str, reset_link: str) -> bool:
     if not smtp_host or not sender:
         return False
 
-    smtp_port = _int_env("SMTP_PORT", 587)
+    smtp_port = int_env("SMTP_PORT", 587)
     use_ssl = _is_truthy(os.getenv("SMTP_USE_SSL"))
     use_tls = _is_truthy(os.getenv("SMTP_USE_TLS")) or not use_ssl
 
@@ -651,7 +642,7 @@ def _create_password_change_request(db: Session, current_user: User, new_passwor
                 password_hash=password_hash,
                 status="pending",
                 created_at=now,
-                expires_at=now + timedelta(days=_int_env("PASSWORD_CHANGE_APPROVAL_EXPIRES_DAYS", 7)),
+                expires_at=now + timedelta(days=int_env("PASSWORD_CHANGE_APPROVAL_EXPIRES_DAYS", 7)),
             )
         )
         db.commit()
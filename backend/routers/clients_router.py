@@ -19,6 +19,7 @@ from models_new import GenerationClient, User
 from routers.it_tools_router import _resolve_usage_event_actor
 from services.workplace_access_service import enforce_workplace_tools_access
 from utils.client_gate import get_active_clients
+from utils.config_cache import invalidate_config_cache
 from utils.generation_gate import resolve_generation_gate_tool
 from utils.permissions import require_admin
 
@@ -128,6 +129,7 @@ def create_client(
         db.add(client)
 
     db.commit()
+    invalidate_config_cache()
     db.refresh(client)
     return {"success": True, "message": "Client added successfully", "client": _serialize_client(client)}
 
@@ -165,5 +167,6 @@ def update_client(
     client.updated_by = current_user.id
     client.updated_at = datetime.utcnow()
     db.commit()
+    invalidate_config_cache()
     db.refresh(client)
     return {"success": True, "client": _serialize_client(client)}
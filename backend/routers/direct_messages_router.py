@@ -1,7 +1,6 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from collections import defaultdict
 import logging
-import time
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
@@ -10,16 +9,14 @@ from sqlalchemy import and_, func, or_
 from sqlalchemy.orm import Session
 
 from database_config import get_operational_db
-from models_new import ActivityStatus, ChatMessageReaction, ChatMessageReadReceipt, DirectMessage, User, UserActivity
+from models_new import ChatMessageReaction, ChatMessageReadReceipt, DirectMessage, User
 from routers.auth_router import get_current_user
 from routers.tasks_router import notification_dispatcher
-from utils.datetime_utils import normalize_to_utc_naive, utcnow_naive
+from services.ephemeral_state_service import build_presence_lookup, default_presence, should_send_typing_event
+from utils.datetime_utils import utcnow_naive
 
 
 router = APIRouter(prefix="/api/direct-messages", tags=["Direct Messages"])
-PRESENCE_STALE_SECONDS = 90
-TYPING_THROTTLE_SECONDS = 5
-_TYPING_THROTTLE: dict[tuple[int, int, bool], float] = {}
 logger = logging.getLogger(__name__)
 
 
@@ -66,48 +63,6 @@ def _normalize_attachments(items: list[dict]) -> list[dict]:
     return normalized
 
 
-def _default_presence() -> dict:
-    return {
-        "status": ActivityStatus.OFFLINE.value,
-        "isOnline": False,
-        "lastSeen": None,
-    }
-
-
-def _serialize_presence(activity: Optional[UserActivity], now: Optional[datetime] = None) -> dict:
-    if not activity:
-        return _default_presence()
-
-    current_time = normalize_to_utc_naive(now) or _utcnow()
-    last_seen = normalize_to_utc_naive(activity.last_seen)
-    is_recent = bool(last_seen and last_seen >= current_time - timedelta(seconds=PRESENCE_STALE_SECONDS))
-    status = activity.status.value if hasattr(activity.status, "value") else activity.status
-    status = status or ActivityStatus.OFFLINE.value
-    if not is_recent:
-        status = ActivityStatus.OFFLINE.value
-
-    return {
-        "status": status,
-        "isOnline": status in {ActivityStatus.ACTIVE.value, ActivityStatus.IDLE.value, ActivityStatus.AWAY.value},
-        "lastSeen": last_seen.isoformat() if last_seen else None,
-    }
-
-
-def _build_presence_lookup(db: Session, user_ids: list[int]) -> dict[int, dict]:
-    unique_user_ids = sorted({user_id for user_id in user_ids if user_id})
-    if not unique_user_ids:
-        return {}
-
-    now = _utcnow()
-    activities = (
-        db.query(UserActivity)
-        .filter(UserActivity.user_id.in_(unique_user_ids), UserActivity.date == now.date())
-        .all()
-    )
-    activity_map = {activity.user_id: activity for activity in activities}
-    return {user_id: _serialize_presence(activity_map.get(user_id), now) for user_id in unique_user_ids}
-
-
 def _serialize_user(user: User, presence: Optional[dict] = None) -> dict:
     return {
         "id": user.id,
@@ -116,7 +71,7 @@ def _serialize_user(user: User, presence: Optional[dict] = None) -> dict:
         "department": user.department,
         "position": user.position,
         "isAdmin": bool(user.is_admin or (user.position or "").lower() == "admin"),
-        "presence": presence or _default_presence(),
+        "presence": presence or default_presence(),
     }
 
 
@@ -202,22 +157,6 @@ def _notify_receipt_update(user_id: int, payload: dict) -> None:
         logger.exception("Failed to enqueue direct message notification for user_id=%s event=%s", user_id, payload.get("eventType"))
 
 
-def _should_send_typing_event(sender_id: int, recipient_id: int, active: bool) -> bool:
-    now = time.monotonic()
-    key = (sender_id, recipient_id, bool(active))
-    last_sent_at = _TYPING_THROTTLE.get(key)
-    if last_sent_at and now - last_sent_at < TYPING_THROTTLE_SECONDS:
-        return False
-    _TYPING_THROTTLE[key] = now
-
-    if len(_TYPING_THROTTLE) > 2000:
-        cutoff = now - (TYPING_THROTTLE_SECONDS * 4)
-        for stale_key, sent_at in list(_TYPING_THROTTLE.items()):
-            if sent_at < cutoff:
-                _TYPING_THROTTLE.pop(stale_key, None)
-    return True
-
-
 def _get_active_user(db: Session, user_id: int) -> User:
     user = (
         db.query(User)
@@ -415,7 +354,7 @@ def list_direct_message_users(
         .all()
     )
     visible_users = [user for user in users if user.id != current_user.id]
-    presence_lookup = _build_presence_lookup(db, [user.id for user in visible_users])
+    presence_lookup = build_presence_lookup(db, [user.id for user in visible_users])
     return {
         "success": True,
         "data": [_serialize_user(user, presence_lookup.get(user.id)) for user in visible_users],
@@ -500,7 +439,7 @@ def list_direct_conversations(
         .all()
     )
     partner_map = {partner.id: partner for partner in partners}
-    presence_lookup = _build_presence_lookup(db, [partner.id for partner in partners])
+    presence_lookup = build_presence_lookup(db, [partner.id for partner in partners])
 
     data = []
     for row in rows:
@@ -612,7 +551,7 @@ def list_direct_messages(
     receipt_lookup = _build_direct_receipt_lookup(db, messages, current_user.id)
     reaction_lookup = _build_reaction_lookup(db, "direct", [message.id for message in messages], current_user.id)
     reply_lookup = _build_direct_reply_lookup(db, messages)
-    presence_lookup = _build_presence_lookup(db, [other_user.id])
+    presence_lookup = build_presence_lookup(db, [other_user.id])
     return {
         "success": True,
         "conversationWith": _serialize_user(other_user, presence_lookup.get(other_user.id)),
@@ -747,7 +686,7 @@ def send_direct_typing_indicator(
             "updatedAt": _utcnow().isoformat(),
         },
     }
-    if _should_send_typing_event(current_user.id, recipient.id, payload.active):
+    if should_send_typing_event("dm", current_user.id, recipient.id, payload.active):
         _notify_receipt_update(recipient.id, ws_payload)
 
     return {"success": True}
@@ -8,7 +8,7 @@ from datetime import datetime
 from database_config import get_operational_db
 from models_new import Task, User, TaskStatus, Priority, ParticipantRole, TaskParticipant
 from auth import get_request_session_token, resolve_session_user
-from task_helpers import TaskHelpers
+from services.id_allocator_service import allocate_task_number
 from utils.datetime_utils import normalize_deadline_to_utc_naive
 
 router = APIRouter(prefix="/api/drafts", tags=["Drafts"])
@@ -146,7 +146,7 @@ def save_draft(
     
     try:
         deadline = parse_deadline(draft_data.deadline)
-        task_number = TaskHelpers.generate_task_number(db)
+        task_number = allocate_task_number(db)
         
         priority_map = {
             "low": Priority.LOW,
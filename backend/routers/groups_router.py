@@ -1,8 +1,7 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional
 from collections import defaultdict
 import logging
-import time
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel, Field
@@ -10,17 +9,16 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_, func, select
 
 from database_config import get_operational_db
-from models_new import ActivityStatus, ChatMessageReaction, ChatMessageReadReceipt, GroupChat, GroupChatMember, GroupChatMessage, User, UserActivity
+from models_new import ChatMessageReaction, ChatMessageReadReceipt, GroupChat, GroupChatMember, GroupChatMessage, User
 from routers.auth_router import get_current_user
 from routers.tasks_router import notification_dispatcher
+from services.ephemeral_state_service import build_presence_lookup, default_presence, should_send_typing_event
+from services.notification_broadcast import NotificationBroadcast
 from utils.cache import cache_response
-from utils.datetime_utils import normalize_to_utc_naive, utcnow_naive
+from utils.datetime_utils import utcnow_naive
 
 
 router = APIRouter(prefix="/api/groups", tags=["Groups"])
-PRESENCE_STALE_SECONDS = 90
-TYPING_THROTTLE_SECONDS = 5
-_TYPING_THROTTLE: dict[tuple[int, int, bool], float] = {}
 logger = logging.getLogger(__name__)
 
 
@@ -61,48 +59,6 @@ def _utcnow() -> datetime:
     return utcnow_naive()
 
 
-def _default_presence() -> dict:
-    return {
-        "status": ActivityStatus.OFFLINE.value,
-        "isOnline": False,
-        "lastSeen": None,
-    }
-
-
-def _serialize_presence(activity: Optional[UserActivity], now: Optional[datetime] = None) -> dict:
-    if not activity:
-        return _default_presence()
-
-    current_time = normalize_to_utc_naive(now) or _utcnow()
-    last_seen = normalize_to_utc_naive(activity.last_seen)
-    is_recent = bool(last_seen and last_seen >= current_time - timedelta(seconds=PRESENCE_STALE_SECONDS))
-    status = activity.status.value if hasattr(activity.status, "value") else activity.status
-    status = status or ActivityStatus.OFFLINE.value
-    if not is_recent:
-        status = ActivityStatus.OFFLINE.value
-
-    return {
-        "status": status,
-        "isOnline": status in {ActivityStatus.ACTIVE.value, ActivityStatus.IDLE.value, ActivityStatus.AWAY.value},
-        "lastSeen": last_seen.isoformat() if last_seen else None,
-    }
-
-
-def _build_presence_lookup(db: Session, user_ids: list[int]) -> dict[int, dict]:
-    unique_user_ids = sorted({user_id for user_id in user_ids if user_id})
-    if not unique_user_ids:
-        return {}
-
-    now = _utcnow()
-    activities = (
-        db.query(UserActivity)
-        .filter(UserActivity.user_id.in_(unique_user_ids), UserActivity.date == now.date())
-        .all()
-    )
-    activity_map = {activity.user_id: activity for activity in activities}
-    return {user_id: _serialize_presence(activity_map.get(user_id), now) for user_id in unique_user_ids}
-
-
 def _group_member_row(db: Session, group_id: int, user_id: int) -> Optional[GroupChatMember]:
     return (
         db.query(GroupChatMember)
@@ -307,30 +263,32 @@ def _notify_receipt_update(user_id: int, payload: dict) -> None:
         logger.exception("Failed to enqueue group notification for user_id=%s event=%s", user_id, payload.get("eventType"))
 
 
-def _notify_group_members(member_ids: list[int] | set[int], sender_id: int, payload_factory) -> int:
-    queued_count = 0
-    for member_id in sorted({int(member_id) for member_id in member_ids if member_id}):
-        if member_id == sender_id:
-            continue
-        _notify_receipt_update(member_id, payload_factory(member_id))
-        queued_count += 1
-    return queued_count
-
-
-def _should_send_typing_event(sender_id: int, group_id: int, active: bool) -> bool:
-    now = time.monotonic()
-    key = (sender_id, group_id, bool(active))
-    last_sent_at = _TYPING_THROTTLE.get(key)
-    if last_sent_at and now - last_sent_at < TYPING_THROTTLE_SECONDS:
-        return False
-    _TYPING_THROTTLE[key] = now
-
-    if len(_TYPING_THROTTLE) > 3000:
-        cutoff = now - (TYPING_THROTTLE_SECONDS * 4)
-        for stale_key, sent_at in list(_TYPING_THROTTLE.items()):
-            if sent_at < cutoff:
-                _TYPING_THROTTLE.pop(stale_key, None)
-    return True
+def _notify_group_members(
+    member_ids: list[int] | set[int],
+    sender_id: int,
+    payload: dict,
+    overlays: Optional[dict[int, dict]] = None,
+) -> int:
+    """Fans `payload` out to every member but the sender as one dispatcher
+    broadcast; `overlays` carries the per-member differences (see
+    services/notification_broadcast.py)."""
+    broadcast = NotificationBroadcast.for_members(
+        payload,
+        member_ids,
+        exclude_user_id=sender_id,
+        overlays=overlays,
+    )
+    try:
+        queued = notification_dispatcher.enqueue_broadcast(broadcast)
+        if not queued:
+            logger.warning(
+                "Group notification queue full for %s recipients event=%s",
+                len(broadcast.recipient_ids),
+                payload.get("eventType"),
+            )
+    except Exception:
+        logger.exception("Failed to enqueue group broadcast event=%s", payload.get("eventType"))
+    return len(broadcast.recipient_ids)
 
 
 def _mark_group_receipts(
@@ -510,7 +468,7 @@ def _serialize_group(
         group,
         current_user_id,
         members,
-        presence_lookup=_build_presence_lookup(db, [user.id for _member, user in members]),
+        presence_lookup=build_presence_lookup(db, [user.id for _member, user in members]),
         latest_message_sender_id=latest_message.sender_id if latest_message else None,
     )
 
@@ -537,7 +495,7 @@ def _serialize_group_with_members(
                 "department": u.department,
                 "position": u.position,
                 "role": role,
-                "presence": presence_lookup.get(u.id) or _default_presence(),
+                "presence": presence_lookup.get(u.id) or default_presence(),
             }
         )
     return {
@@ -580,7 +538,7 @@ def _serialize_groups(
     for member, user in member_rows:
         members_by_group[member.group_id].append((member, user))
         member_user_ids.add(user.id)
-    presence_lookup = _build_presence_lookup(db, list(member_user_ids))
+    presence_lookup = build_presence_lookup(db, list(member_user_ids))
 
     latest_message_ids = (
         db.query(func.max(GroupChatMessage.id).label("message_id"))
@@ -1041,8 +999,8 @@ def send_group_typing_indicator(
             "updatedAt": _utcnow().isoformat(),
         },
     }
-    if _should_send_typing_event(current_user.id, group.id, payload.active):
-        _notify_group_members(member_ids, current_user.id, lambda _member_id: ws_payload)
+    if should_send_typing_event("group", current_user.id, group.id, payload.active):
+        _notify_group_members(member_ids, current_user.id, ws_payload)
 
     return {"success": True}
 
@@ -1105,24 +1063,21 @@ def set_group_message_reaction(
             GroupChatMember.is_active == True,
         ).all()
     ]
-    for member_id in member_ids:
-        if member_id == current_user.id:
-            continue
-        _notify_receipt_update(member_id, {
-            "eventType": "message_reaction",
-            "title": f"{current_user.name} reacted in {group.name}",
-            "message": f"{current_user.name} reacted to a message",
-            "metadata": {
-                "scope": "group",
-                "groupId": group.id,
-                "messageId": message.id,
-                "userId": current_user.id,
-                "userName": current_user.name,
-                "emoji": emoji,
-                "removed": False,
-                "updatedAt": now.isoformat(),
-            },
-        })
+    _notify_group_members(member_ids, current_user.id, {
+        "eventType": "message_reaction",
+        "title": f"{current_user.name} reacted in {group.name}",
+        "message": f"{current_user.name} reacted to a message",
+        "metadata": {
+            "scope": "group",
+            "groupId": group.id,
+            "messageId": message.id,
+            "userId": current_user.id,
+            "userName": current_user.name,
+            "emoji": emoji,
+            "removed": False,
+            "updatedAt": now.isoformat(),
+        },
+    })
 
     return {"success": True, "data": reaction_data}
 
@@ -1170,23 +1125,20 @@ def remove_group_message_reaction(
             GroupChatMember.is_active == True,
         ).all()
     ]
-    for member_id in member_ids:
-        if member_id == current_user.id:
-            continue
-        _notify_receipt_update(member_id, {
-            "eventType": "message_reaction",
-            "title": f"{current_user.name} updated a reaction in {group.name}",
-            "message": f"{current_user.name} updated a reaction",
-            "metadata": {
-                "scope": "group",
-                "groupId": group.id,
-                "messageId": message.id,
-                "userId": current_user.id,
-                "userName": current_user.name,
-                "removed": True,
-                "updatedAt": now.isoformat(),
-            },
-        })
+    _notify_group_members(member_ids, current_user.id, {
+        "eventType": "message_reaction",
+        "title": f"{current_user.name} updated a reaction in {group.name}",
+        "message": f"{current_user.name} updated a reaction",
+        "metadata": {
+            "scope": "group",
+            "groupId": group.id,
+            "messageId": message.id,
+            "userId": current_user.id,
+            "userName": current_user.name,
+            "removed": True,
+            "updatedAt": now.isoformat(),
+        },
+    })
 
     return {"success": True, "data": reaction_data}
 
@@ -1244,24 +1196,21 @@ def edit_group_message(
     db.refresh(message)
 
     member_ids = [member.user_id for member, _user in member_rows]
-    for member_id in member_ids:
-        if member_id == current_user.id:
-            continue
-        _notify_receipt_update(member_id, {
-            "eventType": "message_updated",
-            "title": f"{current_user.name} edited a message in {group.name}",
-            "message": f"{current_user.name} edited a message",
-            "metadata": {
-                "scope": "group",
-                "groupId": group.id,
-                "messageId": message.id,
-                "senderId": current_user.id,
-                "messageText": message.message,
-                "mentions": mentions,
-                "mentionIds": sorted(mentioned_user_ids),
-                "editedAt": message.edited_at.isoformat() if message.edited_at else None,
-            },
-        })
+    _notify_group_members(member_ids, current_user.id, {
+        "eventType": "message_updated",
+        "title": f"{current_user.name} edited a message in {group.name}",
+        "message": f"{current_user.name} edited a message",
+        "metadata": {
+            "scope": "group",
+            "groupId": group.id,
+            "messageId": message.id,
+            "senderId": current_user.id,
+            "messageText": message.message,
+            "mentions": mentions,
+            "mentionIds": sorted(mentioned_user_ids),
+            "editedAt": message.edited_at.isoformat() if message.edited_at else None,
+        },
+    })
 
     return {
         "success": True,
@@ -1315,21 +1264,18 @@ def delete_group_message(
             GroupChatMember.is_active == True,
         ).all()
     ]
-    for member_id in member_ids:
-        if member_id == current_user.id:
-            continue
-        _notify_receipt_update(member_id, {
-            "eventType": "message_deleted",
-            "title": f"{current_user.name} deleted a message in {group.name}",
-            "message": f"{current_user.name} deleted a message",
-            "metadata": {
-                "scope": "group",
-                "groupId": group.id,
-                "messageId": message.id,
-                "senderId": current_user.id,
-                "deletedAt": message.deleted_at.isoformat() if message.deleted_at else now.isoformat(),
-            },
-        })
+    _notify_group_members(member_ids, current_user.id, {
+        "eventType": "message_deleted",
+        "title": f"{current_user.name} deleted a message in {group.name}",
+        "message": f"{current_user.name} deleted a message",
+        "metadata": {
+            "scope": "group",
+            "groupId": group.id,
+            "messageId": message.id,
+            "senderId": current_user.id,
+            "deletedAt": message.deleted_at.isoformat() if message.deleted_at else now.isoformat(),
+        },
+    })
 
     return {
         "success": True,
@@ -1434,21 +1380,18 @@ def send_group_message(
             "createdAt": msg.created_at.isoformat() if msg.created_at else None,
         },
     }
-    def _message_payload_for_member(member_id: int) -> dict:
-        if member_id in mentioned_user_ids:
-            return {
-                **ws_payload,
-                "title": f"{current_user.name} mentioned you in {group.name}",
-                "message": (text or "You were mentioned in a group message")[:180],
-                "metadata": {
-                    **ws_payload["metadata"],
-                    "mentionedUserId": member_id,
-                    "isMention": True,
-                },
-            }
-        return ws_payload
+    mention_title = f"{current_user.name} mentioned you in {group.name}"
+    mention_message = (text or "You were mentioned in a group message")[:180]
+    mention_overlays = {
+        member_id: {
+            "title": mention_title,
+            "message": mention_message,
+            "metadata": {"mentionedUserId": member_id, "isMention": True},
+        }
+        for member_id in mentioned_user_ids
+    }
 
-    _notify_group_members(member_ids, current_user.id, _message_payload_for_member)
+    _notify_group_members(member_ids, current_user.id, ws_payload, mention_overlays)
 
     return {
         "success": True,
@@ -26,6 +26,7 @@ from sqlalchemy.orm import Session
 from auth import get_request_session_token, resolve_session_user
 from database_config import get_operational_db
 from models_new import ITPortalTool, ITPortalToolAudit, ITPortalToolCredential, ITPortalToolMailbox, ITPortalToolUsageEvent, User
+from services.mailbox_watcher import auth_link_query, mailbox_watchers, otp_query
 from services.otp_mail_service import fetch_auth_link_from_gmail, fetch_otp_from_gmail, latest_otp_uid_from_gmail
 from services.totp_service import generate_totp_code, parse_totp_config
 from services.workplace_access_service import (
@@ -35,6 +36,7 @@ from services.workplace_access_service import (
     require_admin_with_workplace_tools_access,
 )
 from utils.client_gate import validate_client_for_generation
+from utils.config_cache import cached_lookup, get_active_tool_by_id, get_active_tools, invalidate_config_cache
 from utils.credential_crypto import decrypt_secret, encrypt_secret
 from utils.generation_backfill import sync_generation_record_from_usage_event
 from utils.permissions import get_current_user, has_any_role
@@ -937,20 +939,33 @@ def _resolve_usage_event_credential(
     user_id: int,
     explicit_credential_id: Optional[int] = None,
 ) -> Optional[ITPortalToolCredential]:
+    # Runs once per capture event: served from the per-process config
+    # snapshot (utils/config_cache.py), invalidated by upsert_credential /
+    # delete_credential below.
     explicit_id = int(explicit_credential_id or 0)
     if explicit_id > 0:
-        explicit_credential = (
-            db.query(ITPortalToolCredential)
-            .filter(
-                ITPortalToolCredential.id == explicit_id,
-                ITPortalToolCredential.tool_id == tool_id,
-            )
-            .first()
+        explicit_credential = cached_lookup(
+            db,
+            "explicit-credential",
+            (tool_id, explicit_id),
+            lambda: (
+                db.query(ITPortalToolCredential)
+                .filter(
+                    ITPortalToolCredential.id == explicit_id,
+                    ITPortalToolCredential.tool_id == tool_id,
+                )
+                .first()
+            ),
         )
         if explicit_credential:
             return explicit_credential
 
-    return _resolve_tool_credential(db, tool_id, user_id)
+    return cached_lookup(
+        db,
+        "tool-credential",
+        (tool_id, user_id),
+        lambda: _resolve_tool_credential(db, tool_id, user_id),
+    )
 
 
 def _normalize_login_identifier(value: Optional[str]) -> str:
@@ -1281,19 +1296,21 @@ def _find_extension_tool(db: Session, payload: ExtensionCredentialPayload) -> Op
         if ticket_payload.get("kind") == "extension_autofill":
             tool_id = int(ticket_payload.get("toolId") or 0)
             if tool_id > 0:
-                ticket_tool = (
-                    db.query(ITPortalTool)
-                    .filter(ITPortalTool.id == tool_id, ITPortalTool.is_active == True)
-                    .first()
-                )
+                ticket_tool = get_active_tool_by_id(db, tool_id)
                 if ticket_tool:
                     return ticket_tool
 
     tool_slug = _canonical_tool_slug(payload.tool_slug or "")
     hostname = _normalize_hostname(payload.hostname or payload.page_url)
+    return cached_lookup(
+        db,
+        "extension-tool",
+        (tool_slug, hostname),
+        lambda: _match_extension_tool(get_active_tools(db), tool_slug, hostname),
+    )
 
-    query = db.query(ITPortalTool).filter(ITPortalTool.is_active == True)
-    active_tools = query.all()
+
+def _match_extension_tool(active_tools: list[ITPortalTool], tool_slug: str, hostname: str) -> Optional[ITPortalTool]:
     if tool_slug and tool_slug != "tool":
         for tool in active_tools:
             if _canonical_tool_slug_for_tool(tool) == tool_slug:
@@ -1374,6 +1391,9 @@ OTP_TICKET_TTL_SEC = 600
 _otp_consumed_tickets: dict[str, float] = {}
 AUTH_LINK_MAX_WAIT_SEC = 60
 AUTH_LINK_EMAIL_MAX_AGE_SEC = 300
+# How long /extension/otp-baseline waits for the shared mailbox watcher to
+# log in and read the inbox (services/mailbox_watcher.py).
+MAILBOX_CONNECT_WAIT_SEC = 30
 _auth_link_consumed_tickets: dict[str, float] = {}
 USAGE_TRACKING_TICKET_TTL_SEC = 24 * 60 * 60
 
@@ -2521,6 +2541,7 @@ def create_tool(
     db.flush()
     _add_audit(db, actor_id=current_user.id, action="tool_created", tool_id=tool.id)
     db.commit()
+    invalidate_config_cache()
     db.refresh(tool)
     return {"success": True, "tool": _serialize_tool(tool, is_admin=True)}
 
@@ -2567,6 +2588,7 @@ def update_tool(
 
     _add_audit(db, actor_id=current_user.id, action="tool_updated", tool_id=tool.id)
     db.commit()
+    invalidate_config_cache()
     db.refresh(tool)
     return {"success": True, "tool": _serialize_tool(tool, is_admin=True)}
 
@@ -2590,6 +2612,7 @@ def delete_tool(
 
     _add_audit(db, actor_id=current_user.id, action="tool_deleted", tool_id=tool.id)
     db.commit()
+    invalidate_config_cache()
     return {"success": True}
 
 
@@ -3194,14 +3217,23 @@ async def get_extension_otp_baseline(
     db.close()
 
     try:
-        latest_uid = await asyncio.to_thread(
-            latest_otp_uid_from_gmail,
-            mailbox_entry["email_address"],
-            app_password,
-            mailbox_entry.get("otp_sender_filter"),
-            mailbox_entry.get("otp_subject_pattern"),
-            OTP_EMAIL_MAX_AGE_SEC,
-        )
+        if mailbox_watchers.enabled:
+            # The newest uid in the mailbox, matching or not - /extension/otp
+            # only wants mail that arrives after it.
+            latest_uid = await mailbox_watchers.latest_uid(
+                mailbox_entry["email_address"],
+                app_password,
+                MAILBOX_CONNECT_WAIT_SEC,
+            )
+        else:
+            latest_uid = await asyncio.to_thread(
+                latest_otp_uid_from_gmail,
+                mailbox_entry["email_address"],
+                app_password,
+                mailbox_entry.get("otp_sender_filter"),
+                mailbox_entry.get("otp_subject_pattern"),
+                OTP_EMAIL_MAX_AGE_SEC,
+            )
     except imaplib.IMAP4.error as exc:
         raise HTTPException(
             status_code=502,
@@ -3258,20 +3290,35 @@ async def get_extension_otp(
     db.close()
 
     try:
-        otp = await asyncio.to_thread(
-            fetch_otp_from_gmail,
-            mailbox_entry["email_address"],
-            app_password,
-            mailbox_entry.get("otp_regex") or r"\b(\d{4,8})\b",
-            mailbox_entry.get("otp_sender_filter"),
-            mailbox_entry.get("otp_subject_pattern"),
-            OTP_EMAIL_MAX_AGE_SEC,
-            OTP_EMAIL_SCAN_LIMIT,
-            otp_poll_timeout_sec,
-            OTP_CODE_POLL_INTERVAL_SEC,
-            otp_not_before_dt,
-            payload.otp_after_uid,
-        )
+        if mailbox_watchers.enabled:
+            otp = await mailbox_watchers.wait_for(
+                mailbox_entry["email_address"],
+                app_password,
+                otp_query(
+                    mailbox_entry.get("otp_regex") or r"\b(\d{4,8})\b",
+                    sender_filter=mailbox_entry.get("otp_sender_filter"),
+                    subject_pattern=mailbox_entry.get("otp_subject_pattern"),
+                    max_age_seconds=OTP_EMAIL_MAX_AGE_SEC,
+                    not_before=otp_not_before_dt,
+                    after_uid=payload.otp_after_uid,
+                ),
+                otp_poll_timeout_sec,
+            )
+        else:
+            otp = await asyncio.to_thread(
+                fetch_otp_from_gmail,
+                mailbox_entry["email_address"],
+                app_password,
+                mailbox_entry.get("otp_regex") or r"\b(\d{4,8})\b",
+                mailbox_entry.get("otp_sender_filter"),
+                mailbox_entry.get("otp_subject_pattern"),
+                OTP_EMAIL_MAX_AGE_SEC,
+                OTP_EMAIL_SCAN_LIMIT,
+                otp_poll_timeout_sec,
+                OTP_CODE_POLL_INTERVAL_SEC,
+                otp_not_before_dt,
+                payload.otp_after_uid,
+            )
         last_fetch_error = None
     except imaplib.IMAP4.error as exc:
         raise HTTPException(
@@ -3377,19 +3424,20 @@ async def get_extension_auth_link(
     # transaction the next time the Session is touched.
     tool_id = tool.id
     db.close()
-    for attempt_index in range(attempts):
+    if mailbox_watchers.enabled:
         try:
-            auth_link = await asyncio.to_thread(
-                fetch_auth_link_from_gmail,
+            auth_link = await mailbox_watchers.wait_for(
                 mailbox_entry["email_address"],
                 app_password,
-                mailbox_entry.get("auth_link_pattern"),
-                mailbox_entry.get("auth_link_host"),
-                mailbox_entry.get("otp_sender_filter"),
-                mailbox_entry.get("otp_subject_pattern"),
-                AUTH_LINK_EMAIL_MAX_AGE_SEC,
+                auth_link_query(
+                    mailbox_entry.get("auth_link_pattern"),
+                    mailbox_entry.get("auth_link_host"),
+                    sender_filter=mailbox_entry.get("otp_sender_filter"),
+                    subject_pattern=mailbox_entry.get("otp_subject_pattern"),
+                    max_age_seconds=AUTH_LINK_EMAIL_MAX_AGE_SEC,
+                ),
+                AUTH_LINK_MAX_WAIT_SEC,
             )
-            last_fetch_error = None
         except imaplib.IMAP4.error as exc:
             raise HTTPException(
                 status_code=502,
@@ -3398,12 +3446,34 @@ async def get_extension_auth_link(
         except Exception as exc:
             last_fetch_error = exc
             auth_link = None
+    else:
+        for attempt_index in range(attempts):
+            try:
+                auth_link = await asyncio.to_thread(
+                    fetch_auth_link_from_gmail,
+                    mailbox_entry["email_address"],
+                    app_password,
+                    mailbox_entry.get("auth_link_pattern"),
+                    mailbox_entry.get("auth_link_host"),
+                    mailbox_entry.get("otp_sender_filter"),
+                    mailbox_entry.get("otp_subject_pattern"),
+                    AUTH_LINK_EMAIL_MAX_AGE_SEC,
+                )
+                last_fetch_error = None
+            except imaplib.IMAP4.error as exc:
+                raise HTTPException(
+                    status_code=502,
+                    detail=f"Mailbox login failed for {mailbox_entry['email_address']}. Update the Gmail app password or enable IMAP. ({exc})",
+                ) from exc
+            except Exception as exc:
+                last_fetch_error = exc
+                auth_link = None
+
+            if auth_link:
+                break
 
-        if auth_link:
-            break
-
-        if attempt_index < attempts - 1:
-            await asyncio.sleep(OTP_POLL_INTERVAL_SEC)
+            if attempt_index < attempts - 1:
+                await asyncio.sleep(OTP_POLL_INTERVAL_SEC)
 
     if not auth_link:
         if last_fetch_error is not None:
@@ -3777,6 +3847,7 @@ def upsert_credential(
         },
     )
     db.commit()
+    invalidate_config_cache()
     db.refresh(credential)
     return {"success": True, "credential": _serialize_credential_summary(credential)}
 
@@ -3843,6 +3914,7 @@ def delete_credential(
         },
     )
     db.commit()
+    invalidate_config_cache()
     return {"success": True}
 
 
@@ -30,6 +30,7 @@ from models_new import (
     TaskForward,
     TaskNotification,
     TaskView,
+    TaskVisibility,
     TaskEditLog,
     WebPushSubscription,
     User,
@@ -44,19 +45,34 @@ from task_helpers import TaskHelpers
 from utils.cache import cache_response, invalidate_pattern
 from utils.datetime_utils import normalize_deadline_to_utc_naive, normalize_to_utc_naive, serialize_utc_datetime
 from utils.edge_cache import queue_edge_cache_purge
+from utils.env import int_env
 from utils.generation_gate import resolve_generation_gate_tool
-from utils.task_gate import get_active_tasks_for_user
+from utils.task_gate import get_active_tasks_for_user, invalidate_active_task_ids
+from utils.task_comments import comment_stats_ready, record_task_comment
+from utils.task_cards import load_task_cards, register_task_card_builder, store_rebuilt_task_cards, task_cards_ready
+from utils.task_search import join_task_search, task_search_ready
+from utils.task_views import task_view_buffer
+from utils.task_visibility import (
+    LANE_INBOX,
+    LANE_OUTBOX,
+    LANE_TRACKING,
+    join_task_visibility,
+    task_visibility_ready,
+    visibility_order,
+)
+from services.notification_broadcast import NotificationBroadcast
+from services.notification_collector import collect_notification
+from services.id_allocator_service import next_identifier_candidate
+from services.data_repair_service import RepairRule, register_repair_rule, repair_rule_completed
 from services.role_service import user_role_names
+from services.web_push_service import WebPushSend, web_push_sender
 from routers.it_tools_router import _resolve_usage_event_actor
 
 try:
-    from pywebpush import webpush, WebPushException
+    from pywebpush import webpush
 except ImportError:  # pragma: no cover - optional until dependency is installed in runtime
     webpush = None
 
-    class WebPushException(Exception):
-        response = None
-
 TASK_ALL_CACHE_PATTERN = "cache:tasks_all:*"
 TASK_ASSETS_CACHE_PATTERN = "cache:tasks_assets:*"
 TASK_ASSETS_DIRECTORY_GROUPS_CACHE_PATTERN = "cache:tasks_assets_directory_groups:*"
@@ -80,6 +96,10 @@ EDGE_TASK_CACHE_PATTERNS = (
 
 
 async def invalidate_task_lane_b_cache(*, include_assets: bool = True):
+    # Every task state change (assign/submit/approve/forward/revoke/hold...)
+    # lands here, so this is also where the capture gate's cached
+    # "active task ids per user" is dropped.
+    await asyncio.to_thread(invalidate_active_task_ids)
     await invalidate_pattern(TASK_ALL_CACHE_PATTERN)
     await invalidate_pattern(TASK_UNREAD_CACHE_PATTERN)
     await invalidate_pattern(TASK_INBOX_CACHE_PATTERN)
@@ -118,6 +138,15 @@ class NotificationHub:
             if not self.connections[user_id]:
                 self.connections.pop(user_id, None)
 
+    async def _send_text(self, user_id: int, text: str, timeout: float) -> None:
+        for socket in list(self.connections.get(user_id, set())):
+            try:
+                await asyncio.wait_for(socket.send_text(text), timeout=timeout)
+            except Exception:
+                # A socket that can't take a message in time is as good as
+                # gone; the client reconnects.
+                self.disconnect(user_id, socket)
+
     async def push(self, user_id: int, payload: dict):
         sockets = list(self.connections.get(user_id, set()))
         for socket in sockets:
@@ -127,29 +156,51 @@ class NotificationHub:
                 self.disconnect(user_id, socket)
         await deliver_web_push_notifications(user_id, payload)
 
-
-notification_hub = NotificationHub()
+    async def push_broadcast(self, broadcast: NotificationBroadcast, *, send_timeout: float, push_timeout: float):
+        # Each variant is serialized once and the same text goes to every
+        # local socket of every recipient sharing it; web push runs as one
+        # batch for all recipients instead of one DB round-trip each. The
+        # push batch starts first and on its own timeout, and every socket
+        # gets `send_timeout` concurrently, so one stalled client can't hold
+        # up anyone else's socket message or push.
+        web_push = asyncio.create_task(
+            asyncio.wait_for(deliver_web_push_broadcast(broadcast), timeout=push_timeout)
+        )
+        sends = [
+            self._send_text(user_id, text, send_timeout)
+            for text, user_ids in broadcast.serialized_variants()
+            for user_id in user_ids
+            if user_id in self.connections
+        ]
+        try:
+            await asyncio.gather(*sends)
+        except BaseException:
+            web_push.cancel()
+            raise
+        await web_push
 
 
-def _int_env(name: str, default: int) -> int:
-    raw = (os.getenv(name) or "").strip()
-    if not raw:
-        return default
-    try:
-        return int(raw)
-    except ValueError:
-        return default
+notification_hub = NotificationHub()
 
 
 class NotificationDispatcher:
+    # Queue items are (user_id, payload) for a single recipient, or
+    # (None, NotificationBroadcast) for one payload fanned out to many - a
+    # broadcast takes one slot however many recipients it has.
     def __init__(self, max_queue_size: int = 1000, worker_count: int = 2):
-        self.queue: asyncio.Queue[tuple[int, dict]] = asyncio.Queue(maxsize=max_queue_size)
+        self.queue: asyncio.Queue[tuple[Optional[int], "dict | NotificationBroadcast"]] = asyncio.Queue(maxsize=max_queue_size)
         self.worker_count = max(1, worker_count)
         self._workers: list[asyncio.Task] = []
         self._loop: Optional[asyncio.AbstractEventLoop] = None
         self.dropped = 0
         self.failures = 0
-        self.push_timeout_seconds = max(1, _int_env("NOTIFICATION_PUSH_TIMEOUT_SECONDS", 5))
+        self.broadcasts = 0
+        self.broadcast_recipients = 0
+        self.push_timeout_seconds = max(1, int_env("NOTIFICATION_PUSH_TIMEOUT_SECONDS", 5))
+        self.broadcast_timeout_seconds = max(
+            self.push_timeout_seconds,
+            int_env("NOTIFICATION_BROADCAST_TIMEOUT_SECONDS", 30),
+        )
 
     def start(self) -> None:
         try:
@@ -173,15 +224,15 @@ class NotificationDispatcher:
         if self._workers:
             await asyncio.gather(*self._workers, return_exceptions=True)
         self._workers = []
+        await web_push_sender.aclose()
 
     def _put_nowait(
         self,
-        user_id: int,
-        payload: dict,
+        item: tuple,
         result_future: "concurrent.futures.Future[bool] | None" = None,
     ) -> None:
         try:
-            self.queue.put_nowait((user_id, payload))
+            self.queue.put_nowait(item)
             ok = True
         except asyncio.QueueFull:
             self.dropped += 1
@@ -189,7 +240,7 @@ class NotificationDispatcher:
         if result_future is not None and not result_future.done():
             result_future.set_result(ok)
 
-    def enqueue(self, user_id: int, payload: dict) -> bool:
+    def _enqueue_item(self, item: tuple) -> bool:
         self.start()
         try:
             asyncio.get_running_loop()
@@ -208,7 +259,7 @@ class NotificationDispatcher:
                 return False
             result_future: concurrent.futures.Future = concurrent.futures.Future()
             try:
-                self._loop.call_soon_threadsafe(self._put_nowait, user_id, payload, result_future)
+                self._loop.call_soon_threadsafe(self._put_nowait, item, result_future)
             except RuntimeError:
                 # Loop is closed (e.g. a request thread still finishing work
                 # during process shutdown) - degrade the same way every other
@@ -221,23 +272,105 @@ class NotificationDispatcher:
                 return False
 
         try:
-            self.queue.put_nowait((user_id, payload))
+            self.queue.put_nowait(item)
             return True
         except asyncio.QueueFull:
             self.dropped += 1
             return False
 
+    def enqueue(self, user_id: int, payload: dict) -> bool:
+        return self._enqueue_item((user_id, payload))
+
+    def _put_many_nowait(
+        self,
+        items: list,
+        result_future: "concurrent.futures.Future[list] | None" = None,
+    ) -> list:
+        rejected = []
+        for item in items:
+            try:
+                self.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                rejected.append(item)
+        if result_future is not None and not result_future.done():
+            result_future.set_result(rejected)
+        return rejected
+
+    def enqueue_many(self, items: list) -> list:
+        """Queues (user_id, payload) / (None, NotificationBroadcast) items with
+        a single hop onto the event loop, however many there are. Returns the
+        items that were not queued."""
+        items = list(items)
+        if not items:
+            return []
+        self.start()
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Same cross-thread handoff as _enqueue_item(), once per batch.
+            if self._loop is None:
+                self.dropped += len(items)
+                return items
+            result_future: concurrent.futures.Future = concurrent.futures.Future()
+            try:
+                self._loop.call_soon_threadsafe(self._put_many_nowait, items, result_future)
+            except RuntimeError:
+                self.dropped += len(items)
+                return items
+            try:
+                rejected = result_future.result(timeout=5)
+            except concurrent.futures.TimeoutError:
+                return items
+        else:
+            rejected = self._put_many_nowait(items)
+        for _user_id, payload in items:
+            if isinstance(payload, NotificationBroadcast) and not any(payload is other for _, other in rejected):
+                self.broadcasts += 1
+                self.broadcast_recipients += len(payload.recipient_ids)
+        return rejected
+
+    def can_accept(self, count: int) -> bool:
+        """Best-effort check, from any thread, that `count` items would fit
+        right now: the loop is running and the queue has room."""
+        if self._loop is None or self._loop.is_closed():
+            return False
+        return self.queue.maxsize <= 0 or self.queue.maxsize - self.queue.qsize() >= count
+
+    def enqueue_broadcast(self, broadcast: NotificationBroadcast) -> bool:
+        if not broadcast.recipient_ids:
+            return True
+        queued = self._enqueue_item((None, broadcast))
+        if queued:
+            self.broadcasts += 1
+            self.broadcast_recipients += len(broadcast.recipient_ids)
+        return queued
+
     async def _worker(self) -> None:
         while True:
             user_id, payload = await self.queue.get()
             try:
-                await asyncio.wait_for(
-                    notification_hub.push(user_id, payload),
-                    timeout=self.push_timeout_seconds,
-                )
+                if isinstance(payload, NotificationBroadcast):
+                    await notification_hub.push_broadcast(
+                        payload,
+                        send_timeout=self.push_timeout_seconds,
+                        push_timeout=self.broadcast_timeout_seconds,
+                    )
+                else:
+                    await asyncio.wait_for(
+                        notification_hub.push(user_id, payload),
+                        timeout=self.push_timeout_seconds,
+                    )
             except Exception:
                 self.failures += 1
-                logger.exception("Notification dispatch failed for user_id=%s", user_id)
+                if isinstance(payload, NotificationBroadcast):
+                    logger.exception(
+                        "Notification broadcast failed for event=%s recipients=%s",
+                        payload.event_type,
+                        len(payload.recipient_ids),
+                    )
+                else:
+                    logger.exception("Notification dispatch failed for user_id=%s", user_id)
             finally:
                 self.queue.task_done()
 
@@ -252,12 +385,16 @@ class NotificationDispatcher:
             "running": len(running_workers),
             "stopped": max(0, self.worker_count - len(running_workers)),
             "pushTimeoutSeconds": self.push_timeout_seconds,
+            "broadcasts": self.broadcasts,
+            "broadcastRecipients": self.broadcast_recipients,
+            "broadcastTimeoutSeconds": self.broadcast_timeout_seconds,
+            "webPush": web_push_sender.status(),
         }
 
 
 notification_dispatcher = NotificationDispatcher(
-    max_queue_size=max(100, _int_env("NOTIFICATION_QUEUE_MAX_SIZE", 1000)),
-    worker_count=max(1, _int_env("NOTIFICATION_QUEUE_WORKERS", 2)),
+    max_queue_size=max(100, int_env("NOTIFICATION_QUEUE_MAX_SIZE", 1000)),
+    worker_count=max(1, int_env("NOTIFICATION_QUEUE_WORKERS", 2)),
 )
 logger = logging.getLogger(__name__)
 
@@ -412,136 +549,77 @@ def _serialize_web_push_payload(payload: dict) -> str:
     return json.dumps(notification)
 
 
-def _push_failure_reason(exc: Exception) -> tuple[Optional[int], str]:
-    response = getattr(exc, "response", None)
-    status_code = getattr(response, "status_code", None)
-    body = ""
-    if response is not None:
-        try:
-            body = response.text or ""
-        except Exception:
-            body = ""
-    message = str(exc).strip() or body.strip() or "web push failed"
-    return status_code, message[:500]
-
-
-def _send_single_web_push(endpoint: str, p256dh: str, auth: str, payload_json: str) -> tuple[bool, Optional[int], str]:
-    if not web_push_enabled():
-        return False, None, "web push is not configured"
-
-    try:
-        webpush(
-            subscription_info={
-                "endpoint": endpoint,
-                "keys": {
-                    "p256dh": p256dh,
-                    "auth": auth,
-                },
-            },
-            data=payload_json,
-            vapid_private_key=_web_push_private_key(),
-            vapid_claims={"sub": _web_push_subject()},
-            ttl=30,
-            # ttl above is the push service's message TTL, NOT a socket
-            # timeout. Without this, pywebpush's underlying requests.post has
-            # no timeout at all, so one unresponsive push endpoint pins this
-            # worker thread indefinitely.
-            timeout=_int_env("WEB_PUSH_HTTP_TIMEOUT_SECONDS", 10),
-        )
-        return True, None, ""
-    except WebPushException as exc:
-        status_code, reason = _push_failure_reason(exc)
-        return False, status_code, reason
-    except Exception as exc:  # pragma: no cover - defensive runtime guard
-        return False, None, (str(exc).strip() or "web push failed")[:500]
-
-
-async def deliver_web_push_notifications(user_id: int, payload: dict) -> None:
-    if not web_push_enabled():
-        return
-
-    # Read targets / fan out / write results back, as three phases with NO
-    # database connection held across the network calls in the middle one.
-    # A single session spanning the whole fan-out (the previous shape) kept a
-    # Postgres connection checked out for as long as the slowest push endpoint
-    # took to answer - and pywebpush had no HTTP timeout, so "as long as" could
-    # mean forever. Under NullPool (hosted Supabase pooler, see
-    # database_config.py) each of those is a real connection nobody can reuse.
+def _load_web_push_targets(user_ids: list[int]) -> list[tuple[int, int, str, str, str]]:
+    """(subscription_id, user_id, endpoint, p256dh, auth) for every active
+    subscription of `user_ids`, read in one query on a short-lived session."""
     db = OperationalSessionLocal()
     try:
-        targets = [
-            (row.id, row.endpoint, row.p256dh, row.auth)
+        return [
+            (row.id, row.user_id, row.endpoint, row.p256dh, row.auth)
             for row in db.query(WebPushSubscription)
             .filter(
-                WebPushSubscription.user_id == user_id,
+                WebPushSubscription.user_id.in_(user_ids),
                 WebPushSubscription.is_active == True,
             )
             .all()
         ]
     except Exception:
         db.rollback()
-        return
+        return []
     finally:
         db.close()
 
+
+async def deliver_web_push_notifications(user_id: int, payload: dict) -> None:
+    if not web_push_enabled():
+        return
+
+    # Read targets / fan out / write results back, with NO database
+    # connection held across the network calls in the middle. A single
+    # session spanning the whole fan-out (an earlier shape) kept a Postgres
+    # connection checked out for as long as the slowest push endpoint took to
+    # answer. Under NullPool (hosted Supabase pooler, see database_config.py)
+    # each of those is a real connection nobody can reuse. The write-back is
+    # batched across notifications by services/web_push_service.py.
+    targets = await asyncio.to_thread(_load_web_push_targets, [user_id])
     if not targets:
         return
 
     payload_json = _serialize_web_push_payload(payload)
-    results = await asyncio.gather(
-        *[
-            asyncio.to_thread(
-                _send_single_web_push,
-                endpoint,
-                p256dh,
-                auth,
-                payload_json,
-            )
-            for _subscription_id, endpoint, p256dh, auth in targets
+    await web_push_sender.send_many(
+        [
+            WebPushSend(subscription_id, endpoint, p256dh, auth, payload_json)
+            for subscription_id, _user_id, endpoint, p256dh, auth in targets
         ],
-        return_exceptions=True,
+        vapid_private_key=_web_push_private_key(),
+        vapid_subject=_web_push_subject(),
     )
 
-    outcomes = []
-    for (subscription_id, *_rest), result in zip(targets, results):
-        if isinstance(result, Exception):
-            outcomes.append((subscription_id, False, None, (str(result).strip() or "web push failed")[:500]))
-        else:
-            ok, status_code, reason = result
-            outcomes.append((subscription_id, ok, status_code, reason))
 
-    db = OperationalSessionLocal()
-    try:
-        now = datetime.utcnow()
-        rows_by_id = {
-            row.id: row
-            for row in db.query(WebPushSubscription)
-            .filter(WebPushSubscription.id.in_([outcome[0] for outcome in outcomes]))
-            .all()
-        }
-        for subscription_id, ok, status_code, reason in outcomes:
-            subscription = rows_by_id.get(subscription_id)
-            if subscription is None:
-                # Unsubscribed between the read above and now; nothing to update.
-                continue
-            subscription.updated_at = now
-            if ok:
-                subscription.last_success_at = now
-                subscription.last_failure_at = None
-                subscription.failure_reason = None
-                subscription.is_active = True
-                continue
+async def deliver_web_push_broadcast(broadcast: NotificationBroadcast) -> None:
+    """deliver_web_push_notifications() for every recipient of a broadcast at
+    once: one subscription query and one push payload serialized per
+    variant."""
+    if not web_push_enabled() or not broadcast.recipient_ids:
+        return
 
-            subscription.last_failure_at = now
-            subscription.failure_reason = reason
-            if status_code in {404, 410}:
-                subscription.is_active = False
+    targets = await asyncio.to_thread(_load_web_push_targets, list(broadcast.recipient_ids))
+    if not targets:
+        return
 
-        db.commit()
-    except Exception:
-        db.rollback()
-    finally:
-        db.close()
+    json_by_user: dict[int, str] = {}
+    for payload_json, user_ids in broadcast.serialized_variants(_serialize_web_push_payload):
+        for user_id in user_ids:
+            json_by_user[user_id] = payload_json
+    await web_push_sender.send_many(
+        [
+            WebPushSend(subscription_id, endpoint, p256dh, auth, json_by_user[user_id])
+            for subscription_id, user_id, endpoint, p256dh, auth in targets
+            if user_id in json_by_user
+        ],
+        vapid_private_key=_web_push_private_key(),
+        vapid_subject=_web_push_subject(),
+    )
 
 
 class TaskCreate(BaseModel):
@@ -1598,26 +1676,26 @@ def create_notification(
         meta.setdefault("actorName", actor.name)
         meta.setdefault("actorRole", actor_roles)
         meta.setdefault("actorDepartment", actor.department)
-    db.add(
-        TaskNotification(
-            task_id=task.id,
-            user_id=user_id,
-            event_type=event_type,
-            title=title,
-            message=message,
-            task_number=task.task_number,
-            project_id=task.project_id,
-            metadata_json=meta,
-            created_at=datetime.utcnow(),
-        )
-    )
-    if actor:
-        actor_desc = f"{actor.name} ({', '.join(sorted(role_set(actor)))}, {actor.department or 'N/A'})"
-        meta.setdefault("actorDescription", actor_desc)
-
-    notification_dispatcher.enqueue(
-        user_id,
-        {
+        meta.setdefault("actorDescription", f"{actor.name} ({actor_roles}, {actor.department or 'N/A'})")
+    # Written and pushed when `db` commits (services/notification_collector.py).
+    collect_notification(
+        db,
+        notification_dispatcher,
+        user_id=user_id,
+        event_type=event_type,
+        row={
+            "task_id": task.id,
+            "user_id": user_id,
+            "event_type": event_type,
+            "title": title,
+            "message": message,
+            "task_number": task.task_number,
+            "project_id": task.project_id,
+            "metadata_json": meta,
+            "is_read": False,
+            "created_at": datetime.utcnow(),
+        },
+        payload={
             "eventType": event_type,
             "title": title,
             "message": message,
@@ -1630,16 +1708,16 @@ def create_notification(
 
 
 def post_system_comment(db: Session, task: Task, user_id: int, comment: str, comment_type: str):
-    db.add(
-        TaskComment(
-            task_id=task.id,
-            user_id=user_id,
-            comment=comment,
-            comment_type=comment_type,
-            is_internal=False,
-            created_at=datetime.utcnow(),
-        )
+    new_comment = TaskComment(
+        task_id=task.id,
+        user_id=user_id,
+        comment=comment,
+        comment_type=comment_type,
+        is_internal=False,
+        created_at=datetime.utcnow(),
     )
+    db.add(new_comment)
+    record_task_comment(db, task, new_comment)
 
 
 def mark_seen(db: Session, task_id: int, user_id: int):
@@ -1788,12 +1866,14 @@ def _is_creator_assignee(
     user_id: Optional[int],
     db: Session,
     my_participation: Optional[TaskParticipant] = None,
+    participation_known: bool = False,
 ) -> bool:
     if not task or not user_id or int(user_id) != int(task.creator_id or 0):
         return False
-    if my_participation is not None:
+    if my_participation is not None or participation_known:
         return bool(
-            my_participation.is_active == True
+            my_participation is not None
+            and my_participation.is_active == True
             and my_participation.role == ParticipantRole.ASSIGNEE
         )
     return user_is_participant(task.id, int(user_id), ParticipantRole.ASSIGNEE, db)
@@ -1856,6 +1936,45 @@ def _repair_task_worker_progress_from_history(task: Task, db: Session) -> bool:
     return True
 
 
+# Legacy shapes the three repairs above fix are no longer written by any
+# endpoint. services/data_repair_service.py sweeps them out; once a rule's
+# sweep has completed, read paths stop calling its repair.
+REPAIR_LEGACY_HOD_APPROVAL = "legacy_hod_approval"
+REPAIR_WORKFLOW_SUBMISSION = "workflow_submission"
+REPAIR_WORKER_PROGRESS = "worker_progress_from_history"
+
+register_repair_rule(
+    RepairRule(
+        name=REPAIR_LEGACY_HOD_APPROVAL,
+        description="Non-workflow tasks left FORWARDED/hod_approved with a result become APPROVED.",
+        candidates=lambda: and_(
+            Task.status == TaskStatus.FORWARDED,
+            func.lower(func.trim(Task.workflow_stage)) == "hod_approved",
+        ),
+        repair=lambda task, db: _repair_legacy_hod_approval_if_needed(task),
+    )
+)
+register_repair_rule(
+    RepairRule(
+        name=REPAIR_WORKFLOW_SUBMISSION,
+        description="Workflow tasks submitted through the legacy SPOC path get a stage submission.",
+        candidates=lambda: and_(
+            Task.status == TaskStatus.SUBMITTED,
+            func.lower(func.trim(Task.workflow_stage)) == "submitted_to_spoc",
+        ),
+        repair=lambda task, db: _repair_workflow_submission_if_needed(task, db) is not None,
+    )
+)
+register_repair_rule(
+    RepairRule(
+        name=REPAIR_WORKER_PROGRESS,
+        description="In-progress tasks without worker progress get it rebuilt from status history.",
+        candidates=lambda: Task.status == TaskStatus.IN_PROGRESS,
+        repair=_repair_task_worker_progress_from_history,
+    )
+)
+
+
 def _record_task_worker_submission(
     task: Task,
     current_user: User,
@@ -2050,7 +2169,12 @@ def compute_available_actions(
     user: User,
     db: Session,
     my_participation: Optional[TaskParticipant] = None,
+    *,
+    participation_known: bool = False,
 ) -> List[str]:
+    """`participation_known` says `my_participation` came from a complete
+    load of the viewer's participations, so None means "not a participant"
+    rather than "look it up"."""
     if task.status == TaskStatus.CANCELLED:
         return []
 
@@ -2101,14 +2225,21 @@ def compute_available_actions(
 
     roles = role_set(user)
     actions = ["chat"]
-    if my_participation is not None:
-        is_assignee = (
-            my_participation.is_active == True
+    if my_participation is not None or participation_known:
+        is_assignee = bool(
+            my_participation is not None
+            and my_participation.is_active == True
             and my_participation.role == ParticipantRole.ASSIGNEE
         )
     else:
         is_assignee = user_is_participant(task.id, user.id, ParticipantRole.ASSIGNEE, db)
-    is_creator_assignee = _is_creator_assignee(task, user.id, db, my_participation=my_participation)
+    is_creator_assignee = _is_creator_assignee(
+        task,
+        user.id,
+        db,
+        my_participation=my_participation,
+        participation_known=participation_known,
+    )
 
     if is_held:
         if can_unhold_task(user, task):
@@ -2164,8 +2295,8 @@ def compute_available_actions(
     return deduped
 
 
-def _task_list_loader_options():
-    return (
+def _task_list_loader_options(*, with_relationships: bool = True):
+    columns = (
         load_only(
             Task.id,
             Task.task_number,
@@ -2206,7 +2337,13 @@ def _task_list_loader_options():
             Task.task_edit_locked,
             Task.result_edit_locked,
             Task.is_deleted,
+            Task.comment_count,
+            Task.last_comment_at,
         ),
+    )
+    if not with_relationships:
+        return columns
+    return columns + (
         joinedload(Task.creator).load_only(User.id, User.name, User.department),
         selectinload(Task.participants)
         .load_only(
@@ -2222,6 +2359,12 @@ def _task_list_loader_options():
     )
 
 
+def _task_page_loader_options(db: Session):
+    """Loader options for a task list page: stored cards already carry the
+    creator and participants, so only the task columns are needed then."""
+    return _task_list_loader_options(with_relationships=not task_cards_ready(db))
+
+
 def _workflow_task_loader_options():
     return (
         load_only(
@@ -2338,6 +2481,75 @@ def _serialize_task_workflow_summary(task: Task) -> dict:
     }
 
 
+def _load_viewer_workflow_stages(tasks: List[Task], current_user: User, db: Session) -> dict:
+    workflow_task_ids = [
+        task.id
+        for task in tasks
+        if task.creator_id != current_user.id and _is_workflow_task(task)
+    ]
+    if not workflow_task_ids:
+        return {}
+    workflow_stage_rows = (
+        db.query(TaskStage, TaskStageSubmission)
+        .join(
+            TaskStageAssignee,
+            and_(
+                TaskStageAssignee.stage_id == TaskStage.id,
+                TaskStageAssignee.user_id == current_user.id,
+                TaskStageAssignee.is_active == True,
+                TaskStageAssignee.role == WORKFLOW_ASSIGNEE_ROLE,
+            ),
+        )
+        .outerjoin(
+            TaskStageSubmission,
+            and_(
+                TaskStageSubmission.stage_id == TaskStage.id,
+                TaskStageSubmission.is_current == True,
+            ),
+        )
+        .filter(TaskStage.task_id.in_(workflow_task_ids))
+        .order_by(TaskStage.task_id.asc(), TaskStage.stage_order.asc(), TaskStage.id.asc())
+        .all()
+    )
+    workflow_rows_by_task = defaultdict(list)
+    for stage, current_submission in workflow_stage_rows:
+        workflow_rows_by_task[stage.task_id].append((stage, current_submission))
+    return {
+        task_id: stage_view
+        for task_id, rows in workflow_rows_by_task.items()
+        for stage_view in [_select_workflow_stage_view(rows)]
+        if stage_view
+    }
+
+
+def _load_viewer_participations(task_ids: List[int], current_user: User, db: Session) -> dict:
+    participations_by_task = defaultdict(list)
+    for participation in (
+        db.query(TaskParticipant)
+        .options(
+            load_only(
+                TaskParticipant.id,
+                TaskParticipant.task_id,
+                TaskParticipant.user_id,
+                TaskParticipant.role,
+                TaskParticipant.is_read,
+                TaskParticipant.is_active,
+            )
+        )
+        .filter(
+            TaskParticipant.task_id.in_(task_ids),
+            TaskParticipant.user_id == current_user.id,
+            TaskParticipant.is_active == True,
+        )
+        .all()
+    ):
+        participations_by_task[participation.task_id].append(participation)
+    return {
+        task_id: _select_primary_participation(participations)
+        for task_id, participations in participations_by_task.items()
+    }
+
+
 def build_task_serialization_context(
     tasks: List[Task],
     db: Session,
@@ -2346,7 +2558,10 @@ def build_task_serialization_context(
     include_comment_counts: bool = True,
     include_forward_history: bool = True,
     include_seen_by: bool = True,
+    use_comment_stats: Optional[bool] = None,
 ) -> dict:
+    """`use_comment_stats` None reads tasks.comment_count once the backfill
+    marker is set (utils/task_comments.py); False always counts rows."""
     task_ids = [task.id for task in tasks]
     if not task_ids:
         return {
@@ -2413,15 +2628,28 @@ def build_task_serialization_context(
 
     comment_counts = {}
     if include_comment_counts:
-        comment_counts = {
-            task_id: count
-            for task_id, count in (
-                db.query(TaskComment.task_id, func.count(TaskComment.id))
-                .filter(TaskComment.task_id.in_(task_ids))
-                .group_by(TaskComment.task_id)
-                .all()
+        count_task_ids = task_ids
+        if use_comment_stats is None:
+            use_comment_stats = comment_stats_ready(db)
+        if use_comment_stats:
+            count_task_ids = []
+            for task in tasks:
+                if "comment_count" in inspect(task).unloaded:
+                    count_task_ids.append(task.id)
+                else:
+                    comment_counts[task.id] = task.comment_count or 0
+        if count_task_ids:
+            comment_counts.update(
+                {
+                    task_id: count
+                    for task_id, count in (
+                        db.query(TaskComment.task_id, func.count(TaskComment.id))
+                        .filter(TaskComment.task_id.in_(count_task_ids))
+                        .group_by(TaskComment.task_id)
+                        .all()
+                    )
+                }
             )
-        }
 
     forward_rows = []
     if include_forward_history:
@@ -2491,43 +2719,7 @@ def build_task_serialization_context(
             if primary_participation:
                 my_participation_by_task[task_id] = primary_participation
 
-        workflow_task_ids = [
-            task.id
-            for task in tasks
-            if task.creator_id != current_user.id and _is_workflow_task(task)
-        ]
-        if workflow_task_ids:
-            workflow_stage_rows = (
-                db.query(TaskStage, TaskStageSubmission)
-                .join(
-                    TaskStageAssignee,
-                    and_(
-                        TaskStageAssignee.stage_id == TaskStage.id,
-                        TaskStageAssignee.user_id == current_user.id,
-                        TaskStageAssignee.is_active == True,
-                        TaskStageAssignee.role == WORKFLOW_ASSIGNEE_ROLE,
-                    ),
-                )
-                .outerjoin(
-                    TaskStageSubmission,
-                    and_(
-                        TaskStageSubmission.stage_id == TaskStage.id,
-                        TaskStageSubmission.is_current == True,
-                    ),
-                )
-                .filter(TaskStage.task_id.in_(workflow_task_ids))
-                .order_by(TaskStage.task_id.asc(), TaskStage.stage_order.asc(), TaskStage.id.asc())
-                .all()
-            )
-            workflow_rows_by_task = defaultdict(list)
-            for stage, current_submission in workflow_stage_rows:
-                workflow_rows_by_task[stage.task_id].append((stage, current_submission))
-            viewer_workflow_stage_by_task = {
-                task_id: stage_view
-                for task_id, rows in workflow_rows_by_task.items()
-                for stage_view in [_select_workflow_stage_view(rows)]
-                if stage_view
-            }
+        viewer_workflow_stage_by_task = _load_viewer_workflow_stages(tasks, current_user, db)
 
     return {
         "creators": creators,
@@ -2541,14 +2733,10 @@ def build_task_serialization_context(
     }
 
 
-def serialize_task_with_context(
-    task: Task,
-    db: Session,
-    current_user: Optional[User] = None,
-    context: Optional[dict] = None,
-) -> dict:
+def _serialize_task_card(task: Task, db: Session, context: Optional[dict] = None) -> dict:
+    """The part of a task list entry that is the same for every viewer; this
+    is what utils/task_cards.py stores."""
     has_context = context is not None
-    _repair_task_worker_progress_from_history(task, db)
     task_dict = _serialize_task_list_base(task)
     meta = task.metadata_json or {}
     task_dict["customerName"] = meta.get("customerName")
@@ -2610,12 +2798,15 @@ def serialize_task_with_context(
             }
         )
     task_dict["assignedTo"] = assigned_to
-    task_dict["workerSubmissions"] = _build_worker_submission_summary(task, assigned_to, current_user)
+    task_dict["workerSubmissions"] = _build_worker_submission_summary(task, assigned_to)
 
     comment_counts = (context or {}).get("comment_counts") or {}
     comments_count = comment_counts.get(task.id, 0) if has_context else None
     if not has_context:
-        comments_count = db.query(TaskComment).filter(TaskComment.task_id == task.id).count()
+        if comment_stats_ready(db):
+            comments_count = task.comment_count or 0
+        else:
+            comments_count = db.query(TaskComment).filter(TaskComment.task_id == task.id).count()
 
     forwards_by_task = (context or {}).get("forwards_by_task") or {}
     forwards = forwards_by_task.get(task.id, []) if has_context else None
@@ -2660,6 +2851,7 @@ def serialize_task_with_context(
             # Backward compatibility if migration has not run yet.
             seen_by_rows = []
     task_dict["chatCount"] = comments_count
+    task_dict["lastCommentAt"] = serialize_utc_datetime(task.last_comment_at)
     task_dict["forwardHistory"] = forward_history
     task_dict["lastForwardedBy"] = forward_history[-1]["fromUser"] if forward_history else None
     task_dict["editCount"] = max(0, (task.task_version or 1) - 1)
@@ -2672,12 +2864,69 @@ def serialize_task_with_context(
         }
         for view, user in seen_by_rows
     ]
+    return task_dict
+
+
+def _apply_task_viewer_overlay(
+    task_dict: dict,
+    task: Task,
+    db: Session,
+    current_user: User,
+    *,
+    my_participation: Optional[TaskParticipant],
+    participation_known: bool,
+    viewer_workflow_stage: Optional[dict],
+) -> dict:
+    """Adds the viewer's fields to a task card, in place. Queries nothing
+    when `participation_known` (the viewer's participations were loaded)."""
+    current_user_has_seen = any(
+        seen.get("id") == current_user.id
+        for seen in task_dict.get("seenBy") or []
+    )
+    task_dict["workerSubmissions"] = _build_worker_submission_summary(task, task_dict.get("assignedTo"), current_user)
+    task_dict["isRead"] = bool((my_participation and my_participation.is_read) or current_user_has_seen)
+    task_dict["myRole"] = my_participation.role.value if my_participation else "creator"
+    task_dict["availableActions"] = compute_available_actions(
+        task,
+        current_user,
+        db,
+        my_participation=my_participation,
+        participation_known=participation_known,
+    )
+    task_dict["isCreator"] = current_user.id == task.creator_id
+    task_dict["canEditTask"] = can_edit_task_details(current_user, task)
+    task_dict["canRevokeTask"] = can_revoke_task(current_user, task)
+    task_dict["canHoldTask"] = can_hold_task(current_user, task)
+    task_dict["canUnholdTask"] = can_unhold_task(current_user, task)
+    task_dict["mySystemRoles"] = sorted(list(role_set(current_user)))
+
+    if viewer_workflow_stage and task.status not in {
+        TaskStatus.COMPLETED,
+        TaskStatus.CANCELLED,
+        TaskStatus.REJECTED,
+    }:
+        task_dict["globalStatus"] = task_dict.get("status")
+        task_dict["status"] = viewer_workflow_stage["status"]
+        task_dict["viewerWorkflowStage"] = viewer_workflow_stage
+        if viewer_workflow_stage.get("submittedAt"):
+            task_dict["submittedAt"] = viewer_workflow_stage["submittedAt"]
+        if viewer_workflow_stage.get("submittedBy") is not None:
+            task_dict["submittedBy"] = viewer_workflow_stage["submittedBy"]
+    return task_dict
+
+
+def serialize_task_with_context(
+    task: Task,
+    db: Session,
+    current_user: Optional[User] = None,
+    context: Optional[dict] = None,
+) -> dict:
+    has_context = context is not None
+    if not repair_rule_completed(db, REPAIR_WORKER_PROGRESS):
+        _repair_task_worker_progress_from_history(task, db)
+    task_dict = _serialize_task_card(task, db, context)
 
     if current_user:
-        current_user_has_seen = any(
-            user.id == current_user.id
-            for _view, user in (seen_by_rows or [])
-        )
         my_participation_by_task = (context or {}).get("my_participation_by_task") or {}
         my_participation = my_participation_by_task.get(task.id) if has_context else None
         if not has_context:
@@ -2687,47 +2936,116 @@ def serialize_task_with_context(
                 TaskParticipant.is_active == True,
             ).all()
             my_participation = _select_primary_participation(my_participation_rows)
-        task_dict["isRead"] = bool((my_participation and my_participation.is_read) or current_user_has_seen)
-        task_dict["myRole"] = my_participation.role.value if my_participation else "creator"
-        task_dict["availableActions"] = compute_available_actions(
-            task,
-            current_user,
-            db,
-            my_participation=my_participation,
-        )
-        task_dict["isCreator"] = current_user.id == task.creator_id
-        task_dict["canEditTask"] = can_edit_task_details(current_user, task)
-        task_dict["canRevokeTask"] = can_revoke_task(current_user, task)
-        task_dict["canHoldTask"] = can_hold_task(current_user, task)
-        task_dict["canUnholdTask"] = can_unhold_task(current_user, task)
-        task_dict["mySystemRoles"] = sorted(list(role_set(current_user)))
 
         viewer_workflow_stage_by_task = (context or {}).get("viewer_workflow_stage_by_task") or {}
         viewer_workflow_stage = viewer_workflow_stage_by_task.get(task.id) if has_context else None
         if viewer_workflow_stage is None and not has_context and _is_workflow_task(task):
             viewer_workflow_stage = _get_viewer_workflow_stage_view(task, current_user, db)
-        if viewer_workflow_stage and task.status not in {
-            TaskStatus.COMPLETED,
-            TaskStatus.CANCELLED,
-            TaskStatus.REJECTED,
-        }:
-            task_dict["globalStatus"] = task_dict.get("status")
-            task_dict["status"] = viewer_workflow_stage["status"]
-            task_dict["viewerWorkflowStage"] = viewer_workflow_stage
-            if viewer_workflow_stage.get("submittedAt"):
-                task_dict["submittedAt"] = viewer_workflow_stage["submittedAt"]
-            if viewer_workflow_stage.get("submittedBy") is not None:
-                task_dict["submittedBy"] = viewer_workflow_stage["submittedBy"]
+        _apply_task_viewer_overlay(
+            task_dict,
+            task,
+            db,
+            current_user,
+            my_participation=my_participation,
+            # The context holds every active participant of its tasks.
+            participation_known=True,
+            viewer_workflow_stage=viewer_workflow_stage,
+        )
 
     return task_dict
 
 
+def _build_task_cards(db: Session, task_ids: List[int]) -> dict:
+    """utils/task_cards.py builder: {task_id: (card, task.updated_at)}."""
+    tasks = (
+        db.query(Task)
+        .options(
+            *_task_list_loader_options(),
+            selectinload(Task.stages)
+            .selectinload(TaskStage.assignees)
+            .joinedload(TaskStageAssignee.user)
+            .load_only(User.id, User.name, User.department),
+        )
+        .filter(Task.id.in_(task_ids))
+        # Cards are rebuilt mid-transaction; collections already loaded on
+        # these objects may predate rows added by id.
+        .populate_existing()
+        .all()
+    )
+    # Runs inside the committing transaction (task_cards' before_commit
+    # hook): count the chunk's comments directly rather than consult the
+    # readiness marker, which reads through a connection of its own.
+    context = build_task_serialization_context(tasks, db, use_comment_stats=False)
+    return {task.id: (_serialize_task_card(task, db, context), task.updated_at) for task in tasks}
+
+
+register_task_card_builder(_build_task_cards)
+
+
+def _serialize_task_list_from_cards(tasks: List[Task], db: Session, current_user: Optional[User]) -> List[dict]:
+    """serialize_task_list() over stored cards: one query for the cards, one
+    for the viewer's participations (plus one for workflow stages when the
+    page has workflow tasks the viewer didn't create). Cards that are missing
+    or older than their task are rebuilt in memory and stored for the next
+    read (store_rebuilt_task_cards)."""
+    task_ids = [task.id for task in tasks]
+    stored = load_task_cards(db, task_ids)
+    repair_progress = not repair_rule_completed(db, REPAIR_WORKER_PROGRESS)
+    cards = {}
+    stale = []
+    for task in tasks:
+        if repair_progress:
+            _repair_task_worker_progress_from_history(task, db)
+        card, source_updated_at = stored.get(task.id, (None, None))
+        if card is None or source_updated_at != task.updated_at:
+            stale.append(task)
+        else:
+            cards[task.id] = card
+    if stale:
+        context = build_task_serialization_context(stale, db)
+        for task in stale:
+            cards[task.id] = _serialize_task_card(task, db, context)
+        store_rebuilt_task_cards(db, {task.id: (cards[task.id], task.updated_at) for task in stale})
+
+    my_participation_by_task = {}
+    viewer_workflow_stage_by_task = {}
+    if current_user:
+        my_participation_by_task = _load_viewer_participations(task_ids, current_user, db)
+        viewer_workflow_stage_by_task = _load_viewer_workflow_stages(tasks, current_user, db)
+
+    result = []
+    for task in tasks:
+        task_dict = dict(cards[task.id])
+        # Holds expire with time, not with a write.
+        hold_info = _task_hold_info(task)
+        task_dict["isHeld"] = bool(hold_info.get("active"))
+        task_dict["holdInfo"] = hold_info
+        if current_user:
+            _apply_task_viewer_overlay(
+                task_dict,
+                task,
+                db,
+                current_user,
+                my_participation=my_participation_by_task.get(task.id),
+                participation_known=True,
+                viewer_workflow_stage=viewer_workflow_stage_by_task.get(task.id),
+            )
+        else:
+            task_dict["workerSubmissions"] = _build_worker_submission_summary(task, task_dict.get("assignedTo"))
+        result.append(task_dict)
+    return result
+
+
 def serialize_task_list(
     tasks: List[Task],
     db: Session,
     current_user: Optional[User] = None,
     **context_options,
 ) -> List[dict]:
+    if tasks and task_cards_ready(db):
+        # Cards always carry comment counts, forwards and seen-by, so the
+        # include_* context options have nothing left to save.
+        return _serialize_task_list_from_cards(tasks, db, current_user)
     context = build_task_serialization_context(tasks, db, current_user=current_user, **context_options)
     return [
         serialize_task_with_context(task, db, current_user=current_user, context=context)
@@ -3549,11 +3867,7 @@ def generate_project_id(
     date_part = payload.date or datetime.utcnow().strftime("%Y%m%d")
     prefix = f"PROJ-{to_hex4(payload.project_name)}-{date_part}-{to_hex4(payload.customer_name)}"
 
-    candidate = prefix
-    suffix = 1
-    while db.query(Task).filter(Task.project_id == candidate).first():
-        candidate = f"{prefix}-{suffix:02d}"
-        suffix += 1
+    candidate = next_identifier_candidate(db, Task.project_id, prefix)
 
     raw = f"{payload.project_name}{date_part}{payload.customer_name}"
     raw_hex = hashlib.sha1(raw.encode("utf-8")).hexdigest().upper()[:16]
@@ -3593,11 +3907,7 @@ def generate_task_id(
     project_hex = to_hex4(payload.project_name)
     customer_hex = to_hex4(payload.customer_name)
     prefix = f"TASK-{project_hex}-{date_part}-{customer_hex}"
-    candidate = prefix
-    suffix = 1
-    while db.query(Task).filter(Task.task_number == candidate).first():
-        candidate = f"{prefix}-{suffix:02d}"
-        suffix += 1
+    candidate = next_identifier_candidate(db, Task.task_number, prefix)
 
     return {
         "success": True,
@@ -3661,12 +3971,11 @@ async def create_task(
             date_part = datetime.utcnow().strftime("%Y%m%d")
             task_project_hex = to_hex4(task_data.projectName or task_data.title)
             task_customer_hex = to_hex4(task_data.customerName or current_user.name or "user")
-            candidate = f"TASK-{task_project_hex}-{date_part}-{task_customer_hex}"
-            suffix = 1
-            while db.query(Task).filter(Task.task_number == candidate).first():
-                candidate = f"TASK-{task_project_hex}-{date_part}-{task_customer_hex}-{suffix:02d}"
-                suffix += 1
-            task_data.taskId = candidate
+            task_data.taskId = next_identifier_candidate(
+                db,
+                Task.task_number,
+                f"TASK-{task_project_hex}-{date_part}-{task_customer_hex}",
+            )
 
         initial_assignee_ids = (
             workflow_stage_assignee_ids
@@ -3874,17 +4183,17 @@ def _post_stage_comment(
 ) -> None:
     if not comment:
         return
-    db.add(
-        TaskComment(
-            task_id=task.id,
-            stage_id=stage.id,
-            user_id=user_id,
-            comment=comment,
-            comment_type=comment_type,
-            is_internal=False,
-            created_at=datetime.utcnow(),
-        )
+    new_comment = TaskComment(
+        task_id=task.id,
+        stage_id=stage.id,
+        user_id=user_id,
+        comment=comment,
+        comment_type=comment_type,
+        is_internal=False,
+        created_at=datetime.utcnow(),
     )
+    db.add(new_comment)
+    record_task_comment(db, task, new_comment)
 
 
 def _submit_workflow_stage(
@@ -4294,8 +4603,7 @@ def get_task_workflow(
     if not _is_workflow_task(task):
         raise HTTPException(status_code=400, detail="This task does not use workflow stages")
 
-    repaired_stage = _repair_workflow_submission_if_needed(task, db)
-    if repaired_stage:
+    if not repair_rule_completed(db, REPAIR_WORKFLOW_SUBMISSION) and _repair_workflow_submission_if_needed(task, db):
         db.commit()
         db.refresh(task)
 
@@ -4491,6 +4799,71 @@ async def update_task_stage(
         raise HTTPException(status_code=400, detail=str(exc))
 
 
+def _inbox_tasks_query(db: Session, user_id: int, *, include_read: bool, use_visibility: bool):
+    """Unordered get_inbox() rows for `user_id`: a task_visibility range scan
+    once that table is ready, otherwise the original participant join (which
+    the caller must DISTINCT)."""
+    if use_visibility:
+        # Same rules as below, precomputed per user (utils/task_visibility.py).
+        tasks = join_task_visibility(
+            db.query(Task).options(*_task_page_loader_options(db)),
+            user_id,
+            LANE_INBOX,
+        ).filter(Task.is_deleted == False)
+        if not include_read:
+            tasks = tasks.filter(TaskVisibility.is_read == False)
+    else:
+        review_statuses_for_creator = [
+            TaskStatus.SUBMITTED,
+            TaskStatus.NEED_IMPROVEMENT,
+            TaskStatus.APPROVED,
+            TaskStatus.COMPLETED,
+        ]
+        legacy_hod_approved_for_creator = and_(
+            Task.status == TaskStatus.FORWARDED,
+            Task.workflow_stage == "hod_approved",
+            or_(
+                Task.submitted_at.isnot(None),
+                Task.submitted_by.isnot(None),
+                Task.result_text.isnot(None),
+            ),
+        )
+        tasks = (
+            db.query(Task)
+            .options(*_task_page_loader_options(db))
+            .outerjoin(
+                TaskParticipant,
+                (TaskParticipant.task_id == Task.id) & (TaskParticipant.user_id == user_id),
+            )
+            .filter(
+                Task.is_deleted == False,
+                or_(
+                    # Standard inbox visibility for participants (excluding creator role-only rows)
+                    (
+                        (TaskParticipant.user_id == user_id)
+                        & (TaskParticipant.is_active == True)
+                        & (TaskParticipant.role != ParticipantRole.CREATOR)
+                        & ~(
+                            (TaskParticipant.role == ParticipantRole.HOD)
+                            & (Task.workflow_stage == "pending_creator_hod")
+                        )
+                    ),
+                    # Creator inbox visibility only for review/result states
+                    (
+                        (Task.creator_id == user_id)
+                        & (
+                            Task.status.in_(review_statuses_for_creator)
+                            | legacy_hod_approved_for_creator
+                        )
+                    ),
+                ),
+            )
+        )
+        if not include_read:
+            tasks = tasks.filter(TaskParticipant.is_read == False)
+    return tasks
+
+
 @cache_response(ttl=15, vary_by_user=True, namespace="tasks_inbox")
 def get_inbox(
     request: Request,
@@ -4508,58 +4881,14 @@ def get_inbox(
     profile_enabled = _inbox_profile_logging_enabled()
     started_at = perf_counter()
 
-    review_statuses_for_creator = [
-        TaskStatus.SUBMITTED,
-        TaskStatus.NEED_IMPROVEMENT,
-        TaskStatus.APPROVED,
-        TaskStatus.COMPLETED,
-    ]
-    legacy_hod_approved_for_creator = and_(
-        Task.status == TaskStatus.FORWARDED,
-        Task.workflow_stage == "hod_approved",
-        or_(
-            Task.submitted_at.isnot(None),
-            Task.submitted_by.isnot(None),
-            Task.result_text.isnot(None),
-        ),
-    )
-    tasks = (
-        db.query(Task)
-        .options(*_task_list_loader_options())
-        .outerjoin(
-            TaskParticipant,
-            (TaskParticipant.task_id == Task.id) & (TaskParticipant.user_id == current_user.id),
-        )
-        .filter(
-            Task.is_deleted == False,
-            or_(
-                # Standard inbox visibility for participants (excluding creator role-only rows)
-                (
-                    (TaskParticipant.user_id == current_user.id)
-                    & (TaskParticipant.is_active == True)
-                    & (TaskParticipant.role != ParticipantRole.CREATOR)
-                    & ~(
-                        (TaskParticipant.role == ParticipantRole.HOD)
-                        & (Task.workflow_stage == "pending_creator_hod")
-                    )
-                ),
-                # Creator inbox visibility only for review/result states
-                (
-                    (Task.creator_id == current_user.id)
-                    & (
-                        Task.status.in_(review_statuses_for_creator)
-                        | legacy_hod_approved_for_creator
-                    )
-                ),
-            ),
-        )
-    )
+    use_visibility = task_visibility_ready(db)
+    tasks = _inbox_tasks_query(db, current_user.id, include_read=include_read, use_visibility=use_visibility)
 
-    if not include_read:
-        tasks = tasks.filter(TaskParticipant.is_read == False)
     if status:
         tasks = tasks.filter(Task.status == status)
-    if q:
+    if q and task_search_ready(db):
+        tasks = join_task_search(tasks, q)
+    elif q:
         like_q = f"%{q}%"
         tasks = tasks.filter(
             or_(
@@ -4570,10 +4899,12 @@ def get_inbox(
             )
         )
 
+    if use_visibility:
+        tasks = tasks.order_by(*visibility_order())
+    else:
+        tasks = tasks.distinct().order_by(Task.updated_at.desc())
     task_rows = (
-        tasks.distinct()
-        .order_by(Task.updated_at.desc())
-        .offset(page * limit)
+        tasks.offset(page * limit)
         .limit(limit + 1)
         .all()
     )
@@ -4586,10 +4917,12 @@ def get_inbox(
     # dedicated action endpoint when the user explicitly opens a task.
     write_ms = 0.0
     repaired_any = False
+    repair_workflow = not repair_rule_completed(db, REPAIR_WORKFLOW_SUBMISSION)
+    repair_hod = not repair_rule_completed(db, REPAIR_LEGACY_HOD_APPROVAL)
     for task in task_rows:
-        if _repair_workflow_submission_if_needed(task, db):
+        if repair_workflow and _repair_workflow_submission_if_needed(task, db):
             repaired_any = True
-        if _repair_legacy_hod_approval_if_needed(task):
+        if repair_hod and _repair_legacy_hod_approval_if_needed(task):
             repaired_any = True
     if repaired_any:
         db.commit()
@@ -4635,14 +4968,21 @@ def get_outbox(
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    query = db.query(Task).options(*_task_list_loader_options()).filter(
-        Task.is_deleted == False,
-        or_(
-            Task.creator_id == current_user.id,
-            Task.submitted_by == current_user.id,
-        ),
-    )
-    if q:
+    use_visibility = task_visibility_ready(db)
+    query = db.query(Task).options(*_task_page_loader_options(db))
+    if use_visibility:
+        query = join_task_visibility(query, current_user.id, LANE_OUTBOX).filter(Task.is_deleted == False)
+    else:
+        query = query.filter(
+            Task.is_deleted == False,
+            or_(
+                Task.creator_id == current_user.id,
+                Task.submitted_by == current_user.id,
+            ),
+        )
+    if q and task_search_ready(db):
+        query = join_task_search(query, q)
+    elif q:
         like_q = f"%{q}%"
         query = query.filter(
             or_(
@@ -4653,7 +4993,7 @@ def get_outbox(
         )
 
     tasks = (
-        query.order_by(Task.updated_at.desc())
+        query.order_by(*(visibility_order() if use_visibility else (Task.updated_at.desc(),)))
         .offset(page * limit)
         .limit(limit + 1)
         .all()
@@ -4662,9 +5002,10 @@ def get_outbox(
     if has_more:
         tasks = tasks[:limit]
     repaired_any = False
-    for task in tasks:
-        if _repair_legacy_hod_approval_if_needed(task):
-            repaired_any = True
+    if not repair_rule_completed(db, REPAIR_LEGACY_HOD_APPROVAL):
+        for task in tasks:
+            if _repair_legacy_hod_approval_if_needed(task):
+                repaired_any = True
     if repaired_any:
         db.commit()
     return {
@@ -4735,37 +5076,22 @@ def get_my_active_tasks_for_generation(
     }
 
 
-@cache_response(ttl=60, vary_by_user=True, namespace="tasks_all")
-def get_all_user_tasks(
-    request: Request,
-    status: Optional[str] = Query(None),
-    q: Optional[str] = Query(None),
-    task_id: Optional[str] = Query(None),
-    project_id: Optional[str] = Query(None),
-    user_id: Optional[int] = Query(None),
-    page: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=50),
-    db: Session = Depends(get_operational_db),
-    current_user: User = Depends(get_current_user_from_session),
-):
-    if not current_user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-
-    scoped_user_id = user_id if user_id is not None else current_user.id
-    if user_id is not None and user_id != current_user.id and not has_any_role(current_user, {"super_admin", "hod", "faculty"}):
-        raise HTTPException(status_code=403, detail="Permission denied")
-    scoped_user = current_user
-    if scoped_user_id != current_user.id:
-        scoped_user = db.query(User).filter(User.id == scoped_user_id).first()
-        if not scoped_user:
-            raise HTTPException(status_code=404, detail="User not found")
+def _all_user_tasks_query(db: Session, scoped_user_id: int, *, use_visibility: bool):
+    """Unordered get_all_user_tasks() rows for `scoped_user_id`, from
+    task_visibility once it is ready, else the original joins."""
+    if use_visibility:
+        return join_task_visibility(
+            db.query(Task).options(*_task_page_loader_options(db)),
+            scoped_user_id,
+            LANE_TRACKING,
+        ).filter(Task.is_deleted == False)
 
     tracking_participant = aliased(TaskParticipant)
     scoped_stage = aliased(TaskStage)
     scoped_stage_assignee = aliased(TaskStageAssignee)
-    query = (
+    return (
         db.query(Task)
-        .options(*_task_list_loader_options())
+        .options(*_task_page_loader_options(db))
         .outerjoin(
             tracking_participant,
             and_(
@@ -4797,21 +5123,62 @@ def get_all_user_tasks(
         .distinct()
     )
 
+
+@cache_response(ttl=60, vary_by_user=True, namespace="tasks_all")
+def get_all_user_tasks(
+    request: Request,
+    status: Optional[str] = Query(None),
+    q: Optional[str] = Query(None),
+    task_id: Optional[str] = Query(None),
+    project_id: Optional[str] = Query(None),
+    user_id: Optional[int] = Query(None),
+    page: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=50),
+    db: Session = Depends(get_operational_db),
+    current_user: User = Depends(get_current_user_from_session),
+):
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    scoped_user_id = user_id if user_id is not None else current_user.id
+    if user_id is not None and user_id != current_user.id and not has_any_role(current_user, {"super_admin", "hod", "faculty"}):
+        raise HTTPException(status_code=403, detail="Permission denied")
+    scoped_user = current_user
+    if scoped_user_id != current_user.id:
+        scoped_user = db.query(User).filter(User.id == scoped_user_id).first()
+        if not scoped_user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+    use_visibility = task_visibility_ready(db)
+    query = _all_user_tasks_query(db, scoped_user_id, use_visibility=use_visibility)
+
     if status:
         query = query.filter(Task.status == status)
     if task_id:
         query = query.filter(Task.task_number.ilike(f"%{task_id}%"))
     if project_id:
         query = query.filter(Task.project_id.ilike(f"%{project_id}%"))
-    if q:
+    if q and task_search_ready(db):
+        query = join_task_search(query, q)
+    elif q:
         like_q = f"%{q}%"
         creator_user = aliased(User)
         search_participant = aliased(TaskParticipant)
         participant_user = aliased(User)
+        # EXISTS rather than joining every participant: no row fan-out, so
+        # the visibility path keeps its index order without a DISTINCT.
+        # Only used until task_search_documents is backfilled.
+        participant_name_match = (
+            db.query(search_participant.id)
+            .join(participant_user, participant_user.id == search_participant.user_id)
+            .filter(
+                search_participant.task_id == Task.id,
+                participant_user.name.ilike(like_q),
+            )
+            .exists()
+        )
         query = (
             query.join(creator_user, creator_user.id == Task.creator_id)
-            .outerjoin(search_participant, search_participant.task_id == Task.id)
-            .outerjoin(participant_user, participant_user.id == search_participant.user_id)
             .filter(
                 or_(
                     Task.title.ilike(like_q),
@@ -4822,14 +5189,13 @@ def get_all_user_tasks(
                     Task.from_department.ilike(like_q),
                     Task.to_department.ilike(like_q),
                     creator_user.name.ilike(like_q),
-                    participant_user.name.ilike(like_q),
+                    participant_name_match,
                 )
             )
-            .distinct()
         )
 
     tasks = (
-        query.order_by(Task.updated_at.desc())
+        query.order_by(*(visibility_order() if use_visibility else (Task.updated_at.desc(),)))
         .offset(page * limit)
         .limit(limit + 1)
         .all()
@@ -4838,9 +5204,10 @@ def get_all_user_tasks(
     if has_more:
         tasks = tasks[:limit]
     repaired_any = False
-    for task in tasks:
-        if _repair_legacy_hod_approval_if_needed(task):
-            repaired_any = True
+    if not repair_rule_completed(db, REPAIR_LEGACY_HOD_APPROVAL):
+        for task in tasks:
+            if _repair_legacy_hod_approval_if_needed(task):
+                repaired_any = True
     if repaired_any:
         db.commit()
     return {
@@ -4857,22 +5224,35 @@ def get_all_user_tasks(
 def get_task_reference_suggestions(
     request: Request,
     limit: int = Query(300, ge=50, le=500),
+    q: Optional[str] = Query(None),
     db: Session = Depends(get_operational_db),
     current_user: User = Depends(get_current_user_from_session),
 ):
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    rows = (
-        db.query(
-            Task.task_number,
-            Task.project_id,
-            Task.project_id_raw,
-            Task.project_id_hex,
-            Task.project_name,
+    query = db.query(
+        Task.task_number,
+        Task.project_id,
+        Task.project_id_raw,
+        Task.project_id_hex,
+        Task.project_name,
+    ).filter(Task.is_deleted == False)
+    # `q` narrows suggestions to tasks matching what has been typed so far,
+    # instead of the client filtering the newest few hundred.
+    if q and task_search_ready(db):
+        query = join_task_search(query, q)
+    elif q:
+        like_q = f"%{q}%"
+        query = query.filter(
+            or_(
+                Task.task_number.ilike(like_q),
+                Task.project_id.ilike(like_q),
+                Task.project_name.ilike(like_q),
+            )
         )
-        .filter(Task.is_deleted == False)
-        .order_by(Task.updated_at.desc())
+    rows = (
+        query.order_by(Task.updated_at.desc())
         .limit(max(limit * 4, 200))
         .all()
     )
@@ -5226,12 +5606,11 @@ async def assign_task_members(
         date_part = datetime.utcnow().strftime("%Y%m%d")
         project_hex = to_hex4(task.project_name or task.title)
         customer_hex = to_hex4(((task.metadata_json or {}).get("customerName")) or (task.to_department or "dept"))
-        candidate = f"TASK-{project_hex}-{date_part}-{customer_hex}"
-        suffix = 1
-        while db.query(Task).filter(Task.task_number == candidate).first():
-            candidate = f"TASK-{project_hex}-{date_part}-{customer_hex}-{suffix:02d}"
-            suffix += 1
-        task.task_number = candidate
+        task.task_number = next_identifier_candidate(
+            db,
+            Task.task_number,
+            f"TASK-{project_hex}-{date_part}-{customer_hex}",
+        )
         task.task_id_project_hex = project_hex
         task.task_id_customer_hex = customer_hex
 
@@ -6708,6 +7087,7 @@ def add_comment(
         created_at=datetime.utcnow(),
     )
     db.add(new_comment)
+    record_task_comment(db, task, new_comment)
     try:
         mark_seen(db, task.id, current_user.id)
     except SQLAlchemyError:
@@ -6785,14 +7165,21 @@ def get_comments(
     task_id: int,
     page: int = Query(1, ge=1),
     page_size: int = Query(40, ge=1, le=100),
+    before_id: Optional[int] = Query(None, ge=1),
+    after_id: Optional[int] = Query(None, ge=1),
     include_history: bool = Query(False),
     include_seen_by: bool = Query(True),
     include_total: bool = Query(False),
     db: Session = Depends(get_operational_db),
     current_user: User = Depends(get_current_user_from_session),
 ):
+    """A task's thread, oldest first. `before_id`/`after_id` page by keyset
+    from a comment the client already has (the page_size comments just
+    before/after it); without them `page` pages by offset as before."""
     if not current_user:
         raise HTTPException(status_code=401, detail="Not authenticated")
+    if before_id is not None and after_id is not None:
+        raise HTTPException(status_code=400, detail="Use either before_id or after_id, not both")
 
     task = db.query(Task).filter(Task.id == task_id, Task.is_deleted == False).first()
     if not task:
@@ -6801,26 +7188,67 @@ def get_comments(
     if current_user.id != task.creator_id and not user_is_participant(task.id, current_user.id, None, db):
         raise HTTPException(status_code=403, detail="Permission denied")
 
-    try:
-        mark_seen(db, task.id, current_user.id)
-    except SQLAlchemyError:
-        pass
+    # Buffered; written by main.py's task view flush (utils/task_views.py).
+    wrote_view = False
+    if not task_view_buffer.mark(task.id, current_user.id):
+        try:
+            mark_seen(db, task.id, current_user.id)
+            wrote_view = True
+        except SQLAlchemyError:
+            pass
 
     comments_query = (
         db.query(TaskComment, User)
         .join(User, User.id == TaskComment.user_id)
         .filter(TaskComment.task_id == task_id)
-        .order_by(TaskComment.created_at.asc(), TaskComment.id.asc())
     )
+    cursor_id = before_id if before_id is not None else after_id
+    if cursor_id is not None:
+        anchor = (
+            db.query(TaskComment.created_at, TaskComment.id)
+            .filter(TaskComment.id == cursor_id, TaskComment.task_id == task_id)
+            .first()
+        )
+        if not anchor:
+            raise HTTPException(status_code=400, detail="Comment cursor not found on this task")
+        if before_id is not None:
+            comments_query = comments_query.filter(
+                or_(
+                    TaskComment.created_at < anchor.created_at,
+                    and_(TaskComment.created_at == anchor.created_at, TaskComment.id < anchor.id),
+                )
+            ).order_by(TaskComment.created_at.desc(), TaskComment.id.desc())
+        else:
+            comments_query = comments_query.filter(
+                or_(
+                    TaskComment.created_at > anchor.created_at,
+                    and_(TaskComment.created_at == anchor.created_at, TaskComment.id > anchor.id),
+                )
+            ).order_by(TaskComment.created_at.asc(), TaskComment.id.asc())
+        comment_rows = comments_query.limit(page_size + 1).all()
+    else:
+        comment_rows = (
+            comments_query.order_by(TaskComment.created_at.asc(), TaskComment.id.asc())
+            .offset((page - 1) * page_size)
+            .limit(page_size + 1)
+            .all()
+        )
+    has_more = len(comment_rows) > page_size
+    comment_rows = comment_rows[:page_size]
+    if before_id is not None:
+        comment_rows.reverse()
+
     total_comments = None
     if include_total:
-        total_comments = (
-            db.query(func.count(TaskComment.id))
-            .filter(TaskComment.task_id == task_id)
-            .scalar()
-            or 0
-        )
-    comment_rows = comments_query.offset((page - 1) * page_size).limit(page_size).all()
+        if comment_stats_ready(db):
+            total_comments = task.comment_count or 0
+        else:
+            total_comments = (
+                db.query(func.count(TaskComment.id))
+                .filter(TaskComment.task_id == task_id)
+                .scalar()
+                or 0
+            )
 
     response = [
         {
@@ -6866,7 +7294,35 @@ def get_comments(
                 user.id: user
                 for user in db.query(User).filter(User.id.in_(history_user_ids)).all()
             }
-    db.commit()
+    if wrote_view:
+        db.commit()
+
+    seen_by = [
+        {
+            "id": user.id,
+            "name": user.name,
+            "role": ", ".join(sorted(role_set(user))),
+            "department": user.department,
+            "seenAt": serialize_utc_datetime(view.seen_at),
+        }
+        for view, user in seen_by_rows
+    ]
+    pending_seen_at = task_view_buffer.pending_seen_at(task.id, current_user.id)
+    if include_seen_by and pending_seen_at is not None:
+        # The viewer's own visit may not be flushed yet.
+        mine = [entry for entry in seen_by if entry["id"] == current_user.id]
+        for entry in mine:
+            entry["seenAt"] = serialize_utc_datetime(pending_seen_at)
+        if not mine:
+            seen_by.append(
+                {
+                    "id": current_user.id,
+                    "name": current_user.name,
+                    "role": ", ".join(sorted(role_set(current_user))),
+                    "department": current_user.department,
+                    "seenAt": serialize_utc_datetime(pending_seen_at),
+                }
+            )
 
     return {
         "success": True,
@@ -6878,9 +7334,15 @@ def get_comments(
         },
         "comments": response,
         "pagination": {
-            "page": page,
+            "page": page if cursor_id is None else None,
             "pageSize": page_size,
             "total": total_comments,
+            "beforeId": before_id,
+            "afterId": after_id,
+            # More comments past this page, in the direction paged.
+            "hasMore": has_more,
+            "firstId": response[0]["id"] if response else None,
+            "lastId": response[-1]["id"] if response else None,
         },
         "history": [
             {
@@ -6899,16 +7361,7 @@ def get_comments(
             for h in history_rows
             for editor in [history_user_lookup.get(h.user_id)]
         ],
-        "seenBy": [
-            {
-                "id": user.id,
-                "name": user.name,
-                "role": ", ".join(sorted(role_set(user))),
-                "department": user.department,
-                "seenAt": serialize_utc_datetime(view.seen_at),
-            }
-            for view, user in seen_by_rows
-        ],
+        "seenBy": seen_by,
     }
 
 
@@ -11,8 +11,6 @@ from pathlib import Path
 from typing import List, Optional
 from urllib.parse import unquote, urlparse
 
-import boto3
-from botocore.config import Config as BotoConfig
 from botocore.exceptions import BotoCoreError, ClientError
 from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
 from fastapi.responses import RedirectResponse, StreamingResponse
@@ -20,6 +18,7 @@ from pydantic import BaseModel, Field
 
 from models_new import User
 from routers.auth_router import get_current_user
+from utils import r2_storage
 
 try:
     from PIL import Image, UnidentifiedImageError
@@ -66,70 +65,12 @@ def _env(name: str, default: Optional[str] = None) -> Optional[str]:
     return value or default
 
 
-def _int_env(name: str, default: int) -> int:
-    try:
-        return int((_env(name) or "").strip())
-    except (TypeError, ValueError):
-        return default
-
-
 def _is_r2_configured() -> bool:
-    endpoint = _env("R2_ENDPOINT")
-    access_key = _env("R2_ACCESS_KEY")
-    secret_key = _env("R2_SECRET_KEY")
-    bucket = _env("R2_BUCKET")
-    values = [endpoint, access_key, secret_key, bucket]
-    return all(values)
-
-
-def _r2_client_config():
-    """Bounds how long a single R2 call can block.
-
-    botocore's defaults are 60s connect + 60s read with legacy retries (5
-    attempts), so one stalled put_object can occupy its caller for minutes.
-    That matters beyond slow uploads: several capture endpoints used to hold a
-    database session across this call, which turned a slow R2 into parked
-    Postgres connections. The session holds are fixed at the call sites, but an
-    unbounded storage call is worth capping regardless - a request thread is
-    also a finite resource.
-
-    read_timeout is per socket read, not for the whole transfer, so a large
-    multipart upload is not penalised by a value this size.
-    """
-    return BotoConfig(
-        connect_timeout=_int_env("R2_CONNECT_TIMEOUT_SECONDS", 10),
-        read_timeout=_int_env("R2_READ_TIMEOUT_SECONDS", 60),
-        retries={"max_attempts": _int_env("R2_MAX_ATTEMPTS", 3), "mode": "standard"},
-    )
-
-
-def _build_r2_client():
-    return boto3.client(
-        "s3",
-        endpoint_url=_env("R2_ENDPOINT"),
-        aws_access_key_id=_env("R2_ACCESS_KEY"),
-        aws_secret_access_key=_env("R2_SECRET_KEY"),
-        region_name=_env("R2_REGION", "auto"),
-        config=_r2_client_config(),
-    )
-
-
-def _multipart_part_size_bytes() -> int:
-    raw_value = _env("R2_MULTIPART_PART_SIZE_MB", "24") or "24"
-    try:
-        megabytes = max(5, int(raw_value))
-    except ValueError:
-        megabytes = 24
-    return megabytes * 1024 * 1024
+    return r2_storage.is_configured()
 
 
 def _build_public_url(key: str) -> str:
-    public_base = _env("R2_PUBLIC_BASE_URL")
-    if public_base:
-        return f"{public_base.rstrip('/')}/{key}"
-    endpoint = _env("R2_ENDPOINT", "") or ""
-    bucket = _env("R2_BUCKET", "") or ""
-    return f"{endpoint.rstrip('/')}/{bucket}/{key}"
+    return r2_storage.build_public_url(key)
 
 
 def _normalized_content_type(content_type: Optional[str]) -> str:
@@ -140,7 +81,7 @@ def _normalized_content_type(content_type: Optional[str]) -> str:
 def _should_use_multipart(size: Optional[int]) -> bool:
     if size is None:
         return False
-    return size >= _multipart_part_size_bytes()
+    return size >= r2_storage.multipart_part_size_bytes()
 
 
 def _multipart_part_count(size: int, part_size: int) -> int:
@@ -348,23 +289,9 @@ def _upload_to_r2(file: UploadFile, timestamp_ms: int, relative_path: Optional[s
         size=getattr(file, "size", None),
         relative_path=relative_path,
     )
-    client = _build_r2_client()
-
     file.file.seek(0)
-    extra_args = {}
-    if attachment["mimetype"]:
-        extra_args["ContentType"] = attachment["mimetype"]
-
-    upload_kwargs = {}
-    if extra_args:
-        upload_kwargs["ExtraArgs"] = extra_args
-
-    client.upload_fileobj(
-        file.file,
-        _env("R2_BUCKET"),
-        key,
-        **upload_kwargs,
-    )
+    # Past the multipart threshold the parts go up concurrently.
+    r2_storage.upload_fileobj(key, file.file, content_type=attachment["mimetype"] or None)
 
     return attachment
 
@@ -380,9 +307,9 @@ def create_presigned_uploads(
             raise HTTPException(status_code=500, detail="R2 is not configured on server")
 
         batch_timestamp = int(time.time() * 1000)
-        client = _build_r2_client()
+        client = r2_storage.get_client()
         upload_targets = []
-        multipart_part_size = _multipart_part_size_bytes()
+        multipart_part_size = r2_storage.multipart_part_size_bytes()
 
         for file in payload.files:
             key, attachment = _build_attachment_record(
@@ -469,7 +396,7 @@ def complete_multipart_upload(
         if not _is_r2_configured():
             raise HTTPException(status_code=500, detail="R2 is not configured on server")
 
-        client = _build_r2_client()
+        client = r2_storage.get_client()
         normalized_parts = [
             {
                 "PartNumber": part.partNumber,
@@ -505,7 +432,7 @@ def abort_multipart_upload(
         if not _is_r2_configured():
             raise HTTPException(status_code=500, detail="R2 is not configured on server")
 
-        client = _build_r2_client()
+        client = r2_storage.get_client()
         client.abort_multipart_upload(
             Bucket=_env("R2_BUCKET"),
             Key=payload.key.strip(),
@@ -577,12 +504,7 @@ def open_file(
     r2_key = _extract_r2_key(path, url)
     if r2_key:
         try:
-            client = _build_r2_client()
-            signed_url = client.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": _env("R2_BUCKET"), "Key": r2_key},
-                ExpiresIn=600,
-            )
+            signed_url = r2_storage.generate_presigned_url(r2_key, expires_in=600)
             return RedirectResponse(url=signed_url, status_code=307)
         except (ClientError, BotoCoreError) as exc:
             raise HTTPException(status_code=500, detail=f"Unable to open R2 file: {exc}") from exc
@@ -609,17 +531,13 @@ def thumbnail_file(
             return RedirectResponse(url=url, status_code=307)
         raise HTTPException(status_code=404, detail="File not found")
 
-    client = _build_r2_client()
+    client = r2_storage.get_client()
     bucket = _env("R2_BUCKET")
     cache_key = _thumbnail_cache_key(r2_key, width)
 
     try:
         client.head_object(Bucket=bucket, Key=cache_key)
-        signed_url = client.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": bucket, "Key": cache_key},
-            ExpiresIn=600,
-        )
+        signed_url = r2_storage.generate_presigned_url(cache_key, expires_in=600)
         return RedirectResponse(url=signed_url, status_code=307)
     except ClientError as exc:
         status_code = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
@@ -666,7 +584,7 @@ def download_file(
     r2_key = _extract_r2_key(path, url)
     if r2_key:
         try:
-            client = _build_r2_client()
+            client = r2_storage.get_client()
             obj = client.get_object(Bucket=_env("R2_BUCKET"), Key=r2_key)
             content_type = obj.get("ContentType") or "application/octet-stream"
             body = obj["Body"]
@@ -704,13 +622,14 @@ def download_folder(
         raise HTTPException(status_code=404, detail="Folder files not found")
 
     try:
-        client = _build_r2_client()
+        # Fetched concurrently over the shared client's pool rather than one
+        # round-trip after another.
+        contents = r2_storage.get_objects_bytes([r2_key for r2_key, _archive_name in normalized_items])
         zip_buffer = io.BytesIO()
         seen_names = set()
 
         with zipfile.ZipFile(zip_buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as zip_file:
-            for r2_key, archive_name in normalized_items:
-                obj = client.get_object(Bucket=_env("R2_BUCKET"), Key=r2_key)
+            for (_r2_key, archive_name), body in zip(normalized_items, contents):
                 entry_name = archive_name
                 if entry_name in seen_names:
                     stem = Path(entry_name).stem
@@ -720,7 +639,7 @@ def download_folder(
                         counter += 1
                     entry_name = f"{stem}_{counter}{suffix}"
                 seen_names.add(entry_name)
-                zip_file.writestr(entry_name, obj["Body"].read())
+                zip_file.writestr(entry_name, body)
 
         zip_buffer.seek(0)
         folder_name = _safe_filename(name or "folder")
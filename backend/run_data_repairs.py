@@ -0,0 +1,113 @@
+import argparse
+import json
+import logging
+
+from database_config import OperationalSessionLocal
+from services.data_repair_service import get_repair_rules, run_repair_rule
+
+# Registers the task repair rules next to the functions they wrap.
+import routers.tasks_router  # noqa: F401
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Sweep legacy task data with the registered repair rules. Dry run by "
+            "default; with --apply, a finished sweep switches the rule's read-path "
+            "repair off."
+        )
+    )
+    parser.add_argument(
+        "--rule",
+        action="append",
+        default=[],
+        help="Repair rule to run (repeatable). Defaults to every registered rule.",
+    )
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="Commit repairs and checkpoints instead of rolling each batch back.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=200,
+        help="Number of candidate tasks to repair per transaction.",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore a saved checkpoint and sweep from the first task.",
+    )
+    parser.add_argument(
+        "--max-tasks",
+        type=int,
+        default=None,
+        help="Stop each rule after this many candidates; the checkpoint keeps the place.",
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="List the registered rules and exit.",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logger verbosity for the repair run.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    logging.basicConfig(
+        level=getattr(logging, args.log_level.upper(), logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+    )
+    logger = logging.getLogger("data_repairs")
+    rules = get_repair_rules()
+    if args.list:
+        print(json.dumps([{"name": rule.name, "description": rule.description} for rule in rules], indent=2))
+        return 0
+    names = args.rule or [rule.name for rule in rules]
+
+    def log_progress(progress) -> None:
+        logger.info(
+            "%s %s: scanned=%s repaired=%s last_task_id=%s rate=%s/s eta=%ss",
+            progress.rule,
+            progress.mode,
+            progress.scanned,
+            progress.repaired,
+            progress.last_task_id,
+            progress.tasks_per_second,
+            progress.eta_seconds,
+        )
+
+    session = OperationalSessionLocal()
+    summaries = []
+    try:
+        for name in names:
+            logger.info("Starting repair rule %s apply=%s batch_size=%s", name, args.apply, args.batch_size)
+            progress = run_repair_rule(
+                session,
+                name,
+                apply=args.apply,
+                batch_size=max(1, args.batch_size),
+                resume=not args.restart,
+                max_tasks=args.max_tasks,
+                on_progress=log_progress,
+            )
+            summaries.append(progress.to_dict())
+        print(json.dumps(summaries, indent=2, sort_keys=True))
+        return 0
+    except Exception as exc:
+        session.rollback()
+        logger.exception("Data repair failed: %s", exc)
+        return 1
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
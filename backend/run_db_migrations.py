@@ -2,7 +2,7 @@ import importlib
 import traceback
 
 from database_config import archive_engine, operational_engine
-from db_migrations import ensure_operational_schema
+from db_migrations import ensure_archive_schema, ensure_operational_schema
 from models_new import ArchiveBase, Base
 
 
@@ -82,6 +82,9 @@ def main() -> int:
             _safe_print("Creating archive model tables...")
             ArchiveBase.metadata.create_all(bind=archive_engine)
 
+        _safe_print("Applying archive schema migration fixes...")
+        ensure_archive_schema(archive_engine)
+
         _safe_print("Database migration completed.")
         return 0
     except Exception as exc:
@@ -0,0 +1,28 @@
+"""
+Starts uvicorn after emptying PROMETHEUS_MULTIPROC_DIR.
+
+prometheus_client's multiprocess mode (utils/metrics.py) keeps every
+worker's values in files in that directory, named by pid. Files left over
+from the previous run would be summed into the new one's counters and
+gauges, so the directory has to be empty before any worker starts. PM2 runs
+this instead of uvicorn directly (see ecosystem.config.cjs), which also
+covers restarts after a crash.
+
+Usage (from backend/): python run_server.py main:app [uvicorn options]
+"""
+import os
+import shutil
+import sys
+
+
+def reset_multiprocess_dir() -> None:
+    directory = (os.getenv("PROMETHEUS_MULTIPROC_DIR") or "").strip()
+    if not directory:
+        return
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+if __name__ == "__main__":
+    reset_multiprocess_dir()
+    os.execv(sys.executable, [sys.executable, "-m", "uvicorn", *sys.argv[1:]])
@@ -8,44 +8,53 @@ Not a "recovery" tool (no reconciliation against ChatGPT itself, no
 ConversationRecoveryAudit row) - a straight replay of data this system
 already captured losslessly into ConversationCaptureEvent.
 
+Progress is checkpointed in backfill_checkpoints, so an interrupted run
+resumes where it stopped (--restart replays everything again). Always one
+process: a conversation's events must be normalized in capture order (see
+utils/backfill_engine.py).
+
 Usage (from backend/):
     python scripts/backfill_chatgpt_normalization.py            # apply
     python scripts/backfill_chatgpt_normalization.py --dry-run  # count only, no writes
 """
 import argparse
+import logging
 import os
 import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database_config import OperationalSessionLocal  # noqa: E402
-from providers.chatgpt.normalization import backfill_all  # noqa: E402
+from utils.backfill_engine import run_backfill  # noqa: E402
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("--dry-run", action="store_true", help="Count events that would be processed without writing anything.")
     parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--restart", action="store_true", help="Ignore an unfinished checkpoint and replay from the start.")
     args = parser.parse_args()
 
-    db = OperationalSessionLocal()
-    try:
-        if args.dry_run:
-            from providers.chatgpt.models import ConversationCaptureEvent
+    if args.dry_run:
+        from providers.chatgpt.models import ConversationCaptureEvent
 
+        with OperationalSessionLocal() as db:
             total = db.query(ConversationCaptureEvent).count()
-            print(f"[dry-run] {total} total conversation_capture_events rows present. Re-run without --dry-run to normalize them.")
-            return
-
-        stats = backfill_all(db, batch_size=args.batch_size)
-        print(
-            f"Backfill complete: processed={stats['processed']} normalized={stats['normalized']} "
-            f"skipped={stats['skipped']} errors={stats['errors']}"
-        )
-        if stats["errors"]:
-            print("Some events failed to normalize - see chatgpt_normalization logger output above for details.")
-    finally:
-        db.close()
+        print(f"[dry-run] {total} total conversation_capture_events rows present. Re-run without --dry-run to normalize them.")
+        return
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    result = run_backfill("chatgpt-normalization", batch_size=args.batch_size, resume=not args.restart)
+    stats = result["stats"]
+    print(
+        f"Backfill complete: processed={stats.get('processed', 0)} normalized={stats.get('normalized', 0)} "
+        f"skipped={stats.get('skipped', 0)} errors={stats.get('errors', 0)} "
+        f"({result['rowsPerSecond']} rows/s over {result['elapsedSeconds']}s)"
+    )
+    if result["failed"]:
+        print("The run stopped on an error - re-run to resume from its last checkpoint.")
+    if stats.get("errors"):
+        print("Some events failed to normalize - see chatgpt_normalization logger output above for details.")
 
 
 if __name__ == "__main__":
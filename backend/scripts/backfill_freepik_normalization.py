@@ -16,7 +16,10 @@ behaviour until their raw events are replayed:
 Safe to re-run: every upsert in normalization.py is idempotent, and the
 replay reaches the same ownership verdict the live pass did (freshness is
 measured against the capture event's own created_at, never against now).
-Safe to interrupt: work commits per event as it goes.
+Safe to interrupt: work commits as it goes, and each id range's progress is
+checkpointed in backfill_checkpoints, so the next run resumes where this one
+stopped (pass --restart to replay everything again). --workers N replays N
+id ranges in parallel processes (see utils/backfill_engine.py).
 
 Not a "recovery" tool - there is no reconciliation against Freepik itself and
 no FreepikRecoveryAudit row. This only re-reads payloads this system already
@@ -26,6 +29,7 @@ Usage (from backend/):
     python scripts/backfill_freepik_normalization.py --dry-run   # count only, no writes
     python scripts/backfill_freepik_normalization.py             # apply
     python scripts/backfill_freepik_normalization.py --batch-size 200
+    python scripts/backfill_freepik_normalization.py --workers 4
 """
 import argparse
 import logging
@@ -37,13 +41,15 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database_config import OperationalSessionLocal  # noqa: E402
 from providers.freepik.constants import PROVIDER  # noqa: E402
 from providers.freepik.models import FreepikCaptureEvent  # noqa: E402
-from providers.freepik.normalization import backfill_all  # noqa: E402
+from utils.backfill_engine import run_backfill  # noqa: E402
 
 
 def main() -> int:
     parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("--dry-run", action="store_true", help="Count events that would be replayed without writing anything.")
     parser.add_argument("--batch-size", type=int, default=500, help="Events fetched per page (default 500).")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, one id range each (default 1).")
+    parser.add_argument("--restart", action="store_true", help="Ignore unfinished checkpoints and replay from the start.")
     parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
     args = parser.parse_args()
 
@@ -52,26 +58,30 @@ def main() -> int:
         format="%(asctime)s %(levelname)s %(name)s %(message)s",
     )
 
-    db = OperationalSessionLocal()
-    try:
-        if args.dry_run:
+    if args.dry_run:
+        with OperationalSessionLocal() as db:
             total = db.query(FreepikCaptureEvent).filter(FreepikCaptureEvent.provider == PROVIDER).count()
-            print(f"[dry-run] {total} freepik_capture_events rows would be replayed. Re-run without --dry-run to apply.")
-            return 0
-
-        stats = backfill_all(db, batch_size=args.batch_size)
-        print(
-            f"Backfill complete: processed={stats['processed']} normalized={stats['normalized']} "
-            f"skipped={stats['skipped']} errors={stats['errors']}"
-        )
-        if stats["skipped"]:
-            print(f"  {stats['skipped']} event(s) had no identity field in their payload - expected, nothing to normalize.")
-        if stats["errors"]:
-            print(f"  {stats['errors']} event(s) failed - see the freepik_normalization logger output above.")
-            return 1
+        print(f"[dry-run] {total} freepik_capture_events rows would be replayed. Re-run without --dry-run to apply.")
         return 0
-    finally:
-        db.close()
+
+    result = run_backfill(
+        "freepik-normalization", workers=args.workers, batch_size=args.batch_size, resume=not args.restart,
+    )
+    stats = result["stats"]
+    print(
+        f"Backfill complete: processed={stats.get('processed', 0)} normalized={stats.get('normalized', 0)} "
+        f"skipped={stats.get('skipped', 0)} errors={stats.get('errors', 0)} "
+        f"({result['rowsPerSecond']} rows/s over {result['elapsedSeconds']}s)"
+    )
+    if stats.get("skipped"):
+        print(f"  {stats['skipped']} event(s) had no identity field in their payload - expected, nothing to normalize.")
+    if result["failed"]:
+        print("  A partition failed - re-run to resume it from its last checkpoint.")
+        return 1
+    if stats.get("errors"):
+        print(f"  {stats['errors']} event(s) failed - see the freepik_normalization logger output above.")
+        return 1
+    return 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+"""
+Re-encodes the raw capture payloads already stored as plain JSON in the
+*_capture_events tables through providers/payload_store.py.
+
+New events are compressed as they are ingested; this only moves the
+history. Per provider it can first train a compression dictionary on that
+provider's most recent payloads (--train) - do that once before the first
+run, and again whenever a provider's payload shape has drifted. Rows already
+compressed keep the dictionary they were written with.
+
+Safe to re-run and to interrupt: a row is only touched while it still has
+no payload_blob, work commits per batch, and each id range's progress is
+checkpointed in backfill_checkpoints, so the next run resumes where this
+one stopped (--restart rescans from the start). --workers N re-encodes N id
+ranges in parallel processes (see utils/backfill_engine.py).
+
+Space freed by the old JSON values is reused by later writes once autovacuum
+has run; VACUUM FULL (or pg_repack) on the table hands it back to the disk.
+
+Usage (from backend/):
+    python scripts/compress_capture_payloads.py --dry-run           # sizes only, no writes
+    python scripts/compress_capture_payloads.py --train             # train, then re-encode all
+    python scripts/compress_capture_payloads.py --provider freepik --workers 4
+"""
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_config import OperationalSessionLocal  # noqa: E402
+from providers import payload_store  # noqa: E402
+from providers.registry import list_capture_providers  # noqa: E402
+from utils.backfill_engine import run_backfill  # noqa: E402
+
+
+def main() -> int:
+    specs = {spec.slug: spec for spec in list_capture_providers()}
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", action="append", choices=sorted(specs), help="Limit to one provider (repeatable; default all).")
+    parser.add_argument("--dry-run", action="store_true", help="Report stored payload sizes without writing anything.")
+    parser.add_argument("--train", action="store_true", help="Train a new dictionary per provider before re-encoding.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Events fetched per page (default 500).")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes, one id range each (default 1).")
+    parser.add_argument("--restart", action="store_true", help="Ignore unfinished checkpoints and rescan from the start.")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, args.log_level.upper(), logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+    )
+
+    codec = payload_store.active_codec()
+    if codec is None:
+        print("CAPTURE_PAYLOAD_CODEC is off - nothing to do.")
+        return 0
+
+    failed = False
+    for slug in args.provider or sorted(specs):
+        model = specs[slug].event_model
+        if args.dry_run:
+            with OperationalSessionLocal() as db:
+                sizes = payload_store.payload_storage_stats(db, model)
+            print(
+                f"[dry-run] {model.__tablename__}: {sizes['plain']} plain row(s) would be re-encoded with {codec}; "
+                f"{sizes['compressed']} already compressed ({sizes['compressedBytes']} bytes)."
+            )
+            continue
+
+        if args.train:
+            with OperationalSessionLocal() as db:
+                record = payload_store.train_dictionary(db, model, codec=codec)
+            if record is None:
+                print(f"{slug}: too few payloads to train on - compressing without a dictionary.")
+
+        result = run_backfill(
+            f"{slug}-payload-compaction", workers=args.workers, batch_size=args.batch_size, resume=not args.restart,
+        )
+        stats = result["stats"]
+        before, after = stats.get("bytesBefore", 0), stats.get("bytesAfter", 0)
+        ratio = f"{after / before:.0%}" if before else "n/a"
+        print(
+            f"{slug}: processed={stats.get('processed', 0)} compressed={stats.get('compressed', 0)} "
+            f"plain={stats.get('plain', 0)} json={before}B stored={after}B ({ratio}) "
+            f"({result['rowsPerSecond']} rows/s over {result['elapsedSeconds']}s)"
+        )
+        if result["failed"]:
+            print(f"  {slug}: a partition failed - re-run to resume it from its last checkpoint.")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
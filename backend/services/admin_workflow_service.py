@@ -1,6 +1,5 @@
 from datetime import datetime, timedelta
 import logging
-import os
 from time import monotonic
 from typing import Optional
 
@@ -9,6 +8,7 @@ from sqlalchemy.orm import Session
 from models_new import PendingPasswordChange, User, UserApprovalRequest, UserRole
 from routers.tasks_router import notification_dispatcher
 from services.notification_outbox_service import record_notification_outbox_failure
+from utils.env import int_env
 
 
 logger = logging.getLogger(__name__)
@@ -17,16 +17,6 @@ _ADMIN_IDS_CACHE: dict = {"ids": [], "exp": 0.0}
 _ADMIN_IDS_TTL = 60.0
 
 
-def _int_env(name: str, default: int) -> int:
-    raw = (os.getenv(name) or "").strip()
-    if not raw:
-        return default
-    try:
-        return int(raw)
-    except ValueError:
-        return default
-
-
 def admin_user_ids(db: Session) -> list[int]:
     now = monotonic()
     if _ADMIN_IDS_CACHE["exp"] > now:
@@ -153,7 +143,7 @@ def pending_password_change_for_request(
         status=req.status if req.status != "pending" else "pending",
         created_at=created_at,
         expires_at=created_at + timedelta(
-            days=expires_days if expires_days is not None else _int_env("PASSWORD_CHANGE_APPROVAL_EXPIRES_DAYS", 7)
+            days=expires_days if expires_days is not None else int_env("PASSWORD_CHANGE_APPROVAL_EXPIRES_DAYS", 7)
         ),
     )
     req.payload_json = {
@@ -0,0 +1,206 @@
+"""
+Resumable sweeps that repair legacy task data ahead of time.
+
+Some task shapes written by older releases are still fixed up lazily on the
+read path: serialize_task_with_context() rebuilds worker progress from
+TaskStatusHistory (one query per in-progress task on the page), and the
+inbox, outbox, all-tasks and workflow GETs rewrite legacy statuses and then
+commit. Every new code path already writes the repaired shape, so once the
+old rows have been swept the read-path checks can never fire again.
+
+A RepairRule pairs a SQL filter that narrows the scan to candidate tasks
+with the repair function the read path already uses. run_repair_rule()
+walks `tasks` by id in batches, committing each batch (apply) or rolling it
+back (dry run), and records its position in app_settings so an interrupted
+sweep resumes where it stopped. A sweep that reaches the end in apply mode
+sets the rule's "completed" marker; read paths guard their repair calls
+with repair_rule_completed() and skip them from then on.
+
+Rules are registered next to the functions they wrap (see
+routers/tasks_router.py). run_data_repairs.py is the command-line entry.
+"""
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models_new import AppSetting, Task
+from utils.app_markers import AppSettingMarker
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RepairRule:
+    name: str
+    description: str
+    # SQL predicate over Task selecting tasks that may need the repair; the
+    # repair function makes the final decision.
+    candidates: Callable[[], object]
+    # (task, db) -> truthy when it changed something.
+    repair: Callable[[Task, Session], object]
+    loader_options: Callable[[], Iterable] = field(default=lambda: ())
+
+
+@dataclass
+class RepairProgress:
+    rule: str
+    mode: str
+    scanned: int = 0
+    repaired: int = 0
+    total_candidates: int = 0
+    last_task_id: int = 0
+    elapsed_seconds: float = 0.0
+    tasks_per_second: float = 0.0
+    eta_seconds: Optional[float] = None
+    completed: bool = False
+    resumed_from_task_id: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+_RULES: dict[str, RepairRule] = {}
+_COMPLETED_MARKERS: dict[str, AppSettingMarker] = {}
+
+
+def _completed_key(name: str) -> str:
+    return f"repair:{name}:completed"
+
+
+def _checkpoint_key(name: str) -> str:
+    return f"repair:{name}:checkpoint"
+
+
+def register_repair_rule(rule: RepairRule) -> RepairRule:
+    _RULES[rule.name] = rule
+    _COMPLETED_MARKERS.setdefault(rule.name, AppSettingMarker(_completed_key(rule.name)))
+    return rule
+
+
+def get_repair_rules() -> list[RepairRule]:
+    return [_RULES[name] for name in sorted(_RULES)]
+
+
+def get_repair_rule(name: str) -> RepairRule:
+    try:
+        return _RULES[name]
+    except KeyError:
+        raise ValueError(f"Unknown repair rule: {name}") from None
+
+
+def repair_rule_completed(db: Session, name: str) -> bool:
+    """True once a full apply sweep of `name` has finished; cached per process."""
+    marker = _COMPLETED_MARKERS.get(name)
+    return bool(marker and marker.is_set(db))
+
+
+def reset_repair_state() -> None:
+    """Forget cached completion answers (tests, and after a restore)."""
+    for marker in _COMPLETED_MARKERS.values():
+        marker.reset()
+
+
+def _load_checkpoint(db: Session, name: str) -> int:
+    setting = db.query(AppSetting).filter(AppSetting.key == _checkpoint_key(name)).first()
+    value = setting.value_json if setting and isinstance(setting.value_json, dict) else {}
+    try:
+        return max(0, int(value.get("lastTaskId") or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _save_checkpoint(db: Session, progress: RepairProgress) -> None:
+    value = {
+        "lastTaskId": progress.last_task_id,
+        "scanned": progress.scanned,
+        "repaired": progress.repaired,
+        "updatedAt": datetime.utcnow().isoformat(),
+    }
+    setting = db.query(AppSetting).filter(AppSetting.key == _checkpoint_key(progress.rule)).first()
+    if setting:
+        setting.value_json = value
+    else:
+        db.add(AppSetting(key=_checkpoint_key(progress.rule), value_json=value))
+
+
+def _clear_checkpoint(db: Session, name: str) -> None:
+    db.query(AppSetting).filter(AppSetting.key == _checkpoint_key(name)).delete(synchronize_session=False)
+
+
+def run_repair_rule(
+    db: Session,
+    name: str,
+    *,
+    apply: bool = False,
+    batch_size: int = 200,
+    resume: bool = True,
+    max_tasks: Optional[int] = None,
+    on_progress: Optional[Callable[[RepairProgress], None]] = None,
+) -> RepairProgress:
+    """Sweeps candidate tasks for rule `name` in id order.
+
+    Dry runs (the default) roll every batch back and leave no trace. Apply
+    runs commit each batch together with the checkpoint, so a crash loses at
+    most one batch of work and `resume` picks up after the last committed id.
+    `max_tasks` stops early (the checkpoint keeps the place); only a sweep
+    that runs out of candidates marks the rule completed.
+    """
+    rule = get_repair_rule(name)
+    batch_size = max(1, int(batch_size))
+    start_after_id = _load_checkpoint(db, name) if (apply and resume) else 0
+    progress = RepairProgress(
+        rule=name,
+        mode="apply" if apply else "dry-run",
+        last_task_id=start_after_id,
+        resumed_from_task_id=start_after_id,
+    )
+    progress.total_candidates = db.execute(
+        select(func.count(Task.id)).where(Task.id > start_after_id, rule.candidates())
+    ).scalar() or 0
+    started = time.monotonic()
+
+    while max_tasks is None or progress.scanned < max_tasks:
+        limit = batch_size if max_tasks is None else min(batch_size, max_tasks - progress.scanned)
+        tasks = (
+            db.query(Task)
+            .options(*rule.loader_options())
+            .filter(Task.id > progress.last_task_id, rule.candidates())
+            .order_by(Task.id)
+            .limit(limit)
+            .all()
+        )
+        if not tasks:
+            progress.completed = True
+            break
+        for task in tasks:
+            if rule.repair(task, db):
+                progress.repaired += 1
+        progress.scanned += len(tasks)
+        progress.last_task_id = tasks[-1].id
+        if apply:
+            _save_checkpoint(db, progress)
+            db.commit()
+        else:
+            db.rollback()
+
+        progress.elapsed_seconds = round(time.monotonic() - started, 3)
+        if progress.elapsed_seconds > 0:
+            progress.tasks_per_second = round(progress.scanned / progress.elapsed_seconds, 2)
+            remaining = max(0, progress.total_candidates - progress.scanned)
+            progress.eta_seconds = round(remaining / progress.tasks_per_second, 1) if progress.tasks_per_second else None
+        if on_progress:
+            on_progress(progress)
+
+    if progress.completed and apply:
+        _COMPLETED_MARKERS[name].set(db, {"scanned": progress.scanned, "repaired": progress.repaired})
+        _clear_checkpoint(db, name)
+        db.commit()
+        logger.info("repair rule %s completed: %s", name, progress.to_dict())
+    progress.elapsed_seconds = round(time.monotonic() - started, 3)
+    progress.eta_seconds = 0.0 if progress.completed else progress.eta_seconds
+    return progress
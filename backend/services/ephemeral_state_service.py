@@ -0,0 +1,299 @@
+"""
+Short-lived per-user state that does not belong in Postgres: typing-indicator
+throttles and "current presence" (status + last seen).
+
+Both used to be worked out per process. The typing throttles were
+module-level dicts in direct_messages_router.py and groups_router.py, swept
+linearly once they grew past a few thousand keys and invisible to the other
+uvicorn workers, so a user bouncing between workers sent duplicate typing
+events. Presence was rebuilt from today's UserActivity rows on every chat
+list, member list and live-stats call.
+
+Here every entry is a TTL key. With Redis they live there (SET NX EX for
+throttles, one MGET per batch presence lookup) and are shared by every
+worker; without Redis, or while it is unreachable, the same calls fall back
+to sharded in-process TTLCaches (utils/local_cache.py) so nothing on the
+request path ever depends on Redis being up.
+
+Presence is written by the activity endpoints (heartbeat, update-status,
+start/end-session) and read in batches. Users missing from the store -
+process restart, Redis flushed, first list call of the day - are loaded from
+UserActivity in one query for all misses and written back, including an
+explicit "no row today" marker so offline users don't send every list call
+to the database. In-process entries are kept only briefly
+(PRESENCE_LOCAL_TTL_SECONDS) because heartbeats landing on other workers
+can't update them.
+"""
+import json
+import logging
+import threading
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Hashable, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from models_new import ActivityStatus, UserActivity
+from utils.datetime_utils import normalize_to_utc_naive, utcnow_naive
+from utils.env import int_env
+from utils.local_cache import TTLCache, sync_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+PRESENCE_STALE_SECONDS = 90
+TYPING_THROTTLE_SECONDS = 5
+# A heartbeat-fed entry outlives the day it describes; reads ignore entries
+# whose last_seen is not today, exactly as the UserActivity lookup did.
+PRESENCE_TTL_SECONDS = max(60, int_env("PRESENCE_TTL_SECONDS", 36 * 3600))
+PRESENCE_MISS_TTL_SECONDS = max(5, int_env("PRESENCE_MISS_TTL_SECONDS", 60))
+PRESENCE_LOCAL_TTL_SECONDS = max(1, int_env("PRESENCE_LOCAL_TTL_SECONDS", 15))
+EPHEMERAL_STATE_SHARDS = max(1, int_env("EPHEMERAL_STATE_SHARDS", 16))
+EPHEMERAL_STATE_MAX_ENTRIES = max(EPHEMERAL_STATE_SHARDS, int_env("EPHEMERAL_STATE_MAX_ENTRIES", 20_000))
+
+ONLINE_STATUSES = frozenset({ActivityStatus.ACTIVE.value, ActivityStatus.IDLE.value, ActivityStatus.AWAY.value})
+_PRESENCE_KEY = "presence:v1:{user_id}"
+_TYPING_KEY = "typing:v1:{scope}:{sender_id}:{target_id}:{active}"
+_NO_ROW = ""  # stored value for "no UserActivity row today"
+_STATS_LOCK = threading.Lock()
+_STATS = {"redisErrors": 0, "presenceDbLoads": 0, "typingSuppressed": 0}
+
+
+@dataclass(frozen=True)
+class PresenceEntry:
+    status: str
+    last_seen: Optional[datetime]
+
+
+class _ShardedTTLStore:
+    """TTLCaches split by key hash, so concurrent request threads mostly take
+    different locks and no shard grows past its share of `max_entries`."""
+
+    def __init__(self, ttl: float, shards: int, max_entries: int):
+        per_shard = max(1, max_entries // shards)
+        self._shards = [TTLCache(ttl, max_entries=per_shard) for _ in range(shards)]
+
+    def _shard(self, key: Hashable) -> TTLCache:
+        return self._shards[zlib.crc32(repr(key).encode()) % len(self._shards)]
+
+    def get(self, key: Hashable, default=None):
+        return self._shard(key).get(key, default)
+
+    def set(self, key: Hashable, value, ttl: Optional[float] = None) -> None:
+        self._shard(key).set(key, value, ttl)
+
+    def add(self, key: Hashable, value, ttl: Optional[float] = None) -> bool:
+        return self._shard(key).add(key, value, ttl)
+
+    def clear(self) -> None:
+        for shard in self._shards:
+            shard.clear()
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+_LOCAL_TYPING = _ShardedTTLStore(TYPING_THROTTLE_SECONDS, EPHEMERAL_STATE_SHARDS, EPHEMERAL_STATE_MAX_ENTRIES)
+_LOCAL_PRESENCE = _ShardedTTLStore(PRESENCE_LOCAL_TTL_SECONDS, EPHEMERAL_STATE_SHARDS, EPHEMERAL_STATE_MAX_ENTRIES)
+
+
+def _count(name: str, amount: int = 1) -> None:
+    with _STATS_LOCK:
+        _STATS[name] += amount
+
+
+def _redis_failed(operation: str, exc: Exception) -> None:
+    _count("redisErrors")
+    logger.warning("ephemeral state %s fell back to process memory: %s", operation, exc)
+
+
+def _status_value(status) -> str:
+    value = status.value if hasattr(status, "value") else status
+    return value or ActivityStatus.OFFLINE.value
+
+
+def _encode(entry: Optional[PresenceEntry]) -> str:
+    if entry is None:
+        return _NO_ROW
+    return json.dumps({
+        "s": entry.status,
+        "t": entry.last_seen.isoformat() if entry.last_seen else None,
+    })
+
+
+def _decode(raw: Optional[str]):
+    """PresenceEntry, None for a cached "no row today", or False for a miss."""
+    if raw is None:
+        return False
+    if raw == _NO_ROW:
+        return None
+    try:
+        data = json.loads(raw)
+        last_seen = datetime.fromisoformat(data["t"]) if data.get("t") else None
+        return PresenceEntry(status=data.get("s") or ActivityStatus.OFFLINE.value, last_seen=last_seen)
+    except (TypeError, ValueError, KeyError):
+        return False
+
+
+# ── Typing throttle ──────────────────────────────────────────────────────────
+
+def should_send_typing_event(
+    scope: str,
+    sender_id: int,
+    target_id: int,
+    active: bool,
+    throttle_seconds: int = TYPING_THROTTLE_SECONDS,
+) -> bool:
+    """True at most once per `throttle_seconds` for each (scope, sender,
+    target, active) across every worker. `scope` separates direct chats
+    ("dm") from groups ("group") so their ids can't collide."""
+    key = _TYPING_KEY.format(scope=scope, sender_id=sender_id, target_id=target_id, active=int(bool(active)))
+    client = sync_redis_client()
+    if client is not None:
+        try:
+            sent = bool(client.set(key, "1", nx=True, ex=max(1, int(throttle_seconds))))
+            if not sent:
+                _count("typingSuppressed")
+            return sent
+        except Exception as exc:
+            _redis_failed("typing throttle", exc)
+    sent = _LOCAL_TYPING.add(key, True, ttl=throttle_seconds)
+    if not sent:
+        _count("typingSuppressed")
+    return sent
+
+
+# ── Presence ─────────────────────────────────────────────────────────────────
+
+def record_presence(user_id: int, status, last_seen: Optional[datetime] = None) -> None:
+    """Current presence for `user_id`; called by every activity endpoint that
+    changes status or last_seen, including heartbeats the DB write skips."""
+    entry = PresenceEntry(
+        status=_status_value(status),
+        last_seen=normalize_to_utc_naive(last_seen) or utcnow_naive(),
+    )
+    client = sync_redis_client()
+    if client is not None:
+        try:
+            client.set(_PRESENCE_KEY.format(user_id=user_id), _encode(entry), ex=PRESENCE_TTL_SECONDS)
+        except Exception as exc:
+            _redis_failed("presence write", exc)
+    _LOCAL_PRESENCE.set(user_id, entry)
+
+
+def _load_from_activity(db: Session, user_ids: list[int], today) -> dict[int, Optional[PresenceEntry]]:
+    _count("presenceDbLoads")
+    rows = (
+        db.query(UserActivity.user_id, UserActivity.status, UserActivity.last_seen)
+        .filter(UserActivity.user_id.in_(user_ids), UserActivity.date == today)
+        .all()
+    )
+    loaded: dict[int, Optional[PresenceEntry]] = {user_id: None for user_id in user_ids}
+    for user_id, status, last_seen in rows:
+        loaded[user_id] = PresenceEntry(status=_status_value(status), last_seen=normalize_to_utc_naive(last_seen))
+    return loaded
+
+
+def get_presence_entries(db: Session, user_ids: Iterable[int]) -> dict[int, Optional[PresenceEntry]]:
+    """Today's presence for every id: one MGET (or local lookups) plus at most
+    one UserActivity query covering all misses. None means no activity today."""
+    unique_user_ids = sorted({int(user_id) for user_id in user_ids if user_id})
+    if not unique_user_ids:
+        return {}
+    today = utcnow_naive().date()
+    found: dict[int, Optional[PresenceEntry]] = {}
+
+    client = sync_redis_client()
+    if client is not None:
+        try:
+            raw_values = client.mget([_PRESENCE_KEY.format(user_id=user_id) for user_id in unique_user_ids])
+        except Exception as exc:
+            _redis_failed("presence read", exc)
+            client = None
+        else:
+            for user_id, raw in zip(unique_user_ids, raw_values):
+                entry = _decode(raw)
+                if entry is not False:
+                    found[user_id] = entry
+    if client is None:
+        for user_id in unique_user_ids:
+            entry = _LOCAL_PRESENCE.get(user_id, False)
+            if entry is not False:
+                found[user_id] = entry
+
+    # An entry from a previous day says nothing about today; reload it.
+    for user_id, entry in list(found.items()):
+        if entry is not None and entry.last_seen is not None and entry.last_seen.date() != today:
+            del found[user_id]
+
+    missing = [user_id for user_id in unique_user_ids if user_id not in found]
+    if missing:
+        loaded = _load_from_activity(db, missing, today)
+        found.update(loaded)
+        _write_back(client, loaded)
+    return found
+
+
+def _write_back(client, loaded: dict[int, Optional[PresenceEntry]]) -> None:
+    # NX: a heartbeat that raced this read is newer than the row just loaded.
+    if client is not None:
+        try:
+            pipe = client.pipeline(transaction=False)
+            for user_id, entry in loaded.items():
+                ttl = PRESENCE_TTL_SECONDS if entry is not None else PRESENCE_MISS_TTL_SECONDS
+                pipe.set(_PRESENCE_KEY.format(user_id=user_id), _encode(entry), nx=True, ex=ttl)
+            pipe.execute()
+        except Exception as exc:
+            _redis_failed("presence write-back", exc)
+    for user_id, entry in loaded.items():
+        _LOCAL_PRESENCE.add(user_id, entry)
+
+
+def default_presence() -> dict:
+    return {
+        "status": ActivityStatus.OFFLINE.value,
+        "isOnline": False,
+        "lastSeen": None,
+    }
+
+
+def serialize_presence(entry: Optional[PresenceEntry], now: Optional[datetime] = None) -> dict:
+    if entry is None:
+        return default_presence()
+
+    current_time = normalize_to_utc_naive(now) or utcnow_naive()
+    last_seen = entry.last_seen
+    is_recent = bool(last_seen and last_seen >= current_time - timedelta(seconds=PRESENCE_STALE_SECONDS))
+    status = entry.status if is_recent else ActivityStatus.OFFLINE.value
+    return {
+        "status": status,
+        "isOnline": status in ONLINE_STATUSES,
+        "lastSeen": last_seen.isoformat() if last_seen else None,
+    }
+
+
+def build_presence_lookup(db: Session, user_ids: Iterable[int]) -> dict[int, dict]:
+    """{user_id: serialized presence} for chat lists and member lists."""
+    now = utcnow_naive()
+    return {
+        user_id: serialize_presence(entry, now)
+        for user_id, entry in get_presence_entries(db, user_ids).items()
+    }
+
+
+def get_ephemeral_state_stats() -> dict:
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    return {
+        **stats,
+        "backend": "redis" if sync_redis_client() is not None else "memory",
+        "localTypingEntries": len(_LOCAL_TYPING),
+        "localPresenceEntries": len(_LOCAL_PRESENCE),
+    }
+
+
+def reset_local_state() -> None:
+    """Drops this process's fallback entries (tests, and after a Redis outage)."""
+    _LOCAL_TYPING.clear()
+    _LOCAL_PRESENCE.clear()
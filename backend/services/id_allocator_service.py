@@ -0,0 +1,155 @@
+"""
+Identifier allocation for task numbers and prefixed project/task IDs.
+
+Sequence numbers (TASK-YYYY-NNNNN) come from id_sequences rows advanced with
+one atomic `UPDATE ... SET next_value = next_value + n RETURNING next_value`.
+The old read-modify-write of IdSequence took no row lock, so two creators
+could read the same next_value and hand out the same number.
+
+On Postgres the UPDATE runs on its own short autocommit connection, so the
+row lock is held for one statement rather than until the caller commits -
+concurrent creators no longer queue behind each other's transactions. A
+number reserved by a request that later rolls back is skipped, as with any
+database sequence. With ID_SEQUENCE_BLOCK_SIZE > 1 each worker reserves a
+block of numbers at once and hands them out from memory (hi/lo), touching
+the row once per block; numbers are then unique but not in creation order
+across workers. Elsewhere (SQLite in development and tests) a reservation
+can't commit separately without deadlocking against the caller's own write
+lock, so it runs in the caller's transaction, one number at a time.
+
+Prefixed IDs (TASK-<hex>-<date>-<hex>[-NN], PROJ-...) are derived from the
+task itself, and collisions used to be probed with one SELECT per suffix.
+next_identifier_candidate() reads every existing ID under the prefix in one
+query and returns the one after the highest suffix.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models_new import IdSequence
+from utils.env import int_env
+
+logger = logging.getLogger(__name__)
+
+
+ID_SEQUENCE_BLOCK_SIZE = max(1, int_env("ID_SEQUENCE_BLOCK_SIZE", 1))
+TASK_NUMBER_PREFIX = "TASK"
+
+
+def _insert_ignoring_conflicts(dialect_name: str):
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    return insert(IdSequence).on_conflict_do_nothing(index_elements=[IdSequence.sequence_key])
+
+
+def _reserve_block(conn, key: str, *, prefix: str, year: int, size: int) -> int:
+    """Advances sequence `key` by `size` and returns the first reserved value,
+    creating the row (starting at 1) the first time the key is used."""
+    advance = (
+        update(IdSequence)
+        .where(IdSequence.sequence_key == key)
+        .values(next_value=IdSequence.next_value + size)
+        .returning(IdSequence.next_value)
+    )
+    end = conn.execute(advance).scalar()
+    if end is None:
+        conn.execute(
+            _insert_ignoring_conflicts(conn.dialect.name).values(
+                sequence_key=key,
+                prefix=prefix,
+                year=year,
+                next_value=1,
+            )
+        )
+        end = conn.execute(advance).scalar()
+    return int(end) - size
+
+
+class IdAllocator:
+    def __init__(self, block_size: int = ID_SEQUENCE_BLOCK_SIZE, *, independent: Optional[bool] = None):
+        self.block_size = max(1, int(block_size))
+        # None: reserve on a separate connection only on Postgres.
+        self.independent = independent
+        self._lock = threading.Lock()
+        self._blocks: dict = {}
+
+    def _reserves_independently(self, bind) -> bool:
+        if self.independent is not None:
+            return self.independent
+        return bind.dialect.name == "postgresql"
+
+    def next_value(self, db: Session, key: str, *, prefix: str, year: int) -> int:
+        bind = db.get_bind()
+        if not self._reserves_independently(bind):
+            return _reserve_block(db.connection(), key, prefix=prefix, year=year, size=1)
+
+        pool_key = (bind, key)
+        with self._lock:
+            block = self._blocks.get(pool_key)
+            if block and block[0] < block[1]:
+                value = block[0]
+                block[0] += 1
+                return value
+        size = self.block_size
+        with bind.connect() as conn:
+            first = _reserve_block(conn, key, prefix=prefix, year=year, size=size)
+            conn.commit()
+        if size > 1:
+            # Two threads that both found the pool empty each reserve a block;
+            # the later one replaces the other's leftovers, which become a gap.
+            with self._lock:
+                self._blocks[pool_key] = [first + 1, first + size]
+        return first
+
+    def reset(self) -> None:
+        """Drop reserved-but-unused blocks (tests)."""
+        with self._lock:
+            self._blocks.clear()
+
+
+id_allocator = IdAllocator()
+
+
+def allocate_task_number(db: Session, *, allocator: Optional[IdAllocator] = None) -> str:
+    """Next TASK-YYYY-NNNNN number (the per-year sequence used for drafts)."""
+    year = datetime.utcnow().year
+    value = (allocator or id_allocator).next_value(
+        db,
+        f"task_number:{year}",
+        prefix=TASK_NUMBER_PREFIX,
+        year=year,
+    )
+    return f"{TASK_NUMBER_PREFIX}-{year}-{value:05d}"
+
+
+def format_suffixed_identifier(prefix: str, suffix: int) -> str:
+    return prefix if suffix <= 0 else f"{prefix}-{suffix:02d}"
+
+
+def highest_identifier_suffix(db: Session, column, prefix: str) -> Optional[int]:
+    """Highest suffix in use under `prefix` in `column`: None when nothing uses
+    the prefix, 0 when only the bare prefix does. One query."""
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    highest = None
+    for value in db.execute(
+        select(column).where(or_(column == prefix, column.like(f"{escaped}-%", escape="\\")))
+    ).scalars():
+        if value == prefix:
+            suffix = 0
+        else:
+            tail = value[len(prefix) + 1:]
+            if not tail.isdigit():
+                continue
+            suffix = int(tail)
+        highest = suffix if highest is None else max(highest, suffix)
+    return highest
+
+
+def next_identifier_candidate(db: Session, column, prefix: str) -> str:
+    """`prefix` if unused, otherwise `prefix`-NN one past the highest suffix."""
+    highest = highest_identifier_suffix(db, column, prefix)
+    return format_suffixed_identifier(prefix, 0 if highest is None else highest + 1)
@@ -0,0 +1,611 @@
+"""
+One IMAP connection per OTP mailbox, shared by every request waiting on it.
+
+/extension/otp, /extension/otp-baseline and /extension/auth-link used to
+open their own IMAP4_SSL session each, log in and poll SEARCH/FETCH every
+couple of seconds for up to a minute in a worker thread - ten people
+logging into the shared Kling account at once meant ten Gmail sessions
+polling the same inbox.
+
+A MailboxWatcher owns one authenticated connection and one daemon thread
+for its mailbox. It waits with IDLE when the server advertises it (Gmail
+does) and otherwise polls once per MAILBOX_POLL_SECONDS for everyone.
+Each new message is fetched and parsed once into a MailMessage and kept
+for MAILBOX_CACHE_SECONDS; requests call wait_for() with a MailQuery
+(sender, subject, age and uid filters plus an extractor - see otp_query()
+and auth_link_query()) and await an asyncio future that the watcher
+resolves from whichever message matches first, cached or new. A waiter
+that times out or is cancelled is simply removed.
+
+The watcher connects on first use and logs out once it has had no waiters
+for MAILBOX_LINGER_SECONDS, so a quiet mailbox holds no session. A login
+failure (imaplib.IMAP4.error) is raised to every waiter, like the
+per-request path did; a dropped connection is re-opened while anyone is
+waiting. MAILBOX_WATCHER_ENABLED=0 sends the routers back to
+services/otp_mail_service.py's per-request functions.
+
+IDLE is driven by hand because imaplib only grew idle() in Python 3.14.
+An update that lands in imaplib's read buffer in the same packet as the
+"+ idling" continuation is only noticed at the end of the IDLE slice, so
+slices are kept short (MAILBOX_IDLE_SLICE_SECONDS) while anyone waits.
+"""
+import asyncio
+import email
+import imaplib
+import logging
+import re
+import select
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from services.otp_mail_service import (
+    _GMAIL_IMAP_HOST,
+    _GMAIL_IMAP_PORT,
+    _decode_mime_header,
+    _extract_body,
+    _extract_links,
+    _internal_datetime,
+    _message_datetime,
+    select_auth_link,
+)
+from utils.env import bool_env, int_env
+
+
+logger = logging.getLogger(__name__)
+
+
+MAILBOX_POLL_SECONDS = max(1, int_env("MAILBOX_POLL_SECONDS", 2))
+MAILBOX_IDLE_SLICE_SECONDS = max(1, int_env("MAILBOX_IDLE_SLICE_SECONDS", 10))
+MAILBOX_LINGER_SECONDS = max(0, int_env("MAILBOX_LINGER_SECONDS", 300))
+MAILBOX_CACHE_SECONDS = max(60, int_env("MAILBOX_CACHE_SECONDS", 900))
+MAILBOX_CACHE_MAX = 200
+# Newest messages of the last day read when a watcher (re)connects - the
+# per-request path scanned up to OTP_EMAIL_SCAN_LIMIT (75) as well.
+MAILBOX_SCAN_LIMIT = 75
+# While lingering without waiters an IDLE is re-issued this often, well
+# inside the 29 minutes RFC 2177 allows.
+_IDLE_MAX_SECONDS = 300
+_RECONNECT_MAX_SECONDS = 30
+
+ImapFactory = Callable[[], imaplib.IMAP4]
+
+
+def gmail_imap_factory() -> imaplib.IMAP4:
+    return imaplib.IMAP4_SSL(_GMAIL_IMAP_HOST, _GMAIL_IMAP_PORT)
+
+
+@dataclass(frozen=True)
+class MailMessage:
+    uid: int
+    sender: str
+    subject: str
+    received_at: Optional[datetime]
+    body: str
+    links: tuple[str, ...]
+
+
+def parse_mail_message(uid: int, raw: bytes, fetch_metadata=b"") -> MailMessage:
+    message = email.message_from_bytes(raw)
+    return MailMessage(
+        uid=uid,
+        sender=_decode_mime_header(message.get("From", "")),
+        subject=_decode_mime_header(message.get("Subject", "")),
+        received_at=_internal_datetime(fetch_metadata) or _message_datetime(message.get("Date", "")),
+        body=_extract_body(message),
+        links=tuple(_extract_links(message)),
+    )
+
+
+@dataclass(frozen=True)
+class MailQuery:
+    """What a waiter is looking for. `extract` turns a message that passed
+    the filters into the value to return, or None to keep waiting."""
+    extract: Callable[[MailMessage], Optional[str]]
+    sender_filter: Optional[str] = None
+    subject_pattern: Optional[str] = None
+    max_age_seconds: int = 120
+    not_before: Optional[datetime] = None
+    after_uid: int = 0
+
+    def match(self, message: MailMessage, now: datetime) -> Optional[str]:
+        if message.uid <= self.after_uid:
+            return None
+        if message.received_at is not None:
+            if message.received_at < now - timedelta(seconds=self.max_age_seconds):
+                return None
+            if self.not_before is not None and message.received_at < self.not_before:
+                return None
+        if self.sender_filter and self.sender_filter.lower() not in message.sender.lower():
+            return None
+        if self.subject_pattern and self.subject_pattern.lower() not in message.subject.lower():
+            return None
+        return self.extract(message)
+
+
+def otp_query(
+    otp_regex: Optional[str],
+    *,
+    sender_filter: Optional[str] = None,
+    subject_pattern: Optional[str] = None,
+    max_age_seconds: int = 120,
+    not_before: Optional[datetime] = None,
+    after_uid: Optional[str] = None,
+) -> MailQuery:
+    """The code in the subject, else the body - fetch_otp_from_gmail's rule."""
+    pattern = re.compile(otp_regex or r"\b(\d{4,8})\b")
+
+    def extract(message: MailMessage) -> Optional[str]:
+        for text in (message.subject, message.body):
+            match = pattern.search(text or "")
+            if match:
+                return match.group(1) if match.groups() else match.group(0)
+        return None
+
+    try:
+        after = int(after_uid or 0)
+    except (TypeError, ValueError):
+        after = 0
+    return MailQuery(
+        extract=extract,
+        sender_filter=sender_filter,
+        subject_pattern=subject_pattern,
+        max_age_seconds=max_age_seconds,
+        not_before=not_before.astimezone(timezone.utc) if not_before is not None else None,
+        after_uid=after,
+    )
+
+
+def auth_link_query(
+    auth_link_pattern: Optional[str],
+    auth_link_host: Optional[str],
+    *,
+    sender_filter: Optional[str] = None,
+    subject_pattern: Optional[str] = None,
+    max_age_seconds: int = 300,
+) -> MailQuery:
+    compiled = re.compile(auth_link_pattern, re.IGNORECASE) if (auth_link_pattern or "").strip() else None
+    return MailQuery(
+        extract=lambda message: select_auth_link(list(message.links), compiled, auth_link_host),
+        sender_filter=sender_filter,
+        subject_pattern=subject_pattern,
+        max_age_seconds=max_age_seconds,
+    )
+
+
+def _resolve(future: asyncio.Future, value) -> None:
+    if not future.done():
+        future.set_result(value)
+
+
+def _reject(future: asyncio.Future, exc: BaseException) -> None:
+    if not future.done():
+        future.set_exception(exc)
+
+
+class _Waiter:
+    """A query (None: "tell me the latest uid once connected") and the
+    future of the request awaiting it."""
+
+    def __init__(self, query: Optional[MailQuery], loop: asyncio.AbstractEventLoop):
+        self.query = query
+        self.loop = loop
+        self.future = loop.create_future()
+
+    def resolve(self, value) -> None:
+        self.loop.call_soon_threadsafe(_resolve, self.future, value)
+
+    def fail(self, exc: BaseException) -> None:
+        self.loop.call_soon_threadsafe(_reject, self.future, exc)
+
+
+class MailboxWatcher:
+    def __init__(
+        self,
+        email_address: str,
+        app_password: str,
+        imap_factory: ImapFactory = gmail_imap_factory,
+        *,
+        poll_seconds: int = MAILBOX_POLL_SECONDS,
+        idle_slice_seconds: int = MAILBOX_IDLE_SLICE_SECONDS,
+        linger_seconds: int = MAILBOX_LINGER_SECONDS,
+    ):
+        self.email_address = email_address
+        self.app_password = app_password
+        self.imap_factory = imap_factory
+        self.poll_seconds = poll_seconds
+        self.idle_slice_seconds = idle_slice_seconds
+        self.linger_seconds = linger_seconds
+        self._lock = threading.Lock()
+        self._waiters: set[_Waiter] = set()
+        self._messages: list[MailMessage] = []
+        self._running = False
+        self._ready = False
+        self._stopping = False
+        self._last_interest = time.monotonic()
+        # Wakes the watcher thread out of select(); open only while it runs.
+        self._wake_r: Optional[socket.socket] = None
+        self._wake_w: Optional[socket.socket] = None
+        self.last_uid = 0
+        self.uses_idle: Optional[bool] = None
+        self.connects = 0
+        self.fetched = 0
+        self.resolved = 0
+
+    # ---- request side (event loop) ----
+
+    async def wait_for(self, query: MailQuery, timeout: float) -> Optional[str]:
+        """The first value `query` extracts from a cached or new message, or
+        None after `timeout` seconds."""
+        waiter = self._register(query)
+        try:
+            return await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._unregister(waiter)
+
+    async def latest_uid(self, timeout: float) -> int:
+        """The newest uid in the mailbox, once the watcher is connected."""
+        waiter = self._register(None)
+        try:
+            return await asyncio.wait_for(waiter.future, timeout)
+        finally:
+            self._unregister(waiter)
+
+    def _register(self, query: Optional[MailQuery]) -> _Waiter:
+        waiter = _Waiter(query, asyncio.get_running_loop())
+        with self._lock:
+            self._last_interest = time.monotonic()
+            if query is None and self._ready:
+                _resolve(waiter.future, self.last_uid)
+                return waiter
+            if query is not None:
+                value = self._match_cached(query)
+                if value is not None:
+                    self.resolved += 1
+                    _resolve(waiter.future, value)
+                    return waiter
+            self._waiters.add(waiter)
+            if not self._running:
+                self._start_locked()
+        self._notify()
+        return waiter
+
+    def _unregister(self, waiter: _Waiter) -> None:
+        with self._lock:
+            self._waiters.discard(waiter)
+            self._last_interest = time.monotonic()
+
+    def _match_cached(self, query: MailQuery) -> Optional[str]:
+        now = datetime.now(timezone.utc)
+        for message in reversed(self._messages):
+            value = query.match(message, now)
+            if value is not None:
+                return value
+        return None
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopping = True
+        self._notify()
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._running,
+                "connected": self._ready,
+                "idle": self.uses_idle,
+                "waiters": len(self._waiters),
+                "cachedMessages": len(self._messages),
+                "lastUid": self.last_uid,
+                "connects": self.connects,
+                "fetched": self.fetched,
+                "resolved": self.resolved,
+            }
+
+    # ---- watcher thread ----
+
+    def _start_locked(self) -> None:
+        self._running = True
+        self._stopping = False
+        if self._wake_r is None:
+            self._wake_r, self._wake_w = socket.socketpair()
+            self._wake_r.setblocking(False)
+        thread = threading.Thread(target=self._run, name=f"mailbox-watcher:{self.email_address}", daemon=True)
+        thread.start()
+
+    def _notify(self) -> None:
+        wake = self._wake_w
+        if wake is None:
+            return
+        try:
+            wake.send(b"x")
+        except OSError:
+            # Closed by the thread on its way out; nothing to wake.
+            pass
+
+    def _close_wake_locked(self) -> None:
+        for wake in (self._wake_r, self._wake_w):
+            if wake is not None:
+                wake.close()
+        self._wake_r = self._wake_w = None
+
+    def _drain_wake(self) -> None:
+        try:
+            while self._wake_r.recv(1024):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def _should_exit_locked(self) -> bool:
+        if self._stopping:
+            return True
+        return not self._waiters and time.monotonic() - self._last_interest >= self.linger_seconds
+
+    def _run(self) -> None:
+        backoff = 1
+        was_connected = False
+        try:
+            while True:
+                mail = None
+                try:
+                    mail = self._connect()
+                    was_connected = True
+                    backoff = 1
+                    self._watch(mail)
+                    return
+                except imaplib.IMAP4.abort as exc:
+                    # A dropped connection. Before the first successful login
+                    # it is the request's error, like the per-request path.
+                    if not was_connected:
+                        self._fail_waiters(exc)
+                        return
+                    logger.warning("[MAILBOX] connection to %s dropped: %s", self.email_address, exc)
+                except imaplib.IMAP4.error as exc:
+                    logger.warning("[MAILBOX] IMAP error for %s: %s", self.email_address, exc)
+                    self._fail_waiters(exc)
+                    return
+                except OSError as exc:
+                    if not was_connected:
+                        self._fail_waiters(exc)
+                        return
+                    logger.warning("[MAILBOX] connection to %s failed: %s", self.email_address, exc)
+                except Exception as exc:
+                    logger.exception("[MAILBOX] watcher for %s failed", self.email_address)
+                    self._fail_waiters(exc)
+                    return
+                finally:
+                    with self._lock:
+                        self._ready = False
+                    if mail is not None:
+                        try:
+                            mail.logout()
+                        except Exception:
+                            pass
+                with self._lock:
+                    if self._should_exit_locked():
+                        return
+                time.sleep(backoff)
+                backoff = min(_RECONNECT_MAX_SECONDS, backoff * 2)
+        finally:
+            with self._lock:
+                self._running = False
+                self._ready = False
+                restart = bool(self._waiters) and not self._stopping
+                if restart:
+                    # Registered while this thread was on its way out.
+                    self._start_locked()
+                else:
+                    self._close_wake_locked()
+
+    def _connect(self) -> imaplib.IMAP4:
+        mail = self.imap_factory()
+        try:
+            mail.login(self.email_address, self.app_password)
+            mail.select("INBOX")
+            self.uses_idle = "IDLE" in getattr(mail, "capabilities", ())
+            self.connects += 1
+            self._initial_scan(mail)
+        except BaseException:
+            try:
+                mail.logout()
+            except Exception:
+                pass
+            raise
+        logger.info("[MAILBOX] watching %s (idle=%s, lastUid=%s)", self.email_address, self.uses_idle, self.last_uid)
+        return mail
+
+    def _initial_scan(self, mail: imaplib.IMAP4) -> None:
+        since = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%d-%b-%Y")
+        uids = self._search(mail, f'SINCE "{since}"')
+        latest = max(uids, default=0)
+        if not latest:
+            latest = max(self._search(mail, "UID *"), default=0)
+        self._add_messages(self._fetch(mail, sorted(u for u in uids if u > self.last_uid)[-MAILBOX_SCAN_LIMIT:]))
+        waiters = []
+        with self._lock:
+            self.last_uid = max(self.last_uid, latest)
+            self._ready = True
+            for waiter in list(self._waiters):
+                if waiter.query is None:
+                    waiters.append(waiter)
+        for waiter in waiters:
+            waiter.resolve(self.last_uid)
+
+    def _watch(self, mail: imaplib.IMAP4) -> None:
+        while True:
+            with self._lock:
+                if self._should_exit_locked():
+                    return
+                waiting = bool(self._waiters)
+                linger_left = self.linger_seconds - (time.monotonic() - self._last_interest)
+            if waiting:
+                timeout = self.idle_slice_seconds if self.uses_idle else self.poll_seconds
+            else:
+                timeout = max(0.0, min(linger_left, _IDLE_MAX_SECONDS))
+            if self.uses_idle:
+                self._idle(mail, timeout)
+            else:
+                self._sleep(timeout)
+                mail.noop()
+            self._fetch_new(mail)
+
+    def _sleep(self, timeout: float) -> None:
+        readable, _, _ = select.select([self._wake_r], [], [], timeout)
+        if readable:
+            self._drain_wake()
+
+    def _idle(self, mail: imaplib.IMAP4, timeout: float) -> None:
+        """One IDLE round: returns on a mailbox update, a wake-up or
+        `timeout`, with the IDLE finished."""
+        tag = mail._new_tag()
+        mail.send(tag + b" IDLE\r\n")
+        line = mail.readline()
+        if not line.startswith(b"+"):
+            raise imaplib.IMAP4.error(f"IDLE refused: {line!r}")
+        deadline = time.monotonic() + timeout
+        sock = mail.sock
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            pending = getattr(sock, "pending", None)
+            if pending is not None and pending():
+                readable = [sock]
+            else:
+                readable, _, _ = select.select([sock, self._wake_r], [], [], remaining)
+            if self._wake_r in readable:
+                self._drain_wake()
+                break
+            if sock in readable:
+                update = mail.readline()
+                if not update:
+                    raise imaplib.IMAP4.abort("connection closed during IDLE")
+                if update.startswith(b"* BYE"):
+                    raise imaplib.IMAP4.abort(update.decode("utf-8", errors="ignore").strip())
+                if b"EXISTS" in update:
+                    break
+        mail.send(b"DONE\r\n")
+        while True:
+            line = mail.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed ending IDLE")
+            if line.startswith(tag):
+                if not line[len(tag):].strip().upper().startswith(b"OK"):
+                    raise imaplib.IMAP4.error(f"IDLE failed: {line!r}")
+                return
+
+    def _search(self, mail: imaplib.IMAP4, criteria: str) -> list[int]:
+        status, data = mail.uid("SEARCH", None, criteria)
+        if status != "OK" or not data or not data[0]:
+            return []
+        return [int(uid) for uid in data[0].split() if uid.isdigit()]
+
+    def _fetch(self, mail: imaplib.IMAP4, uids: list[int]) -> list[MailMessage]:
+        if not uids:
+            return []
+        status, data = mail.uid("FETCH", ",".join(str(uid) for uid in uids), "(UID INTERNALDATE BODY.PEEK[])")
+        if status != "OK":
+            return []
+        messages = []
+        for item in data or []:
+            if not isinstance(item, tuple) or len(item) < 2:
+                continue
+            metadata, raw = item[0], item[1]
+            match = re.search(rb"UID (\d+)", metadata or b"")
+            if not match:
+                continue
+            try:
+                messages.append(parse_mail_message(int(match.group(1)), raw, metadata))
+            except Exception:
+                logger.debug("[MAILBOX] could not parse uid %s", match.group(1), exc_info=True)
+        self.fetched += len(messages)
+        return sorted(messages, key=lambda message: message.uid)
+
+    def _fetch_new(self, mail: imaplib.IMAP4) -> None:
+        # "n:*" always includes the newest message, even below n.
+        uids = sorted(uid for uid in self._search(mail, f"UID {self.last_uid + 1}:*") if uid > self.last_uid)
+        if uids:
+            self._add_messages(self._fetch(mail, uids[-MAILBOX_CACHE_MAX:]))
+            with self._lock:
+                self.last_uid = max(self.last_uid, uids[-1])
+
+    def _add_messages(self, messages: list[MailMessage]) -> None:
+        if not messages:
+            return
+        now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(seconds=MAILBOX_CACHE_SECONDS)
+        with self._lock:
+            known = {message.uid for message in self._messages}
+            self._messages.extend(message for message in messages if message.uid not in known)
+            self._messages.sort(key=lambda message: message.uid)
+            self._messages = [
+                message for message in self._messages
+                if message.received_at is None or message.received_at >= cutoff
+            ][-MAILBOX_CACHE_MAX:]
+            waiters = [waiter for waiter in self._waiters if waiter.query is not None]
+        for waiter in waiters:
+            for message in reversed(messages):
+                value = waiter.query.match(message, now)
+                if value is not None:
+                    self.resolved += 1
+                    waiter.resolve(value)
+                    break
+
+    def _fail_waiters(self, exc: BaseException) -> None:
+        with self._lock:
+            waiters, self._waiters = list(self._waiters), set()
+        for waiter in waiters:
+            waiter.fail(exc)
+
+
+class MailboxWatcherService:
+    """One MailboxWatcher per mailbox address for the whole process."""
+
+    def __init__(self, imap_factory: ImapFactory = gmail_imap_factory, enabled: Optional[bool] = None, **watcher_options):
+        self.imap_factory = imap_factory
+        self.enabled = bool_env("MAILBOX_WATCHER_ENABLED", True) if enabled is None else enabled
+        self.watcher_options = watcher_options
+        self._watchers: dict[str, MailboxWatcher] = {}
+        self._lock = threading.Lock()
+
+    def watcher(self, email_address: str, app_password: str) -> MailboxWatcher:
+        key = (email_address or "").strip().lower()
+        with self._lock:
+            watcher = self._watchers.get(key)
+            if watcher is not None and watcher.app_password != app_password:
+                # The app password was rotated; the old session goes.
+                watcher.stop()
+                watcher = None
+            if watcher is None:
+                watcher = MailboxWatcher(email_address, app_password, self.imap_factory, **self.watcher_options)
+                self._watchers[key] = watcher
+            return watcher
+
+    async def wait_for(self, email_address: str, app_password: str, query: MailQuery, timeout: float) -> Optional[str]:
+        return await self.watcher(email_address, app_password).wait_for(query, timeout)
+
+    async def latest_uid(self, email_address: str, app_password: str, timeout: float) -> Optional[str]:
+        latest = await self.watcher(email_address, app_password).latest_uid(timeout)
+        return str(latest) if latest > 0 else None
+
+    def shutdown(self) -> None:
+        with self._lock:
+            watchers, self._watchers = list(self._watchers.values()), {}
+        for watcher in watchers:
+            watcher.stop()
+
+    def status(self) -> dict:
+        with self._lock:
+            watchers = dict(self._watchers)
+        return {
+            "enabled": self.enabled,
+            "mailboxes": {key: watcher.status() for key, watcher in watchers.items()},
+        }
+
+
+mailbox_watchers = MailboxWatcherService()
@@ -0,0 +1,85 @@
+"""
+One notification addressed to many users.
+
+Group fan-out used to build one payload dict per member and enqueue one
+notification_dispatcher item per member, so a message to a 300-person group
+took 300 of the dispatcher's queue slots (dropping whatever didn't fit) and
+serialized the same JSON 300 times. A NotificationBroadcast is one queue
+item instead: a shared payload, the recipient ids, and small per-recipient
+overlays for the few members whose copy differs (mentions). Recipients that
+see the same bytes are grouped into variants, and each variant is
+serialized exactly once for sockets and once for web push.
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+
+def _ws_json(payload: dict) -> str:
+    # Same encoding Starlette's WebSocket.send_json() uses in text mode, so
+    # clients can't tell a broadcast from a per-user push.
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def apply_overlay(payload: dict, overlay: Optional[dict]) -> dict:
+    """`overlay` replaces top-level keys, except "metadata", which is merged
+    one level deep so an overlay only names the fields it changes."""
+    if not overlay:
+        return payload
+    merged = {**payload, **{key: value for key, value in overlay.items() if key != "metadata"}}
+    if "metadata" in overlay:
+        merged["metadata"] = {**(payload.get("metadata") or {}), **(overlay.get("metadata") or {})}
+    return merged
+
+
+@dataclass
+class NotificationBroadcast:
+    payload: dict
+    recipient_ids: tuple[int, ...]
+    overlays: dict[int, dict] = field(default_factory=dict)
+
+    @classmethod
+    def for_members(
+        cls,
+        payload: dict,
+        member_ids: Iterable[int],
+        *,
+        exclude_user_id: Optional[int] = None,
+        overlays: Optional[dict[int, dict]] = None,
+    ) -> "NotificationBroadcast":
+        recipient_ids = tuple(sorted({
+            int(member_id)
+            for member_id in member_ids
+            if member_id and int(member_id) != exclude_user_id
+        }))
+        recipient_set = set(recipient_ids)
+        return cls(
+            payload=payload,
+            recipient_ids=recipient_ids,
+            overlays={user_id: overlay for user_id, overlay in (overlays or {}).items() if user_id in recipient_set},
+        )
+
+    @property
+    def event_type(self) -> Optional[str]:
+        return self.payload.get("eventType")
+
+    def payload_for(self, user_id: int) -> dict:
+        return apply_overlay(self.payload, self.overlays.get(user_id))
+
+    def variants(self) -> list[tuple[dict, tuple[int, ...]]]:
+        """[(payload, user_ids)] - the shared payload first, then one entry
+        per recipient with an overlay."""
+        shared = tuple(user_id for user_id in self.recipient_ids if user_id not in self.overlays)
+        variants = [(self.payload, shared)] if shared else []
+        variants.extend(
+            (self.payload_for(user_id), (user_id,))
+            for user_id in self.recipient_ids
+            if user_id in self.overlays
+        )
+        return variants
+
+    def serialized_variants(
+        self,
+        serialize: Callable[[dict], str] = _ws_json,
+    ) -> list[tuple[str, tuple[int, ...]]]:
+        return [(serialize(payload), user_ids) for payload, user_ids in self.variants()]
@@ -0,0 +1,173 @@
+"""
+Task notifications written and delivered with the transaction that caused them.
+
+create_notification() used to add one TaskNotification and call
+notification_dispatcher.enqueue() per recipient on the spot. Assign,
+forward, approve and stage transitions notify several people, so a sync
+endpoint made that many cross-thread hops onto the event loop (each waiting
+up to five seconds for an answer), and the pushes went out before the
+request committed - a request that then failed still notified everyone.
+
+Now create_notification() only records the notification on the session.
+When the session commits:
+
+* before_commit inserts every collected TaskNotification row with one
+  executemany. If the dispatcher can't take the batch right now (no running
+  loop, or not enough free queue slots) the pushes are written to
+  notification_outbox in the same transaction instead, and the outbox
+  worker in main.py delivers them later;
+* after_commit hands the batch to the dispatcher in one enqueue_many()
+  call, recipients sharing a payload folded into one NotificationBroadcast.
+  Anything the queue still refuses goes to notification_outbox through a
+  short session of its own, since the committed one can't emit SQL.
+
+A rollback discards the batch: no rows, no pushes. Savepoint releases are
+ignored; only the outermost commit writes and delivers.
+"""
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Optional, Protocol
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from models_new import TaskNotification
+from services.notification_broadcast import NotificationBroadcast
+from services.notification_outbox_service import record_notification_outbox_batch
+
+logger = logging.getLogger(__name__)
+
+_BATCH_INFO_KEY = "task_notification_batch"
+
+
+class BatchDispatcher(Protocol):
+    def enqueue_many(self, items: list) -> list:
+        ...
+
+    def can_accept(self, count: int) -> bool:
+        ...
+
+
+@dataclass
+class CollectedNotification:
+    user_id: int
+    event_type: str
+    row: dict
+    payload: dict
+
+
+@dataclass
+class NotificationBatch:
+    dispatcher: BatchDispatcher
+    notifications: list = field(default_factory=list)
+    # Set once the rows are written and the dispatcher looked ready.
+    deliver_after_commit: bool = False
+
+
+def collect_notification(
+    db: Session,
+    dispatcher: BatchDispatcher,
+    *,
+    user_id: int,
+    event_type: str,
+    row: dict,
+    payload: dict,
+) -> None:
+    """Queues one TaskNotification row (column values) and its push payload
+    on `db`; both happen only if the session commits."""
+    if db.get_transaction() is None:
+        # Tie the batch to a transaction so a rollback ends (and discards) it.
+        db.begin()
+    batch = db.info.get(_BATCH_INFO_KEY)
+    if batch is None:
+        batch = db.info[_BATCH_INFO_KEY] = NotificationBatch(dispatcher=dispatcher)
+    batch.notifications.append(
+        CollectedNotification(user_id=user_id, event_type=event_type, row=row, payload=payload)
+    )
+
+
+def build_dispatch_items(notifications: list) -> list:
+    """One (user_id, payload) per recipient, except that recipients of an
+    identical payload share a single (None, NotificationBroadcast) item."""
+    groups: dict = {}
+    for notification in notifications:
+        key = json.dumps(notification.payload, sort_keys=True, default=str)
+        group = groups.setdefault(key, (notification.payload, []))
+        if notification.user_id not in group[1]:
+            group[1].append(notification.user_id)
+    items = []
+    for payload, user_ids in groups.values():
+        if len(user_ids) == 1:
+            items.append((user_ids[0], payload))
+        else:
+            items.append((None, NotificationBroadcast.for_members(payload, user_ids)))
+    return items
+
+
+def _outbox_entries(items: list) -> list:
+    entries = []
+    for user_id, payload in items:
+        if isinstance(payload, NotificationBroadcast):
+            entries.extend(
+                (recipient_id, payload.event_type or "", payload.payload_for(recipient_id))
+                for recipient_id in payload.recipient_ids
+            )
+        else:
+            entries.append((user_id, payload.get("eventType") or "", payload))
+    return entries
+
+
+@event.listens_for(Session, "before_commit")
+def _write_before_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    batch: Optional[NotificationBatch] = session.info.get(_BATCH_INFO_KEY)
+    if batch is None or not batch.notifications or batch.deliver_after_commit:
+        return
+    session.execute(insert(TaskNotification), [notification.row for notification in batch.notifications])
+    items = build_dispatch_items(batch.notifications)
+    if batch.dispatcher.can_accept(len(items)):
+        batch.deliver_after_commit = True
+        return
+    written = record_notification_outbox_batch(
+        session,
+        _outbox_entries(items),
+        error="Notification dispatcher unavailable at commit",
+    )
+    logger.warning("Notification dispatcher can't take %s items; %s pushes moved to the outbox", len(items), written)
+    session.info.pop(_BATCH_INFO_KEY, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_after_commit(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    batch: Optional[NotificationBatch] = session.info.pop(_BATCH_INFO_KEY, None)
+    if batch is None or not batch.deliver_after_commit:
+        return
+    items = build_dispatch_items(batch.notifications)
+    try:
+        rejected = batch.dispatcher.enqueue_many(items)
+    except Exception:
+        logger.exception("Notification batch handoff failed for %s items", len(items))
+        rejected = items
+    if not rejected:
+        return
+    try:
+        with Session(bind=session.get_bind()) as outbox_db:
+            record_notification_outbox_batch(
+                outbox_db,
+                _outbox_entries(rejected),
+                error="Notification dispatcher queue full",
+            )
+            outbox_db.commit()
+    except Exception:
+        logger.exception("Failed to record %s rejected notification items in the outbox", len(rejected))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_uncommitted(session: Session, transaction) -> None:
+    # A rollback (or close without commit) drops what was collected.
+    if transaction.parent is None:
+        session.info.pop(_BATCH_INFO_KEY, None)
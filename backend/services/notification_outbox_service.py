@@ -1,7 +1,8 @@
 from datetime import datetime, timedelta
 import logging
-from typing import Protocol
+from typing import Iterable, Protocol
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from models_new import NotificationOutbox
@@ -15,6 +16,21 @@ class NotificationEnqueuer(Protocol):
         ...
 
 
+def _outbox_row_values(user_id: int, event_type: str, payload: dict, error: str) -> dict:
+    now = datetime.utcnow()
+    return {
+        "user_id": user_id,
+        "event_type": event_type,
+        "payload_json": payload,
+        "status": "pending",
+        "attempts": 0,
+        "max_attempts": 10,
+        "last_error": (error or "")[:1000],
+        "created_at": now,
+        "next_attempt_at": now + timedelta(seconds=30),
+    }
+
+
 def record_notification_outbox_failure(
     db: Session,
     *,
@@ -23,18 +39,21 @@ def record_notification_outbox_failure(
     payload: dict,
     error: str = "",
 ) -> None:
-    row = NotificationOutbox(
-        user_id=user_id,
-        event_type=event_type,
-        payload_json=payload,
-        status="pending",
-        attempts=0,
-        max_attempts=10,
-        last_error=(error or "")[:1000],
-        created_at=datetime.utcnow(),
-        next_attempt_at=datetime.utcnow() + timedelta(seconds=30),
-    )
-    db.add(row)
+    db.add(NotificationOutbox(**_outbox_row_values(user_id, event_type, payload, error)))
+
+
+def record_notification_outbox_batch(
+    db: Session,
+    entries: Iterable[tuple[int, str, dict]],
+    *,
+    error: str = "",
+) -> int:
+    """Writes one pending outbox row per (user_id, event_type, payload) with a
+    single INSERT in the caller's transaction. Returns rows written."""
+    rows = [_outbox_row_values(user_id, event_type, payload, error) for user_id, event_type, payload in entries]
+    if rows:
+        db.execute(insert(NotificationOutbox), rows)
+    return len(rows)
 
 
 def dispatch_notification_outbox_batch(
@@ -383,6 +383,24 @@ def _link_host_matches(candidate_url: str, allowed_host: Optional[str]) -> bool:
     )
 
 
+def select_auth_link(links: list[str], compiled_pattern: Optional[re.Pattern], auth_link_host: Optional[str]) -> Optional[str]:
+    """The first of `links` on `auth_link_host` that matches the pattern; a
+    pattern group holding a full URL is returned instead of the link."""
+    for link in links:
+        if not _link_host_matches(link, auth_link_host):
+            continue
+        if compiled_pattern:
+            match = compiled_pattern.search(link)
+            if not match:
+                continue
+            if match.groups():
+                candidate = (match.group(1) or "").strip()
+                if candidate.startswith("http://") or candidate.startswith("https://"):
+                    return candidate
+        return link
+    return None
+
+
 def fetch_otp_from_gmail(
     email_address: str,
     app_password: str,
@@ -552,22 +570,10 @@ def fetch_auth_link_from_gmail(
             links = _extract_links(message)
             logger.debug("[AUTH LINK IMAP] found %s link candidates for %s", len(links), email_address)
 
-            for link in links:
-                if not _link_host_matches(link, auth_link_host):
-                    continue
-                if compiled_pattern:
-                    match = compiled_pattern.search(link)
-                    if not match:
-                        continue
-                    if match.groups():
-                        candidate = (match.group(1) or "").strip()
-                        if candidate.startswith("http://") or candidate.startswith("https://"):
-                            logger.info("[AUTH LINK IMAP] Auth link extracted for %s", email_address)
-                            return candidate
-                    logger.info("[AUTH LINK IMAP] Auth link extracted for %s", email_address)
-                    return link
+            auth_link = select_auth_link(links, compiled_pattern, auth_link_host)
+            if auth_link:
                 logger.info("[AUTH LINK IMAP] Auth link extracted for %s", email_address)
-                return link
+                return auth_link
 
         logger.info("[AUTH LINK IMAP] Emails found but no auth link matched for %s", email_address)
         return None
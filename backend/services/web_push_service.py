@@ -0,0 +1,362 @@
+"""
+Web-push delivery for the notification dispatcher.
+
+Each push used to be a pywebpush.webpush() call run through asyncio.to_thread:
+a fresh HTTPS connection, a fresh VAPID signature and a thread per endpoint,
+with nothing bounding how many ran at once (an approval burst fanning out to
+a few hundred subscriptions parked that many threads), plus two database
+sessions per notification to read targets and write results.
+
+WebPushSender keeps the network side on the event loop instead:
+
+* one semaphore (WEB_PUSH_MAX_CONCURRENCY) bounds in-flight pushes for the
+  whole process, however many notifications are being delivered at once;
+* one pooled httpx.AsyncClient per push-service origin (fcm.googleapis.com,
+  updates.push.services.mozilla.com, web.push.apple.com, ...), speaking
+  HTTP/2 when the `h2` package is installed so a burst to one origin shares a
+  connection instead of opening one each;
+* the VAPID JWT is signed once per audience (origin) and reused until shortly
+  before it expires, rather than per push;
+* subscription success/failure bookkeeping is buffered and written in one
+  session every WEB_PUSH_STATUS_FLUSH_SECONDS, not one per notification.
+
+Payload encryption (ECDH + AES-GCM per subscription) still comes from
+pywebpush's WebPusher.encode(), so the bytes on the wire are what
+pywebpush.webpush() sent. It is CPU-bound, so it runs on a worker thread
+(together with VAPID signing on a cache miss) rather than stalling the event
+loop for every other request. The VAPID key may be the key itself or a path
+to a PEM file, as pywebpush accepted. Latency and failure histograms are
+reported through notification_dispatcher.status()["webPush"].
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from time import perf_counter
+from typing import Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from database_config import OperationalSessionLocal
+from models_new import WebPushSubscription
+from utils.env import int_env
+
+try:
+    from pywebpush import WebPusher
+    from py_vapid import Vapid02 as Vapid
+except ImportError:  # pragma: no cover - optional until dependency is installed in runtime
+    WebPusher = None
+    Vapid = None
+
+try:
+    import h2  # noqa: F401 - httpx needs it for http2=True
+
+    HTTP2_AVAILABLE = True
+except ImportError:  # pragma: no cover - HTTP/1.1 keep-alive still pools connections
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+WEB_PUSH_MAX_CONCURRENCY = max(1, int_env("WEB_PUSH_MAX_CONCURRENCY", 32))
+WEB_PUSH_MAX_CONNECTIONS_PER_ORIGIN = max(1, int_env("WEB_PUSH_MAX_CONNECTIONS_PER_ORIGIN", 8))
+WEB_PUSH_HTTP_TIMEOUT_SECONDS = max(1, int_env("WEB_PUSH_HTTP_TIMEOUT_SECONDS", 10))
+WEB_PUSH_MESSAGE_TTL_SECONDS = 30
+# RFC 8292 caps a VAPID token's exp at 24h out; pywebpush used 12h.
+WEB_PUSH_VAPID_EXPIRY_SECONDS = min(24 * 3600, max(600, int_env("WEB_PUSH_VAPID_EXPIRY_SECONDS", 12 * 3600)))
+WEB_PUSH_VAPID_REFRESH_MARGIN_SECONDS = 300
+WEB_PUSH_STATUS_FLUSH_SECONDS = max(1, int_env("WEB_PUSH_STATUS_FLUSH_SECONDS", 2))
+
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+@dataclass(frozen=True)
+class WebPushSend:
+    subscription_id: int
+    endpoint: str
+    p256dh: str
+    auth: str
+    payload_json: str
+
+
+# (subscription_id, ok, status_code, reason)
+WebPushOutcome = tuple[int, bool, Optional[int], str]
+
+
+class _Histogram:
+    def __init__(self, buckets: tuple[int, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        labels = [f"le_{bound}" for bound in self.buckets] + ["le_inf"]
+        return {
+            "count": self.total,
+            "avg": round(self.sum / self.total, 1) if self.total else None,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+def _failure_class(status_code: Optional[int], reason: str) -> str:
+    if status_code is None:
+        return "timeout" if reason == "web push timed out" else "network"
+    if status_code in {404, 410, 413, 429}:
+        return str(status_code)
+    return f"{status_code // 100}xx"
+
+
+def _origin(endpoint: str) -> str:
+    url = urlparse(endpoint)
+    return f"{url.scheme}://{url.netloc}"
+
+
+def _load_vapid(private_key: str):
+    # pywebpush.webpush() took either a path to a key file or the key itself.
+    if os.path.isfile(private_key):
+        return Vapid.from_file(private_key_file=private_key)
+    return Vapid.from_string(private_key=private_key)
+
+
+def write_subscription_outcomes(outcomes: list[WebPushOutcome]) -> None:
+    """Applies delivery results to WebPushSubscription rows in one session.
+    404/410 mean the browser dropped the subscription, so it is deactivated."""
+    if not outcomes:
+        return
+    db = OperationalSessionLocal()
+    try:
+        now = datetime.utcnow()
+        rows_by_id = {
+            row.id: row
+            for row in db.query(WebPushSubscription)
+            .filter(WebPushSubscription.id.in_([outcome[0] for outcome in outcomes]))
+            .all()
+        }
+        for subscription_id, ok, status_code, reason in outcomes:
+            subscription = rows_by_id.get(subscription_id)
+            if subscription is None:
+                # Unsubscribed between the read and now; nothing to update.
+                continue
+            subscription.updated_at = now
+            if ok:
+                subscription.last_success_at = now
+                subscription.last_failure_at = None
+                subscription.failure_reason = None
+                subscription.is_active = True
+                continue
+
+            subscription.last_failure_at = now
+            subscription.failure_reason = reason
+            if status_code in {404, 410}:
+                subscription.is_active = False
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("Failed to record web push outcomes for %s subscriptions", len(outcomes))
+    finally:
+        db.close()
+
+
+class WebPushSender:
+    def __init__(self, *, transport: Optional[httpx.AsyncBaseTransport] = None):
+        # `transport` replaces the network for every origin (tests).
+        self._transport = transport
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._vapid_keys: dict[str, object] = {}
+        self._vapid_headers: dict[tuple[str, str, str], tuple[float, dict]] = {}
+        self._pending_outcomes: dict[int, WebPushOutcome] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self.in_flight = 0
+        self.sent = 0
+        self.failed = 0
+        self.vapid_signatures = 0
+        self.status_writes = 0
+        self.latency_ms = _Histogram(LATENCY_BUCKETS_MS)
+        self.failures_by_class: dict[str, int] = {}
+
+    # Loop-bound resources (semaphore, clients) are rebuilt if the sender is
+    # used from a new event loop, e.g. after a reload or in tests.
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(WEB_PUSH_MAX_CONCURRENCY)
+        self._clients = {}
+        self._flush_task = None
+
+    def _client(self, origin: str) -> httpx.AsyncClient:
+        client = self._clients.get(origin)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(WEB_PUSH_HTTP_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=WEB_PUSH_MAX_CONNECTIONS_PER_ORIGIN,
+                    max_keepalive_connections=WEB_PUSH_MAX_CONNECTIONS_PER_ORIGIN,
+                ),
+                transport=self._transport,
+            )
+            self._clients[origin] = client
+        return client
+
+    def _authorization(self, audience: str, private_key: str, subject: str) -> dict:
+        key_id = hashlib.sha256(private_key.encode("utf-8")).hexdigest()[:16]
+        cache_key = (audience, key_id, subject)
+        now = time.time()
+        with self._lock:
+            cached = self._vapid_headers.get(cache_key)
+            if cached and cached[0] - WEB_PUSH_VAPID_REFRESH_MARGIN_SECONDS > now:
+                return cached[1]
+            vapid = self._vapid_keys.get(key_id)
+            if vapid is None:
+                vapid = _load_vapid(private_key)
+                self._vapid_keys[key_id] = vapid
+            # Signed under the lock: concurrent first pushes to an origin
+            # (each on its own worker thread) wait for one signature.
+            expires_at = int(now) + WEB_PUSH_VAPID_EXPIRY_SECONDS
+            headers = vapid.sign({"aud": audience, "exp": expires_at, "sub": subject})
+            self._vapid_headers[cache_key] = (expires_at, headers)
+            self.vapid_signatures += 1
+        return headers
+
+    @staticmethod
+    def _encrypt(send: WebPushSend) -> bytes:
+        pusher = WebPusher({
+            "endpoint": send.endpoint,
+            "keys": {"p256dh": send.p256dh, "auth": send.auth},
+        })
+        return pusher.encode(send.payload_json, "aes128gcm")["body"]
+
+    def _prepare(self, send: WebPushSend, origin: str, private_key: str, subject: str) -> tuple[bytes, dict]:
+        # Runs on a worker thread; _authorization's cache is lock-guarded.
+        return self._encrypt(send), self._authorization(origin, private_key, subject)
+
+    async def _send_one(self, send: WebPushSend, private_key: str, subject: str) -> WebPushOutcome:
+        async with self._semaphore:
+            self.in_flight += 1
+            started = perf_counter()
+            status_code: Optional[int] = None
+            try:
+                origin = _origin(send.endpoint)
+                body, authorization = await asyncio.to_thread(self._prepare, send, origin, private_key, subject)
+                headers = {
+                    **authorization,
+                    "Content-Encoding": "aes128gcm",
+                    "TTL": str(WEB_PUSH_MESSAGE_TTL_SECONDS),
+                }
+                response = await self._client(origin).post(send.endpoint, content=body, headers=headers)
+                status_code = response.status_code
+                if status_code <= 202:
+                    outcome = (send.subscription_id, True, None, "")
+                else:
+                    reason = f"Push failed: {status_code} {response.reason_phrase}\nResponse body:{response.text}"
+                    outcome = (send.subscription_id, False, status_code, reason.strip()[:500])
+            except httpx.TimeoutException:
+                outcome = (send.subscription_id, False, None, "web push timed out")
+            except Exception as exc:
+                outcome = (send.subscription_id, False, None, (str(exc).strip() or "web push failed")[:500])
+            finally:
+                self.in_flight -= 1
+                self.latency_ms.observe((perf_counter() - started) * 1000)
+
+        if outcome[1]:
+            self.sent += 1
+        else:
+            self.failed += 1
+            failure_class = _failure_class(outcome[2], outcome[3])
+            self.failures_by_class[failure_class] = self.failures_by_class.get(failure_class, 0) + 1
+        return outcome
+
+    async def send_many(
+        self,
+        sends: list[WebPushSend],
+        *,
+        vapid_private_key: str,
+        vapid_subject: str,
+    ) -> list[WebPushOutcome]:
+        """Delivers every send under the global concurrency limit and queues
+        the subscription bookkeeping; returns one outcome per send."""
+        if not sends or WebPusher is None or Vapid is None:
+            return []
+        self._bind_loop()
+        outcomes = await asyncio.gather(
+            *[self._send_one(send, vapid_private_key, vapid_subject) for send in sends]
+        )
+        self._record(outcomes)
+        return list(outcomes)
+
+    def _record(self, outcomes: list[WebPushOutcome]) -> None:
+        for outcome in outcomes:
+            self._pending_outcomes[outcome[0]] = outcome
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(
+                self._flush_later(),
+                name="web-push-status-flush",
+            )
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(WEB_PUSH_STATUS_FLUSH_SECONDS)
+        await self.flush()
+
+    async def flush(self) -> None:
+        if not self._pending_outcomes:
+            return
+        batch = list(self._pending_outcomes.values())
+        self._pending_outcomes = {}
+        self.status_writes += 1
+        await asyncio.to_thread(write_subscription_outcomes, batch)
+
+    async def aclose(self) -> None:
+        """Writes pending bookkeeping and closes pooled connections."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Failed to flush web push outcomes on shutdown")
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception:
+                pass
+
+    def status(self) -> dict:
+        return {
+            "maxConcurrency": WEB_PUSH_MAX_CONCURRENCY,
+            "inFlight": self.in_flight,
+            "http2": HTTP2_AVAILABLE,
+            "origins": len(self._clients),
+            "sent": self.sent,
+            "failed": self.failed,
+            "vapidSignatures": self.vapid_signatures,
+            "pendingStatusWrites": len(self._pending_outcomes),
+            "statusWrites": self.status_writes,
+            "latencyMs": self.latency_ms.snapshot(),
+            "failuresByClass": dict(self.failures_by_class),
+        }
+
+
+web_push_sender = WebPushSender()
@@ -1,10 +1,11 @@
 # task_helpers.py - Helper functions for task operations
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from models_new import Task, TaskParticipant, User, ParticipantRole, TaskStatus, IdSequence
+from models_new import Task, TaskParticipant, TaskVisibility, User, ParticipantRole, TaskStatus
 from typing import List, Optional
 from datetime import datetime
 from utils.datetime_utils import serialize_utc_datetime
+from utils.task_visibility import LANE_RECEIVED, has_lane, task_visibility_ready
 
 
 class TaskHelpers:
@@ -67,6 +68,13 @@ class TaskHelpers:
     @staticmethod
     def get_unread_count(user_id: int, db: Session) -> int:
         """Get count of unread tasks for a user"""
+        if task_visibility_ready(db):
+            return db.query(func.count(TaskVisibility.task_id)).filter(
+                TaskVisibility.user_id == user_id,
+                has_lane(LANE_RECEIVED),
+                TaskVisibility.is_read == False
+            ).scalar() or 0
+
         count = db.query(func.count(func.distinct(TaskParticipant.task_id))).join(Task).filter(
             TaskParticipant.user_id == user_id,
             TaskParticipant.is_read == False,
@@ -181,27 +189,6 @@ class TaskHelpers:
         return result
     
     
-    @staticmethod
-    def generate_task_number(db: Session) -> str:
-        """Generate unique task number: TASK-YYYY-XXXX"""
-        year = datetime.utcnow().year
-        key = f"task_number:{year}"
-        seq = db.query(IdSequence).filter(IdSequence.sequence_key == key).first()
-        if not seq:
-            seq = IdSequence(
-                sequence_key=key,
-                prefix="TASK",
-                year=year,
-                next_value=1,
-            )
-            db.add(seq)
-            db.flush()
-
-        task_number = f"{seq.prefix}-{year}-{seq.next_value:05d}"
-        seq.next_value += 1
-        return task_number
-    
-    
     @staticmethod
     def can_user_access_task(task_id: int, user_id: int, db: Session) -> bool:
         """Check if a user can access a task"""
@@ -0,0 +1,116 @@
+"""Regression cover for benchmarks/: the seeder is deterministic for a seed
+and scale, a tiny quick-tier run drives every scenario through the app
+without errors and reports latency percentiles and queries per request, and
+compare_reports() flags latency and query-count regressions but refuses to
+compare runs over different datasets. The Higgsfield ledger replay builds the
+same capture history for a seed and replays it through backfill_all without
+errors.
+
+Run: python tests/benchmark_smoke.py
+"""
+import os
+import sys
+import tempfile
+import warnings
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.seed import configure_environment  # noqa: E402
+
+_DB_DIR = tempfile.TemporaryDirectory()
+DATABASE_URL = f"sqlite:///{os.path.join(_DB_DIR.name, 'bench.sqlite3')}"
+configure_environment(DATABASE_URL)
+warnings.simplefilter("ignore", DeprecationWarning)
+
+from sqlalchemy import create_engine, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from benchmarks.driver import percentile  # noqa: E402
+from benchmarks.higgsfield_ledger import build_capture_history, run_ledger_replay  # noqa: E402
+from benchmarks.run import compare_reports, run_benchmark  # noqa: E402
+from benchmarks.seed import config_for, fingerprint, prepare_schema, seed_dataset  # noqa: E402
+
+
+def _assert(condition: bool, message: str) -> None:
+    if not condition:
+        raise AssertionError(message)
+
+
+def _seed_snapshot(config) -> tuple:
+    from models_new import Task, TaskComment
+
+    engine = create_engine("sqlite://")
+    prepare_schema(engine)
+    with sessionmaker(bind=engine, expire_on_commit=False)() as db:
+        summary = seed_dataset(db, config, build_derived=False)
+        tasks = db.execute(select(Task.task_number, Task.title, Task.creator_id, Task.status).order_by(Task.id)).all()
+        comments = db.scalar(select(TaskComment.comment).order_by(TaskComment.id.desc()).limit(1))
+    engine.dispose()
+    return summary["fingerprint"], summary["counts"], tasks, comments
+
+
+def test_seeding_is_deterministic() -> None:
+    config = config_for("quick", scale=0.02)
+    first, second = _seed_snapshot(config), _seed_snapshot(config)
+    _assert(first == second, "the same seed and scale should produce identical rows")
+    _assert(first[0] == fingerprint(config), "the summary carries the config fingerprint")
+    _assert(fingerprint(config_for("quick", scale=0.02, seed=7)) != first[0], "another seed is another dataset")
+    print("ok  seeding is deterministic for a seed and scale")
+
+
+def test_quick_run_reports_every_scenario() -> None:
+    report = run_benchmark(tier="quick", database_url=DATABASE_URL, scale=0.05, requests=6, concurrency=3, warmup=1)
+    expected = {"tasks_inbox", "tasks_inbox_search", "task_assets", "task_assets_filtered", "reports_executive", "capture_ingest"}
+    _assert(set(report["scenarios"]) == expected, f"scenarios: {sorted(report['scenarios'])}")
+    for name, result in report["scenarios"].items():
+        _assert(result["errors"] == 0, f"{name} failed: {result['firstError']}")
+        _assert(result["requests"] == 6 and result["statusCounts"] == {"200": 6}, f"{name}: {result}")
+        _assert(result["p50Ms"] <= result["p95Ms"] <= result["p99Ms"], f"{name} percentiles out of order")
+        _assert(result["queriesPerRequest"]["mean"] > 0, f"{name} should report queries per request")
+    _assert(report["database"] == "sqlite" and report["peakRssMb"], "dialect and peak RSS are reported")
+    _assert(report["dataset"]["counts"]["tasks"] == 30, f"counts: {report['dataset']['counts']}")
+    print("ok  a quick-tier run drives every scenario and reports latency and query counts")
+
+
+def test_compare_reports() -> None:
+    _assert(percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.0 and percentile([1.0, 2.0, 3.0, 4.0], 99) == 4.0, "nearest rank")
+
+    def report(p95, queries, fp="abc"):
+        scenario = {"p50Ms": 10.0, "p95Ms": p95, "p99Ms": 30.0, "errors": 0, "queriesPerRequest": {"mean": queries}}
+        return {"dataset": {"fingerprint": fp}, "git": {"commit": "base"}, "scenarios": {"tasks_inbox": scenario}}
+
+    same = compare_reports(report(20.0, 5.0), report(22.0, 5.0), max_regression_pct=20)
+    _assert(same["comparable"] and same["regressions"] == [], f"within tolerance: {same}")
+    slower = compare_reports(report(20.0, 5.0), report(30.0, 5.0), max_regression_pct=20)
+    _assert(slower["regressions"] == ["tasks_inbox.p95Ms +50.0% (20.0 -> 30.0 ms)"], f"{slower['regressions']}")
+    chattier = compare_reports(report(20.0, 5.0), report(20.0, 6.0))
+    _assert(chattier["regressions"] == ["tasks_inbox.queriesPerRequest 5.0 -> 6.0"], f"{chattier['regressions']}")
+    other = compare_reports(report(20.0, 5.0), report(90.0, 9.0, fp="xyz"))
+    _assert(not other["comparable"] and other["regressions"] == [], "different datasets are not compared")
+    print("ok  compare_reports flags latency and query regressions on the same dataset only")
+
+
+def test_higgsfield_ledger_replay() -> None:
+    history = build_capture_history(400)
+    _assert(history == build_capture_history(400), "the same seed and size should produce the same history")
+    ledger_captures = sum(1 for event_type, _payload in history if event_type == "credit_ledger_row")
+    report = run_ledger_replay(
+        database_url=f"sqlite:///{os.path.join(_DB_DIR.name, 'ledger.sqlite3')}", events=400, batch_size=100,
+    )
+    replay = report["replay"]
+    _assert(replay["stats"]["processed"] == 400 and replay["stats"]["errors"] == 0, f"stats: {replay['stats']}")
+    _assert(0 < replay["ledgerRows"] < ledger_captures, f"re-captures collapse into one row per tx_id: {replay}")
+    _assert(replay["matchedLedgerRows"] > 0 and replay["creditedGenerations"] > 0, f"ledger rows match: {replay}")
+    _assert(replay["queriesPerEvent"] > 0, "queries are counted")
+    print("ok  the Higgsfield ledger replay is deterministic and replays without errors")
+
+
+if __name__ == "__main__":
+    test_seeding_is_deterministic()
+    test_quick_run_reports_every_scenario()
+    test_compare_reports()
+    test_higgsfield_ledger_replay()
+    print("\nall benchmark smoke checks passed")
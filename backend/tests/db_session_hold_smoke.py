@@ -42,6 +42,7 @@ BACKEND_DIR = pathlib.Path(__file__).resolve().parents[1]
 BLOCKING_CALLS = {
     # object storage
     "put_object", "get_object", "upload_fileobj", "download_fileobj",
+    "get_object_bytes", "get_objects_bytes",
     "create_multipart_upload", "complete_multipart_upload", "generate_presigned_url",
     "_upload_bytes_to_r2",
     # outbound HTTP
@@ -200,24 +201,23 @@ def test_delegated_blocking_work_is_still_covered() -> None:
 
 def test_r2_clients_are_time_bounded() -> None:
     """botocore's defaults (60s connect + 60s read, 5 legacy retry attempts)
-    let one stalled upload occupy its caller for minutes. Both R2 client
-    builders must pass an explicit Config."""
+    let one stalled upload occupy its caller for minutes. The one R2 client
+    builder must pass an explicit Config, and routers/upload.py must use it
+    rather than building its own."""
     sys.path.insert(0, str(BACKEND_DIR))
     from utils import r2_storage
-    from routers import upload as upload_router
-
-    for label, config in (
-        ("utils/r2_storage.build_client", r2_storage._r2_client_config()),
-        ("routers/upload._build_r2_client", upload_router._r2_client_config()),
-    ):
-        _assert(config.connect_timeout and config.connect_timeout <= 30, f"{label}: connect_timeout unbounded")
-        _assert(config.read_timeout and config.read_timeout <= 120, f"{label}: read_timeout unbounded")
-        _assert(
-            (config.retries or {}).get("max_attempts", 99) <= 5,
-            f"{label}: retry count left at the botocore default",
-        )
-    print("ok  both R2 clients are built with explicit timeout and retry bounds")
 
+    config = r2_storage._r2_client_config()
+    label = "utils/r2_storage.build_client"
+    _assert(config.connect_timeout and config.connect_timeout <= 30, f"{label}: connect_timeout unbounded")
+    _assert(config.read_timeout and config.read_timeout <= 120, f"{label}: read_timeout unbounded")
+    _assert(
+        (config.retries or {}).get("max_attempts", 99) <= 5,
+        f"{label}: retry count left at the botocore default",
+    )
+    upload_source = (BACKEND_DIR / "routers" / "upload.py").read_text(encoding="utf-8")
+    _assert("boto3.client(" not in upload_source, "routers/upload.py builds its own R2 client again")
+    print("ok  the shared R2 client is built with explicit timeout and retry bounds")
 
 if __name__ == "__main__":
     test_no_handler_holds_a_session_across_blocking_io()
@@ -49,7 +49,7 @@ from models_new import (  # noqa: E402
     ITPortalTool,
     User,
 )
-from providers.higgsfield.models import HiggsfieldCaptureEvent, HiggsfieldGeneration  # noqa: E402
+from providers.higgsfield.models import HiggsfieldCaptureEvent, HiggsfieldCreditLedgerEntry, HiggsfieldGeneration  # noqa: E402
 from providers.higgsfield.normalization import _parse_dt, backfill_all, normalize_capture_event  # noqa: E402
 from providers.higgsfield.queries import GenerationFilters, list_generations  # noqa: E402
 
@@ -67,6 +67,7 @@ Base.metadata.create_all(
         GenerationProjectEvent.__table__,
         HiggsfieldCaptureEvent.__table__,
         HiggsfieldGeneration.__table__,
+        HiggsfieldCreditLedgerEntry.__table__,
     ],
 )
 
@@ -635,8 +636,9 @@ def test_credit_ledger_tied_batch_resolves_deterministically() -> None:
     (backfill_all can replay in any order). Both ledger events are captured
     (raw-inserted) BEFORE either is normalized - mirrors router.py's real
     capture_events flow (ingest the whole batch first, normalize after), and
-    matters here specifically: _find_sibling_credit_ledger_events needs both
-    rows already durably present to see the tie at all."""
+    matters here specifically: the first row can't see the tie until the
+    second is in higgsfield_credit_ledger, so it only resolves when the
+    second row re-tries its unmatched siblings."""
     with SessionLocal() as db:
         gen_a = normalize_capture_event(db, _capture(db, {
             "generationId": "gen-tied-a", "job_set_type": "nano_banana_2",
@@ -854,6 +856,43 @@ def test_credit_ledger_replay_is_idempotent() -> None:
     print("ok  replaying the same credit-ledger event is idempotent")
 
 
+def test_credit_ledger_recaptured_row_counts_once() -> None:
+    """The extension re-reads the whole ledger page, so one transaction is
+    captured many times. Each capture must land on the same
+    higgsfield_credit_ledger row, and a re-capture must not count as another
+    same-amount sibling - two captures of tx-recap-1 plus tx-recap-2 is
+    still exactly two rows for the two-generation batch."""
+    with SessionLocal() as db:
+        gen_a = normalize_capture_event(db, _capture(db, {
+            "generationId": "gen-recap-a", "job_set_type": "seedance1_5",
+            "status": "completed", "createdAt": "2026-06-02T09:15:00.100000+00:00",
+        }))
+        gen_b = normalize_capture_event(db, _capture(db, {
+            "generationId": "gen-recap-b", "job_set_type": "seedance1_5",
+            "status": "completed", "createdAt": "2026-06-02T09:15:00.100040+00:00",
+        }))
+        row_1 = {
+            "tx_id": "tx-recap-1", "display_name": "Seedance 1.5 Pro", "total_credits": -1800,
+            "action": "spend", "created_at": "2026-06-02T09:15:00.160000Z",
+        }
+        row_2 = {**row_1, "tx_id": "tx-recap-2", "created_at": "2026-06-02T09:15:00.170000Z"}
+        first_capture = _capture(db, row_1)
+        normalize_capture_event(db, first_capture)
+        normalize_capture_event(db, _capture(db, dict(row_1)))
+        normalize_capture_event(db, _capture(db, row_2))
+        db.flush()
+
+        entries = db.query(HiggsfieldCreditLedgerEntry).filter(HiggsfieldCreditLedgerEntry.tx_id.like("tx-recap-%")).order_by(HiggsfieldCreditLedgerEntry.tx_id).all()
+        _assert([entry.tx_id for entry in entries] == ["tx-recap-1", "tx-recap-2"], f"one ledger row per tx_id: {[e.tx_id for e in entries]}")
+        _assert(entries[0].capture_event_id == first_capture.id, "the row keeps the capture it was first seen in")
+        _assert([entry.generation_id for entry in entries] == [gen_a.id, gen_b.id], "both rows matched, paired by sorted tx_id")
+        db.refresh(gen_a)
+        db.refresh(gen_b)
+        _assert(gen_a.credits_used == 18 and gen_b.credits_used == 18, f"credits: {gen_a.credits_used!r}, {gen_b.credits_used!r}")
+        db.rollback()
+    print("ok  a re-captured ledger row is one higgsfield_credit_ledger row and one sibling")
+
+
 def test_bare_id_maps_to_generation_id() -> None:
     """A bare "id" field (the shape a queue/status-poll response plausibly
     uses, per content-higgsfield-network.js's hasGenerationIdentity) must map
@@ -1111,6 +1150,7 @@ if __name__ == "__main__":
     test_credit_ledger_angles_maps_to_qwen_camera_control()
     test_credit_ledger_spend_and_refund_net_correctly()
     test_credit_ledger_replay_is_idempotent()
+    test_credit_ledger_recaptured_row_counts_once()
     test_bare_id_maps_to_generation_id()
     test_cross_column_identity_without_shared_correlation_key_merges()
     test_shared_job_id_never_lets_one_sibling_steal_another()
@@ -0,0 +1,520 @@
+# utils/activity_log_partitions.py
+"""
+Monthly range partitioning of activity_log on Postgres, and the retention
+job that moves old months out to R2.
+
+activity_log ("Log every single action in the system") only ever grows, and
+every /api/archive/activity read filtered one ever-larger table. On Postgres
+the table becomes a parent partitioned BY RANGE (timestamp) with one child
+per calendar month (activity_log_pYYYYMM). A query with a `timestamp >=`
+bound only scans the months it covers, and retiring a month is a DETACH and
+a DROP instead of a bulk DELETE.
+
+convert_activity_log_to_partitions() converts an existing plain table in
+place, once, through `python activity_log_retention.py convert`: the old
+table is renamed to activity_log_legacy and attached as the partition for
+everything before the first partitioned month, so nothing is copied. It is
+deliberately not a deploy-time migration - see its docstring for how the
+table scans are kept out from under the exclusive lock. A DEFAULT partition
+catches rows outside every month that exists, and each migration
+(ensure_activity_log_partitioning, from db_migrations.ensure_archive_schema)
+and retention run creates the months ahead
+(ACTIVITY_LOG_PARTITION_MONTHS_AHEAD) so the default stays empty.
+
+run_activity_log_retention() exports every partition that ended more than
+ACTIVITY_LOG_RETAIN_MONTHS months ago as gzipped JSONL to R2 (one object per
+partition, utils/r2_storage), records it in activity_log_archives, then
+detaches and drops it. The legacy partition is retired as one unit once its
+newest month is old enough. rehydrate_activity_partition() brings an
+exported partition back for a while (the retention job leaves it alone
+until rehydrated_until); activity_log_retention.py is the CLI for both.
+
+SQLite (tests, local) keeps the plain table and every function here is a
+no-op on it.
+"""
+import gzip
+import json
+import logging
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import MetaData, insert, or_, select, text
+from sqlalchemy.orm import Session
+
+from models_new import ActivityLog, ActivityLogArchive
+from utils import r2_storage
+from utils.env import bool_env, int_env
+
+logger = logging.getLogger(__name__)
+
+
+ACTIVITY_LOG_PARTITIONING_ENABLED = bool_env("ACTIVITY_LOG_PARTITIONING_ENABLED", True)
+ACTIVITY_LOG_PARTITION_MONTHS_AHEAD = max(1, int_env("ACTIVITY_LOG_PARTITION_MONTHS_AHEAD", 2))
+ACTIVITY_LOG_RETAIN_MONTHS = max(1, int_env("ACTIVITY_LOG_RETAIN_MONTHS", 12))
+ACTIVITY_LOG_REHYDRATE_DAYS = max(1, int_env("ACTIVITY_LOG_REHYDRATE_DAYS", 7))
+ACTIVITY_LOG_EXPORT_PREFIX = (os.getenv("ACTIVITY_LOG_EXPORT_PREFIX") or "activity-log").strip().strip("/") or "activity-log"
+EXPORT_BATCH_SIZE = 5000
+# Exports larger than this spill from memory to a temp file while they're built.
+_EXPORT_SPOOL_BYTES = 16 * 1024 * 1024
+
+PARENT_TABLE = "activity_log"
+LEGACY_PARTITION = "activity_log_legacy"
+DEFAULT_PARTITION = "activity_log_default"
+_RANGE_BOUND = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+# Indexes on the parent; Postgres builds (or adopts) the matching index on
+# every partition. Mirrors ActivityLog's columns with index=True and its
+# __table_args__.
+_PARENT_INDEXES = {
+    "ix_activity_log_user_id": "(user_id)",
+    "ix_activity_log_task_id": "(task_id)",
+    "ix_activity_log_action": "(action)",
+    "ix_activity_log_timestamp": '("timestamp")',
+    "ix_activity_log_task_timestamp_id": '(task_id, "timestamp", id)',
+    "ix_activity_log_user_timestamp_id": '(user_id, "timestamp", id)',
+}
+_EXPORT_COLUMNS = (
+    "id", "user_id", "task_id", "action", "entity_type", "entity_id",
+    "details", "ip_address", "user_agent", "timestamp",
+)
+
+
+@dataclass(frozen=True)
+class ActivityPartition:
+    """One child of activity_log. `start` None means MINVALUE; both None is
+    the DEFAULT partition."""
+    name: str
+    start: Optional[datetime]
+    end: Optional[datetime]
+
+    @property
+    def is_default(self) -> bool:
+        return self.start is None and self.end is None
+
+    def covers(self, moment: datetime) -> bool:
+        if self.is_default:
+            return False
+        return (self.start is None or self.start <= moment) and (self.end is None or moment < self.end)
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + (month.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"activity_log_p{month.year:04d}{month.month:02d}"
+
+
+def retention_cutoff(now: datetime, retain_months: int) -> datetime:
+    """Partitions ending on or before this are retired: the current month
+    plus `retain_months` full months before it stay in the database."""
+    return add_months(month_start(now), -max(1, retain_months))
+
+
+def partitions_due(partitions: Iterable[ActivityPartition], now: datetime, retain_months: int) -> list:
+    cutoff = retention_cutoff(now, retain_months)
+    due = [partition for partition in partitions if partition.end is not None and partition.end <= cutoff]
+    return sorted(due, key=lambda partition: partition.end)
+
+
+def export_object_key(partition: ActivityPartition) -> str:
+    if partition.start is not None:
+        return f"{ACTIVITY_LOG_EXPORT_PREFIX}/{partition.start:%Y}/{partition.name}.jsonl.gz"
+    return f"{ACTIVITY_LOG_EXPORT_PREFIX}/{partition.name}-until-{partition.end:%Y%m}.jsonl.gz"
+
+
+def _is_postgres(db) -> bool:
+    return db.get_bind().dialect.name == "postgresql" if isinstance(db, Session) else db.dialect.name == "postgresql"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _bound_literal(moment: Optional[datetime]) -> str:
+    return "MINVALUE" if moment is None else f"'{moment:%Y-%m-%d %H:%M:%S}'"
+
+
+def _parse_bound(raw: str) -> Optional[datetime]:
+    value = raw.strip()
+    if value.upper() == "MINVALUE":
+        return None
+    return datetime.fromisoformat(value.strip("'").split("+")[0])
+
+
+def is_partitioned(conn) -> bool:
+    kind = conn.execute(
+        text("SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(:name)"),
+        {"name": PARENT_TABLE},
+    ).scalar()
+    return kind == "p"
+
+
+def list_partitions(conn) -> list:
+    rows = conn.execute(
+        text(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(:name)
+            """
+        ),
+        {"name": PARENT_TABLE},
+    ).all()
+    partitions = []
+    for name, bound in rows:
+        if (bound or "").strip().upper() == "DEFAULT":
+            partitions.append(ActivityPartition(name, None, None))
+            continue
+        match = _RANGE_BOUND.search(bound or "")
+        if not match:
+            logger.warning("activity_log partition %s has an unexpected bound: %s", name, bound)
+            continue
+        partitions.append(ActivityPartition(name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+    return sorted(partitions, key=lambda partition: (partition.end is None, partition.end or datetime.min))
+
+
+def _create_partition(conn, name: str, start: Optional[datetime], end: datetime) -> None:
+    conn.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {_quote(name)} PARTITION OF {PARENT_TABLE} "
+            f"FOR VALUES FROM ({_bound_literal(start)}) TO ({_bound_literal(end)})"
+        )
+    )
+
+
+def ensure_month_partitions(conn, now: Optional[datetime] = None, months_ahead: Optional[int] = None) -> list:
+    """Creates the monthly partitions from this month through `months_ahead`
+    months ahead that no existing partition covers. Returns names created."""
+    current = month_start(now or datetime.utcnow())
+    ahead = ACTIVITY_LOG_PARTITION_MONTHS_AHEAD if months_ahead is None else max(0, months_ahead)
+    existing = list_partitions(conn)
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(current, offset)
+        if any(partition.covers(month) for partition in existing):
+            continue
+        name = partition_name(month)
+        _create_partition(conn, name, month, add_months(month, 1))
+        existing.append(ActivityPartition(name, month, add_months(month, 1)))
+        created.append(name)
+    return created
+
+
+def _constraint_name(conn, table: str, kind: str) -> Optional[str]:
+    return conn.execute(
+        text("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:table) AND contype = :kind"),
+        {"table": table, "kind": kind},
+    ).scalar()
+
+
+def convert_activity_log_to_partitions(engine, now: Optional[datetime] = None, *, batch_size: int = 50000) -> dict:
+    """Turns the plain activity_log table into a partitioned parent without
+    copying rows: the old table becomes the partition for everything before
+    `boundary` (the start of the month after next, which leaves the staged
+    steps below a month of slack) and later months get their own partitions.
+
+    Every full-table pass runs before the one ACCESS EXCLUSIVE step and
+    without blocking writes: NULL timestamps are backfilled in committed
+    batches, a CHECK matching the partition bound is added NOT VALID and then
+    validated, and the (id, "timestamp") unique index the new primary key
+    needs is built CONCURRENTLY. With those in place SET NOT NULL and ATTACH
+    PARTITION skip their own scans and the primary key is swapped in from
+    the index, so the final transaction only touches the catalog.
+
+    Not part of the deploy-time migration - run it once, off-peak, through
+    `python activity_log_retention.py convert`. Safe to re-run after an
+    interruption; a table that is already partitioned is left alone."""
+    now = now or datetime.utcnow()
+    boundary = add_months(month_start(now), 2)
+    bound_check = f"{LEGACY_PARTITION}_bound"
+    unique_index = f"{PARENT_TABLE}_id_timestamp_key"
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": PARENT_TABLE}).scalar() is None:
+            return {"converted": False, "reason": "activity_log does not exist"}
+        if is_partitioned(conn):
+            return {"converted": False, "reason": "already partitioned"}
+
+    backfilled = 0
+    while True:
+        with engine.begin() as conn:
+            updated = conn.execute(
+                text(
+                    f"UPDATE {PARENT_TABLE} SET \"timestamp\" = '1970-01-01' WHERE id IN "
+                    f"(SELECT id FROM {PARENT_TABLE} WHERE \"timestamp\" IS NULL LIMIT :limit)"
+                ),
+                {"limit": batch_size},
+            ).rowcount
+        backfilled += updated
+        if updated < batch_size:
+            break
+
+    with engine.begin() as conn:
+        existing = conn.execute(
+            text("SELECT pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(:table) AND conname = :name"),
+            {"table": PARENT_TABLE, "name": bound_check},
+        ).scalar()
+        if existing is not None and _bound_literal(boundary).strip("'") not in existing:
+            # Left by an interrupted run in an earlier month.
+            conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DROP CONSTRAINT {bound_check}"))
+            existing = None
+        if existing is None:
+            conn.execute(
+                text(
+                    f"ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT {bound_check} "
+                    f'CHECK ("timestamp" IS NOT NULL AND "timestamp" < {_bound_literal(boundary)}) NOT VALID'
+                )
+            )
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} VALIDATE CONSTRAINT {bound_check}"))
+    with engine.begin() as conn:
+        # Proven by the validated CHECK, so Postgres skips the scan.
+        conn.execute(text(f'ALTER TABLE {PARENT_TABLE} ALTER COLUMN "timestamp" SET NOT NULL'))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        valid = conn.execute(
+            text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": unique_index},
+        ).scalar()
+        if valid is False:  # an interrupted CONCURRENTLY build leaves an invalid index behind
+            conn.execute(text(f"DROP INDEX CONCURRENTLY {unique_index}"))
+        conn.execute(text(f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {unique_index} ON {PARENT_TABLE} (id, "timestamp")'))
+
+    with engine.begin() as conn:
+        conn.execute(text(f"LOCK TABLE {PARENT_TABLE} IN ACCESS EXCLUSIVE MODE"))
+        # The parent's primary key has to include the partition key, and the
+        # partition's must match it for ATTACH to adopt it.
+        primary_key = _constraint_name(conn, PARENT_TABLE, "p")
+        if primary_key:
+            conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DROP CONSTRAINT {_quote(primary_key)}"))
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT {PARENT_TABLE}_pkey PRIMARY KEY USING INDEX {unique_index}"))
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {LEGACY_PARTITION}"))
+        # Index names are per schema; the parent's indexes take the old names.
+        for (index_name,) in conn.execute(
+            text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table"),
+            {"table": LEGACY_PARTITION},
+        ).all():
+            conn.execute(text(f"ALTER INDEX {_quote(index_name)} RENAME TO {_quote(index_name + '_legacy')}"))
+        sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": LEGACY_PARTITION}).scalar()
+        conn.execute(
+            text(
+                f"CREATE TABLE {PARENT_TABLE} (LIKE {LEGACY_PARTITION} INCLUDING DEFAULTS) "
+                'PARTITION BY RANGE ("timestamp")'
+            )
+        )
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} ADD PRIMARY KEY (id, \"timestamp\")"))
+        if sequence:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {PARENT_TABLE}.id"))
+        conn.execute(
+            text(
+                f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {LEGACY_PARTITION} "
+                f"FOR VALUES FROM (MINVALUE) TO ({_bound_literal(boundary)})"
+            )
+        )
+        conn.execute(text(f"ALTER TABLE {LEGACY_PARTITION} DROP CONSTRAINT {bound_check}"))
+        ensure_activity_log_partitioning(conn, now)
+    logger.info("activity_log converted to monthly partitions; existing rows kept in %s", LEGACY_PARTITION)
+    return {"converted": True, "backfilledTimestamps": backfilled, "legacyUntil": boundary.isoformat()}
+
+
+def ensure_activity_log_partitioning(conn, now: Optional[datetime] = None) -> None:
+    """Migration entry point: keeps a partitioned activity_log's DEFAULT
+    partition, parent indexes and coming months in place. A plain table is
+    left alone - converting one is convert_activity_log_to_partitions, run
+    explicitly. Postgres only."""
+    if conn.dialect.name != "postgresql" or not ACTIVITY_LOG_PARTITIONING_ENABLED:
+        return
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": PARENT_TABLE}).scalar() is None:
+        return
+    if not is_partitioned(conn):
+        return
+    now = now or datetime.utcnow()
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+    for index_name, columns in _PARENT_INDEXES.items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {PARENT_TABLE} {columns}"))
+    ensure_month_partitions(conn, now)
+
+
+def encode_rows(rows: Iterable[dict], sink) -> tuple[int, int]:
+    """Writes `rows` to the binary file `sink` as gzipped JSON lines.
+    Returns (rows written, compressed bytes)."""
+    count = 0
+    with gzip.GzipFile(fileobj=sink, mode="wb") as stream:
+        for row in rows:
+            record = dict(row)
+            moment = record.get("timestamp")
+            if isinstance(moment, datetime):
+                record["timestamp"] = moment.isoformat()
+            stream.write(json.dumps(record, separators=(",", ":"), default=str).encode("utf-8") + b"\n")
+            count += 1
+    return count, sink.tell()
+
+
+def decode_rows(data: bytes) -> Iterator[dict]:
+    """Reads back what encode_rows() wrote, with timestamps as datetimes."""
+    for line in gzip.decompress(data).splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if record.get("timestamp"):
+            record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+        yield record
+
+
+def _partition_rows(db: Session, name: str) -> Iterator[dict]:
+    # activity_log's own column types, so details and timestamp come back
+    # as Python values from the partition table too.
+    table = ActivityLog.__table__.to_metadata(MetaData(), name=name)
+    result = db.connection().execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(
+        select(*(table.c[column] for column in _EXPORT_COLUMNS)).order_by(table.c.id)
+    )
+    for row in result.mappings():
+        yield row
+
+
+def export_partition(db: Session, partition: ActivityPartition, *, client=None) -> dict:
+    """Uploads the partition's rows to R2 and returns (without committing)
+    its activity_log_archives row."""
+    key = export_object_key(partition)
+    with tempfile.SpooledTemporaryFile(max_size=_EXPORT_SPOOL_BYTES) as spool:
+        row_count, byte_size = encode_rows(_partition_rows(db, partition.name), spool)
+        spool.seek(0)
+        r2_storage.put_object(key, spool.read(), content_type="application/gzip", client=client)
+    entry = db.scalar(select(ActivityLogArchive).where(ActivityLogArchive.partition_name == partition.name))
+    if entry is None:
+        entry = ActivityLogArchive(partition_name=partition.name)
+        db.add(entry)
+    entry.range_start = partition.start
+    entry.range_end = partition.end
+    entry.object_key = key
+    entry.row_count = row_count
+    entry.byte_size = byte_size
+    entry.exported_at = datetime.utcnow()
+    entry.dropped_at = None
+    return entry
+
+
+def drop_partition(db: Session, partition: ActivityPartition) -> None:
+    db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {_quote(partition.name)}"))
+    db.execute(text(f"DROP TABLE {_quote(partition.name)}"))
+
+
+def run_activity_log_retention(
+    db: Session,
+    *,
+    retain_months: Optional[int] = None,
+    now: Optional[datetime] = None,
+    client=None,
+    dry_run: bool = False,
+) -> dict:
+    """Exports and drops every partition past the retention window, one
+    partition per transaction, after making sure the coming months exist.
+    A partition is only dropped once its export is uploaded and recorded."""
+    now = now or datetime.utcnow()
+    months = ACTIVITY_LOG_RETAIN_MONTHS if retain_months is None else max(1, retain_months)
+    stats = {"created": [], "due": [], "exported": [], "dropped": [], "kept": [], "failed": []}
+    if not _is_postgres(db) or not ACTIVITY_LOG_PARTITIONING_ENABLED:
+        return stats
+    if not is_partitioned(db.connection()):
+        return stats
+    if not dry_run:
+        stats["created"] = ensure_month_partitions(db.connection(), now)
+        db.commit()
+    due = partitions_due(list_partitions(db.connection()), now, months)
+    stats["due"] = [partition.name for partition in due]
+    if dry_run or not due:
+        return stats
+    if client is None and not r2_storage.is_configured():
+        logger.warning("activity_log retention: R2 is not configured; %s partition(s) left in place", len(due))
+        stats["kept"] = stats["due"]
+        return stats
+
+    active_client = client or r2_storage.get_client()
+    for partition in due:
+        try:
+            entry = db.scalar(select(ActivityLogArchive).where(ActivityLogArchive.partition_name == partition.name))
+            if entry is not None and entry.rehydrated_until and entry.rehydrated_until > now:
+                stats["kept"].append(partition.name)
+                continue
+            live_rows = db.scalar(text(f"SELECT count(*) FROM {_quote(partition.name)}"))
+            # A rehydrated partition that gained no rows is already in R2.
+            if entry is None or entry.dropped_at is None or entry.row_count != live_rows:
+                entry = export_partition(db, partition, client=active_client)
+                db.commit()
+                stats["exported"].append(partition.name)
+            drop_partition(db, partition)
+            entry.dropped_at = datetime.utcnow()
+            entry.rehydrated_until = None
+            db.commit()
+            stats["dropped"].append(partition.name)
+            logger.info(
+                "activity_log partition %s retired to %s (%s rows)", partition.name, entry.object_key, entry.row_count
+            )
+        except Exception as exc:
+            db.rollback()
+            logger.exception("activity_log retention failed for %s", partition.name)
+            stats["failed"].append({"partition": partition.name, "error": str(exc)})
+    return stats
+
+
+def rehydrate_activity_partition(
+    db: Session,
+    name: str,
+    *,
+    keep_days: Optional[int] = None,
+    now: Optional[datetime] = None,
+    client=None,
+) -> dict:
+    """Restores an exported partition from R2 and keeps it for `keep_days`
+    before the retention job may drop it again. Restoring a partition that
+    is still attached only extends that."""
+    now = now or datetime.utcnow()
+    days = ACTIVITY_LOG_REHYDRATE_DAYS if keep_days is None else max(1, keep_days)
+    if not _is_postgres(db):
+        raise ValueError("activity_log partitions exist on Postgres only")
+    entry = db.scalar(select(ActivityLogArchive).where(ActivityLogArchive.partition_name == name))
+    if entry is None:
+        raise ValueError(f"No export recorded for activity_log partition {name}")
+    attached = any(partition.name == name for partition in list_partitions(db.connection()))
+    restored = 0
+    if not attached:
+        _create_partition(db.connection(), name, entry.range_start, entry.range_end)
+        batch = []
+        for record in decode_rows(r2_storage.get_object_bytes(entry.object_key, client=client)):
+            batch.append({column: record.get(column) for column in _EXPORT_COLUMNS})
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                db.execute(insert(ActivityLog.__table__), batch)
+                restored += len(batch)
+                batch = []
+        if batch:
+            db.execute(insert(ActivityLog.__table__), batch)
+            restored += len(batch)
+        entry.rehydrated_at = now
+    entry.rehydrated_until = now + timedelta(days=days)
+    db.commit()
+    return {"partition": name, "restoredRows": restored, "alreadyAttached": attached, "keepUntil": entry.rehydrated_until.isoformat()}
+
+
+def cold_activity_ranges(db: Session, since: datetime, now: Optional[datetime] = None) -> list:
+    """Exported partitions overlapping [since, now) that are not currently
+    rehydrated - the part of a window whose rows are only in R2."""
+    now = now or datetime.utcnow()
+    entries = db.scalars(
+        select(ActivityLogArchive)
+        .where(
+            ActivityLogArchive.dropped_at.isnot(None),
+            ActivityLogArchive.range_end > since,
+            or_(ActivityLogArchive.rehydrated_until.is_(None), ActivityLogArchive.rehydrated_until <= now),
+        )
+        .order_by(ActivityLogArchive.range_end)
+    ).all()
+    return [entry.to_dict() for entry in entries]
+
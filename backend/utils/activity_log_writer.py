@@ -0,0 +1,334 @@
+# utils/activity_log_writer.py
+"""
+Write-behind queue for activity_log rows.
+
+ArchiveService.log_activity() used to add one ActivityLog and commit on the
+caller's archive session, so every audited request paid a round trip and a
+commit on the archive database - and when the archive database was down the
+row was printed and dropped.
+
+log_activity() now hands the row to activity_log_writer.enqueue(), which
+only appends it to a bounded in-memory queue. main.py's loop calls flush()
+every ACTIVITY_LOG_FLUSH_MS, which inserts the queue in batches of
+ACTIVITY_LOG_BATCH_SIZE, one executemany (multi-row VALUES on Postgres) and
+one commit per batch.
+
+Rows are never dropped on purpose: when a batch fails to insert, or the
+queue is full, the rows are written to a JSONL file in
+ACTIVITY_LOG_SPOOL_DIR, and later flushes replay those files before the
+queue once the database answers again. After a failure flushes back off
+(up to ACTIVITY_LOG_MAX_BACKOFF_SECONDS) so a dead database isn't retried
+four times a second. With ACTIVITY_LOG_WRITER_ENABLED=0 enqueue() returns
+False and the caller writes through instead.
+
+Rows still in the queue when the process is killed without a shutdown are
+lost; a normal shutdown flushes, and spools whatever that flush can't write.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Deque, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from models_new import ActivityLog
+from utils.env import bool_env, int_env
+
+logger = logging.getLogger(__name__)
+
+
+ACTIVITY_LOG_FLUSH_MS = max(50, int_env("ACTIVITY_LOG_FLUSH_MS", 250))
+ACTIVITY_LOG_QUEUE_MAX = max(1, int_env("ACTIVITY_LOG_QUEUE_MAX", 10000))
+ACTIVITY_LOG_BATCH_SIZE = max(1, int_env("ACTIVITY_LOG_BATCH_SIZE", 500))
+ACTIVITY_LOG_MAX_BACKOFF_SECONDS = max(1, int_env("ACTIVITY_LOG_MAX_BACKOFF_SECONDS", 30))
+ACTIVITY_LOG_SPOOL_DIR = os.getenv("ACTIVITY_LOG_SPOOL_DIR") or os.path.join(
+    tempfile.gettempdir(), "activity-log-spool"
+)
+# A claimed spool file whose replay hasn't finished in this long belonged to
+# a process that died mid-replay; another process may take it over.
+SPOOL_CLAIM_TIMEOUT_SECONDS = 300
+
+SPOOL_SUFFIX = ".jsonl"
+CLAIM_SUFFIX = ".claimed"
+ROW_FIELDS = ("user_id", "task_id", "action", "entity_type", "entity_id", "details", "ip_address", "user_agent", "timestamp")
+
+
+def activity_row(
+    user_id: int,
+    action: str,
+    task_id: Optional[int] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    details: Optional[dict] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    timestamp: Optional[datetime] = None,
+) -> dict:
+    """An activity_log insert row. Every row carries every column so a batch
+    is a single executemany."""
+    return {
+        "user_id": user_id,
+        "task_id": task_id,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "details": details or {},
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "timestamp": timestamp or datetime.utcnow(),
+    }
+
+
+def _encode_row(row: dict) -> str:
+    return json.dumps(
+        {**row, "timestamp": row["timestamp"].isoformat() if row.get("timestamp") else None},
+        default=str,
+        separators=(",", ":"),
+    )
+
+
+def _decode_row(line: str) -> dict:
+    raw = json.loads(line)
+    row = {field: raw.get(field) for field in ROW_FIELDS}
+    row["timestamp"] = datetime.fromisoformat(raw["timestamp"]) if raw.get("timestamp") else datetime.utcnow()
+    return row
+
+
+def insert_activity_rows(db: Session, rows: List[dict]) -> None:
+    db.execute(insert(ActivityLog.__table__), rows)
+
+
+class ActivityLogWriter:
+    def __init__(
+        self,
+        max_pending: int = ACTIVITY_LOG_QUEUE_MAX,
+        batch_size: int = ACTIVITY_LOG_BATCH_SIZE,
+        spool_dir: str = ACTIVITY_LOG_SPOOL_DIR,
+        enabled: Optional[bool] = None,
+    ):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.spool_dir = Path(spool_dir)
+        self.enabled = bool_env("ACTIVITY_LOG_WRITER_ENABLED", True) if enabled is None else enabled
+        self._queue: Deque[dict] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+        self.written = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, row: dict) -> bool:
+        """Queues a row built by activity_row() for the next flush. False
+        means the writer is off and the caller should write it itself."""
+        if not self.enabled:
+            return False
+        overflow: List[dict] = []
+        with self._lock:
+            self._queue.append(row)
+            if len(self._queue) > self.max_pending:
+                overflow = list(self._queue)
+                self._queue.clear()
+        if overflow:
+            # Nobody is draining fast enough (or the database is down): move
+            # the backlog to disk instead of growing without bound.
+            self.spill(overflow)
+        return True
+
+    def _take(self, limit: int) -> List[dict]:
+        with self._lock:
+            return [self._queue.popleft() for _ in range(min(limit, len(self._queue)))]
+
+    def spill(self, rows: Optional[List[dict]] = None) -> int:
+        """Writes `rows` (default: everything queued) to a new spool file.
+        Returns rows written; rows that can't be spooled either are logged
+        and lost."""
+        if rows is None:
+            with self._lock:
+                rows, self._queue = list(self._queue), deque()
+        if not rows:
+            return 0
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        path = self.spool_dir / f"{name}{SPOOL_SUFFIX}"
+        partial = self.spool_dir / f"{name}.tmp"
+        try:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            with open(partial, "w", encoding="utf-8") as handle:
+                handle.writelines(_encode_row(row) + "\n" for row in rows)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(partial, path)
+        except OSError as exc:
+            logger.error("could not spool %s activity log rows to %s: %s", len(rows), self.spool_dir, exc)
+            self.last_error = str(exc)
+            return 0
+        self.spilled += len(rows)
+        return len(rows)
+
+    def spool_files(self) -> List[Path]:
+        if not self.spool_dir.is_dir():
+            return []
+        return sorted(self.spool_dir.glob(f"*{SPOOL_SUFFIX}"))
+
+    def _claim_spool_files(self) -> List[Path]:
+        """Renames this flush's spool files out of other processes' reach,
+        oldest first, including claims abandoned by a dead process."""
+        candidates = self.spool_files()
+        if self.spool_dir.is_dir():
+            stale_before = time.time() - SPOOL_CLAIM_TIMEOUT_SECONDS
+            for path in self.spool_dir.glob(f"*{CLAIM_SUFFIX}"):
+                try:
+                    if path.stat().st_mtime < stale_before:
+                        candidates.append(path)
+                except OSError:
+                    continue
+        claimed = []
+        for path in sorted(candidates, key=lambda p: p.name):
+            base = path.name.split(SPOOL_SUFFIX)[0]
+            target = self.spool_dir / f"{base}{SPOOL_SUFFIX}.{os.getpid()}{CLAIM_SUFFIX}"
+            try:
+                os.replace(path, target)
+                os.utime(target)
+            except OSError:
+                continue  # another process got there first
+            claimed.append(target)
+        return claimed
+
+    def _release(self, path: Path) -> None:
+        base = path.name.split(SPOOL_SUFFIX)[0]
+        try:
+            os.replace(path, self.spool_dir / f"{base}{SPOOL_SUFFIX}")
+        except OSError:
+            pass
+
+    def _replay_spool(self, session_factory: Callable[[], Session]) -> int:
+        """Inserts the claimed spool files oldest first and returns their
+        rows. `replayed` grows per file as it commits, so the files done
+        before a failure still count."""
+        claimed = self._claim_spool_files()
+        replayed = 0
+        for index, path in enumerate(claimed):
+            try:
+                with open(path, encoding="utf-8") as handle:
+                    rows = [_decode_row(line) for line in handle if line.strip()]
+            except (OSError, ValueError) as exc:
+                logger.error("unreadable activity log spool file %s set aside as .bad: %s", path, exc)
+                try:
+                    os.replace(path, path.with_name(path.name + ".bad"))
+                except OSError:
+                    pass
+                continue
+            committed = 0
+            try:
+                for start in range(0, len(rows), self.batch_size):
+                    committed += self._write(session_factory, rows[start:start + self.batch_size])
+            except Exception:
+                # A file is replayed whole or not at all; batches already
+                # committed would be inserted twice, so keep only the rest.
+                if committed:
+                    self._rewrite(path, rows[committed:])
+                    self.replayed += committed
+                for pending in claimed[index:]:
+                    self._release(pending)
+                raise
+            path.unlink(missing_ok=True)
+            self.replayed += len(rows)
+            replayed += len(rows)
+        return replayed
+
+    def _rewrite(self, path: Path, rows: List[dict]) -> None:
+        partial = path.with_name(path.name + ".tmp")
+        with open(partial, "w", encoding="utf-8") as handle:
+            handle.writelines(_encode_row(row) + "\n" for row in rows)
+        os.replace(partial, path)
+
+    def _write(self, session_factory: Callable[[], Session], rows: List[dict]) -> int:
+        db = session_factory()
+        try:
+            insert_activity_rows(db, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return len(rows)
+
+    def _record_failure(self, exc: Exception) -> None:
+        self.failures += 1
+        self._consecutive_failures += 1
+        self.last_error = str(exc)
+        backoff = min(ACTIVITY_LOG_MAX_BACKOFF_SECONDS, 0.5 * 2 ** (self._consecutive_failures - 1))
+        self._retry_at = time.monotonic() + backoff
+
+    def flush(self, session_factory: Callable[[], Session], *, force: bool = False) -> int:
+        """Replays spool files, then inserts everything queued, a batch per
+        transaction. Returns rows inserted, replayed ones included; the
+        `written` count is the queued ones alone. On failure the batch in hand is
+        spooled, the rest stays queued, and the error is re-raised; until
+        the backoff passes, flushes return 0 unless `force`."""
+        if not force and time.monotonic() < self._retry_at:
+            return 0
+        if not self._flush_lock.acquire(blocking=False):
+            return 0  # another flush is running
+        inserted = 0
+        try:
+            try:
+                inserted += self._replay_spool(session_factory)
+            except Exception as exc:
+                self._record_failure(exc)
+                raise
+            while True:
+                batch = self._take(self.batch_size)
+                if not batch:
+                    break
+                try:
+                    written = self._write(session_factory, batch)
+                except Exception as exc:
+                    self.spill(batch)
+                    self._record_failure(exc)
+                    raise
+                self.written += written
+                inserted += written
+            self._consecutive_failures = 0
+            self._retry_at = 0.0
+        finally:
+            self._flush_lock.release()
+        return inserted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._queue.clear()
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self),
+            "maxPending": self.max_pending,
+            "batchSize": self.batch_size,
+            "spoolFiles": len(self.spool_files()),
+            "written": self.written,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "failures": self.failures,
+            "lastError": self.last_error,
+        }
+
+
+activity_log_writer = ActivityLogWriter()
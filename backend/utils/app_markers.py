@@ -0,0 +1,76 @@
+# utils/app_markers.py
+"""
+Persisted "this one-off job has finished" flags, stored as app_settings rows.
+
+Derived tables (task_visibility, task search documents) and data repairs
+are switched on only after a backfill has covered every existing row. The
+request path asks whether that happened on every call, so the answer is
+cached per process: a set marker is remembered for good, an unset one is
+re-read at most every `recheck_seconds` so a finished backfill is picked up
+without a restart.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models_new import AppSetting
+
+logger = logging.getLogger(__name__)
+
+
+class AppSettingMarker:
+    def __init__(self, key: str, recheck_seconds: int = 60):
+        self.key = key
+        self.recheck_seconds = max(1, int(recheck_seconds))
+        self._lock = threading.Lock()
+        self._value = False
+        self._checked_at = 0.0
+
+    def is_set(self, db: Session) -> bool:
+        """Read through its own connection so a missing app_settings table
+        (older schema, trimmed test databases) can't poison the caller's
+        transaction."""
+        now = time.monotonic()
+        with self._lock:
+            if self._value or now - self._checked_at < self.recheck_seconds:
+                return self._value
+            self._checked_at = now
+        try:
+            with db.get_bind().connect() as conn:
+                value = conn.execute(
+                    select(AppSetting.id).where(AppSetting.key == self.key)
+                ).first() is not None
+        except Exception as exc:
+            logger.debug("marker %s check failed: %s", self.key, exc)
+            value = False
+        with self._lock:
+            self._value = value
+        return value
+
+    def get(self, db: Session) -> Optional[dict]:
+        setting = db.query(AppSetting).filter(AppSetting.key == self.key).first()
+        return setting.value_json if setting else None
+
+    def set(self, db: Session, details: Optional[dict] = None) -> None:
+        """Records the marker in the caller's transaction; commit to publish."""
+        value = {"completedAt": datetime.utcnow().isoformat(), **(details or {})}
+        setting = db.query(AppSetting).filter(AppSetting.key == self.key).first()
+        if setting:
+            setting.value_json = value
+        else:
+            db.add(AppSetting(key=self.key, value_json=value))
+
+    def clear(self, db: Session) -> None:
+        db.query(AppSetting).filter(AppSetting.key == self.key).delete(synchronize_session=False)
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the cached answer (tests, and after a restore)."""
+        with self._lock:
+            self._value = False
+            self._checked_at = 0.0
@@ -0,0 +1,209 @@
+# utils/archived_tasks.py
+"""
+Indexed summary of archived_tasks rows.
+
+An archived task is a task_data JSON snapshot, and the archive endpoints used
+to page over every snapshot with OFFSET and then check
+task_data["creatorId"] in Python, so a user's page came back sparse or empty
+while the database scanned the whole archive. The fields those endpoints
+filter and list on - creator, task number, title, status - are copied onto
+the archived_tasks row, and task_data["participants"] becomes one
+archived_task_participants row per user, when the row is written
+(ArchiveService.archive_task via apply_archived_task_summary()).
+
+Listing reads the columns only once backfill_archived_tasks.py has filled the
+rows archived before them and recorded the app_settings marker (see
+archived_task_columns_ready()); until then it keeps its original scan.
+Access checks on a single row fall back to task_data for a row the backfill
+hasn't reached.
+"""
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import bindparam, delete, exists, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from models_new import ArchivedTask, ArchivedTaskParticipant
+from utils.app_markers import AppSettingMarker
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_TASK_COLUMNS_READY = AppSettingMarker("archived_task_columns")
+
+
+def archived_task_columns_ready(db: Session) -> bool:
+    """`db` is an operational session: app_settings lives there even when the
+    archive has its own database."""
+    return ARCHIVED_TASK_COLUMNS_READY.is_set(db)
+
+
+def _int_or_none(value) -> Optional[int]:
+    try:
+        return int(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _str_or_none(value) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def summarize_task_data(task_data: Optional[dict]) -> tuple[dict, list[tuple[int, Optional[str]]]]:
+    """The archived_tasks summary columns and the (user_id, role) participant
+    pairs for a snapshot, one pair per user (their first role)."""
+    data = task_data if isinstance(task_data, dict) else {}
+    columns = {
+        "creator_id": _int_or_none(data.get("creatorId")),
+        "task_number": _str_or_none(data.get("taskNumber")),
+        "title": _str_or_none(data.get("title")),
+        "status": _str_or_none(data.get("status")),
+    }
+    participants: dict[int, Optional[str]] = {}
+    for participant in data.get("participants") or []:
+        if not isinstance(participant, dict):
+            continue
+        user_id = _int_or_none(participant.get("userId"))
+        if user_id is not None and user_id not in participants:
+            participants[user_id] = _str_or_none(participant.get("role"))
+    return columns, list(participants.items())
+
+
+def apply_archived_task_summary(archived: ArchivedTask) -> None:
+    """Fills the summary columns and participant rows of a new (unflushed)
+    ArchivedTask from its task_data."""
+    columns, participants = summarize_task_data(archived.task_data)
+    for attr, value in columns.items():
+        setattr(archived, attr, value)
+    archived.participants = [
+        ArchivedTaskParticipant(original_task_id=archived.original_task_id, user_id=user_id, role=role)
+        for user_id, role in participants
+    ]
+
+
+def archived_task_creator_id(archived: ArchivedTask) -> Optional[int]:
+    if archived.creator_id is not None:
+        return archived.creator_id
+    return summarize_task_data(archived.task_data)[0]["creator_id"]
+
+
+def user_can_view_archived_task(archive_db: Session, archived: ArchivedTask, user_id: int) -> bool:
+    """Creator or participant of the snapshot."""
+    if archived.creator_id is None:
+        # Not backfilled yet: read the snapshot.
+        columns, participants = summarize_task_data(archived.task_data)
+        return user_id == columns["creator_id"] or any(pid == user_id for pid, _role in participants)
+    if archived.creator_id == user_id:
+        return True
+    return bool(archive_db.scalar(
+        select(
+            exists().where(
+                ArchivedTaskParticipant.archived_task_id == archived.id,
+                ArchivedTaskParticipant.user_id == user_id,
+            )
+        )
+    ))
+
+
+def user_took_part_in_archived_task(archive_db: Session, original_task_id: int, user_id: int) -> bool:
+    """Whether any archived snapshot of task `original_task_id` lists
+    `user_id` as creator or participant - the access check for a task that no
+    longer exists in the operational database."""
+    return bool(archive_db.scalar(
+        select(
+            or_(
+                exists().where(
+                    ArchivedTask.original_task_id == original_task_id,
+                    ArchivedTask.creator_id == user_id,
+                ),
+                exists().where(
+                    ArchivedTaskParticipant.original_task_id == original_task_id,
+                    ArchivedTaskParticipant.user_id == user_id,
+                ),
+            )
+        )
+    ))
+
+
+def refresh_archived_task_summaries(archive_db: Session, rows: list) -> int:
+    """Rewrites the summary columns and participant rows of `rows`, given as
+    (id, original_task_id, task_data). Returns rows updated."""
+    if not rows:
+        return 0
+    table = ArchivedTask.__table__
+    column_rows = []
+    participant_rows = []
+    for archive_id, original_task_id, task_data in rows:
+        columns, participants = summarize_task_data(task_data)
+        column_rows.append({"archive_id": archive_id, **columns})
+        participant_rows.extend(
+            {"archived_task_id": archive_id, "original_task_id": original_task_id, "user_id": user_id, "role": role}
+            for user_id, role in participants
+        )
+    connection = archive_db.connection()
+    connection.execute(
+        update(table)
+        .where(table.c.id == bindparam("archive_id"))
+        .values(
+            creator_id=bindparam("creator_id"),
+            task_number=bindparam("task_number"),
+            title=bindparam("title"),
+            status=bindparam("status"),
+        ),
+        column_rows,
+    )
+    connection.execute(
+        delete(ArchivedTaskParticipant.__table__).where(
+            ArchivedTaskParticipant.__table__.c.archived_task_id.in_([row["archive_id"] for row in column_rows])
+        )
+    )
+    if participant_rows:
+        connection.execute(insert(ArchivedTaskParticipant.__table__), participant_rows)
+    return len(column_rows)
+
+
+def reset_archived_tasks_state() -> None:
+    """Forget cached readiness (tests, and after a restore)."""
+    ARCHIVED_TASK_COLUMNS_READY.reset()
+
+
+def run_archived_task_backfill(
+    archive_db: Session,
+    operational_db: Session,
+    *,
+    batch_size: int = 500,
+    start_after_id: int = 0,
+    mark_ready: bool = True,
+    logger: Optional[logging.Logger] = None,
+) -> dict:
+    """Summarizes every archived task with id > `start_after_id`, committing
+    per batch so an interrupted run can resume from the last id it logged.
+    The marker is written through `operational_db`."""
+    log = logger if logger is not None else logging.getLogger(__name__)
+    last_id = start_after_id
+    rows_scanned = 0
+    started = time.monotonic()
+    while True:
+        rows = archive_db.execute(
+            select(ArchivedTask.id, ArchivedTask.original_task_id, ArchivedTask.task_data)
+            .where(ArchivedTask.id > last_id)
+            .order_by(ArchivedTask.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        refresh_archived_task_summaries(archive_db, [tuple(row) for row in rows])
+        archive_db.commit()
+        rows_scanned += len(rows)
+        last_id = rows[-1][0]
+        log.info("archived task backfill through archive id %s (%s rows)", last_id, rows_scanned)
+
+    if mark_ready:
+        ARCHIVED_TASK_COLUMNS_READY.set(operational_db, {"rows": rows_scanned})
+        operational_db.commit()
+    return {
+        "rowsScanned": rows_scanned,
+        "lastArchiveId": last_id,
+        "markedReady": mark_ready,
+        "elapsedSeconds": round(time.monotonic() - started, 2),
+    }
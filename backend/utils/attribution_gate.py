@@ -0,0 +1,115 @@
+# utils/attribution_gate.py
+"""
+Set-based form of the Task/Client attribution checks in utils/task_gate.py
+and utils/client_gate.py, for callers that validate many events at once.
+
+A capture batch routinely carries dozens of events tagged with the same one
+or two (user, task) pairs and the same client. Checking them one at a time
+re-ran the assignment subqueries for every event. Here the whole batch's
+task and client ids are resolved up front: one query for the Task rows, one
+(cached) query per distinct user for their active task ids, and clients from
+the config snapshot (utils/config_cache.py). Per-event checks are then
+dictionary lookups.
+
+The rules themselves are not restated here - "active" and "assigned" still
+mean exactly what task_gate.py says they mean.
+"""
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from models_new import GenerationClient, Task
+from utils.client_gate import validate_client_for_generation
+from utils.task_gate import ACTIVE_TASK_STATUSES, get_active_task_ids
+
+
+def _ids(values: Iterable[Optional[int]]) -> set[int]:
+    return {int(value) for value in values if value}
+
+
+@dataclass
+class GenerationAttribution:
+    """Pre-resolved attribution lookups for one request's worth of events."""
+
+    tasks: dict[int, Task] = field(default_factory=dict)
+    clients: dict[int, GenerationClient] = field(default_factory=dict)
+    active_task_ids: dict[int, frozenset[int]] = field(default_factory=dict)
+
+    def task_for(self, db: Session, user_id: int, task_id: Optional[int]) -> Optional[Task]:
+        """Same answer as task_gate.validate_task_for_generation()."""
+        if not task_id:
+            return None
+        if user_id not in self.active_task_ids:
+            self.active_task_ids.update(get_active_task_ids(db, [user_id]))
+        if task_id not in self.active_task_ids.get(user_id, frozenset()):
+            return None
+        return self.tasks.get(task_id)
+
+    def client_for(self, client_id: Optional[int]) -> Optional[GenerationClient]:
+        """Same answer as client_gate.validate_client_for_generation()."""
+        if not client_id:
+            return None
+        return self.clients.get(client_id)
+
+
+def prefetch_generation_attribution(
+    db: Session,
+    *,
+    task_ids: Iterable[Optional[int]] = (),
+    client_ids: Iterable[Optional[int]] = (),
+    user_ids: Iterable[Optional[int]] = (),
+) -> GenerationAttribution:
+    """Resolves every task and client id a batch mentions in one pass.
+
+    `user_ids` is optional - users not named here are looked up lazily (and
+    still from the per-user cache) the first time task_for() sees them, which
+    suits capture routers that only learn the actor while walking the batch.
+    """
+    wanted_task_ids = _ids(task_ids)
+    tasks: dict[int, Task] = {}
+    if wanted_task_ids:
+        tasks = {
+            task.id: task
+            for task in (
+                db.query(Task)
+                .filter(
+                    Task.id.in_(wanted_task_ids),
+                    Task.is_deleted == False,  # noqa: E712
+                    Task.status.in_(ACTIVE_TASK_STATUSES),
+                )
+                .all()
+            )
+        }
+
+    clients: dict[int, GenerationClient] = {}
+    for client_id in _ids(client_ids):
+        client = validate_client_for_generation(db, client_id)
+        if client is not None:
+            clients[client_id] = client
+
+    wanted_user_ids = _ids(user_ids)
+    active_task_ids = get_active_task_ids(db, wanted_user_ids) if wanted_user_ids and tasks else {}
+    return GenerationAttribution(tasks=tasks, clients=clients, active_task_ids=dict(active_task_ids))
+
+
+def validate_generation_attributions(
+    db: Session,
+    task_pairs: Iterable[tuple[int, int]],
+    client_ids: Iterable[Optional[int]] = (),
+) -> tuple[dict[tuple[int, int], Optional[Task]], dict[int, Optional[GenerationClient]]]:
+    """Answers a set of (user_id, task_id) pairs and client ids together.
+
+    Returns ({(user_id, task_id): Task | None}, {client_id: GenerationClient | None}).
+    """
+    pairs = {(int(user_id), int(task_id)) for user_id, task_id in task_pairs if user_id and task_id}
+    wanted_client_ids = _ids(client_ids)
+    attribution = prefetch_generation_attribution(
+        db,
+        task_ids=[task_id for _user_id, task_id in pairs],
+        client_ids=wanted_client_ids,
+        user_ids=[user_id for user_id, _task_id in pairs],
+    )
+    tasks = {(user_id, task_id): attribution.task_for(db, user_id, task_id) for user_id, task_id in pairs}
+    clients = {client_id: attribution.client_for(client_id) for client_id in wanted_client_ids}
+    return tasks, clients
@@ -0,0 +1,401 @@
+# utils/backfill_engine.py
+"""
+Streaming, checkpointed replay of a capture-event table.
+
+The provider backfills (backfill_all in providers/*/normalization.py) used
+to page through their event table with `id > last_id ORDER BY id LIMIT n`
+on the same session that did the normalizing, so every page was a fresh
+index seek and every loaded event - JSON payload included - stayed in that
+session's identity map until the run ended.
+
+A BackfillJob describes the replay: the event model, the filter, and the
+per-batch function the live path already uses. replay_range() reads the
+events through a server-side cursor (yield_per + stream_results) on its own
+session, so committing the normalizer's work never closes the cursor; each
+batch is merge()d into the working session without a reload, processed, and
+then dropped from both sessions.
+
+run_backfill() is the resumable form the scripts use. It splits the id
+range into partitions, records each one in backfill_checkpoints, and moves a
+partition's last_id forward after every batch, so an interrupted run picks
+up where each partition stopped. With workers > 1 the partitions run in
+separate processes (spawned, each with its own engine); jobs whose batches
+must see events strictly in id order (parallel_safe=False) always run as a
+single partition. Progress - rows done, rows per second and an ETA - is
+logged per batch and, for multi-process runs, for the whole run every
+`progress_interval` seconds from the checkpoint rows.
+"""
+import importlib
+import logging
+import math
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from models_new import BackfillCheckpoint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_FACTORY = "database_config:OperationalSessionLocal"
+
+BACKFILL_JOBS: dict[str, str] = {
+    "freepik-normalization": "providers.freepik.normalization:BACKFILL_JOB",
+    "higgsfield-normalization": "providers.higgsfield.normalization:BACKFILL_JOB",
+    "chatgpt-normalization": "providers.chatgpt.normalization:BACKFILL_JOB",
+    "freepik-payload-compaction": "providers.freepik.capture:PAYLOAD_COMPACTION_JOB",
+    "heygen-payload-compaction": "providers.heygen.capture:PAYLOAD_COMPACTION_JOB",
+    "higgsfield-payload-compaction": "providers.higgsfield.capture:PAYLOAD_COMPACTION_JOB",
+    "envato-payload-compaction": "providers.envato.capture:PAYLOAD_COMPACTION_JOB",
+    "elevenlabs-payload-compaction": "providers.elevenlabs.capture:PAYLOAD_COMPACTION_JOB",
+    "flow-payload-compaction": "providers.flow.capture:PAYLOAD_COMPACTION_JOB",
+}
+
+
+@dataclass(frozen=True)
+class BackfillJob:
+    name: str
+    model: type
+    # (db, events) -> counts to add to the run's stats. Commits its own work.
+    process_batch: Callable[[Session, list], dict]
+    criteria: tuple = ()
+    parallel_safe: bool = True
+
+    @property
+    def id_column(self):
+        return self.model.id
+
+    def statement(self, after_id: int = 0, through_id: Optional[int] = None):
+        stmt = select(self.model).where(*self.criteria, self.id_column > after_id)
+        if through_id is not None:
+            stmt = stmt.where(self.id_column <= through_id)
+        return stmt.order_by(self.id_column)
+
+
+def _resolve(ref: str):
+    module_name, _, attr = ref.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def resolve_backfill_job(ref: str) -> BackfillJob:
+    """A BACKFILL_JOBS name, or a "module:attribute" path to a BackfillJob."""
+    return _resolve(BACKFILL_JOBS.get(ref, ref))
+
+
+class BackfillProgress:
+    def __init__(self, total: int, done: int = 0):
+        self.total = total
+        self.done = done
+        self._baseline = done
+        self._started = time.monotonic()
+
+    def advance(self, rows: int) -> None:
+        self.done += rows
+
+    def set_done(self, done: int) -> None:
+        self.done = done
+
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self._started
+        return (self.done - self._baseline) / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self) -> Optional[float]:
+        rate = self.rate()
+        if rate <= 0:
+            return None
+        return max(0, self.total - self.done) / rate
+
+    def describe(self) -> str:
+        percent = 100.0 * self.done / self.total if self.total else 100.0
+        eta = self.eta_seconds()
+        eta_text = f"{int(eta // 60)}m{int(eta % 60):02d}s" if eta is not None else "?"
+        return f"{self.done}/{self.total} rows ({percent:.1f}%), {self.rate():.0f} rows/s, ETA {eta_text}"
+
+    def to_dict(self) -> dict:
+        eta = self.eta_seconds()
+        return {
+            "processed": self.done,
+            "total": self.total,
+            "rowsPerSecond": round(self.rate(), 1),
+            "etaSeconds": round(eta, 1) if eta is not None else None,
+            "elapsedSeconds": round(time.monotonic() - self._started, 2),
+        }
+
+
+def stream_batches(db: Session, statement, batch_size: int) -> Iterator[list]:
+    """Yields the rows of `statement` `batch_size` at a time from a
+    server-side cursor on a separate session bound to db's engine. A batch's
+    objects are expunged once the caller asks for the next one."""
+    reader = Session(bind=db.get_bind())
+    try:
+        result = reader.scalars(statement.execution_options(yield_per=batch_size, stream_results=True))
+        for partition in result.partitions():
+            rows = list(partition)
+            yield rows
+            # Not expunge_all(): that swaps out the identity map the open
+            # yield_per result is still loading into.
+            for row in rows:
+                reader.expunge(row)
+    finally:
+        reader.close()
+
+
+def count_rows(db: Session, job: BackfillJob, after_id: int = 0, through_id: Optional[int] = None) -> int:
+    stmt = select(func.count()).select_from(job.model).where(*job.criteria, job.id_column > after_id)
+    if through_id is not None:
+        stmt = stmt.where(job.id_column <= through_id)
+    return db.scalar(stmt) or 0
+
+
+def replay_range(
+    db: Session,
+    job: BackfillJob,
+    *,
+    after_id: int = 0,
+    through_id: Optional[int] = None,
+    batch_size: int = 500,
+    on_batch: Optional[Callable[[int, dict], None]] = None,
+    progress: Optional[BackfillProgress] = None,
+    log: Optional[logging.Logger] = None,
+) -> dict:
+    """Replays `job`'s events with after_id < id <= through_id, oldest first.
+    Returns {"processed", "lastId", ...counts from process_batch}.
+    `on_batch(last_id, stats)` runs after each batch has committed."""
+    log = log if log is not None else logger
+    stats: dict = {"processed": 0}
+    last_id = after_id
+    for rows in stream_batches(db, job.statement(after_id, through_id), max(1, batch_size)):
+        events = [db.merge(row, load=False) for row in rows]
+        for key, value in (job.process_batch(db, events) or {}).items():
+            if isinstance(value, (int, float)):
+                stats[key] = stats.get(key, 0) + value
+        last_id = rows[-1].id
+        stats["processed"] += len(rows)
+        db.expunge_all()
+        if on_batch is not None:
+            on_batch(last_id, stats)
+        if progress is not None:
+            progress.advance(len(rows))
+            log.info("%s backfill through id %s: %s", job.name, last_id, progress.describe())
+        else:
+            log.info("%s backfill through id %s: %s rows", job.name, last_id, stats["processed"])
+    stats["lastId"] = last_id
+    return stats
+
+
+def plan_partitions(first_id: int, last_id: int, count: int) -> list[tuple[int, int]]:
+    """Splits ids first_id..last_id into `count` contiguous (after_id,
+    through_id] ranges of equal width."""
+    count = max(1, count)
+    width = max(1, math.ceil((last_id - first_id + 1) / count))
+    ranges = []
+    after = first_id - 1
+    while after < last_id:
+        through = min(last_id, after + width)
+        ranges.append((after, through))
+        after = through
+    return ranges
+
+
+def _checkpoints(db: Session, job_name: str) -> list[BackfillCheckpoint]:
+    return list(db.scalars(
+        select(BackfillCheckpoint).where(BackfillCheckpoint.job == job_name).order_by(BackfillCheckpoint.partition_index)
+    ))
+
+
+def plan_backfill(db: Session, job: BackfillJob, *, partitions: int = 1, resume: bool = True) -> list[BackfillCheckpoint]:
+    """The checkpoint rows this run works through: the unfinished ones from
+    the previous run when resuming, otherwise a fresh plan over the job's
+    current id range."""
+    existing = _checkpoints(db, job.name)
+    if resume and any(checkpoint.status != "done" for checkpoint in existing):
+        return [checkpoint for checkpoint in existing if checkpoint.status != "done"]
+    db.execute(delete(BackfillCheckpoint).where(BackfillCheckpoint.job == job.name))
+    first_id, last_id = db.execute(
+        select(func.min(job.id_column), func.max(job.id_column)).where(*job.criteria)
+    ).one()
+    planned = []
+    if first_id is not None:
+        count = partitions if job.parallel_safe else 1
+        for index, (after, through) in enumerate(plan_partitions(first_id, last_id, count)):
+            checkpoint = BackfillCheckpoint(
+                job=job.name, partition_index=index, range_start=after, range_end=through,
+                last_id=after, rows_processed=0, stats={}, status="pending",
+            )
+            db.add(checkpoint)
+            planned.append(checkpoint)
+    db.commit()
+    return planned
+
+
+def save_checkpoint(
+    db: Session,
+    job_name: str,
+    last_id: int,
+    *,
+    rows_processed: Optional[int] = None,
+    stats: Optional[dict] = None,
+    status: str = "running",
+) -> None:
+    """Records progress for a job that runs as a single range outside
+    run_backfill() (partition 0), and commits."""
+    checkpoint = db.scalar(
+        select(BackfillCheckpoint).where(BackfillCheckpoint.job == job_name, BackfillCheckpoint.partition_index == 0)
+    )
+    if checkpoint is None:
+        checkpoint = BackfillCheckpoint(
+            job=job_name, partition_index=0, range_start=0, range_end=last_id,
+            started_at=datetime.utcnow(), stats={},
+        )
+        db.add(checkpoint)
+    checkpoint.last_id = last_id
+    checkpoint.range_end = max(checkpoint.range_end or 0, last_id)
+    checkpoint.status = status
+    if rows_processed is not None:
+        checkpoint.rows_processed = rows_processed
+    if stats is not None:
+        checkpoint.stats = stats
+    db.commit()
+
+
+def checkpoint_last_id(db: Session, job_name: str) -> Optional[int]:
+    """The last id save_checkpoint() recorded for `job_name`, if any."""
+    return db.scalar(
+        select(BackfillCheckpoint.last_id).where(BackfillCheckpoint.job == job_name, BackfillCheckpoint.partition_index == 0)
+    )
+
+
+def _add_stats(saved: dict, stats: dict) -> dict:
+    totals = dict(saved)
+    for key, value in stats.items():
+        if key != "lastId":
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _run_partition(job_ref: str, session_factory_ref: str, checkpoint_id: int, batch_size: int) -> dict:
+    """One partition of run_backfill(), in this process or a worker."""
+    job = resolve_backfill_job(job_ref)
+    db = _resolve(session_factory_ref)()
+    try:
+        checkpoint = db.get(BackfillCheckpoint, checkpoint_id)
+        after_id, through_id = checkpoint.last_id, checkpoint.range_end
+        saved_rows, saved_stats = checkpoint.rows_processed or 0, dict(checkpoint.stats or {})
+        log = logging.getLogger(f"{__name__}.{job.name}.p{checkpoint.partition_index}")
+        checkpoint.status = "running"
+        checkpoint.error = None
+        checkpoint.started_at = checkpoint.started_at or datetime.utcnow()
+        db.commit()
+        progress = BackfillProgress(count_rows(db, job, after_id, through_id))
+        db.expunge_all()
+
+        def save(last_id: int, stats: dict, **values) -> None:
+            db.execute(
+                update(BackfillCheckpoint).where(BackfillCheckpoint.id == checkpoint_id).values(
+                    last_id=last_id,
+                    rows_processed=saved_rows + stats.get("processed", 0),
+                    stats=_add_stats(saved_stats, stats),
+                    updated_at=datetime.utcnow(),
+                    **values,
+                )
+            )
+            db.commit()
+
+        try:
+            stats = replay_range(
+                db, job, after_id=after_id, through_id=through_id, batch_size=batch_size,
+                on_batch=save, progress=progress, log=log,
+            )
+        except Exception as exc:
+            db.rollback()
+            db.execute(
+                update(BackfillCheckpoint).where(BackfillCheckpoint.id == checkpoint_id)
+                .values(status="failed", error=str(exc)[:2000], updated_at=datetime.utcnow())
+            )
+            db.commit()
+            log.exception("%s partition failed; a resumed run continues after its last checkpoint", job.name)
+            return {"checkpointId": checkpoint_id, "failed": True, "error": str(exc)}
+        save(stats["lastId"], stats, status="done", finished_at=datetime.utcnow())
+        return {"checkpointId": checkpoint_id, "failed": False, **progress.to_dict()}
+    finally:
+        db.close()
+
+
+def run_backfill(
+    job_ref: str,
+    *,
+    workers: int = 1,
+    partitions: Optional[int] = None,
+    batch_size: int = 500,
+    resume: bool = True,
+    session_factory: str = DEFAULT_SESSION_FACTORY,
+    progress_interval: float = 10.0,
+    log: Optional[logging.Logger] = None,
+) -> dict:
+    """Replays a job (a BACKFILL_JOBS name or "module:attribute") over
+    `partitions` id ranges (default: one per worker), `workers` processes at
+    a time. Resumes the previous run's unfinished partitions unless
+    `resume` is False. `session_factory` is a "module:attribute" path so
+    worker processes can build their own."""
+    log = log if log is not None else logger
+    job = resolve_backfill_job(job_ref)
+    workers = max(1, workers) if job.parallel_safe else 1
+    if not job.parallel_safe and partitions not in (None, 1):
+        log.warning("%s replays strictly in id order; running it as one partition", job.name)
+    started = time.monotonic()
+    db = _resolve(session_factory)()
+    try:
+        planned = plan_backfill(db, job, partitions=partitions or workers, resume=resume)
+        remaining = sum(count_rows(db, job, checkpoint.last_id, checkpoint.range_end) for checkpoint in planned)
+        checkpoint_ids = [checkpoint.id for checkpoint in planned]
+        log.info("%s backfill: %s partition(s), %s rows to replay, %s worker(s)", job.name, len(planned), remaining, workers)
+
+        if workers == 1 or len(checkpoint_ids) <= 1:
+            results = [_run_partition(job_ref, session_factory, checkpoint_id, batch_size) for checkpoint_id in checkpoint_ids]
+        else:
+            progress = BackfillProgress(remaining)
+            baseline = _rows_done(db, checkpoint_ids)
+            results = []
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, len(checkpoint_ids)), mp_context=context) as pool:
+                pending = {
+                    pool.submit(_run_partition, job_ref, session_factory, checkpoint_id, batch_size)
+                    for checkpoint_id in checkpoint_ids
+                }
+                while pending:
+                    finished, pending = wait(pending, timeout=progress_interval, return_when=FIRST_COMPLETED)
+                    results.extend(future.result() for future in finished)
+                    progress.set_done(_rows_done(db, checkpoint_ids) - baseline)
+                    log.info("%s backfill: %s", job.name, progress.describe())
+
+        db.expire_all()
+        checkpoints = [db.get(BackfillCheckpoint, checkpoint_id) for checkpoint_id in checkpoint_ids]
+        totals: dict = {}
+        for checkpoint in checkpoints:
+            for key, value in (checkpoint.stats or {}).items():
+                totals[key] = totals.get(key, 0) + value
+        elapsed = time.monotonic() - started
+        replayed = sum(result.get("processed", 0) for result in results)
+        return {
+            "job": job.name,
+            "stats": totals,
+            "rowsThisRun": replayed,
+            "rowsPerSecond": round(replayed / elapsed, 1) if elapsed > 0 else None,
+            "elapsedSeconds": round(elapsed, 2),
+            "failed": any(result["failed"] for result in results),
+            "partitions": [checkpoint.to_dict() for checkpoint in checkpoints],
+        }
+    finally:
+        db.close()
+
+
+def _rows_done(db: Session, checkpoint_ids: list[int]) -> int:
+    db.rollback()  # a fresh snapshot of the workers' commits
+    return db.scalar(
+        select(func.coalesce(func.sum(BackfillCheckpoint.rows_processed), 0)).where(BackfillCheckpoint.id.in_(checkpoint_ids))
+    ) or 0
@@ -8,6 +8,8 @@ from functools import wraps
 from fastapi import Request
 from starlette.concurrency import run_in_threadpool
 
+from utils.metrics import CACHE_REQUESTS
+
 try:
     import redis.asyncio as redis
 except ImportError:  # pragma: no cover - graceful fallback when dependency is absent
@@ -163,6 +165,7 @@ def cache_response(
 
     def decorator(func):
         is_coroutine = asyncio.iscoroutinefunction(func)
+        metrics_namespace = _normalize_namespace(namespace or func.__name__)
 
         async def _call(*args, **kwargs):
             if is_coroutine:
@@ -177,13 +180,17 @@ def cache_response(
 
             key = _build_cache_key(request, vary_by_user, namespace=namespace)
 
-            if redis_client is not None:
+            if redis_client is None:
+                CACHE_REQUESTS.labels(namespace=metrics_namespace, result="disabled").inc()
+            else:
                 try:
                     cached = await redis_client.get(key)
                     if cached:
+                        CACHE_REQUESTS.labels(namespace=metrics_namespace, result="hit").inc()
                         return json.loads(cached)
                 except Exception as exc:  # pragma: no cover - depends on runtime infra
                     logger.warning("Redis read failed for %s: %s", key, exc)
+                CACHE_REQUESTS.labels(namespace=metrics_namespace, result="miss").inc()
 
             result = await _call(*args, **kwargs)
 
@@ -11,6 +11,7 @@ from typing import Optional
 from sqlalchemy.orm import Session
 
 from models_new import GenerationClient
+from utils.config_cache import get_active_client
 
 
 def get_active_clients(db: Session, limit: int = 500) -> list[GenerationClient]:
@@ -30,8 +31,4 @@ def validate_client_for_generation(db: Session, client_id: Optional[int]) -> Opt
     browser, or otherwise) at face value."""
     if not client_id:
         return None
-    return (
-        db.query(GenerationClient)
-        .filter(GenerationClient.id == client_id, GenerationClient.is_active == True)  # noqa: E712
-        .first()
-    )
+    return get_active_client(db, client_id)
@@ -0,0 +1,224 @@
+# utils/config_cache.py
+"""
+Per-process cache of the slow-changing configuration every capture and
+usage-event request resolves before doing any real work: active ITPortalTool
+rows (by slug, id and hostname), ITPortalToolCredential resolution per
+(tool, user), and active GenerationClient rows.
+
+These rows change a handful of times a week (an admin edits a tool, rotates a
+credential, adds a client), but were read from Postgres on every single
+capture POST - several times per event in a batch. Here they are loaded once
+into a snapshot that lives for CONFIG_CACHE_TTL_SECONDS and is thrown away
+early when the config version moves.
+
+Versioning
+----------
+Admin mutation endpoints (routers/it_tools_router.py, routers/clients_router.py)
+call invalidate_config_cache() after committing. That clears this process's
+snapshot immediately and INCRs a version key in Redis; every other uvicorn
+worker compares that key at most once per CONFIG_CACHE_VERSION_CHECK_SECONDS
+and drops its own snapshot when it has moved. Without Redis (local dev) the
+TTL alone bounds staleness, which is what the TTL is for.
+
+What is cached, and how it comes back
+-------------------------------------
+Column values only - never live ORM instances. A cached row is rebuilt and
+handed to the caller through Session.merge(load=False), which attaches it to
+the caller's session without emitting a SELECT. Callers therefore get an
+ordinary persistent instance they can read (and, for credentials, update)
+exactly as before; they never share mutable state with another request.
+"""
+import threading
+import time
+from typing import Callable, Hashable, Iterable, Optional
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from models_new import GenerationClient, ITPortalTool
+from utils.env import int_env
+from utils.local_cache import VersionWatcher
+
+
+CONFIG_CACHE_TTL_SECONDS = max(0, int_env("CONFIG_CACHE_TTL_SECONDS", 60))
+CONFIG_CACHE_VERSION_CHECK_SECONDS = max(1, int_env("CONFIG_CACHE_VERSION_CHECK_SECONDS", 5))
+CONFIG_CACHE_VERSION_KEY = "config-cache:version"
+
+_MISSING = object()
+_LOCK = threading.Lock()
+_STATE: dict = {"snapshot": None}
+_VERSION = VersionWatcher(CONFIG_CACHE_VERSION_KEY, CONFIG_CACHE_VERSION_CHECK_SECONDS)
+_STATS = {"hits": 0, "misses": 0, "reloads": 0, "invalidations": 0}
+
+
+class _Snapshot:
+    __slots__ = ("loaded_at", "tools", "clients", "lookups")
+
+    def __init__(self):
+        self.loaded_at = time.monotonic()
+        # Each section loads on first use, so a worker that only ever serves
+        # one provider's captures never reads the client table at all.
+        self.tools: Optional[list[dict]] = None
+        self.clients: Optional[dict[int, dict]] = None
+        # (namespace, key) -> (model, column dict) | (None, None)
+        self.lookups: dict[tuple, tuple] = {}
+
+
+def _cache_enabled() -> bool:
+    return CONFIG_CACHE_TTL_SECONDS > 0
+
+
+def _row_values(instance) -> dict:
+    mapper = sa_inspect(instance).mapper
+    return {attr.key: getattr(instance, attr.key) for attr in mapper.column_attrs}
+
+
+def _attach(db: Session, model, values: Optional[dict]):
+    """Rebuilds a cached row as an instance persistent in `db` - no SELECT."""
+    if values is None:
+        return None
+    instance = model(**values)
+    make_transient_to_detached(instance)
+    return db.merge(instance, load=False)
+
+
+def _current_snapshot() -> _Snapshot:
+    with _LOCK:
+        snapshot = _STATE["snapshot"]
+        stale = (
+            snapshot is None
+            or time.monotonic() - snapshot.loaded_at >= CONFIG_CACHE_TTL_SECONDS
+            or _VERSION.changed()
+        )
+        if stale:
+            snapshot = _Snapshot()
+            _STATE["snapshot"] = snapshot
+            _STATS["reloads"] += 1
+        return snapshot
+
+
+# Sections are loaded outside the lock so a slow query never serialises every
+# capture thread behind it; two threads racing on a cold section both load it
+# and the last one wins, which is harmless for read-only data.
+def _snapshot_tools(db: Session) -> list[dict]:
+    snapshot = _current_snapshot()
+    if snapshot.tools is None:
+        tools = (
+            db.query(ITPortalTool)
+            .filter(ITPortalTool.is_active == True)  # noqa: E712
+            .order_by(ITPortalTool.id.asc())
+            .all()
+        )
+        snapshot.tools = [_row_values(tool) for tool in tools]
+    return snapshot.tools
+
+
+def _snapshot_clients(db: Session) -> dict[int, dict]:
+    snapshot = _current_snapshot()
+    if snapshot.clients is None:
+        clients = (
+            db.query(GenerationClient)
+            .filter(GenerationClient.is_active == True)  # noqa: E712
+            .all()
+        )
+        snapshot.clients = {client.id: _row_values(client) for client in clients}
+    return snapshot.clients
+
+
+def invalidate_config_cache() -> None:
+    """Drop this process's snapshot and tell every other worker to do the
+    same. Call after committing any change to tools, credentials or clients."""
+    with _LOCK:
+        _STATE["snapshot"] = None
+        _STATS["invalidations"] += 1
+    _VERSION.bump()
+
+
+def get_config_cache_stats() -> dict:
+    with _LOCK:
+        snapshot = _STATE["snapshot"]
+        return {
+            **_STATS,
+            "enabled": _cache_enabled(),
+            "ttlSeconds": CONFIG_CACHE_TTL_SECONDS,
+            "ageSeconds": round(time.monotonic() - snapshot.loaded_at, 1) if snapshot else None,
+            "lookups": len(snapshot.lookups) if snapshot else 0,
+        }
+
+
+def get_active_tools(db: Session) -> list[ITPortalTool]:
+    """Every active ITPortalTool, ordered by id."""
+    if not _cache_enabled():
+        return (
+            db.query(ITPortalTool)
+            .filter(ITPortalTool.is_active == True)  # noqa: E712
+            .order_by(ITPortalTool.id.asc())
+            .all()
+        )
+    return [_attach(db, ITPortalTool, values) for values in _snapshot_tools(db)]
+
+
+def get_active_tool_by_slugs(db: Session, slugs: Iterable[str]) -> Optional[ITPortalTool]:
+    """The lowest-id active tool whose slug is one of `slugs`."""
+    wanted = set(slugs)
+    if not _cache_enabled():
+        return (
+            db.query(ITPortalTool)
+            .filter(ITPortalTool.slug.in_(tuple(wanted)))
+            .filter(ITPortalTool.is_active == True)  # noqa: E712
+            .order_by(ITPortalTool.id.asc())
+            .first()
+        )
+    for values in _snapshot_tools(db):
+        if values.get("slug") in wanted:
+            return _attach(db, ITPortalTool, values)
+    return None
+
+
+def get_active_tool_by_id(db: Session, tool_id: int) -> Optional[ITPortalTool]:
+    if not _cache_enabled():
+        return (
+            db.query(ITPortalTool)
+            .filter(ITPortalTool.id == tool_id, ITPortalTool.is_active == True)  # noqa: E712
+            .first()
+        )
+    for values in _snapshot_tools(db):
+        if values.get("id") == tool_id:
+            return _attach(db, ITPortalTool, values)
+    return None
+
+
+def get_active_client(db: Session, client_id: int) -> Optional[GenerationClient]:
+    if not _cache_enabled():
+        return (
+            db.query(GenerationClient)
+            .filter(GenerationClient.id == client_id, GenerationClient.is_active == True)  # noqa: E712
+            .first()
+        )
+    return _attach(db, GenerationClient, _snapshot_clients(db).get(client_id))
+
+
+def cached_lookup(db: Session, namespace: str, key: Hashable, resolve: Callable[[], object]):
+    """Memoizes a single-row resolution (credential for (tool, user), tool for
+    a hostname, ...) for the life of the current snapshot.
+
+    `resolve` runs against `db` on a miss and returns an ORM instance or None;
+    both outcomes are cached, so a user with no credential doesn't re-query
+    on every event either.
+    """
+    if not _cache_enabled():
+        return resolve()
+    snapshot = _current_snapshot()
+    cache_key = (namespace, key)
+    with _LOCK:
+        cached = snapshot.lookups.get(cache_key, _MISSING)
+        _STATS["hits" if cached is not _MISSING else "misses"] += 1
+    if cached is not _MISSING:
+        model, values = cached
+        return _attach(db, model, values) if model is not None else None
+
+    instance = resolve()
+    entry = (type(instance), _row_values(instance)) if instance is not None else (None, None)
+    with _LOCK:
+        snapshot.lookups[cache_key] = entry
+    return instance
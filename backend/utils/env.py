@@ -0,0 +1,24 @@
+import os
+
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def int_env(name: str, default: int) -> int:
+    """The variable as an int; `default` when it is unset, blank or not a
+    number."""
+    raw = (os.getenv(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        return default
+
+
+def bool_env(name: str, default: bool = False) -> bool:
+    """1/true/yes/on (any case) are true, anything else set is false;
+    `default` when it is unset or blank."""
+    raw = (os.getenv(name) or "").strip().lower()
+    if not raw:
+        return default
+    return raw in _TRUE_VALUES
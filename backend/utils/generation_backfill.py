@@ -7,11 +7,12 @@ from datetime import datetime
 from typing import Optional
 from urllib.parse import urlparse
 
-from sqlalchemy import inspect
+from sqlalchemy import inspect, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from models_new import GenerationRecord, ITPortalTool, ITPortalToolUsageEvent
+from utils.backfill_engine import save_checkpoint, stream_batches
 
 LOGGER = logging.getLogger(__name__)
 KLING_TOOL_SLUGS = {"kling", "kling-ai", "klingai"}
@@ -22,6 +23,7 @@ INTERNAL_ASSET_HINT_RE = re.compile(
     flags=re.IGNORECASE,
 )
 _GENERATION_TABLE_READY_BINDS: set[str] = set()
+GENERATION_BACKFILL_JOB = "generation-records"
 
 
 @dataclass
@@ -715,8 +717,13 @@ def run_generation_records_backfill(
     batch_size: int = 500,
     max_rows: Optional[int] = None,
     start_after_id: int = 0,
+    checkpoint: bool = False,
     logger: Optional[logging.Logger] = None,
 ) -> BackfillSummary:
+    """Scans Kling usage events after `start_after_id` into generation_records
+    (dry run unless `apply`). With `checkpoint`, each applied batch records
+    its last id under GENERATION_BACKFILL_JOB in backfill_checkpoints, where
+    backfill_generation_records.py --resume picks it up."""
     logger = logger or LOGGER
     _ensure_generation_tables_exist(session)
     summary = BackfillSummary(
@@ -738,29 +745,23 @@ def run_generation_records_backfill(
         return summary
 
     last_id = summary.start_after_id
-    processed = 0
-
-    while True:
-        remaining = None if summary.max_rows is None else max(summary.max_rows - processed, 0)
-        if remaining == 0:
-            break
-        current_limit = summary.batch_size if remaining is None else min(summary.batch_size, remaining)
-        rows = (
-            session.query(ITPortalToolUsageEvent)
-            .filter(
-                ITPortalToolUsageEvent.tool_id.in_(kling_tool_ids),
-                ITPortalToolUsageEvent.id > last_id,
-            )
-            .order_by(ITPortalToolUsageEvent.id.asc())
-            .limit(current_limit)
-            .all()
+    statement = (
+        select(ITPortalToolUsageEvent)
+        .where(
+            ITPortalToolUsageEvent.tool_id.in_(kling_tool_ids),
+            ITPortalToolUsageEvent.id > last_id,
         )
-        if not rows:
-            break
+        .order_by(ITPortalToolUsageEvent.id.asc())
+    )
+    if summary.max_rows is not None:
+        statement = statement.limit(summary.max_rows)
 
+    # Streamed on a separate session (utils/backfill_engine.py) so the
+    # per-batch commits below don't close the cursor and the scanned usage
+    # events, metadata JSON included, don't pile up in `session`.
+    for rows in stream_batches(session, statement, summary.batch_size):
         last_id = rows[-1].id
         summary.last_processed_id = last_id
-        processed += len(rows)
 
         batch_candidates: list[BackfillCandidate] = []
         for row in rows:
@@ -885,6 +886,11 @@ def run_generation_records_backfill(
 
         if apply:
             session.commit()
+            if checkpoint:
+                save_checkpoint(
+                    session, GENERATION_BACKFILL_JOB, last_id,
+                    rows_processed=summary.scanned_rows, stats=summary.to_dict(),
+                )
         else:
             session.rollback()
 
@@ -25,6 +25,7 @@ from providers.flow.constants import TOOL_SLUGS as FLOW_GATE_TOOL_SLUGS
 from providers.freepik.constants import TOOL_SLUGS as FREEPIK_GATE_TOOL_SLUGS
 from providers.heygen.constants import TOOL_SLUGS as HEYGEN_GATE_TOOL_SLUGS
 from providers.higgsfield.constants import TOOL_SLUGS as HIGGSFIELD_GATE_TOOL_SLUGS
+from utils.config_cache import get_active_tool_by_slugs
 from utils.generation_backfill import KLING_TOOL_SLUGS as KLING_GATE_TOOL_SLUGS
 
 
@@ -48,9 +49,4 @@ def resolve_generation_gate_tool(db: Session, tool_slug: Optional[str]) -> Optio
         slugs = ELEVENLABS_GATE_TOOL_SLUGS
     else:
         slugs = FREEPIK_GATE_TOOL_SLUGS
-    return (
-        db.query(ITPortalTool)
-        .filter(ITPortalTool.slug.in_(tuple(slugs)))
-        .filter(ITPortalTool.is_active == True)  # noqa: E712
-        .first()
-    )
+    return get_active_tool_by_slugs(db, slugs)
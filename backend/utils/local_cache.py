@@ -0,0 +1,143 @@
+# utils/local_cache.py
+"""
+Building blocks for process-local caches that still have to agree across
+uvicorn workers.
+
+utils/cache.py covers whole-response caching in Redis for async endpoints.
+The caches built on this module are different: they sit on hot synchronous
+paths (capture ingestion, attribution checks) where even a Redis round-trip
+per call is too much, so the data lives in process memory and Redis is only
+used to carry a version counter that says "throw yours away".
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def sync_redis_client():
+    """The process's synchronous Redis client, or None.
+
+    auth.py owns that client (reconnect cooldown, single-flight connect). Any
+    failure there means "no cross-worker signal" to callers here - never an
+    error on the path that asked.
+    """
+    try:
+        from auth import _get_redis_client
+
+        return _get_redis_client()
+    except Exception:
+        return None
+
+
+class VersionWatcher:
+    """A Redis counter other workers poll to learn a local cache went stale.
+
+    changed() reads the counter at most once per `check_seconds` and reports
+    whether it moved since the last read; bump() increments it. Without Redis
+    both are no-ops and the caller's own TTL is the only staleness bound.
+    """
+
+    def __init__(self, key: str, check_seconds: int = 5):
+        self.key = key
+        self.check_seconds = max(1, int(check_seconds))
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+
+    def changed(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.check_seconds:
+                return False
+            self._checked_at = now
+        client = sync_redis_client()
+        if client is None:
+            return False
+        try:
+            version = client.get(self.key)
+        except Exception:
+            return False
+        with self._lock:
+            previous = self._version
+            self._version = version
+        return previous is not None and version != previous
+
+    def bump(self) -> None:
+        client = sync_redis_client()
+        if client is None:
+            return
+        try:
+            version = f"{client.incr(self.key)}"
+        except Exception as exc:
+            logger.warning("cache version bump failed for %s: %s", self.key, exc)
+            return
+        with self._lock:
+            self._version = version
+
+
+class TTLCache:
+    """Thread-safe, size-bounded mapping whose entries expire after `ttl`
+    seconds. Oldest entries are evicted first once `max_entries` is reached,
+    so memory stays flat no matter how many distinct keys pass through."""
+
+    def __init__(self, ttl: float, max_entries: int = 10_000):
+        self.ttl = float(ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple[float, object]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= now:
+                if entry is not _MISSING:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else float(ttl))
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key: Hashable, value, ttl: Optional[float] = None) -> bool:
+        """Stores `value` only if `key` is absent or expired (SET NX); True
+        when this call stored it."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                return False
+            self._entries[key] = (now + (self.ttl if ttl is None else float(ttl)), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "ttlSeconds": self.ttl}
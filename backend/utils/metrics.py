@@ -0,0 +1,320 @@
+# utils/metrics.py
+"""
+Process metrics for Prometheus, on prometheus_client.
+
+Runtime counters used to live wherever they were computed: each provider's
+_INGEST_STATS, NotificationDispatcher.status(), pool status behind
+/api/debug/pool, and mirror sweep dicts that were printed and dropped. This
+module defines the metrics they all report to, rendered by GET /metrics:
+
+* http_request_duration_seconds - latency per method, route template and
+  status class;
+* db_pool_checkout_seconds - time to get a connection from each engine's pool
+  (including opening one), plus pool size/checked-out gauges;
+* cache_requests_total - cache_response() hits, misses and disabled lookups
+  per namespace;
+* notification_dispatcher_* - queue depth, drops and failures;
+* capture_ingest_total - created/duplicate/rejected per provider;
+* asset_mirror_items_total / asset_mirror_sweep_seconds - mirror sweep
+  throughput per provider.
+
+uvicorn workers are separate processes, and a scrape lands on one of them.
+With PROMETHEUS_MULTIPROC_DIR set, prometheus_client's multiprocess mode keeps
+each worker's values in files there and a scrape aggregates them with
+MultiProcessCollector. The directory must be empty when the server starts:
+ecosystem.config.cjs sets it and starts through run_server.py, which clears
+it. Gauges are "livesum". A worker calls mark_process_dead() on shutdown,
+and each scrape does the same for workers whose process is gone (a crash),
+so only live workers' gauges count; counters and histograms of exited
+workers stay. Without the directory the scrape shows the answering process
+alone.
+
+Gauges and counters that mirror someone else's state (queue depth, pool
+size, the dispatcher's drop count) are filled in by collectors registered
+with register_collector(). They run before each scrape and, in multiprocess
+mode, every METRICS_COLLECT_SECONDS in every worker so the files stay fresh.
+"""
+import glob
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from utils.env import int_env
+
+
+def multiprocess_dir() -> Optional[str]:
+    return (os.getenv("PROMETHEUS_MULTIPROC_DIR") or "").strip() or None
+
+
+# prometheus_client picks its value storage when it is imported, and the
+# multiprocess files need their directory to exist by then.
+if multiprocess_dir():
+    os.makedirs(multiprocess_dir(), exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+logger = logging.getLogger(__name__)
+
+METRICS_COLLECT_SECONDS = max(1, int_env("METRICS_COLLECT_SECONDS", 10))
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+SWEEP_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 180.0)
+
+# This process's metrics. In multiprocess mode a scrape reads the files
+# instead, through a registry of its own (see render()).
+registry = CollectorRegistry()
+_collectors: list = []
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route", "status"),
+    buckets=DEFAULT_LATENCY_BUCKETS,
+    registry=registry,
+)
+DB_POOL_CHECKOUT = Histogram(
+    "db_pool_checkout_seconds",
+    "Time to obtain a connection from the pool, including opening one.",
+    ("pool",),
+    buckets=CHECKOUT_BUCKETS,
+    registry=registry,
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Pool connections by state.",
+    ("pool", "state"),
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests",
+    "cache_response lookups by namespace and result.",
+    ("namespace", "result"),
+    registry=registry,
+)
+DISPATCHER_QUEUE_DEPTH = Gauge(
+    "notification_dispatcher_queue_depth",
+    "Pushes waiting in the notification dispatcher queue.",
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+DISPATCHER_DROPPED = Counter(
+    "notification_dispatcher_dropped",
+    "Pushes the notification dispatcher queue refused.",
+    registry=registry,
+)
+DISPATCHER_FAILURES = Counter(
+    "notification_dispatcher_failures",
+    "Pushes that failed during delivery.",
+    registry=registry,
+)
+ACTIVITY_LOG_QUEUE_DEPTH = Gauge(
+    "activity_log_writer_queue_depth",
+    "Activity log rows waiting for the batched writer.",
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+ACTIVITY_LOG_SPOOL_FILES = Gauge(
+    "activity_log_writer_spool_files",
+    "Spool files of activity log rows waiting to be replayed.",
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+ACTIVITY_LOG_ROWS = Counter(
+    "activity_log_writer_rows",
+    "Activity log rows handled by the batched writer by outcome.",
+    ("outcome",),
+    registry=registry,
+)
+ACTIVITY_LOG_FAILURES = Counter(
+    "activity_log_writer_failures",
+    "Activity log batches that failed to insert.",
+    registry=registry,
+)
+CAPTURE_INGEST = Counter(
+    "capture_ingest",
+    "Provider capture ingests by outcome.",
+    ("provider", "status"),
+    registry=registry,
+)
+ASSET_MIRROR_ITEMS = Counter(
+    "asset_mirror_items",
+    "Rows handled by asset mirror sweeps by outcome.",
+    ("provider", "outcome"),
+    registry=registry,
+)
+ASSET_MIRROR_SWEEP = Histogram(
+    "asset_mirror_sweep_seconds",
+    "Duration of one asset mirror sweep.",
+    ("provider",),
+    buckets=SWEEP_BUCKETS,
+    registry=registry,
+)
+
+
+class _TotalMirror:
+    """Feeds running totals kept elsewhere (the dispatcher's drops) into
+    Counters, which only take increments: each update adds what the total
+    grew by since the last one. The periodic collection and a scrape can
+    run it at once, hence the lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen: dict = {}
+
+    def update(self, counter: Counter, total: float, **labels) -> None:
+        key = (id(counter), tuple(sorted(labels.items())))
+        with self._lock:
+            delta = total - self._seen.get(key, 0)
+            self._seen[key] = total
+        # A smaller total means the source was reset; carry on from there.
+        if delta > 0:
+            (counter.labels(**labels) if labels else counter).inc(delta)
+
+
+def register_collector(collector: Callable[[], None]) -> None:
+    _collectors.append(collector)
+
+
+def run_collectors() -> None:
+    for collector in list(_collectors):
+        try:
+            collector()
+        except Exception:  # noqa: BLE001 - one broken collector must not break the scrape
+            logger.exception("Metrics collector %s failed", getattr(collector, "__name__", collector))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def prune_dead_workers(directory: Optional[str] = None) -> list[int]:
+    """mark_process_dead() for every worker that left live gauges behind
+    without calling it itself."""
+    directory = directory or multiprocess_dir()
+    if not directory:
+        return []
+    dead = set()
+    for path in glob.glob(os.path.join(directory, "gauge_live*_*.db")):
+        try:
+            pid = int(os.path.basename(path)[: -len(".db")].rsplit("_", 1)[1])
+        except ValueError:
+            continue
+        if not _pid_alive(pid):
+            dead.add(pid)
+    for pid in dead:
+        multiprocess.mark_process_dead(pid, directory)
+    return sorted(dead)
+
+
+def render(directory: Optional[str] = None) -> bytes:
+    """The scrape body: every worker's values from the multiprocess
+    directory, or this process's alone without one."""
+    run_collectors()
+    directory = directory or multiprocess_dir()
+    if not directory:
+        return generate_latest(registry)
+    prune_dead_workers(directory)
+    scrape = CollectorRegistry()
+    multiprocess.MultiProcessCollector(scrape, path=directory)
+    return generate_latest(scrape)
+
+
+def mark_process_dead(pid: Optional[int] = None) -> None:
+    """Drops a worker's live gauges from the multiprocess directory; called
+    on shutdown."""
+    directory = multiprocess_dir()
+    if directory:
+        multiprocess.mark_process_dead(pid or os.getpid(), directory)
+
+
+def status_class(status_code: int) -> str:
+    return f"{int(status_code) // 100}xx"
+
+
+def observe_request(method: str, route: str, status_code: int, seconds: float) -> None:
+    HTTP_REQUEST_DURATION.labels(method=method, route=route, status=status_class(status_code)).observe(seconds)
+
+
+def record_capture_ingest(provider: str, status: str) -> None:
+    CAPTURE_INGEST.labels(provider=provider, status=status).inc()
+
+
+def record_mirror_sweep(provider: str, stats: dict, seconds: float) -> None:
+    for outcome in ("mirrored", "skipped", "failed"):
+        count = int(stats.get(outcome) or 0)
+        if count:
+            ASSET_MIRROR_ITEMS.labels(provider=provider, outcome=outcome).inc(count)
+    ASSET_MIRROR_SWEEP.labels(provider=provider).observe(seconds)
+
+
+def instrument_pool_checkout(engine, name: str) -> None:
+    """Times every pool checkout on `engine` and reports its pool gauges.
+
+    SQLAlchemy's pool events fire after a connection is handed out, so the
+    wait is measured around Engine.raw_connection(), which every Connection
+    goes through and which outlives engine.dispose() recreating the pool.
+    """
+    if getattr(engine, "_metrics_pool_name", None):
+        return
+    engine._metrics_pool_name = name
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return raw_connection(*args, **kwargs)
+        finally:
+            DB_POOL_CHECKOUT.labels(pool=name).observe(time.perf_counter() - started)
+
+    engine.raw_connection = timed_raw_connection
+
+    def collect_pool() -> None:
+        pool = engine.pool
+        for state, reader in (("checked_out", "checkedout"), ("idle", "checkedin"), ("overflow", "overflow"), ("size", "size")):
+            method = getattr(pool, reader, None)
+            # Only QueuePool has all four; SingletonThreadPool.size is an int.
+            if callable(method):
+                DB_POOL_CONNECTIONS.labels(pool=name, state=state).set(max(0, method()))
+
+    register_collector(collect_pool)
+
+
+def register_dispatcher_collector(dispatcher) -> None:
+    totals = _TotalMirror()
+
+    def collect_dispatcher() -> None:
+        DISPATCHER_QUEUE_DEPTH.set(dispatcher.queue.qsize())
+        totals.update(DISPATCHER_DROPPED, dispatcher.dropped)
+        totals.update(DISPATCHER_FAILURES, dispatcher.failures)
+
+    register_collector(collect_dispatcher)
+
+
+def register_activity_log_writer_collector(writer) -> None:
+    totals = _TotalMirror()
+
+    def collect_activity_log_writer() -> None:
+        ACTIVITY_LOG_QUEUE_DEPTH.set(len(writer))
+        ACTIVITY_LOG_SPOOL_FILES.set(len(writer.spool_files()))
+        for outcome in ("written", "spilled", "replayed"):
+            totals.update(ACTIVITY_LOG_ROWS, getattr(writer, outcome), outcome=outcome)
+        totals.update(ACTIVITY_LOG_FAILURES, writer.failures)
+
+    register_collector(collect_activity_log_writer)
@@ -18,23 +18,75 @@ been broken from the moment it was written. build_public_url is kept for
 whichever future bucket genuinely IS public (R2_PUBLIC_BASE_URL set) - it's
 just not what THIS bucket is.
 
-This deliberately does NOT import from routers/upload.py, which already has
-its own inline R2 client/env helpers for task attachments: routers/ sits
-above providers/ and utils/ in this codebase's dependency direction (routers
-call into providers and utils, never the other way around), so a
-provider-layer module importing a router module would invert that. Both
-modules read the exact same R2_* env vars and bucket, so they stay two
-implementations of the same config, not two different storage backends -
-the small duplication here is the deliberate tradeoff for keeping the layers
-one-directional. If a third caller shows up, promote this module (or extract
-routers/upload.py's helpers into it) to be the single shared implementation.
+This is the one R2 client implementation: routers/upload.py (task
+attachments), the provider asset mirrors, ChatGPT media/attachment capture
+and the activity-log archive all go through it. routers/upload.py used to
+build its own client from the same R2_* env vars; it now imports from here,
+which keeps the dependency direction (routers call into utils, never the
+other way around).
+
+One client per process
+----------------------
+Building a boto3 client costs milliseconds (endpoint resolution, credential
+chain, loading the service model) and gives it a fresh urllib3 pool, so a
+client per call - what every caller used to do - paid that setup and a new
+TLS handshake per request. get_client() returns a process-wide client
+(botocore clients are thread-safe) whose pool is sized for the request
+threadpool plus concurrent transfer parts (R2_MAX_POOL_CONNECTIONS), with
+TCP keepalive so idle connections survive between requests. It is rebuilt
+after a fork, because a pool inherited across fork shares sockets with the
+parent.
+
+Transfers and async callers
+---------------------------
+upload_fileobj/download_fileobj go through boto3's transfer manager: objects
+past R2_MULTIPART_PART_SIZE_MB move as parts, R2_TRANSFER_CONCURRENCY at a
+time over the shared pool. get_objects_bytes fetches many small objects
+concurrently. The *_async variants run the same calls on a bounded storage
+executor, so an async caller neither blocks the event loop nor competes with
+sync handlers for the default threadpool.
+
+Presigned URLs
+--------------
+Presigned GET URLs are signed here rather than through botocore: building a
+botocore request per URL (parameter validation, endpoint rules, event
+hooks) costs far more than the signature itself, and a gallery page embeds
+one or two per row. presign_urls signs every key on a page in one pass. The
+SigV4 signing key depends only on the credentials, the UTC date and the
+region, so it is derived once per day and each URL costs one HMAC over its
+canonical request.
+
+Signatures are bucketed in time: every URL minted within a window (at most
+a quarter of the TTL, R2_PRESIGN_CACHE_SECONDS caps it) is signed as of the
+window's start, with X-Amz-Expires stretched by the window so it is still
+valid for the full TTL from the moment it is handed out. Within a window the
+same key therefore always yields the same URL - in every worker process, so
+browsers and an edge cache can reuse the object instead of refetching it
+under a new query string - and URLs are memoized per (key, TTL, window).
+generate_presigned_url is the single-key form; list serializers call
+presign_urls for the whole page first and then hit the memo per row.
+
+Testing against a local S3 stand-in: point R2_ENDPOINT at it (MinIO, or the
+in-process server in tests/r2_storage_smoke.py) and call reset_client().
 """
+import asyncio
+import functools
+import hashlib
+import hmac
 import os
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterable, Optional
+from urllib.parse import quote, urlsplit
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config as BotoConfig
 
+from utils.env import int_env
+
 DEFAULT_PRESIGNED_URL_TTL_SECONDS = 600  # matches routers/upload.py's own file-serving presigned URLs
 
 
@@ -46,18 +98,30 @@ def _env(name: str, default: Optional[str] = None) -> Optional[str]:
     return value or default
 
 
-def _int_env(name: str, default: int) -> int:
-    try:
-        return int((_env(name) or "").strip())
-    except (TypeError, ValueError):
-        return default
+def _r2_client_config():
+    """Bounds how long a single R2 call can block.
 
+    botocore's defaults are 60s connect + 60s read with legacy retries (5
+    attempts), so one stalled put_object can occupy its caller for minutes.
+    That matters beyond slow uploads: several capture endpoints used to hold a
+    database session across this call, which turned a slow R2 into parked
+    Postgres connections. The session holds are fixed at the call sites, but an
+    unbounded storage call is worth capping regardless - a request thread is
+    also a finite resource.
 
-def _r2_client_config():
+    read_timeout is per socket read, not for the whole transfer, so a large
+    multipart upload is not penalised by a value this size.
+
+    max_pool_connections defaults to botocore's 10, which the shared client
+    would exhaust under the request threadpool alone (urllib3 then opens and
+    discards extra connections instead of reusing them).
+    """
     return BotoConfig(
-        connect_timeout=_int_env("R2_CONNECT_TIMEOUT_SECONDS", 10),
-        read_timeout=_int_env("R2_READ_TIMEOUT_SECONDS", 60),
-        retries={"max_attempts": _int_env("R2_MAX_ATTEMPTS", 3), "mode": "standard"},
+        connect_timeout=int_env("R2_CONNECT_TIMEOUT_SECONDS", 10),
+        read_timeout=int_env("R2_READ_TIMEOUT_SECONDS", 60),
+        retries={"max_attempts": int_env("R2_MAX_ATTEMPTS", 3), "mode": "standard"},
+        max_pool_connections=int_env("R2_MAX_POOL_CONNECTIONS", 64),
+        tcp_keepalive=True,
     )
 
 
@@ -65,10 +129,13 @@ def is_configured() -> bool:
     return all([_env("R2_ENDPOINT"), _env("R2_ACCESS_KEY"), _env("R2_SECRET_KEY"), _env("R2_BUCKET")])
 
 
+def bucket() -> Optional[str]:
+    return _env("R2_BUCKET")
+
+
 def build_client():
-    # Timeout/retry bounds are shared with routers/upload.py's client - see
-    # _r2_client_config there for why botocore's defaults (60s+60s, 5 legacy
-    # retry attempts) are too loose to leave in place.
+    """A new client with its own connection pool. Callers want get_client();
+    this is what it builds once per process."""
     return boto3.client(
         "s3",
         endpoint_url=_env("R2_ENDPOINT"),
@@ -79,6 +146,55 @@ def build_client():
     )
 
 
+_client = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide client (see the module docstring)."""
+    global _client, _client_pid
+    client = _client
+    if client is not None and _client_pid == os.getpid():
+        return client
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = build_client()
+            _client_pid = os.getpid()
+        return _client
+
+
+def reset_client() -> None:
+    """Drops the shared client and cached presigned URLs, e.g. after the R2_*
+    settings change (tests pointing at a local stand-in)."""
+    global _client, _client_pid
+    with _client_lock:
+        _client = None
+        _client_pid = None
+    with _presign_lock:
+        _presign_cache.clear()
+        _signing_keys.clear()
+
+
+def multipart_part_size_bytes() -> int:
+    raw_value = _env("R2_MULTIPART_PART_SIZE_MB", "24") or "24"
+    try:
+        megabytes = max(5, int(raw_value))
+    except ValueError:
+        megabytes = 24
+    return megabytes * 1024 * 1024
+
+
+def transfer_config() -> TransferConfig:
+    part_size = multipart_part_size_bytes()
+    return TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=max(1, int_env("R2_TRANSFER_CONCURRENCY", 8)),
+        use_threads=True,
+    )
+
+
 def build_public_url(key: str) -> str:
     """Only correct for a bucket actually configured for public reads
     (R2_PUBLIC_BASE_URL set to a public custom domain/R2.dev URL). Without
@@ -89,15 +205,33 @@ def build_public_url(key: str) -> str:
     if public_base:
         return f"{public_base.rstrip('/')}/{key}"
     endpoint = _env("R2_ENDPOINT", "") or ""
-    bucket = _env("R2_BUCKET", "") or ""
-    return f"{endpoint.rstrip('/')}/{bucket}/{key}"
+    bucket_name = _env("R2_BUCKET", "") or ""
+    return f"{endpoint.rstrip('/')}/{bucket_name}/{key}"
+
+
+def object_key(url: Optional[str]) -> Optional[str]:
+    """The key a build_public_url() URL points at (rows such as ChatGPT's
+    media assets store the URL, not the key), or None for any other URL."""
+    if not url:
+        return None
+    prefixes = []
+    public_base = _env("R2_PUBLIC_BASE_URL")
+    if public_base:
+        prefixes.append(f"{public_base.rstrip('/')}/")
+    endpoint = _env("R2_ENDPOINT")
+    if endpoint and bucket():
+        prefixes.append(f"{endpoint.rstrip('/')}/{bucket()}/")
+    for prefix in prefixes:
+        if url.startswith(prefix) and len(url) > len(prefix):
+            return url[len(prefix):].split("?", 1)[0]
+    return None
 
 
 def put_object(key: str, data: bytes, *, content_type: str = "application/octet-stream", client=None) -> None:
     """Uploads `data` to `key`. Raises whatever botocore raises on failure -
     callers own deciding how to handle that (e.g. asset_mirror.py records it
     per-row instead of letting one bad upload take down a whole sweep)."""
-    active_client = client or build_client()
+    active_client = client or get_client()
     active_client.put_object(
         Bucket=_env("R2_BUCKET"),
         Key=key,
@@ -116,16 +250,237 @@ def upload_bytes(key: str, data: bytes, *, content_type: str = "application/octe
     return build_public_url(key)
 
 
+def upload_fileobj(
+    key: str,
+    fileobj: BinaryIO,
+    *,
+    content_type: Optional[str] = None,
+    extra_args: Optional[dict] = None,
+    client=None,
+) -> None:
+    """Streams `fileobj` to `key`; past the multipart threshold its parts
+    upload concurrently (see transfer_config)."""
+    args = dict(extra_args or {})
+    if content_type:
+        args["ContentType"] = content_type
+    active_client = client or get_client()
+    active_client.upload_fileobj(fileobj, _env("R2_BUCKET"), key, ExtraArgs=args or None, Config=transfer_config())
+
+
+def download_fileobj(key: str, fileobj: BinaryIO, *, client=None) -> None:
+    """Writes the object at `key` into `fileobj`, fetching ranges of a large
+    object concurrently."""
+    active_client = client or get_client()
+    active_client.download_fileobj(_env("R2_BUCKET"), key, fileobj, Config=transfer_config())
+
+
+# (bucket, key, expires_in, window index) -> URL, least recently used first.
+_presign_cache: OrderedDict = OrderedDict()
+# (access key, date stamp, region) -> SigV4 signing key.
+_signing_keys: dict = {}
+_presign_lock = threading.Lock()
+
+_SIGV4_ALGORITHM = "AWS4-HMAC-SHA256"
+_MAX_PRESIGN_EXPIRES_SECONDS = 7 * 24 * 3600  # SigV4's own ceiling for X-Amz-Expires
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def _presign_window_seconds(expires_in: int) -> int:
+    return min(int_env("R2_PRESIGN_CACHE_SECONDS", 120), expires_in // 4)
+
+
+def _hmac_sha256(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _signing_key(access_key: str, secret_key: str, date_stamp: str, region: str) -> bytes:
+    cache_key = (access_key, date_stamp, region)
+    signing_key = _signing_keys.get(cache_key)
+    if signing_key is None:
+        signing_key = _hmac_sha256(("AWS4" + secret_key).encode("utf-8"), date_stamp)
+        for part in (region, "s3", "aws4_request"):
+            signing_key = _hmac_sha256(signing_key, part)
+        with _presign_lock:
+            if len(_signing_keys) > 16:  # yesterday's keys, or rotated credentials
+                _signing_keys.clear()
+            _signing_keys[cache_key] = signing_key
+    return signing_key
+
+
+def _presign_target() -> Optional[dict]:
+    """Everything about the endpoint a presigned URL needs, or None when R2
+    isn't configured. Path-style addressing, as botocore uses for a custom
+    endpoint."""
+    endpoint = _env("R2_ENDPOINT")
+    access_key = _env("R2_ACCESS_KEY")
+    secret_key = _env("R2_SECRET_KEY")
+    bucket_name = _env("R2_BUCKET")
+    if not all([endpoint, access_key, secret_key, bucket_name]):
+        return None
+    parts = urlsplit(endpoint)
+    host = parts.netloc
+    if parts.port is not None and str(parts.port) == _DEFAULT_PORTS.get(parts.scheme):
+        host = parts.hostname
+    return {
+        "base": f"{parts.scheme}://{parts.netloc}",
+        "host": host,
+        "path": f"{parts.path.rstrip('/')}/{quote(bucket_name, safe='')}/",
+        "bucket": bucket_name,
+        "access_key": access_key,
+        "secret_key": secret_key,
+        "region": _env("R2_REGION", "auto"),
+    }
+
+
+def _sign_get_url(target: dict, key: str, *, signed_at: int, expires: int) -> str:
+    amz_date = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(signed_at))
+    date_stamp = amz_date[:8]
+    scope = f"{date_stamp}/{target['region']}/s3/aws4_request"
+    path = target["path"] + quote(key, safe="/~")
+    query = (
+        f"X-Amz-Algorithm={_SIGV4_ALGORITHM}"
+        f"&X-Amz-Credential={quote(target['access_key'] + '/' + scope, safe='-_.~')}"
+        f"&X-Amz-Date={amz_date}&X-Amz-Expires={expires}&X-Amz-SignedHeaders=host"
+    )
+    canonical_request = f"GET\n{path}\n{query}\nhost:{target['host']}\n\nhost\nUNSIGNED-PAYLOAD"
+    string_to_sign = "\n".join([
+        _SIGV4_ALGORITHM, amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+    ])
+    signing_key = _signing_key(target["access_key"], target["secret_key"], date_stamp, target["region"])
+    signature = hmac.new(signing_key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{target['base']}{path}?{query}&X-Amz-Signature={signature}"
+
+
+def presign_urls(keys: Iterable[Optional[str]], *, expires_in: int = DEFAULT_PRESIGNED_URL_TTL_SECONDS) -> dict[str, str]:
+    """Presigned GET URLs for every key in `keys`, in one pass: memo hits are
+    taken under a single lock acquisition and the rest are signed with the
+    day's cached signing key (see the module docstring). Empty keys are
+    skipped; returns {} when R2 isn't configured. Each URL is valid for at
+    least `expires_in` seconds from now."""
+    target = _presign_target()
+    wanted = list(dict.fromkeys(key for key in keys if key))
+    if target is None or not wanted:
+        return {}
+    now = time.time()
+    window = _presign_window_seconds(expires_in)
+    if window > 0:
+        index = int(now // window)
+        signed_at, expires = index * window, min(expires_in + window, _MAX_PRESIGN_EXPIRES_SECONDS)
+    else:
+        index, signed_at, expires = None, int(now), expires_in
+    urls: dict[str, str] = {}
+    if index is not None:
+        with _presign_lock:
+            for key in wanted:
+                url = _presign_cache.get((target["bucket"], key, expires_in, index))
+                if url is not None:
+                    _presign_cache.move_to_end((target["bucket"], key, expires_in, index))
+                    urls[key] = url
+    signed = {
+        key: _sign_get_url(target, key, signed_at=signed_at, expires=expires)
+        for key in wanted if key not in urls
+    }
+    if signed and index is not None:
+        limit = max(1, int_env("R2_PRESIGN_CACHE_SIZE", 20000))
+        with _presign_lock:
+            for key, url in signed.items():
+                _presign_cache[(target["bucket"], key, expires_in, index)] = url
+            while len(_presign_cache) > limit:
+                _presign_cache.popitem(last=False)
+    urls.update(signed)
+    return urls
+
+
+def prime_presigned(rows: Iterable, *attrs: str) -> None:
+    """Presigns the keys held in each row's `attrs` (e.g.
+    "mirrored_asset_key") for a whole list page in one presign_urls pass, so
+    the generate_presigned_url calls each row's to_dict() makes are memo
+    hits rather than a signature apiece. Best effort: a failure here just
+    leaves those calls to sign (or fail) row by row."""
+    keys = [getattr(row, attr) for row in rows for attr in attrs]
+    try:
+        presign_urls(keys)
+    except Exception:
+        pass
+
+
 def generate_presigned_url(key: str, *, expires_in: int = DEFAULT_PRESIGNED_URL_TTL_SECONDS, client=None) -> str:
     """Mints a short-lived, browser-loadable GET URL for a private-bucket
     object - the correct way to serve a permanently-stored R2 key back to
     the browser (mirrors routers/upload.py's own /api/files/open). Callers
-    should generate this fresh at serialization time, never persist it: it
-    expires in `expires_in` seconds regardless of how long the underlying
-    object itself lives."""
-    active_client = client or build_client()
-    return active_client.generate_presigned_url(
-        "get_object",
-        Params={"Bucket": _env("R2_BUCKET"), "Key": key},
-        ExpiresIn=expires_in,
-    )
+    should generate this at serialization time, never persist it: it
+    expires regardless of how long the underlying object itself lives.
+    Stable and memoized per time window (see the module docstring), so
+    repeated calls within one are free; a list page should presign_urls its
+    keys first. An explicit `client` signs through botocore instead,
+    uncached."""
+    if client is not None:
+        return client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": _env("R2_BUCKET"), "Key": key},
+            ExpiresIn=expires_in,
+        )
+    url = presign_urls([key], expires_in=expires_in).get(key)
+    if url is None:
+        raise RuntimeError("R2 is not configured" if key else "an object key is required")
+    return url
+
+
+def get_object_bytes(key: str, *, client=None) -> bytes:
+    """Reads the whole object at `key`. Raises whatever botocore raises (a
+    missing key is botocore's NoSuchKey ClientError)."""
+    active_client = client or get_client()
+    response = active_client.get_object(Bucket=_env("R2_BUCKET"), Key=key)
+    return response["Body"].read()
+
+
+def get_objects_bytes(keys: Iterable[str], *, client=None) -> list[bytes]:
+    """get_object_bytes for many keys, fetched concurrently on the storage
+    executor; results keep the order of `keys`. The first failure raises."""
+    active_client = client or get_client()
+    return list(_storage_executor().map(functools.partial(get_object_bytes, client=active_client), list(keys)))
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+
+
+def _storage_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _client_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, int_env("R2_IO_THREADS", 16)), thread_name_prefix="r2-io",
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+async def _run(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_storage_executor(), functools.partial(fn, *args, **kwargs))
+
+
+async def put_object_async(key: str, data: bytes, *, content_type: str = "application/octet-stream", client=None) -> None:
+    await _run(put_object, key, data, content_type=content_type, client=client)
+
+
+async def get_object_bytes_async(key: str, *, client=None) -> bytes:
+    return await _run(get_object_bytes, key, client=client)
+
+
+async def get_objects_bytes_async(keys: Iterable[str], *, client=None) -> list[bytes]:
+    return list(await asyncio.gather(*(get_object_bytes_async(key, client=client) for key in keys)))
+
+
+async def upload_fileobj_async(key: str, fileobj: BinaryIO, *, content_type: Optional[str] = None, client=None) -> None:
+    await _run(upload_fileobj, key, fileobj, content_type=content_type, client=client)
+
+
+async def download_fileobj_async(key: str, fileobj: BinaryIO, *, client=None) -> None:
+    await _run(download_fileobj, key, fileobj, client=client)
+
+
+async def generate_presigned_url_async(key: str, *, expires_in: int = DEFAULT_PRESIGNED_URL_TTL_SECONDS, client=None) -> str:
+    return await _run(generate_presigned_url, key, expires_in=expires_in, client=client)
@@ -0,0 +1,226 @@
+# utils/sql_profiler.py
+"""
+Opt-in per-request SQL profiling.
+
+Finding a hot path used to mean adding INBOX_PROFILE_LOGGING-style prints or
+turning on SQLALCHEMY_ECHO for the whole process. With SQL_PROFILER_ENABLED
+set (or switched on at runtime through POST /api/debug/sql-profile), the
+middleware in main.py opens a RequestProfile per request and the
+before/after_cursor_execute hooks installed on operational_engine and
+archive_engine add every statement to it:
+
+* statement count and total DB time, per engine;
+* the SQL_PROFILER_TOP_STATEMENTS slowest statements;
+* fingerprints - the statement with literals, bind markers and IN lists
+  collapsed - that ran at least SQL_PROFILER_REPEAT_THRESHOLD times, which is
+  what an N+1 loop looks like from the database.
+
+The totals go back to the client in a Server-Timing header, and requests
+that took at least SQL_PROFILER_RECORD_MS or tripped the repeat threshold are
+kept in a bounded ring buffer served by the local-only debug endpoint.
+
+The profile rides a ContextVar. Starlette copies the context into the
+threadpool that runs sync endpoints, so the hooks see the same (mutable)
+profile object; statements run outside a request - workers, startup - find
+no profile and cost one ContextVar lookup.
+"""
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from utils.env import bool_env, int_env
+
+
+SQL_PROFILER_TOP_STATEMENTS = max(1, int_env("SQL_PROFILER_TOP_STATEMENTS", 5))
+SQL_PROFILER_REPEAT_THRESHOLD = max(2, int_env("SQL_PROFILER_REPEAT_THRESHOLD", 5))
+SQL_PROFILER_RECORD_MS = max(0, int_env("SQL_PROFILER_RECORD_MS", 200))
+SQL_PROFILER_RING_SIZE = max(1, int_env("SQL_PROFILER_RING_SIZE", 50))
+_STATEMENT_PREVIEW_CHARS = 500
+
+_enabled = bool_env("SQL_PROFILER_ENABLED", False)
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("sql_request_profile", default=None)
+_installed_engines: set = set()
+_install_lock = threading.Lock()
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_BIND_MARKER = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_POSTCOMPILE = re.compile(r"\(__\[POSTCOMPILE_\w+\]\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_fingerprint(statement: str) -> str:
+    """`statement` with literals and bind markers replaced by ?, IN lists
+    folded to IN (...) and whitespace collapsed, so one query issued in a
+    loop with different ids always yields the same fingerprint."""
+    text = _STRING_LITERAL.sub("?", statement)
+    text = _BIND_MARKER.sub("?", text)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _POSTCOMPILE.sub("(...)", text)
+    text = _IN_LIST.sub("IN (...)", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.elapsed_ms = 0.0
+        self.status_code: Optional[int] = None
+        self.statement_count = 0
+        self.db_ms = 0.0
+        self.engines: dict = {}
+        self.fingerprints: Counter = Counter()
+        self.fingerprint_ms: Counter = Counter()
+        # (duration_ms, engine, statement, executemany), longest first, at most TOP_STATEMENTS.
+        self.slowest: list = []
+        self._lock = threading.Lock()
+
+    def record(self, engine_name: str, statement: str, duration_ms: float, executemany: bool = False) -> None:
+        fingerprint = statement_fingerprint(statement)
+        with self._lock:
+            self.statement_count += 1
+            self.db_ms += duration_ms
+            counts = self.engines.setdefault(engine_name, {"statements": 0, "dbMs": 0.0})
+            counts["statements"] += 1
+            counts["dbMs"] += duration_ms
+            self.fingerprints[fingerprint] += 1
+            self.fingerprint_ms[fingerprint] += duration_ms
+            if len(self.slowest) < SQL_PROFILER_TOP_STATEMENTS or duration_ms > self.slowest[-1][0]:
+                self.slowest.append((duration_ms, engine_name, statement[:_STATEMENT_PREVIEW_CHARS], executemany))
+                self.slowest.sort(key=lambda entry: entry[0], reverse=True)
+                del self.slowest[SQL_PROFILER_TOP_STATEMENTS:]
+
+    def finish(self, status_code: Optional[int]) -> None:
+        self.status_code = status_code
+        self.elapsed_ms = (time.perf_counter() - self._started) * 1000
+
+    def repeated_statements(self) -> list:
+        return [
+            {"fingerprint": fingerprint, "count": count, "dbMs": round(self.fingerprint_ms[fingerprint], 2)}
+            for fingerprint, count in self.fingerprints.most_common()
+            if count >= SQL_PROFILER_REPEAT_THRESHOLD
+        ]
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_ms:.1f};desc="{self.statement_count} queries", '
+            f"app;dur={max(0.0, self.elapsed_ms - self.db_ms):.1f}"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": self.status_code,
+            "startedAt": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(self.started_at)),
+            "elapsedMs": round(self.elapsed_ms, 2),
+            "statementCount": self.statement_count,
+            "dbMs": round(self.db_ms, 2),
+            "engines": {
+                name: {"statements": counts["statements"], "dbMs": round(counts["dbMs"], 2)}
+                for name, counts in self.engines.items()
+            },
+            "slowestStatements": [
+                {"durationMs": round(duration_ms, 2), "engine": engine_name, "statement": statement, "executemany": executemany}
+                for duration_ms, engine_name, statement, executemany in self.slowest
+            ],
+            "repeatedStatements": self.repeated_statements(),
+        }
+
+
+class SlowRequestLog:
+    """Bounded ring of finished profiles worth keeping; the oldest falls off."""
+
+    def __init__(self, size: int = SQL_PROFILER_RING_SIZE):
+        self._entries: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def offer(self, profile: RequestProfile) -> bool:
+        if profile.elapsed_ms < SQL_PROFILER_RECORD_MS and not profile.repeated_statements():
+            return False
+        with self._lock:
+            self._entries.append(profile)
+        return True
+
+    def snapshot(self, limit: Optional[int] = None) -> list:
+        with self._lock:
+            entries = list(self._entries)
+        entries.sort(key=lambda profile: profile.elapsed_ms, reverse=True)
+        return [profile.to_dict() for profile in entries[:limit]]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+slow_request_log = SlowRequestLog()
+
+
+def profiling_enabled() -> bool:
+    return _enabled
+
+
+def set_profiling_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current_profile.get()
+
+
+def start_request_profile(method: str, path: str):
+    """Starts profiling the current request; returns the profile and the
+    ContextVar token for finish_request_profile()."""
+    profile = RequestProfile(method, path)
+    return profile, _current_profile.set(profile)
+
+
+def finish_request_profile(profile: RequestProfile, token, status_code: Optional[int]) -> None:
+    _current_profile.reset(token)
+    profile.finish(status_code)
+    slow_request_log.offer(profile)
+
+
+def install_sql_profiler(engine, name: str) -> None:
+    """Attaches the cursor hooks to `engine` once, whatever name it is
+    installed under (the archive engine may be the operational one)."""
+    with _install_lock:
+        if id(engine) in _installed_engines:
+            return
+        _installed_engines.add(id(engine))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(_conn, _cursor, _statement, _parameters, context, _executemany):  # noqa: ANN001
+        if _current_profile.get() is not None:
+            context._sql_profiler_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(_conn, _cursor, statement, _parameters, context, executemany):  # noqa: ANN001
+        profile = _current_profile.get()
+        started = getattr(context, "_sql_profiler_started", None)
+        if profile is None or started is None:
+            return
+        profile.record(name, statement, (time.perf_counter() - started) * 1000, executemany)
+
+
+def profiler_status() -> dict:
+    return {
+        "enabled": _enabled,
+        "recordMs": SQL_PROFILER_RECORD_MS,
+        "repeatThreshold": SQL_PROFILER_REPEAT_THRESHOLD,
+        "ringSize": SQL_PROFILER_RING_SIZE,
+        "recorded": len(slow_request_log),
+    }
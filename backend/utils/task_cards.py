@@ -0,0 +1,301 @@
+# utils/task_cards.py
+"""
+Precomputed task list cards, kept in the task_cards table.
+
+serialize_task_list() used to rebuild every card on every page: creators,
+participants and their users, comment counts, forwards and forward users,
+TaskView seen-by rows and each workflow task's stages were all queried per
+request, then assembled in Python. None of that depends on who is looking.
+
+task_cards stores that viewer-independent part as JSON, one row per task.
+A list page then reads its cards in one query and its viewer overlays
+(the viewer's participations and workflow stages - my role, read state,
+available actions) in one more; see tasks_router._serialize_task_list_from_cards().
+
+Cards are rebuilt when a transaction that touched the task commits: a
+Session after_flush hook collects the ids of tasks whose Task row,
+participants, comments, forwards, views or workflow stages changed (and
+tasks naming a renamed user), and a before_commit hook rebuilds them in
+that same transaction. The builder lives with the serializer in
+routers/tasks_router.py and registers itself here; a process that never
+imported it deletes the stale cards instead, and readers rebuild any
+missing card - or one whose source_updated_at no longer matches the task -
+on the fly and store it from a session of their own
+(store_rebuilt_task_cards()). Code that changes these tables with bulk
+UPDATEs should call mark_task_cards_stale().
+
+Cards are only read once backfill_task_cards.py has filled the table and
+recorded the app_settings marker (see task_cards_ready()).
+"""
+import logging
+import time
+from datetime import datetime
+from itertools import chain
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, event, insert, inspect, or_, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from models_new import (
+    Task,
+    TaskCard,
+    TaskComment,
+    TaskForward,
+    TaskParticipant,
+    TaskStage,
+    TaskStageAssignee,
+    TaskView,
+    User,
+)
+from utils.app_markers import AppSettingMarker
+
+logger = logging.getLogger(__name__)
+
+TASK_CARDS_READY = AppSettingMarker("task_cards")
+REFRESH_CHUNK_SIZE = 200
+
+# (db, task_ids) -> {task_id: (card, task.updated_at)}
+TaskCardBuilder = Callable[[Session, list], Dict[int, Tuple[dict, Optional[datetime]]]]
+
+_PENDING_INFO_KEY = "task_cards_pending"
+_PARTICIPANT_CARD_ATTRS = ("task_id", "user_id", "role", "is_active")
+_USER_CARD_ATTRS = ("name", "department")
+_builder: Optional[TaskCardBuilder] = None
+_table_present: dict = {}
+
+
+def register_task_card_builder(builder: TaskCardBuilder) -> TaskCardBuilder:
+    global _builder
+    _builder = builder
+    return builder
+
+
+def task_cards_ready(db: Session) -> bool:
+    """True once the backfill has completed."""
+    return TASK_CARDS_READY.is_set(db)
+
+
+def load_task_cards(db: Session, task_ids: Iterable[int]) -> Dict[int, Tuple[dict, Optional[datetime]]]:
+    wanted = sorted({int(task_id) for task_id in task_ids if task_id})
+    if not wanted:
+        return {}
+    rows = db.execute(
+        select(TaskCard.task_id, TaskCard.card_json, TaskCard.source_updated_at).where(TaskCard.task_id.in_(wanted))
+    ).all()
+    return {task_id: (card, source_updated_at) for task_id, card, source_updated_at in rows}
+
+
+def mark_task_cards_stale(db: Session, task_ids: Iterable[int]) -> None:
+    """Queue `task_ids` for the rebuild that runs when the session commits."""
+    db.info.setdefault(_PENDING_INFO_KEY, set()).update(int(task_id) for task_id in task_ids if task_id)
+
+
+# ── Maintaining cards ────────────────────────────────────────────────────────
+
+def refresh_task_cards(db: Session, task_ids: Iterable[int]) -> int:
+    """Rebuilds the cards of `task_ids` from the current (flushed) state;
+    tasks that no longer exist lose theirs. Returns cards written."""
+    db.flush()
+    conn = db.connection()
+    wanted = sorted({int(task_id) for task_id in task_ids if task_id})
+    written = 0
+    for start in range(0, len(wanted), REFRESH_CHUNK_SIZE):
+        chunk = wanted[start:start + REFRESH_CHUNK_SIZE]
+        conn.execute(delete(TaskCard).where(TaskCard.task_id.in_(chunk)))
+        if _builder is None:
+            continue
+        cards = _builder(db, chunk)
+        _insert_cards(conn, cards)
+        written += len(cards)
+    return written
+
+
+def store_rebuilt_task_cards(db: Session, cards: Dict[int, Tuple[dict, Optional[datetime]]]) -> None:
+    """Saves cards a reader rebuilt (see the module docstring) in a short
+    session of its own: list GETs never commit theirs, so queuing them with
+    mark_task_cards_stale() there would rebuild them on every read. A card
+    built from an older snapshot than a concurrent write still carries that
+    snapshot's updated_at, so readers go on treating it as stale. Best
+    effort: a failure leaves them to the next reader."""
+    if not cards:
+        return
+    try:
+        with Session(bind=db.get_bind()) as writer:
+            conn = writer.connection()
+            conn.execute(delete(TaskCard).where(TaskCard.task_id.in_(sorted(cards))))
+            _insert_cards(conn, cards)
+            writer.commit()
+    except Exception:
+        logger.exception("storing %s rebuilt task cards failed", len(cards))
+
+
+def _insert_cards(conn: Connection, cards: Dict[int, Tuple[dict, Optional[datetime]]]) -> None:
+    if not cards:
+        return
+    now = datetime.utcnow()
+    conn.execute(
+        insert(TaskCard),
+        [
+            {"task_id": task_id, "card_json": card, "source_updated_at": source_updated_at, "updated_at": now}
+            for task_id, (card, source_updated_at) in cards.items()
+        ],
+    )
+
+
+def _table_exists(conn: Connection) -> bool:
+    engine = conn.engine
+    present = _table_present.get(engine)
+    if present is None:
+        present = inspect(conn).has_table(TaskCard.__tablename__)
+        _table_present[engine] = present
+    return present
+
+
+def _loaded(obj, attribute: str):
+    # Read what the flush already knows; never trigger a lazy load mid-flush.
+    return inspect(obj).dict.get(attribute)
+
+
+def _changed(obj, attributes: Iterable[str]) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_after_flush(session: Session, _flush_context) -> None:
+    task_ids: set = set()
+    stage_ids: set = set()
+    user_ids: set = set()
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, Task):
+            task_ids.add(_loaded(obj, "id"))
+        elif isinstance(obj, (TaskParticipant, TaskComment, TaskForward, TaskView, TaskStage)):
+            task_ids.add(_loaded(obj, "task_id"))
+        elif isinstance(obj, TaskStageAssignee):
+            stage_ids.add(_loaded(obj, "stage_id"))
+    for obj in session.dirty:
+        if isinstance(obj, Task) and session.is_modified(obj, include_collections=False):
+            task_ids.add(_loaded(obj, "id"))
+        elif isinstance(obj, TaskParticipant) and _changed(obj, _PARTICIPANT_CARD_ATTRS):
+            # is_read flips are viewer state, not card state.
+            task_ids.add(_loaded(obj, "task_id"))
+        elif isinstance(obj, (TaskView, TaskStage)) and session.is_modified(obj, include_collections=False):
+            task_ids.add(_loaded(obj, "task_id"))
+        elif isinstance(obj, TaskStageAssignee) and session.is_modified(obj, include_collections=False):
+            stage_ids.add(_loaded(obj, "stage_id"))
+        elif isinstance(obj, User) and _changed(obj, _USER_CARD_ATTRS):
+            user_ids.add(_loaded(obj, "id"))
+    task_ids.discard(None)
+    stage_ids.discard(None)
+    user_ids.discard(None)
+    if not task_ids and not stage_ids and not user_ids:
+        return
+
+    conn = session.connection()
+    if not _table_exists(conn):
+        return
+    if stage_ids:
+        task_ids.update(conn.execute(select(TaskStage.task_id).where(TaskStage.id.in_(stage_ids))).scalars())
+    if user_ids:
+        task_ids.update(_task_ids_naming_users(conn, user_ids))
+    mark_task_cards_stale(session, task_ids)
+
+
+def _task_ids_naming_users(conn: Connection, user_ids: set) -> set:
+    """Tasks whose cards show any of `user_ids` by name."""
+    found = set(conn.execute(select(Task.id).where(Task.creator_id.in_(user_ids))).scalars())
+    found.update(conn.execute(select(TaskParticipant.task_id).where(TaskParticipant.user_id.in_(user_ids))).scalars())
+    found.update(conn.execute(select(TaskView.task_id).where(TaskView.user_id.in_(user_ids))).scalars())
+    found.update(
+        conn.execute(
+            select(TaskForward.task_id).where(
+                or_(TaskForward.from_user_id.in_(user_ids), TaskForward.to_user_id.in_(user_ids))
+            )
+        ).scalars()
+    )
+    found.update(
+        conn.execute(
+            select(TaskStage.task_id)
+            .join(TaskStageAssignee, TaskStageAssignee.stage_id == TaskStage.id)
+            .where(TaskStageAssignee.user_id.in_(user_ids))
+        ).scalars()
+    )
+    return found
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_before_commit(session: Session) -> None:
+    if not session.info.get(_PENDING_INFO_KEY) and not (session.new or session.dirty or session.deleted):
+        return
+    # Flush first so the last changes are collected too.
+    session.flush()
+    task_ids = session.info.pop(_PENDING_INFO_KEY, None)
+    if not task_ids:
+        return
+    try:
+        # In a savepoint: on Postgres a failed statement aborts the whole
+        # transaction, and the write this rides on has to survive it.
+        with session.begin_nested():
+            refresh_task_cards(session, task_ids)
+    except Exception:
+        # A card bug must not fail the write it rides on; drop the cards and
+        # let readers rebuild them.
+        logger.exception("task card refresh failed for %s tasks", len(task_ids))
+        session.connection().execute(delete(TaskCard).where(TaskCard.task_id.in_(sorted(task_ids))))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending(session: Session, transaction) -> None:
+    # Rolled-back (or closed) transactions leave nothing to rebuild.
+    if transaction.parent is None:
+        session.info.pop(_PENDING_INFO_KEY, None)
+
+
+def reset_task_cards_state() -> None:
+    """Forget cached readiness and table checks (tests, and after a restore)."""
+    TASK_CARDS_READY.reset()
+    _table_present.clear()
+
+
+def run_task_cards_backfill(
+    db: Session,
+    *,
+    batch_size: int = 200,
+    start_after_id: int = 0,
+    mark_ready: bool = True,
+    logger: Optional[logging.Logger] = None,
+) -> dict:
+    """Builds cards for every task with id > `start_after_id`, committing per
+    batch so an interrupted run can resume from the last id it logged."""
+    log = logger if logger is not None else logging.getLogger(__name__)
+    if _builder is None:
+        raise RuntimeError("No task card builder registered; import routers.tasks_router first")
+    last_id = start_after_id
+    tasks_scanned = 0
+    cards_written = 0
+    started = time.monotonic()
+    while True:
+        task_ids = db.execute(
+            select(Task.id).where(Task.id > last_id).order_by(Task.id).limit(batch_size)
+        ).scalars().all()
+        if not task_ids:
+            break
+        cards_written += refresh_task_cards(db, task_ids)
+        db.commit()
+        # Keep the identity map from growing across the whole table.
+        db.expunge_all()
+        tasks_scanned += len(task_ids)
+        last_id = task_ids[-1]
+        log.info("task card backfill through task id %s (%s tasks)", last_id, tasks_scanned)
+
+    if mark_ready:
+        TASK_CARDS_READY.set(db, {"tasks": tasks_scanned, "cards": cards_written})
+        db.commit()
+    return {
+        "tasksScanned": tasks_scanned,
+        "cardsWritten": cards_written,
+        "lastTaskId": last_id,
+        "markedReady": mark_ready,
+        "elapsedSeconds": round(time.monotonic() - started, 2),
+    }
@@ -0,0 +1,138 @@
+# utils/task_comments.py
+"""
+Per-task comment thread summary: tasks.comment_count, last_comment_id and
+last_comment_at.
+
+Every task list page used to GROUP BY task_comments to show chat counts, and
+the comment thread ran a COUNT(*) for its total. The summary lives on the
+task row instead and is moved forward by record_task_comment() in the
+transaction that inserts the comment - one UPDATE with the increment done in
+SQL, so concurrent comments on the same task can't lose a count. Every code
+path that adds a TaskComment goes through it.
+
+Readers use the columns only once backfill_task_comment_stats.py has counted
+the existing threads and recorded the app_settings marker (see
+comment_stats_ready()); until then they keep counting rows.
+"""
+import logging
+import time
+from typing import Iterable, Optional
+
+from sqlalchemy import bindparam, case, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from models_new import Task, TaskComment
+from utils.app_markers import AppSettingMarker
+
+logger = logging.getLogger(__name__)
+
+TASK_COMMENT_STATS_READY = AppSettingMarker("task_comment_stats")
+REFRESH_CHUNK_SIZE = 500
+_STAT_ATTRS = ("comment_count", "last_comment_id", "last_comment_at")
+
+
+def comment_stats_ready(db: Session) -> bool:
+    return TASK_COMMENT_STATS_READY.is_set(db)
+
+
+def record_task_comment(db: Session, task: Task, comment: TaskComment) -> None:
+    """Counts `comment` (added to `db`, not yet flushed) on its task and
+    points last_comment_* at it if it is the newest."""
+    db.flush()
+    newer = or_(Task.last_comment_id.is_(None), Task.last_comment_id < comment.id)
+    db.execute(
+        update(Task)
+        .where(Task.id == task.id)
+        .values(
+            comment_count=Task.comment_count + 1,
+            last_comment_id=case((newer, comment.id), else_=Task.last_comment_id),
+            last_comment_at=case((newer, comment.created_at), else_=Task.last_comment_at),
+            # Commenting is not an edit of the task.
+            updated_at=Task.updated_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.expire(task, _STAT_ATTRS)
+
+
+def refresh_task_comment_stats(db: Session, task_ids: Iterable[int]) -> int:
+    """Recounts the threads of `task_ids` from task_comments. The task rows
+    are locked first so a comment committed meanwhile is either counted here
+    or increments the recount. Returns tasks updated."""
+    wanted = sorted({int(task_id) for task_id in task_ids if task_id})
+    updated = 0
+    statement = (
+        update(Task.__table__)
+        .where(Task.__table__.c.id == bindparam("task_id"))
+        .values(
+            comment_count=bindparam("count"),
+            last_comment_id=bindparam("last_id"),
+            last_comment_at=bindparam("last_at"),
+            updated_at=Task.__table__.c.updated_at,
+        )
+    )
+    for start in range(0, len(wanted), REFRESH_CHUNK_SIZE):
+        chunk = wanted[start:start + REFRESH_CHUNK_SIZE]
+        present = db.execute(select(Task.id).where(Task.id.in_(chunk)).with_for_update()).scalars().all()
+        counts = {
+            task_id: (count, last_id)
+            for task_id, count, last_id in db.execute(
+                select(TaskComment.task_id, func.count(TaskComment.id), func.max(TaskComment.id))
+                .where(TaskComment.task_id.in_(present))
+                .group_by(TaskComment.task_id)
+            )
+        }
+        last_ids = [last_id for _count, last_id in counts.values()]
+        last_at = dict(
+            db.execute(select(TaskComment.id, TaskComment.created_at).where(TaskComment.id.in_(last_ids))).all()
+        ) if last_ids else {}
+        rows = []
+        for task_id in present:
+            count, last_id = counts.get(task_id, (0, None))
+            rows.append({"task_id": task_id, "count": count, "last_id": last_id, "last_at": last_at.get(last_id)})
+        if rows:
+            db.connection().execute(statement, rows)
+        updated += len(rows)
+    return updated
+
+
+def reset_task_comment_stats_state() -> None:
+    """Forget cached readiness (tests, and after a restore)."""
+    TASK_COMMENT_STATS_READY.reset()
+
+
+def run_task_comment_stats_backfill(
+    db: Session,
+    *,
+    batch_size: int = 500,
+    start_after_id: int = 0,
+    mark_ready: bool = True,
+    logger: Optional[logging.Logger] = None,
+) -> dict:
+    """Recounts every task with id > `start_after_id`, committing per batch
+    so an interrupted run can resume from the last id it logged."""
+    log = logger if logger is not None else logging.getLogger(__name__)
+    last_id = start_after_id
+    tasks_scanned = 0
+    started = time.monotonic()
+    while True:
+        task_ids = db.execute(
+            select(Task.id).where(Task.id > last_id).order_by(Task.id).limit(batch_size)
+        ).scalars().all()
+        if not task_ids:
+            break
+        refresh_task_comment_stats(db, task_ids)
+        db.commit()
+        tasks_scanned += len(task_ids)
+        last_id = task_ids[-1]
+        log.info("task comment stats backfill through task id %s (%s tasks)", last_id, tasks_scanned)
+
+    if mark_ready:
+        TASK_COMMENT_STATS_READY.set(db, {"tasks": tasks_scanned})
+        db.commit()
+    return {
+        "tasksScanned": tasks_scanned,
+        "lastTaskId": last_id,
+        "markedReady": mark_ready,
+        "elapsedSeconds": round(time.monotonic() - started, 2),
+    }
@@ -7,12 +7,14 @@ capture-ingestion revalidation (providers/freepik/capture.py) can never drift
 apart on what "active" / "assigned to this user" means - the whole point of
 revalidating server-side is that both checks must agree.
 """
-from typing import Optional
+from typing import Iterable, Optional
 
-from sqlalchemy import or_
+from sqlalchemy import select, union_all
 from sqlalchemy.orm import Session
 
-from models_new import ParticipantRole, Task, TaskParticipant, TaskStage, TaskStageAssignee, TaskStatus
+from models_new import ParticipantRole, Task, TaskParticipant, TaskStage, TaskStageAssignee, TaskStatus, TaskVisibility
+from utils.env import int_env
+from utils.local_cache import TTLCache, VersionWatcher
 
 # Statuses where the assignee still has to act on the task. Deliberately
 # excludes SUBMITTED/UNDER_REVIEW (actionable for a reviewer/approver, not the
@@ -30,37 +32,117 @@ ACTIVE_TASK_STATUSES = (
 WORKFLOW_ASSIGNEE_ROLE = "assignee"
 
 
-def _assigned_task_ids_query(db: Session, user_id: int):
-    """Task ids where `user_id` is an active, non-creator participant or an
+# Every captured event with a task attribution used to re-run both
+# assignment subqueries for the same (user, task) pair. The answer only
+# changes when a task moves through its workflow, so it is cached per user
+# for a few seconds and dropped by invalidate_active_task_ids(), which the
+# task state-change endpoints reach through
+# tasks_router.invalidate_task_lane_b_cache().
+ACTIVE_TASK_IDS_TTL_SECONDS = max(0, int_env("TASK_GATE_ACTIVE_IDS_TTL_SECONDS", 30))
+_ACTIVE_TASK_IDS = TTLCache(ttl=ACTIVE_TASK_IDS_TTL_SECONDS, max_entries=5000)
+_ACTIVE_TASK_IDS_VERSION = VersionWatcher("task-gate:active-task-ids:version")
+
+
+def _load_active_task_ids(db: Session, user_ids: set[int]) -> dict[int, frozenset[int]]:
+    """Task ids where each user is an active, non-creator participant or an
     active stage-assignee - the same visibility get_all_user_tasks()
-    (tasks_router.py) grants, narrowed here to "must act", not "involved"."""
-    participant_task_ids = db.query(TaskParticipant.task_id).filter(
-        TaskParticipant.user_id == user_id,
-        TaskParticipant.is_active == True,  # noqa: E712
-        TaskParticipant.role != ParticipantRole.CREATOR,
+    (tasks_router.py) grants, narrowed here to "must act", not "involved".
+    One round-trip for any number of users: a LANE_ACTIVE scan of
+    task_visibility once it is backfilled, otherwise the participant and
+    stage-assignee branches combined with UNION ALL."""
+    from utils.task_visibility import LANE_ACTIVE, has_lane, task_visibility_ready
+
+    by_user: dict[int, set[int]] = {user_id: set() for user_id in user_ids}
+    if task_visibility_ready(db):
+        rows = db.execute(
+            select(TaskVisibility.user_id, TaskVisibility.task_id).where(
+                TaskVisibility.user_id.in_(user_ids),
+                has_lane(LANE_ACTIVE),
+            )
+        ).all()
+        for user_id, task_id in rows:
+            by_user.setdefault(user_id, set()).add(task_id)
+        return {user_id: frozenset(task_ids) for user_id, task_ids in by_user.items()}
+
+    participant_rows = (
+        select(TaskParticipant.user_id.label("user_id"), Task.id.label("task_id"))
+        .join(Task, Task.id == TaskParticipant.task_id)
+        .where(
+            TaskParticipant.user_id.in_(user_ids),
+            TaskParticipant.is_active == True,  # noqa: E712
+            TaskParticipant.role != ParticipantRole.CREATOR,
+            Task.is_deleted == False,  # noqa: E712
+            Task.status.in_(ACTIVE_TASK_STATUSES),
+        )
     )
-    stage_assignee_task_ids = (
-        db.query(TaskStage.task_id)
-        .join(TaskStageAssignee, TaskStageAssignee.stage_id == TaskStage.id)
-        .filter(
-            TaskStageAssignee.user_id == user_id,
+    stage_assignee_rows = (
+        select(TaskStageAssignee.user_id.label("user_id"), Task.id.label("task_id"))
+        .join(TaskStage, TaskStage.id == TaskStageAssignee.stage_id)
+        .join(Task, Task.id == TaskStage.task_id)
+        .where(
+            TaskStageAssignee.user_id.in_(user_ids),
             TaskStageAssignee.is_active == True,  # noqa: E712
             TaskStageAssignee.role == WORKFLOW_ASSIGNEE_ROLE,
+            Task.is_deleted == False,  # noqa: E712
+            Task.status.in_(ACTIVE_TASK_STATUSES),
         )
     )
-    return participant_task_ids, stage_assignee_task_ids
+    for user_id, task_id in db.execute(union_all(participant_rows, stage_assignee_rows)).all():
+        by_user.setdefault(user_id, set()).add(task_id)
+    return {user_id: frozenset(task_ids) for user_id, task_ids in by_user.items()}
+
+
+def get_active_task_ids(db: Session, user_ids: Iterable[int]) -> dict[int, frozenset[int]]:
+    """Active, assigned task ids per user - cached, with every cache miss in
+    the batch answered by a single query."""
+    wanted = {int(user_id) for user_id in user_ids if user_id}
+    if not wanted:
+        return {}
+    if _ACTIVE_TASK_IDS_VERSION.changed():
+        _ACTIVE_TASK_IDS.clear()
+
+    result: dict[int, frozenset[int]] = {}
+    missing: set[int] = set()
+    for user_id in wanted:
+        cached = _ACTIVE_TASK_IDS.get(user_id) if ACTIVE_TASK_IDS_TTL_SECONDS else None
+        if cached is None:
+            missing.add(user_id)
+        else:
+            result[user_id] = cached
+    if missing:
+        loaded = _load_active_task_ids(db, missing)
+        for user_id, task_ids in loaded.items():
+            if ACTIVE_TASK_IDS_TTL_SECONDS:
+                _ACTIVE_TASK_IDS.set(user_id, task_ids)
+            result[user_id] = task_ids
+    return result
+
+
+def invalidate_active_task_ids(user_ids: Optional[Iterable[int]] = None) -> None:
+    """Drop cached active-task ids - for `user_ids` only when given, else for
+    everyone - and tell the other workers to drop theirs."""
+    if user_ids is None:
+        _ACTIVE_TASK_IDS.clear()
+    else:
+        for user_id in user_ids:
+            _ACTIVE_TASK_IDS.pop(int(user_id))
+    _ACTIVE_TASK_IDS_VERSION.bump()
 
 
 def get_active_tasks_for_user(db: Session, user_id: int, limit: int = 200) -> list[Task]:
     """Tasks `user_id` is currently expected to act on - populates the
     pre-generation task picker."""
-    participant_task_ids, stage_assignee_task_ids = _assigned_task_ids_query(db, user_id)
+    task_ids = get_active_task_ids(db, [user_id]).get(user_id) or frozenset()
+    if not task_ids:
+        return []
+    # Re-filtered on status/is_deleted so a task that closed inside the cache
+    # window drops out of the picker straight away.
     return (
         db.query(Task)
         .filter(
+            Task.id.in_(task_ids),
             Task.is_deleted == False,  # noqa: E712
             Task.status.in_(ACTIVE_TASK_STATUSES),
-            or_(Task.id.in_(participant_task_ids), Task.id.in_(stage_assignee_task_ids)),
         )
         .order_by(Task.updated_at.desc())
         .limit(limit)
@@ -76,24 +158,9 @@ def validate_task_for_generation(db: Session, task_id: Optional[int], user_id: i
     silently-dropped attribution, depending on context)."""
     if not task_id:
         return None
-
-    task = (
-        db.query(Task)
-        .filter(
-            Task.id == task_id,
-            Task.is_deleted == False,  # noqa: E712
-            Task.status.in_(ACTIVE_TASK_STATUSES),
-        )
-        .first()
-    )
-    if not task:
+    if task_id not in (get_active_task_ids(db, [user_id]).get(user_id) or frozenset()):
         return None
-
-    participant_task_ids, stage_assignee_task_ids = _assigned_task_ids_query(db, user_id)
-    is_assigned = (
-        db.query(Task.id)
-        .filter(Task.id == task_id, Task.id.in_(participant_task_ids))
-        .first()
-        or db.query(Task.id).filter(Task.id == task_id, Task.id.in_(stage_assignee_task_ids)).first()
-    )
-    return task if is_assigned else None
+    task = db.get(Task, task_id)
+    if not task or task.is_deleted or task.status not in ACTIVE_TASK_STATUSES:
+        return None
+    return task
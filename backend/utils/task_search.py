@@ -0,0 +1,231 @@
+# utils/task_search.py
+"""
+Task text search over one maintained document per task.
+
+The task lists used to search with ILIKE '%q%' against up to seven Task
+columns, and all-tasks also outer-joined every participant's User row to
+match names - multiplying rows before a DISTINCT. A leading wildcard can't
+use a btree, so every search read the whole tasks table (and the join).
+
+task_search_documents keeps, per task, one lower-cased text: number, project
+ids and name, title, description, departments, creator and participant
+names. On Postgres it carries a pg_trgm GIN index, which answers
+LIKE '%q%' from the index; elsewhere (SQLite, or Postgres without the
+extension) the same LIKE scans one narrow table with no joins. Fields are
+joined with newlines and whitespace inside a field is collapsed, so a
+match can't straddle two fields.
+
+Documents are rebuilt by a Session after_flush hook whenever a task's
+searchable columns, its participants, or a referenced user's name change.
+Search reads from the table only after backfill_task_search.py has filled
+it (see task_search_ready()); until then callers keep their ILIKE filters.
+"""
+import logging
+import re
+import time
+from datetime import datetime
+from itertools import chain
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, aliased
+
+from models_new import Task, TaskParticipant, TaskSearchDocument, User
+from utils.app_markers import AppSettingMarker
+
+logger = logging.getLogger(__name__)
+
+TASK_SEARCH_READY = AppSettingMarker("task_search_documents")
+REFRESH_CHUNK_SIZE = 500
+# Task columns whose text goes into the document, in document order.
+SEARCH_FIELDS = (
+    "task_number",
+    "project_id",
+    "project_id_raw",
+    "project_name",
+    "title",
+    "description",
+    "from_department",
+    "to_department",
+)
+_WATCHED_TASK_ATTRS = frozenset(SEARCH_FIELDS) | {"creator_id"}
+_WHITESPACE = re.compile(r"\s+")
+_table_present: dict = {}
+
+
+def normalize_search_text(value) -> str:
+    return _WHITESPACE.sub(" ", f"{value or ''}").strip().lower()
+
+
+def build_search_document(fields: Iterable, names: Iterable) -> str:
+    parts = [normalize_search_text(value) for value in chain(fields, names)]
+    return "\n".join(part for part in parts if part)
+
+
+def search_pattern(q: str) -> Optional[str]:
+    """LIKE pattern for `q` (escaped, lower-cased), or None when `q` has no
+    searchable text. Built in Python rather than with '%' || :q || '%' so the
+    planner sees a constant and can use the trigram index."""
+    needle = normalize_search_text(q)
+    if not needle:
+        return None
+    escaped = needle.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def join_task_search(query, q: str):
+    """Restrict an ORM query over Task to tasks whose document contains `q`.
+    One row per task, so no DISTINCT is needed afterwards."""
+    pattern = search_pattern(q)
+    if pattern is None:
+        return query
+    return query.join(TaskSearchDocument, TaskSearchDocument.task_id == Task.id).filter(
+        TaskSearchDocument.document.like(pattern, escape="\\")
+    )
+
+
+def task_search_ready(db: Session) -> bool:
+    return TASK_SEARCH_READY.is_set(db)
+
+
+# ── Maintaining documents ────────────────────────────────────────────────────
+
+def refresh_task_search_documents(bind, task_ids: Iterable[int]) -> int:
+    """Rewrites the documents of `task_ids` from the current (flushed) state;
+    tasks that no longer exist lose theirs. Returns documents written."""
+    if isinstance(bind, Session):
+        bind.flush()
+        conn = bind.connection()
+    else:
+        conn = bind
+    wanted = sorted({int(task_id) for task_id in task_ids if task_id})
+    written = 0
+    creator = aliased(User)
+    for start in range(0, len(wanted), REFRESH_CHUNK_SIZE):
+        chunk = wanted[start:start + REFRESH_CHUNK_SIZE]
+        tasks = conn.execute(
+            select(Task.id, *(getattr(Task, name) for name in SEARCH_FIELDS), creator.name)
+            .outerjoin(creator, creator.id == Task.creator_id)
+            .where(Task.id.in_(chunk))
+            .order_by(Task.id)
+            .with_for_update(of=Task)
+        ).all()
+        names: dict[int, list[str]] = {}
+        for task_id, name in conn.execute(
+            select(TaskParticipant.task_id, User.name)
+            .join(User, User.id == TaskParticipant.user_id)
+            .where(TaskParticipant.task_id.in_(chunk))
+            .order_by(TaskParticipant.id)
+        ):
+            names.setdefault(task_id, []).append(name)
+
+        now = datetime.utcnow()
+        rows = []
+        for row in tasks:
+            fields = row[1:1 + len(SEARCH_FIELDS)]
+            creator_name = row[-1]
+            people = [creator_name, *(name for name in names.get(row.id, []) if name != creator_name)]
+            rows.append({
+                "task_id": row.id,
+                "document": build_search_document(fields, dict.fromkeys(people)),
+                "updated_at": now,
+            })
+        conn.execute(delete(TaskSearchDocument).where(TaskSearchDocument.task_id.in_(chunk)))
+        if rows:
+            conn.execute(insert(TaskSearchDocument), rows)
+        written += len(rows)
+    return written
+
+
+def _table_exists(conn: Connection) -> bool:
+    engine = conn.engine
+    present = _table_present.get(engine)
+    if present is None:
+        present = inspect(conn).has_table(TaskSearchDocument.__tablename__)
+        _table_present[engine] = present
+    return present
+
+
+def _changed(obj, attributes: Iterable[str]) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_after_flush(session: Session, _flush_context) -> None:
+    task_ids: set[int] = set()
+    renamed_user_ids: set[int] = set()
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, Task):
+            task_ids.add(inspect(obj).dict.get("id"))
+        elif isinstance(obj, TaskParticipant):
+            task_ids.add(inspect(obj).dict.get("task_id"))
+    for obj in session.dirty:
+        # Most task flushes only move status/updated_at; skip those.
+        if isinstance(obj, Task) and _changed(obj, _WATCHED_TASK_ATTRS):
+            task_ids.add(inspect(obj).dict.get("id"))
+        elif isinstance(obj, TaskParticipant) and _changed(obj, ("user_id", "task_id")):
+            task_ids.add(inspect(obj).dict.get("task_id"))
+        elif isinstance(obj, User) and _changed(obj, ("name",)):
+            renamed_user_ids.add(inspect(obj).dict.get("id"))
+    task_ids.discard(None)
+    renamed_user_ids.discard(None)
+    if not task_ids and not renamed_user_ids:
+        return
+
+    conn = session.connection()
+    if not _table_exists(conn):
+        return
+    if renamed_user_ids:
+        task_ids.update(conn.execute(select(Task.id).where(Task.creator_id.in_(renamed_user_ids))).scalars())
+        task_ids.update(
+            conn.execute(
+                select(TaskParticipant.task_id).where(TaskParticipant.user_id.in_(renamed_user_ids))
+            ).scalars()
+        )
+    refresh_task_search_documents(conn, task_ids)
+
+
+def reset_task_search_state() -> None:
+    """Forget cached readiness and table checks (tests, and after a restore)."""
+    TASK_SEARCH_READY.reset()
+    _table_present.clear()
+
+
+def run_task_search_backfill(
+    db: Session,
+    *,
+    batch_size: int = 500,
+    start_after_id: int = 0,
+    mark_ready: bool = True,
+    logger: Optional[logging.Logger] = None,
+) -> dict:
+    """Builds documents for every task with id > `start_after_id`, committing
+    per batch so an interrupted run can resume from the last id it logged."""
+    log = logger if logger is not None else logging.getLogger(__name__)
+    last_id = start_after_id
+    tasks_scanned = 0
+    started = time.monotonic()
+    while True:
+        task_ids = db.execute(
+            select(Task.id).where(Task.id > last_id).order_by(Task.id).limit(batch_size)
+        ).scalars().all()
+        if not task_ids:
+            break
+        refresh_task_search_documents(db, task_ids)
+        db.commit()
+        tasks_scanned += len(task_ids)
+        last_id = task_ids[-1]
+        log.info("task search backfill through task id %s (%s tasks)", last_id, tasks_scanned)
+
+    if mark_ready:
+        TASK_SEARCH_READY.set(db, {"tasks": tasks_scanned})
+        db.commit()
+    return {
+        "tasksScanned": tasks_scanned,
+        "lastTaskId": last_id,
+        "markedReady": mark_ready,
+        "elapsedSeconds": round(time.monotonic() - started, 2),
+    }
+
@@ -0,0 +1,140 @@
+# utils/task_views.py
+"""
+Write-behind buffer for TaskView ("seen by") timestamps.
+
+Opening a task's comment thread used to update its TaskView row and commit
+on every GET - and each of those commits rebuilt the task's card. Readers
+of a busy thread poll it, so most of those writes only moved a timestamp by
+a few seconds.
+
+GET handlers now call task_view_buffer.mark(), which only records the
+latest seen_at per (task, user) in memory. main.py's periodic loop calls
+flush() every TASK_VIEW_FLUSH_SECONDS, which writes the pending entries in
+one transaction: existing rows move forward (never back), missing rows are
+inserted, and the affected cards are rebuilt once per flush. Writes that
+carry their own commit (posting a comment, POST /seen) keep calling
+mark_seen() directly.
+
+Pending entries are per process and are lost if the process dies before a
+flush; seen-by is advisory, so that is the trade. When the buffer is full,
+or TASK_VIEW_BUFFER_ENABLED=0, mark() returns False and the caller writes
+through instead.
+"""
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models_new import TaskView
+from utils.env import bool_env, int_env
+
+
+TASK_VIEW_FLUSH_SECONDS = max(1, int_env("TASK_VIEW_FLUSH_SECONDS", 5))
+TASK_VIEW_BUFFER_MAX = max(1, int_env("TASK_VIEW_BUFFER_MAX", 10000))
+FLUSH_CHUNK_SIZE = 500
+
+ViewKey = Tuple[int, int]  # (task_id, user_id)
+
+
+class TaskViewBuffer:
+    def __init__(self, max_pending: int = TASK_VIEW_BUFFER_MAX, enabled: Optional[bool] = None):
+        self.max_pending = max_pending
+        self.enabled = bool_env("TASK_VIEW_BUFFER_ENABLED", True) if enabled is None else enabled
+        self._pending: Dict[ViewKey, datetime] = {}
+        self._lock = threading.Lock()
+        self.flushed = 0
+        self.failures = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def mark(self, task_id: int, user_id: int, seen_at: Optional[datetime] = None) -> bool:
+        """Records a view for the next flush. False means not buffered (off,
+        or full) and the caller should write it itself."""
+        if not self.enabled:
+            return False
+        key = (int(task_id), int(user_id))
+        seen_at = seen_at or datetime.utcnow()
+        with self._lock:
+            if key not in self._pending and len(self._pending) >= self.max_pending:
+                return False
+            previous = self._pending.get(key)
+            if previous is None or seen_at > previous:
+                self._pending[key] = seen_at
+        return True
+
+    def pending_seen_at(self, task_id: int, user_id: int) -> Optional[datetime]:
+        return self._pending.get((int(task_id), int(user_id)))
+
+    def _drain(self) -> Dict[ViewKey, datetime]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def _requeue(self, entries: Dict[ViewKey, datetime]) -> None:
+        with self._lock:
+            for key, seen_at in entries.items():
+                current = self._pending.get(key)
+                if current is None or seen_at > current:
+                    self._pending[key] = seen_at
+
+    def flush(self, session_factory: Callable[[], Session]) -> int:
+        """Writes every pending view in one transaction; returns how many.
+        On failure the entries go back into the buffer for the next flush."""
+        entries = self._drain()
+        if not entries:
+            return 0
+        db = session_factory()
+        try:
+            write_task_views(db, entries)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self._requeue(entries)
+            self.failures += 1
+            raise
+        finally:
+            db.close()
+        self.flushed += len(entries)
+        return len(entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending.clear()
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self),
+            "maxPending": self.max_pending,
+            "flushed": self.flushed,
+            "failures": self.failures,
+        }
+
+
+def write_task_views(db: Session, entries: Dict[ViewKey, datetime]) -> None:
+    """Moves TaskView rows forward to `entries`' timestamps, inserting the
+    missing ones. Goes through the ORM so the task_cards hook sees the
+    changed views."""
+    keys = sorted(entries)
+    for start in range(0, len(keys), FLUSH_CHUNK_SIZE):
+        chunk = keys[start:start + FLUSH_CHUNK_SIZE]
+        task_ids = {task_id for task_id, _user_id in chunk}
+        user_ids = {user_id for _task_id, user_id in chunk}
+        existing: Dict[ViewKey, TaskView] = {}
+        for view in db.scalars(
+            select(TaskView).where(TaskView.task_id.in_(task_ids), TaskView.user_id.in_(user_ids)).order_by(TaskView.id)
+        ):
+            existing.setdefault((view.task_id, view.user_id), view)
+        for key in chunk:
+            seen_at = entries[key]
+            view = existing.get(key)
+            if view is None:
+                db.add(TaskView(task_id=key[0], user_id=key[1], seen_at=seen_at))
+            elif view.seen_at is None or view.seen_at < seen_at:
+                view.seen_at = seen_at
+
+
+task_view_buffer = TaskViewBuffer()
@@ -0,0 +1,327 @@
+# utils/task_visibility.py
+"""
+Per-user task list membership, kept in the task_visibility table.
+
+Inbox, outbox, all-tasks and the unread badge each used to work out "which
+tasks can this user see" on every call: outer joins from tasks to
+task_participants (and, for all-tasks, task_stages and task_stage_assignees),
+an OR across creator / submitter / participant branches, then DISTINCT to
+undo the join fan-out before ordering by updated_at. None of that can use an
+index for the ORDER BY, so every page sorted the user's whole task history.
+
+task_visibility stores the answer instead: one row per (user, task) the user
+can see, with a bit per list (LANE_*), whether any of the user's
+inbox-relevant participant rows is unread, and the task's updated_at. Each
+listing becomes a range scan of ix_task_visibility_user_updated for one
+user, newest first.
+
+Rows are derived, never edited by hand. A Session after_flush hook recomputes
+every task touched by the flush - Task, TaskParticipant, TaskStage and
+TaskStageAssignee changes - so ensure_participant(), stage assignment,
+forward, revoke, mark-seen and the rest stay covered without each call site
+remembering to. Code that changes those tables with bulk UPDATEs must call
+refresh_task_visibility() itself.
+
+The table is only read once backfill_task_visibility.py has filled it and
+recorded the app_settings marker; until then callers keep their original
+queries (see task_visibility_ready()).
+"""
+import logging
+import time
+from itertools import chain
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import and_, delete, event, insert, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from models_new import (
+    ParticipantRole,
+    Task,
+    TaskParticipant,
+    TaskStage,
+    TaskStageAssignee,
+    TaskStatus,
+    TaskVisibility,
+)
+from utils.app_markers import AppSettingMarker
+from utils.task_gate import ACTIVE_TASK_STATUSES, WORKFLOW_ASSIGNEE_ROLE
+
+logger = logging.getLogger(__name__)
+
+LANE_INBOX = 1      # get_inbox()
+LANE_OUTBOX = 2     # get_outbox(): creator or submitter
+LANE_TRACKING = 4   # get_all_user_tasks(): any involvement, drafts excluded
+LANE_ACTIVE = 8     # utils/task_gate.py: must act on it now
+LANE_RECEIVED = 16  # inbox via a participant row on someone else's task - the unread badge
+
+# Statuses in which get_inbox() shows a task to its creator (results to review).
+CREATOR_REVIEW_STATUSES = frozenset({
+    TaskStatus.SUBMITTED,
+    TaskStatus.NEED_IMPROVEMENT,
+    TaskStatus.APPROVED,
+    TaskStatus.COMPLETED,
+})
+
+TASK_VISIBILITY_READY = AppSettingMarker("task_visibility")
+REFRESH_CHUNK_SIZE = 500
+
+_STALE_INFO_KEY = "task_visibility_stale"
+_table_present: dict = {}
+
+
+def has_lane(lane: int):
+    """SQL predicate: the joined TaskVisibility row carries `lane`."""
+    return TaskVisibility.lanes.op("&")(lane) != 0
+
+
+def join_task_visibility(query, user_id: int, lane: int):
+    """Restrict an ORM query over Task to tasks in `user_id`'s `lane`."""
+    return query.join(
+        TaskVisibility,
+        and_(TaskVisibility.task_id == Task.id, TaskVisibility.user_id == user_id),
+    ).filter(has_lane(lane))
+
+
+def visibility_order():
+    """Newest first, matching the index; task_id breaks updated_at ties."""
+    return (TaskVisibility.updated_at.desc(), TaskVisibility.task_id.desc())
+
+
+# ── Computing rows ───────────────────────────────────────────────────────────
+
+def _is_unread(is_read) -> bool:
+    # The legacy filters compared `is_read == False`, which a NULL never matches.
+    return is_read is not None and not is_read
+
+
+def compute_task_visibility(task, participants: list, stage_assignee_ids: Iterable[int]) -> dict[int, tuple[int, bool]]:
+    """{user_id: (lanes, is_read)} for one task row.
+
+    `participants` are (user_id, role, is_active, is_read) tuples for every
+    participant row of the task, `stage_assignee_ids` the users with an active
+    "assignee" row on any of its stages.
+    """
+    if task.is_deleted is None or task.is_deleted:
+        return {}
+    status = task.status
+    legacy_hod_approved = (
+        status == TaskStatus.FORWARDED
+        and task.workflow_stage == "hod_approved"
+        and (task.submitted_at is not None or task.submitted_by is not None or task.result_text is not None)
+    )
+    creator_inbox = status in CREATOR_REVIEW_STATUSES or legacy_hod_approved
+    is_active_status = status in ACTIVE_TASK_STATUSES
+    # Matches `status != DRAFT` in SQL, which a NULL status fails too.
+    is_tracked = status is not None and status != TaskStatus.DRAFT
+    tracking = LANE_TRACKING if is_tracked else 0
+
+    lanes: dict[int, int] = {}
+    unread: dict[int, bool] = {}
+
+    def add(user_id: int, lane: int) -> None:
+        lanes[user_id] = lanes.get(user_id, 0) | lane
+
+    for user_id in {task.creator_id, task.submitted_by} - {None}:
+        add(user_id, LANE_OUTBOX | tracking)
+    if task.creator_id is not None and creator_inbox:
+        add(task.creator_id, LANE_INBOX)
+
+    # Inbox rows are read per participant row: a creator-branch row is unread
+    # while any of the creator's rows is, a participant-branch row while the
+    # qualifying row itself is.
+    for user_id, role, is_active, is_read in participants:
+        if not is_active:
+            qualifies = False
+        else:
+            add(user_id, tracking)
+            if role != ParticipantRole.CREATOR and is_active_status:
+                add(user_id, LANE_ACTIVE)
+            qualifies = role != ParticipantRole.CREATOR and not (
+                role == ParticipantRole.HOD and task.workflow_stage == "pending_creator_hod"
+            )
+        if qualifies:
+            add(user_id, LANE_INBOX)
+            if user_id != task.creator_id:
+                add(user_id, LANE_RECEIVED)
+        if _is_unread(is_read) and (qualifies or (user_id == task.creator_id and creator_inbox)):
+            unread[user_id] = True
+
+    for user_id in stage_assignee_ids:
+        add(user_id, tracking | (LANE_ACTIVE if is_active_status else 0))
+
+    return {user_id: (lane_bits, not unread.get(user_id, False)) for user_id, lane_bits in lanes.items() if lane_bits}
+
+
+def _connection(bind: Union[Session, Connection]) -> Connection:
+    if isinstance(bind, Session):
+        bind.flush()
+        return bind.connection()
+    return bind
+
+
+def refresh_task_visibility(bind: Union[Session, Connection], task_ids: Iterable[int]) -> int:
+    """Rewrites the task_visibility rows of `task_ids` from the current
+    (flushed) state; returns the number of rows written.
+
+    Task rows are locked first, in id order, so two transactions refreshing
+    the same task run one after the other instead of racing on the
+    delete-then-insert.
+    """
+    conn = _connection(bind)
+    wanted = sorted({int(task_id) for task_id in task_ids if task_id})
+    written = 0
+    for start in range(0, len(wanted), REFRESH_CHUNK_SIZE):
+        chunk = wanted[start:start + REFRESH_CHUNK_SIZE]
+        tasks = conn.execute(
+            select(
+                Task.id,
+                Task.creator_id,
+                Task.submitted_by,
+                Task.status,
+                Task.workflow_stage,
+                Task.submitted_at,
+                Task.result_text,
+                Task.is_deleted,
+                Task.updated_at,
+            )
+            .where(Task.id.in_(chunk))
+            .order_by(Task.id)
+            .with_for_update()
+        ).all()
+        participants: dict[int, list] = {}
+        for task_id, user_id, role, is_active, is_read in conn.execute(
+            select(
+                TaskParticipant.task_id,
+                TaskParticipant.user_id,
+                TaskParticipant.role,
+                TaskParticipant.is_active,
+                TaskParticipant.is_read,
+            ).where(TaskParticipant.task_id.in_(chunk))
+        ):
+            participants.setdefault(task_id, []).append((user_id, role, is_active, is_read))
+        stage_assignees: dict[int, set[int]] = {}
+        for task_id, user_id in conn.execute(
+            select(TaskStage.task_id, TaskStageAssignee.user_id)
+            .join(TaskStage, TaskStage.id == TaskStageAssignee.stage_id)
+            .where(
+                TaskStage.task_id.in_(chunk),
+                TaskStageAssignee.is_active == True,  # noqa: E712
+                TaskStageAssignee.role == WORKFLOW_ASSIGNEE_ROLE,
+            )
+        ):
+            stage_assignees.setdefault(task_id, set()).add(user_id)
+
+        rows = []
+        for task in tasks:
+            visibility = compute_task_visibility(task, participants.get(task.id, []), stage_assignees.get(task.id, ()))
+            rows.extend(
+                {"user_id": user_id, "task_id": task.id, "lanes": lane_bits, "is_read": is_read, "updated_at": task.updated_at}
+                for user_id, (lane_bits, is_read) in visibility.items()
+            )
+        conn.execute(delete(TaskVisibility).where(TaskVisibility.task_id.in_(chunk)))
+        if rows:
+            conn.execute(insert(TaskVisibility), rows)
+        written += len(rows)
+    return written
+
+
+# ── Keeping rows current ─────────────────────────────────────────────────────
+
+def _table_exists(conn: Connection) -> bool:
+    # Checked once per engine: deployments that haven't run the migration yet
+    # (and test databases that only create the tables they need) must keep
+    # flushing tasks normally.
+    engine = conn.engine
+    present = _table_present.get(engine)
+    if present is None:
+        present = inspect(conn).has_table(TaskVisibility.__tablename__)
+        _table_present[engine] = present
+    return present
+
+
+def mark_task_visibility_stale(db: Session, task_ids: Iterable[int]) -> None:
+    """Queue `task_ids` for the refresh that runs at the session's next flush."""
+    db.info.setdefault(_STALE_INFO_KEY, set()).update(int(task_id) for task_id in task_ids if task_id)
+
+
+def _loaded(obj, attribute: str):
+    # Read what the flush already knows; never trigger a lazy load mid-flush.
+    return inspect(obj).dict.get(attribute)
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_after_flush(session: Session, _flush_context) -> None:
+    task_ids: set[int] = set(session.info.pop(_STALE_INFO_KEY, ()))
+    stage_ids: set[int] = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Task):
+            task_ids.add(_loaded(obj, "id"))
+        elif isinstance(obj, (TaskParticipant, TaskStage)):
+            task_ids.add(_loaded(obj, "task_id"))
+        elif isinstance(obj, TaskStageAssignee):
+            stage_ids.add(_loaded(obj, "stage_id"))
+    task_ids.discard(None)
+    stage_ids.discard(None)
+    if not task_ids and not stage_ids:
+        return
+
+    conn = session.connection()
+    if not _table_exists(conn):
+        return
+    if stage_ids:
+        task_ids.update(conn.execute(select(TaskStage.task_id).where(TaskStage.id.in_(stage_ids))).scalars())
+    refresh_task_visibility(conn, task_ids)
+
+
+# ── Readiness ────────────────────────────────────────────────────────────────
+
+def task_visibility_ready(db: Session) -> bool:
+    """True once the backfill has completed."""
+    return TASK_VISIBILITY_READY.is_set(db)
+
+
+def reset_task_visibility_state() -> None:
+    """Forget cached readiness and table checks (tests, and after a restore)."""
+    TASK_VISIBILITY_READY.reset()
+    _table_present.clear()
+
+
+def run_task_visibility_backfill(
+    db: Session,
+    *,
+    batch_size: int = 500,
+    start_after_id: int = 0,
+    mark_ready: bool = True,
+    logger: Optional[logging.Logger] = None,
+) -> dict:
+    """Rebuilds task_visibility for every task with id > `start_after_id`,
+    committing per batch so an interrupted run can resume from the last id it
+    logged. Records the readiness marker at the end unless `mark_ready` is off."""
+    log = logger if logger is not None else logging.getLogger(__name__)
+    last_id = start_after_id
+    tasks_scanned = 0
+    rows_written = 0
+    started = time.monotonic()
+    while True:
+        task_ids = db.execute(
+            select(Task.id).where(Task.id > last_id).order_by(Task.id).limit(batch_size)
+        ).scalars().all()
+        if not task_ids:
+            break
+        rows_written += refresh_task_visibility(db, task_ids)
+        db.commit()
+        tasks_scanned += len(task_ids)
+        last_id = task_ids[-1]
+        log.info("task visibility backfill through task id %s (%s tasks, %s rows)", last_id, tasks_scanned, rows_written)
+
+    if mark_ready:
+        TASK_VISIBILITY_READY.set(db, {"tasks": tasks_scanned, "rows": rows_written})
+        db.commit()
+    return {
+        "tasksScanned": tasks_scanned,
+        "rowsWritten": rows_written,
+        "lastTaskId": last_id,
+        "markedReady": mark_ready,
+        "elapsedSeconds": round(time.monotonic() - started, 2),
+    }